@@ -30,8 +30,10 @@
 from __future__ import division
 
 from builtins import range
+from multiprocessing import Pool, cpu_count
 import os
 import re
+import time
 import cv2
 import traceback
 
@@ -48,11 +50,23 @@ from mig.shared.imagemetaio import __tables_image_volumes_preview_data_group, \
     add_image_volume, update_image_volume_setting, \
     get_image_file_ent_template_dict, get_image_volume_ent_template_dict
 
-from numpy import zeros, empty, fromfile, int8, uint8, int16, uint16, \
-    int32, uint32, int64, uint64, float64, cast, rint, mean, median
+from numpy import zeros, empty, asarray, memmap, dtype, int8, uint8, \
+    int16, uint16, int32, uint32, int64, uint64, float64, rint, \
+    median
 from libtiff import TIFF
 import hashlib
 
+# Size of the blocks used when hashing and collecting stats for image files
+stats_block_size = 1048576
+
+# Progress is saved in the settings file after this many percent of the files
+# or seconds whichever comes first
+progress_update_percent = 5
+progress_update_interval = 10
+
+# Logger used in preview worker processes
+_worker_logger = None
+
 
 def __init_meta(
     logger,
@@ -83,26 +97,26 @@ def __init_meta(
     return result
 
 
-def fill_image_md5sum(logger, meta, blocksize=65536):
-    """Generate md5sum"""
+def __init_progress(total):
+    """Init state for batched progress updates of total steps"""
 
-    result = False
-    image = meta['2D']
+    return {'total': total, 'saved_count': 0, 'saved_time': time.time()}
 
-    filepath = os.path.join(os.path.join(meta['base_path'], meta['path'
-                                                                 ]), meta['filename'])
-    try:
-        hash = hashlib.md5()
-        fh = open(filepath, 'rb')
-        for block in iter(lambda: fh.read(blocksize), ''):
-            hash.update(block)
-        fh.close()
-        image['md5sum'] = hash.hexdigest()
-        result = True
-    except Exception:
-        logger.error(traceback.format_exc())
-        result = False
-    return result
+
+def __progress_due(progress, count):
+    """Check if progress after count steps should be saved in the settings
+    file. That is the case after progress_update_percent of the steps or
+    progress_update_interval seconds since the last save and at the end.
+    """
+
+    now = time.time()
+    step = max(1, progress['total'] * progress_update_percent // 100)
+    if count < progress['total'] and count - progress['saved_count'] < step \
+            and now - progress['saved_time'] < progress_update_interval:
+        return False
+    progress['saved_count'] = count
+    progress['saved_time'] = now
+    return True
 
 
 def fill_image_data(logger, meta):
@@ -127,12 +141,17 @@ def fill_image_data(logger, meta):
         y_dimension = settings['y_dimension']
         data_type = allowed_data_types[settings['data_type']]
 
+        # Map the file copy-on-write and use a view of the image part as
+        # data to avoid copies and to reuse the mapping for the md5sum
+
         try:
-            fh = open(filepath, 'rb')
-            fh.seek(offset)
-            image['data'] = fromfile(fh, dtype=data_type)
-            fh.close()
-            image['data'].shape = (y_dimension, x_dimension)
+            raw = memmap(filepath, dtype=uint8, mode='c')
+            data_size = x_dimension * y_dimension \
+                * dtype(data_type).itemsize
+            data = asarray(raw[offset:offset + data_size]).view(data_type)
+            data.shape = (y_dimension, x_dimension)
+            image['raw'] = raw
+            image['data'] = data
         except Exception:
             result = False
             logger.error(traceback.format_exc())
@@ -203,16 +222,56 @@ def fill_image_data(logger, meta):
     return result
 
 
-def fill_image_stats(logger, meta):
-    """Generate image statistics"""
+def fill_image_stats(logger, meta, blocksize=stats_block_size):
+    """Generate image statistics and md5sum in a single pass over the image
+    file and data. The median requires a separate partial sort.
+    """
 
-    result = True
+    result = False
     image = meta['2D']
+    data = image['data']
+    raw = image.get('raw', None)
+    filepath = os.path.join(os.path.join(meta['base_path'], meta['path'
+                                                                 ]), meta['filename'])
 
-    image['stats']['mean'] = mean(image['data'])
-    image['stats']['median'] = median(image['data'])
-    image['stats']['min_value'] = image['data'].min()
-    image['stats']['max_value'] = image['data'].max()
+    rows_per_block = max(1, blocksize // max(1, data[0].nbytes))
+    checksum = hashlib.md5()
+    (min_value, max_value, total) = (None, None, 0.0)
+    fh = None
+    try:
+        if raw is not None:
+            pos = image['settings']['offset']
+            checksum.update(raw[:pos])
+        else:
+            fh = open(filepath, 'rb')
+        for start in range(0, data.shape[0], rows_per_block):
+            block = data[start:start + rows_per_block]
+            if raw is not None:
+                checksum.update(raw[pos:pos + block.nbytes])
+                pos += block.nbytes
+            else:
+                checksum.update(fh.read(blocksize))
+            (block_min, block_max) = (block.min(), block.max())
+            if min_value is None or block_min < min_value:
+                min_value = block_min
+            if max_value is None or block_max > max_value:
+                max_value = block_max
+            total += block.sum(dtype=float64)
+        if raw is not None:
+            checksum.update(raw[pos:])
+        else:
+            for chunk in iter(lambda: fh.read(blocksize), b''):
+                checksum.update(chunk)
+        image['md5sum'] = checksum.hexdigest()
+        image['stats']['mean'] = total / (data.size or 1)
+        image['stats']['median'] = median(data)
+        image['stats']['min_value'] = min_value
+        image['stats']['max_value'] = max_value
+        result = True
+    except Exception:
+        logger.error(traceback.format_exc())
+    if fh is not None:
+        fh.close()
 
     return result
 
@@ -227,8 +286,8 @@ def fill_image_preview(logger, meta):
     settings = image['settings']
     x_dimension = settings['preview_x_dimension']
     y_dimension = settings['preview_y_dimension']
-    settings['min_value'] = data.min()
-    settings['max_value'] = data.max()
+    settings['min_value'] = image['stats']['min_value']
+    settings['max_value'] = image['stats']['max_value']
 
     # Cutoff data
 
@@ -256,8 +315,15 @@ def fill_image_preview(logger, meta):
     (low, high) = (0, 255)
     scale = high * 1. / (cmax - cmin or 1)
 
-    bytedata = ((data * 1. - cmin) * scale + 0.4999).astype(uint8)
-    bytedata += cast[uint8](low)
+    # NOTE: rescale in a single float buffer to avoid temporary copies
+
+    floatdata = data.astype(float64)
+    floatdata -= cmin
+    floatdata *= scale
+    floatdata += 0.4999
+    bytedata = floatdata.astype(uint8)
+    del floatdata
+    bytedata += asarray(low).astype(uint8)
 
     # Resize data
 
@@ -281,7 +347,7 @@ def fill_image_preview(logger, meta):
     preview['cutoff_max'] = cmax
     preview['scale'] = scale
     preview['rescaled_data'] = rescaled_data
-    logger.debug('data.shape: %s' % data.shape)
+    logger.debug('data.shape: %s' % (data.shape, ))
     logger.debug('data.dtype: %s' % data.dtype)
 
     # cv2.resize can't handle (u)ints of more than 16 bit
@@ -690,7 +756,8 @@ def add_volume_preview_slice_data(logger, meta):
         filepattern_index = volume_slice_filepattern.find('%')
         logger.debug('filepattern_index: %s' % filepattern_index)
         image_files = get_image_files(logger, abs_base_path, path=path,
-                                      extension=extension, data_entries=None)
+                                      extension=extension, data_entries=None,
+                                      columns=['name', 'data_type'])
         logger.debug('image_files count: %s' % len(image_files))
 
         # Get metadata
@@ -755,13 +822,18 @@ def add_volume_preview_slice_data(logger, meta):
             slice_idx = 0
             max_slice_shape = (0, 0)
 
+            # NOTE: only save progress once in a while as each update
+            #       rewrites the shared settings file under lock
+
+            progress = __init_progress(int(100.0 / volume_progress_step))
             for file_idx in sorted_keys[:z_dimension]:
                 volume_progress += volume_progress_step
-                update_volume_setting['settings_update_progress'] = \
-                    '%s/%s : %s%%' % (volume_nr, volume_count,
-                                      int(round(volume_progress)))
-                update_image_volume_setting(logger, abs_base_path,
-                                            update_volume_setting)
+                if __progress_due(progress, slice_idx + 1):
+                    update_volume_setting['settings_update_progress'] = \
+                        '%s/%s : %s%%' % (volume_nr, volume_count,
+                                          int(round(volume_progress)))
+                    update_image_volume_setting(logger, abs_base_path,
+                                                update_volume_setting)
 
                 filename = volume_slice_filepattern % int(file_idx)
                 slice_preview_data = \
@@ -777,11 +849,8 @@ def add_volume_preview_slice_data(logger, meta):
                                    max(max_slice_shape[1],
                                        slice_preview_data.shape[1]))
 
-                logger.debug('slice_preview_data: %s, shape: %s, min: %s, max: %s'
-                             % (slice_idx,
-                                 slice_preview_data.shape,
-                                 tmp_volume[slice_idx].min(),
-                                 tmp_volume[slice_idx].max()))
+                logger.debug('slice_preview_data: %s, shape: %s'
+                             % (slice_idx, slice_preview_data.shape))
 
                 logger.debug('max_slice_shape: %s' % (max_slice_shape, ))
                 slice_idx += 1
@@ -811,25 +880,16 @@ def add_volume_preview_slice_data(logger, meta):
             resized_volume = zeros(resized_volume_shape,
                                    dtype=data_type)
             for x in range(resize_x_dimension):
-                update_volume_setting['settings_update_progress'] = \
-                    '%s/%s : %s%%' % (volume_nr, volume_count,
-                                      int(round(volume_progress)))
-                update_image_volume_setting(logger, abs_base_path,
-                                            update_volume_setting)
-                logger.debug('resize_x_dimension: %s, tmp slice: shape: %s, min: %s, max: %s'
-                             % (x, tmp_volume[:, :, x].shape,
-                                 tmp_volume[:, :, x].min(), tmp_volume[:, :, x].max()))
+                volume_progress += volume_progress_step
+                if __progress_due(progress, slice_idx + x + 1):
+                    update_volume_setting['settings_update_progress'] = \
+                        '%s/%s : %s%%' % (volume_nr, volume_count,
+                                          int(round(volume_progress)))
+                    update_image_volume_setting(logger, abs_base_path,
+                                                update_volume_setting)
                 resized_zy_slice = cv2.resize(tmp_volume[:, :, x],
                                               (resize_z_dimension, resize_y_dimension))
                 resized_volume[:, :, x] = resized_zy_slice
-                logger.debug('resized_zy_slice: %s, min: %s, max: %s'
-                             % (resized_zy_slice.shape,
-                                resized_zy_slice.min(),
-                                resized_zy_slice.max()))
-                logger.debug('resized_volume[:,:,x]: %s, min: %s, max: %s'
-                             % (resized_volume[:, :, x].shape,
-                                 resized_volume[:, :, x].min(),
-                                 resized_volume[:, :, x].max()))
             logger.debug('resized_volume: %s, min: %s, max: %s'
                          % (resized_volume.shape,
                             resized_volume.min(), resized_volume.max()))
@@ -855,7 +915,9 @@ def cleanup_previews(logger, base_path):
 
     result = True
     image_file_settings = get_image_file_settings(logger, abs_base_path)
-    image_file_entries = get_image_files(logger, abs_base_path)
+    image_file_entries = get_image_files(logger, abs_base_path,
+                                         columns=['path', 'name',
+                                                  'extension'])
 
     if image_file_entries is not None:
         for entry in image_file_entries:
@@ -951,8 +1013,8 @@ def update_file_preview(
 
     if settings is not None:
         org_settings = settings.copy()
-        if fill_image_data(logger, meta) and fill_image_stats(logger,
-                                                              meta) and fill_image_md5sum(logger, meta) \
+        if fill_image_data(logger, meta) \
+                and fill_image_stats(logger, meta) \
                 and fill_image_preview(logger, meta) \
                 and write_preview_image(logger, meta) \
                 and add_image_meta_data(logger, meta) \
@@ -1043,8 +1105,82 @@ def update_preview(
     return result
 
 
-def update_previews(logger, base_path, extension):
-    """Update image previews for *extension* in *base_path*"""
+def __find_image_files(base_path, extension, recursive):
+    """Find image files with *extension* in *base_path* in a single pass.
+    Returns a list of (path, name) tuples with path relative to base_path.
+    """
+
+    result = []
+    if recursive:
+        for (root, _, files) in os.walk(base_path):
+            path = root.replace(base_path, '', 1).strip('/')
+            for name in files:
+                if not name.startswith('.') \
+                        and name.endswith('.%s' % extension):
+                    result.append((path, name))
+    else:
+        for name in os.listdir(base_path):
+            if not name.startswith('.') and name.endswith('.%s'
+                                                          % extension) \
+                    and os.path.isfile(os.path.join(base_path, name)):
+                result.append(('', name))
+    return result
+
+
+def __init_preview_worker(logger):
+    """Set logger for use in preview worker processes"""
+
+    global _worker_logger
+    _worker_logger = logger
+
+
+def __file_preview_worker(task):
+    """Update file preview in worker process"""
+
+    (base_path, path, name) = task
+    _worker_logger.debug('check entry -> path: %s, name: %s' % (path,
+                                                                 name))
+    try:
+        result = update_file_preview(_worker_logger, base_path, path, name)
+    except Exception:
+        _worker_logger.error(traceback.format_exc())
+        result = False
+    return (path, name, result)
+
+
+def __volume_preview_worker(task):
+    """Update volume preview in worker process"""
+
+    (base_path, path, volume_nr, volume_count) = task
+    try:
+        result = update_volume_preview(_worker_logger, base_path, path,
+                                       volume_nr=volume_nr,
+                                       volume_count=volume_count)
+    except Exception:
+        _worker_logger.error(traceback.format_exc())
+        result = False
+    return (path, result)
+
+
+def __map_tasks(logger, pool, worker, tasks):
+    """Run worker on tasks in pool or in this process if pool is None.
+    Yields the results in completion order.
+    """
+
+    if pool is None:
+        __init_preview_worker(logger)
+        for task in tasks:
+            yield worker(task)
+    else:
+        for res in pool.imap_unordered(worker, tasks):
+            yield res
+
+
+def update_previews(logger, base_path, extension, workers=None):
+    """Update image previews for *extension* in *base_path*. The files are
+    processed in parallel by *workers* processes, which defaults to the
+    number of cpus. Processing takes place in this process if it is 1.
+    """
 
     abs_base_path = os.path.abspath(base_path)
 
@@ -1076,21 +1212,12 @@ def update_previews(logger, base_path, extension):
             logger.debug('settings status: %s'
                          % update_file_setting['settings_status'])
 
-            # Count files to process and set status / update progress
+            # Find files to process and set status / update progress
 
+            image_files = __find_image_files(base_path, extension,
+                                             image_setting['settings_recursive'])
             processed_filecount = 0
-            total_filecount = 0
-            if image_setting['settings_recursive']:
-                for (root, _, files) in os.walk(base_path):
-                    for name in files:
-                        if not name.startswith('.') \
-                                and name.endswith('.%s' % extension):
-                            total_filecount += 1
-            else:
-                for name in os.listdir(base_path):
-                    if not name.startswith('.') and name.endswith('.%s'
-                                                                  % extension):
-                        total_filecount += 1
+            total_filecount = len(image_files)
 
             update_file_setting['settings_update_progress'] = '%s/%s' \
                 % (processed_filecount, total_filecount)
@@ -1102,8 +1229,6 @@ def update_previews(logger, base_path, extension):
             update_image_file_setting(logger, abs_base_path,
                                       update_file_setting)
 
-            # Process image files
-
             processed_volume_count = 0
             total_volume_count = 0
             if volume_setting is not None \
@@ -1112,74 +1237,61 @@ def update_previews(logger, base_path, extension):
                     == allowed_volume_types['slice']:
                 total_volume_count = total_filecount // volume_setting['z_dimension']
 
-            if image_setting['settings_recursive']:
-                for (root, _, files) in os.walk(base_path):
-                    slice_modified = False
-                    path = root.replace(base_path, '', 1).strip('/')
-                    for name in files:
-                        if not name.startswith('.') \
-                                and name.endswith('.%s' % extension):
-                            logger.debug('check entry -> path: %s, name: %s'
-                                         % (path, name))
-                            if update_file_preview(logger, base_path,
-                                                   path, name):
-                                processed_filecount += 1
-
-                                update_file_setting['settings_update_progress'
-                                                    ] = '%s/%s' \
-                                    % (processed_filecount,
-                                        total_filecount)
-                                logger.debug('settings_update_progress: %s'
-
-                                             % update_file_setting['settings_update_progress'
-                                                                   ])
-                                update_image_file_setting(logger,
-                                                          abs_base_path,
-                                                          update_file_setting)
-                                slice_modified = True
-                            else:
-                                image_status = False
-                    if slice_modified and volume_setting is not None \
-                            and volume_setting['z_dimension'] > 0:
-                        volume_status = update_volume_preview(logger,
-                                                              base_path, path,
-                                                              volume_nr=processed_volume_count,
-                                                              volume_count=total_volume_count)
-                        if volume_status:
-                            processed_volume_count += 1
-            else:
-                slice_modified = False
-                path = ''
-                for name in os.listdir(base_path):
-                    logger.debug('check entry: %s' % name)
-                    if not name.startswith('.') and name.endswith('.%s'
-                                                                  % extension):
-                        filepath = os.path.join(base_path, name)
-                        if os.path.isfile(filepath):
-                            if update_file_preview(logger, base_path,
-                                                   path, name):
-                                processed_filecount += 1
-
-                                update_file_setting['settings_update_progress'
-                                                    ] = '%s/%s' \
-                                    % (processed_filecount,
-                                        total_filecount)
-                                logger.debug('settings_update_progress: %s'
-
-                                             % update_file_setting['settings_update_progress'
-                                                                   ])
-                                update_image_file_setting(logger,
-                                                          abs_base_path,
-                                                          update_file_setting)
-                                slice_modified = True
-                            else:
-                                image_status = False
-                if slice_modified and volume_setting is not None \
+            if workers is None:
+                workers = cpu_count()
+            workers = max(1, min(workers, total_filecount))
+            pool = None
+            if workers > 1:
+                pool = Pool(processes=workers,
+                            initializer=__init_preview_worker,
+                            initargs=(logger, ))
+
+            # Process image files and save progress in batches as each update
+            # rewrites the shared settings file under lock
+
+            modified_paths = []
+            progress = __init_progress(total_filecount)
+            try:
+                tasks = [(base_path, path, name) for (path, name) in
+                         image_files]
+                for (path, name, status) in __map_tasks(
+                        logger, pool, __file_preview_worker, tasks):
+                    if not status:
+                        image_status = False
+                        continue
+                    processed_filecount += 1
+                    if path not in modified_paths:
+                        modified_paths.append(path)
+                    if __progress_due(progress, processed_filecount):
+                        update_file_setting['settings_update_progress'] = \
+                            '%s/%s' % (processed_filecount, total_filecount)
+                        logger.debug('settings_update_progress: %s'
+                                     % update_file_setting['settings_update_progress'])
+                        update_image_file_setting(logger, abs_base_path,
+                                                  update_file_setting)
+
+                # Volume previews are built from the preview data of the
+                # slices so they can only be processed when all files are done
+
+                if volume_setting is not None \
                         and volume_setting['z_dimension'] > 0:
-                    volume_status = update_volume_preview(logger,
-                                                          base_path, path)
-                    if volume_status:
-                        processed_volume_count += 1
+                    modified_paths.sort()
+                    if image_setting['settings_recursive']:
+                        tasks = [(base_path, path, nr, total_volume_count)
+                                 for (nr, path) in enumerate(modified_paths)]
+                    else:
+                        tasks = [(base_path, path, 1, 1) for path in
+                                 modified_paths]
+                    for (path, status) in __map_tasks(
+                            logger, pool, __volume_preview_worker, tasks):
+                        if status:
+                            processed_volume_count += 1
+                        else:
+                            volume_status = False
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
 
             # Set final update status and progress
 
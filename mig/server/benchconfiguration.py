@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# benchconfiguration - benchmark configuration loading at request startup
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Benchmark the configuration loading done at the start of every CGI and
+WSGI request. Compares a full parse of the server configuration with a load
+from the compiled snapshot like a fresh CGI process and with the in-process
+cache used across requests in a WSGI process.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import getopt
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# NOTE: __file__ is /MIG_BASE/mig/server/benchconfiguration.py and we need
+# MIG_BASE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from mig.shared import confsnapshot
+from mig.shared.configuration import Configuration
+
+
+def usage(name='benchconfiguration.py'):
+    """Usage help"""
+
+    print("""Benchmark configuration loading at request startup.
+Usage:
+%(name)s [OPTIONS]
+Where OPTIONS may be one or more of:
+   -c CONF_FILE        Use CONF_FILE as server configuration (default from
+                       MIG_CONF environment)
+   -h                  Show this help
+   -n LOADS            Number of loads for each method (default 100)
+""" % {'name': name})
+
+
+def bench_loads(load, load_count):
+    """Run load load_count times and return elapsed seconds"""
+
+    start = time.time()
+    for _ in range(load_count):
+        load()
+    return time.time() - start
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    conf_path = os.environ.get('MIG_CONF', None)
+    load_count = 100
+    opt_args = 'c:hn:'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-c':
+            conf_path = val
+        elif opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-n':
+            load_count = int(val)
+        else:
+            print('Error: %s not supported!' % opt)
+            sys.exit(1)
+
+    if not conf_path:
+        print('Error: no configuration given with -c or MIG_CONF')
+        sys.exit(1)
+
+    # NOTE: use a private snapshot dir to leave any live snapshots alone
+    bench_dir = tempfile.mkdtemp(prefix='benchconf-')
+    os.environ['MIG_CONF_SNAPSHOT_DIR'] = os.path.join(bench_dir,
+                                                       'snapshots')
+    skip_log, disable_auth_log = True, True
+
+    def full_parse():
+        """Full parse as done without snapshots"""
+        Configuration(conf_path, False, skip_log, disable_auth_log)
+
+    def snapshot_load():
+        """Snapshot load as in a fresh CGI process"""
+        confsnapshot._cache.clear()
+        confsnapshot.load_configuration(conf_path, skip_log,
+                                        disable_auth_log)
+
+    def cached_load():
+        """In-process cache lookup as in a WSGI process"""
+        confsnapshot.load_configuration(conf_path, skip_log,
+                                        disable_auth_log)
+
+    # Prepare snapshot and check that it is equivalent to a full parse
+    parsed = Configuration(conf_path, False, skip_log, disable_auth_log)
+    confsnapshot.parse_configuration(conf_path, skip_log, disable_auth_log)
+    restored = confsnapshot.load_snapshot(conf_path, skip_log,
+                                          disable_auth_log)
+    if restored is None:
+        print('Error: could not save and load snapshot of %s' % conf_path)
+        shutil.rmtree(bench_dir)
+        sys.exit(1)
+    mismatch = [name for name in vars(parsed) if name not in
+                confsnapshot._logger_fields and name != 'config_file' and
+                getattr(restored[0], name, None) != getattr(parsed, name)]
+    if mismatch:
+        print('Error: snapshot differs from parsed conf in %s' % mismatch)
+        shutil.rmtree(bench_dir)
+        sys.exit(1)
+
+    print('Benchmarking %d configuration loads of %s' % (load_count,
+                                                         conf_path))
+    results = []
+    for (label, load) in [('full parse', full_parse),
+                          ('snapshot load (cgi)', snapshot_load),
+                          ('in-process cache (wsgi)', cached_load)]:
+        elapsed = bench_loads(load, load_count)
+        results.append(elapsed)
+        print('%-32s %8.3fs  %8.3fms/load' % (label, elapsed,
+                                              1000.0 * elapsed / load_count))
+    print('speedup %.1fx with snapshot and %.1fx with in-process cache' %
+          (results[0] / max(results[1], 1e-9),
+           results[0] / max(results[2], 1e-9)))
+    shutil.rmtree(bench_dir)
+    sys.exit(0)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# benchjobqueue - Benchmark the grid_script job queue operations
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Benchmark the JobQueue used by grid_script with a synthetic workload of
+enqueue, lookup and dequeue operations on a large number of jobs.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import getopt
+import logging
+import os
+import random
+import sys
+import time
+
+# NOTE: __file__ is /MIG_BASE/mig/server/benchjobqueue.py and we need MIG_BASE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from mig.server.jobqueue import JobQueue
+
+
+def usage(name='benchjobqueue.py'):
+    """Usage help"""
+
+    print("""Benchmark job queue operations.
+Usage:
+%(name)s [OPTIONS]
+Where OPTIONS may be one or more of:
+   -h                  Show this help
+   -n JOBS             Number of jobs to enqueue and dequeue (default 100000)
+   -o OWNERS           Number of distinct job owners (default 1000)
+   -s SEED             Random seed for reproducible runs (default 42)
+""" % {'name': name})
+
+
+def make_jobs(job_count, owner_count):
+    """Generate job_count minimal job dicts spread over owner_count owners"""
+
+    jobs = []
+    for i in range(job_count):
+        jobs.append({'JOB_ID': '%d_1_1_2026__0_0_0_bench' % i,
+                     'USER_CERT': '/C=DK/CN=Bench User %d' % (i % owner_count),
+                     'UNIQUE_RESOURCE_NAME': 'bench.%d' % (i % 100),
+                     'STATUS': 'QUEUED'})
+    return jobs
+
+
+def timed(label, func, *args):
+    """Run func with args and print the elapsed time under label"""
+
+    start = time.time()
+    result = func(*args)
+    print('%-32s %8.3fs' % (label, time.time() - start))
+    return result
+
+
+def bench_enqueue(job_queue, jobs):
+    """Append all jobs to the end of the queue"""
+
+    for job in jobs:
+        job_queue.enqueue_job(job, job_queue.queue_length())
+
+
+def bench_duplicates(job_queue, jobs):
+    """Try to re-enqueue already queued jobs which must be rejected"""
+
+    for job in jobs:
+        job_queue.enqueue_job(job, job_queue.queue_length())
+
+
+def bench_lookup(job_queue, job_ids):
+    """Lookup jobs by ID"""
+
+    for job_id in job_ids:
+        job_queue.get_job_by_id(job_id)
+
+
+def bench_scan(job_queue):
+    """Positional scan through entire queue like the schedulers do"""
+
+    for i in range(job_queue.queue_length()):
+        job_queue.get_job(i)
+
+
+def bench_dequeue_by_id(job_queue, job_ids):
+    """Dequeue jobs by ID"""
+
+    for job_id in job_ids:
+        job_queue.dequeue_job_by_id(job_id)
+
+
+def bench_dequeue_head(job_queue):
+    """Dequeue remaining jobs from the head of the queue like FIFO"""
+
+    while job_queue.queue_length() > 0:
+        job_queue.dequeue_job(0)
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    job_count = 100000
+    owner_count = 1000
+    seed = 42
+    opt_args = 'hn:o:s:'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-n':
+            job_count = int(val)
+        elif opt == '-o':
+            owner_count = int(val)
+        elif opt == '-s':
+            seed = int(val)
+        else:
+            print('Error: %s not supported!' % opt)
+
+    random.seed(seed)
+    logger = logging.getLogger('benchjobqueue')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    jobs = make_jobs(job_count, owner_count)
+    sample_ids = [job['JOB_ID'] for job in random.sample(jobs,
+                                                         min(job_count, 10000))]
+    job_queue = JobQueue(logger)
+    print('Benchmarking job queue with %d jobs' % job_count)
+    total_start = time.time()
+    timed('enqueue %d jobs' % job_count, bench_enqueue, job_queue, jobs)
+    timed('reject %d duplicates' % len(sample_ids), bench_duplicates,
+          job_queue, jobs[:len(sample_ids)])
+    timed('lookup %d jobs by id' % len(sample_ids), bench_lookup, job_queue,
+          sample_ids)
+    timed('positional scan of queue', bench_scan, job_queue)
+    timed('lookup jobs of one owner', job_queue.get_jobs_by_owner,
+          jobs[0]['USER_CERT'])
+    timed('dequeue %d jobs by id' % len(sample_ids), bench_dequeue_by_id,
+          job_queue, sample_ids)
+    timed('dequeue %d jobs from head' % job_queue.queue_length(),
+          bench_dequeue_head, job_queue)
+    print('%-32s %8.3fs' % ('total', time.time() - total_start))
+    sys.exit(0)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# benchpriceeval - benchmark scheduler price expression evaluation
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+
+"""Benchmark the scheduler price evaluation with a synthetic set of resources
+with price expressions and queued jobs with max price expressions. Replays the
+price calculations of a number of resource requests with the compiled price
+cache disabled and enabled to show the per-request cost before and after.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import getopt
+import logging
+import os
+import random
+import sys
+import time
+
+# NOTE: __file__ is /MIG_BASE/mig/server/benchpriceeval.py and we need
+# MIG_BASE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from mig.server.scheduler import Scheduler
+
+runtime_envs = ['PYTHON-3', 'POVRAY-3.6', 'R-4', 'MATLAB', 'GROMACS']
+min_prices = ['1.0', '2*(1+hour/24.0)', 'max(1, 3-wday)',
+              'sqrt(yday)/10', '(month+date)/50.0']
+max_prices = ['100', '20+exec_delay/60.0',
+              'min(1000, 10*exp(exec_delay/86400.0))']
+
+
+class BenchConfiguration(object):
+    """Just the configuration values needed by the scheduler"""
+
+    expire_after = 86400
+    peers = {}
+    mig_server_id = 'bench.0'
+    server_fqdn = 'localhost'
+
+
+def usage(name='benchpriceeval.py'):
+    """Usage help"""
+
+    print("""Benchmark scheduler price expression evaluation.
+Usage:
+%(name)s [OPTIONS]
+Where OPTIONS may be one or more of:
+   -h                  Show this help
+   -j JOBS             Number of queued jobs (default 500)
+   -q REQUESTS         Number of resource requests to replay (default 10)
+   -r RESOURCES        Number of resources (default 50)
+   -s SEED             Random seed for reproducible runs (default 42)
+""" % {'name': name})
+
+
+def make_resources(resource_count):
+    """Generate resource confs with a mix of price expressions"""
+
+    resources = []
+    for i in range(resource_count):
+        envs = random.sample(runtime_envs, random.randrange(len(runtime_envs)))
+        # Charge extra for some of the runtime environments
+        min_price = random.choice(min_prices)
+        for name in envs[:2]:
+            min_price += '+%s*%d' % (name, random.randrange(1, 10))
+        resources.append({'RESOURCE_ID': 'res%d_0' % i,
+                          'MINPRICE': min_price,
+                          'RUNTIMEENVIRONMENT': [(j, []) for j in envs]})
+    return resources
+
+
+def make_jobs(job_count):
+    """Generate jobs with a mix of max price expressions"""
+
+    received = time.gmtime(time.time() - 3600)
+    jobs = []
+    for i in range(job_count):
+        jobs.append({'JOB_ID': 'job%d' % i, 'RECEIVED_TIMESTAMP': received,
+                     'MAXPRICE': random.choice(max_prices),
+                     'RUNTIMEENVIRONMENT':
+                     random.sample(runtime_envs, random.randrange(3))})
+    return jobs
+
+
+def bench_requests(scheduler, resources, jobs, request_count):
+    """Price all jobs on all resources like request_count schedule filter
+    runs. Returns the total of all prices as a sanity check.
+    """
+
+    total = 0.0
+    for _ in range(request_count):
+        for job in jobs:
+            total += scheduler.get_max_price(job)
+            for res in resources:
+                total += scheduler.get_min_price(res, job['RUNTIMEENVIRONMENT'])
+    return total
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    job_count = 500
+    request_count = 10
+    resource_count = 50
+    seed = 42
+    opt_args = 'hj:q:r:s:'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-j':
+            job_count = int(val)
+        elif opt == '-q':
+            request_count = int(val)
+        elif opt == '-r':
+            resource_count = int(val)
+        elif opt == '-s':
+            seed = int(val)
+        else:
+            print('Error: %s not supported!' % opt)
+
+    random.seed(seed)
+    resources = make_resources(resource_count)
+    jobs = make_jobs(job_count)
+    logger = logging.getLogger('benchpriceeval')
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.ERROR)
+    print('Benchmarking %d requests pricing %d jobs on %d resources' %
+          (request_count, job_count, resource_count))
+    results = {}
+    for cache_size in (0, Scheduler.price_cache_size):
+        scheduler = Scheduler(logger, BenchConfiguration())
+        scheduler.price_cache_size = cache_size
+        start = time.time()
+        total = bench_requests(scheduler, resources, jobs, request_count)
+        elapsed = time.time() - start
+        results[cache_size] = (total, elapsed)
+        print('%-32s %8.3fs  %8.3fms/request  %s' %
+              ('price cache size %d' % cache_size, elapsed,
+               1000.0 * elapsed / request_count,
+               scheduler.price_cache_stats))
+    (uncached_total, uncached_secs) = results[0]
+    (cached_total, cached_secs) = results[Scheduler.price_cache_size]
+    # NOTE: max prices depend on exec_delay so totals drift slightly
+    if abs(uncached_total - cached_total) > 1e-2 * abs(uncached_total):
+        print('Error: cached prices total %f but uncached %f' %
+              (cached_total, uncached_total))
+        sys.exit(1)
+    print('speedup %.1fx with compiled price cache' %
+          (uncached_secs / max(cached_secs, 1e-9)))
+    sys.exit(0)
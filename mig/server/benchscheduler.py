@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# benchscheduler - benchmark the scheduling cost of the schedulers
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+
+
+"""Benchmark the scheduling cost of the production scheduler classes.
+
+Replays a job and resource trace through each of the selected scheduler
+algorithms and reports the schedule latency percentiles, the throughput and
+the peak memory use of every algorithm. The trace is either generated from a
+random seed or loaded from a JSON file, which makes runs reproducible and
+allows replaying recorded workloads. Results can be saved as JSON to track
+the scheduling cost across releases.
+
+A trace is a dictionary with a list of resource confs, a list of jobs and a
+list of events replayed in order. An event is either ["job", INDEX] to queue
+the job with that index in the job list or ["request", RESOURCE_ID] for a job
+request from that resource. Job timestamps are given as the number of seconds
+before the replay starts. The vgrid access checks are limited to the plain
+vgrid name matching as the trace users and resources are not in any real
+vgrids.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import copy
+import getopt
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# NOTE: __file__ is /MIG_BASE/mig/server/benchscheduler.py and we need
+# MIG_BASE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from mig.server.bestfitscheduler import BestFitScheduler
+from mig.server.fairfitscheduler import FairFitScheduler
+from mig.server.fifoscheduler import FIFOScheduler
+from mig.server.firstfitscheduler import FirstFitScheduler
+from mig.server.jobqueue import JobQueue
+from mig.server.maxthroughputscheduler import MaxThroughputScheduler
+from mig.server.randomscheduler import RandomScheduler
+from mig.shared.vgrid import job_fits_res_vgrid
+
+# Same algorithm names as the sched_alg configuration option
+algorithms = {'FirstFit': FirstFitScheduler, 'BestFit': BestFitScheduler,
+              'FairFit': FairFitScheduler,
+              'MaxThroughput': MaxThroughputScheduler,
+              'Random': RandomScheduler, 'FIFO': FIFOScheduler}
+default_algorithms = ['FirstFit', 'BestFit', 'FairFit', 'Random', 'FIFO']
+timestamp_fields = ['QUEUED_TIMESTAMP', 'RECEIVED_TIMESTAMP']
+percentiles = [50, 90, 99]
+
+architectures = ['X86', 'AMD64', 'ARM64']
+runtime_envs = ['PYTHON-3', 'POVRAY-3.6', 'R-4', 'MATLAB', 'GROMACS']
+vgrids = ['Generic', 'physics', 'bio', 'climate']
+min_prices = ['1.0', '2*(1+hour/24.0)', 'max(1, 3-wday)']
+max_prices = ['100', '20+exec_delay/60.0']
+
+
+class BenchConfiguration(object):
+    """Just the configuration values needed by the schedulers"""
+
+    expire_after = 7 * 86400
+    peers = {}
+    mig_server_id = 'bench.0'
+    server_fqdn = 'localhost'
+
+    def __init__(self, logger):
+        self.logger = logger
+
+
+def bench_scheduler(scheduler_class):
+    """Wrap scheduler_class to check vgrid names without access lookups"""
+
+    class BenchScheduler(scheduler_class):
+        """Scheduler with a vgrid check independent of the vgrid files"""
+
+        def job_vgrid_fits_resource(self, job, res):
+            """Match job and res vgrid names just like vgrid_access_match
+            with all users and resources in all vgrids.
+            """
+
+            (match, job_vgrid, res_vgrid) = job_fits_res_vgrid(
+                job.get('VGRID', []), res.get('VGRID', []))
+            if match:
+                job['RESOURCE_VGRID'] = res_vgrid
+            else:
+                job['RESOURCE_VGRID'] = 'No_suitable_VGrid_found'
+            return match
+
+    return BenchScheduler
+
+
+def usage(name='benchscheduler.py'):
+    """Usage help"""
+
+    print("""Benchmark the scheduling cost of the scheduler algorithms.
+Usage:
+%(name)s [OPTIONS]
+Where OPTIONS may be one or more of:
+   -a ALGORITHMS       Comma separated algorithms to benchmark
+                       (default %(algorithms)s)
+   -h                  Show this help
+   -j JOBS             Number of initially queued jobs (default 500)
+   -m                  Skip the extra replay measuring peak memory use
+   -o PATH             Save the results as JSON in PATH
+   -q REQUESTS         Number of resource requests (default 200)
+   -r RESOURCES        Number of resources (default 50)
+   -s SEED             Random seed for reproducible runs (default 42)
+   -t PATH             Replay trace from JSON file in PATH instead of a
+                       generated one
+   -w PATH             Save the generated trace as JSON in PATH
+""" % {'name': name, 'algorithms': ','.join(default_algorithms)})
+
+
+def make_resource(index):
+    """Generate resource conf number index"""
+
+    res_id = 'res%d.bench.org_0' % index
+    envs = random.sample(runtime_envs, random.randrange(len(runtime_envs)))
+    return {'RESOURCE_ID': res_id, 'HOSTURL': 'res%d.bench.org' % index,
+            'SERVER': BenchConfiguration.mig_server_id,
+            'ANONYMOUS': True, 'ARCHITECTURE': random.choice(architectures),
+            'JOBTYPE': random.choice(['batch', 'bulk', 'all']),
+            'SANDBOX': random.random() < 0.1, 'PLATFORM': '',
+            'NODECOUNT': random.choice([1, 1, 2, 4]),
+            'CPUCOUNT': random.choice([1, 2, 4, 8, 16]),
+            'CPUTIME': random.choice([600, 3600, 86400]),
+            'DISK': random.choice([10, 100, 1000]),
+            'MEMORY': random.choice([1024, 4096, 16384]),
+            'MINPRICE': random.choice(min_prices),
+            'VGRID': random.sample(vgrids, random.randrange(1, 3)),
+            'RUNTIMEENVIRONMENT': [(name, []) for name in envs]}
+
+
+def make_job(index, user_count):
+    """Generate job number index submitted by one of user_count users"""
+
+    user_id = '/C=DK/O=Bench/CN=User %d' % random.randrange(user_count)
+    age = random.randrange(3600)
+    job = {'JOB_ID': 'job%d_bench' % index, 'USER_CERT': user_id,
+           'STATUS': 'QUEUED', 'QUEUED_TIMESTAMP': age,
+           'RECEIVED_TIMESTAMP': age, 'MAXPRICE': random.choice(max_prices),
+           'NODECOUNT': 1, 'CPUCOUNT': random.choice([1, 1, 2, 4, 8]),
+           'CPUTIME': random.choice([60, 600, 3600]),
+           'DISK': random.choice([1, 10, 100]),
+           'MEMORY': random.choice([128, 1024, 4096]),
+           'VGRID': random.sample(vgrids, random.randrange(1, 3)),
+           'RUNTIMEENVIRONMENT': random.sample(runtime_envs,
+                                               random.randrange(2))}
+    if random.random() < 0.3:
+        job['ARCHITECTURE'] = random.choice(architectures)
+    return job
+
+
+def make_trace(job_count, request_count, resource_count, user_count=20):
+    """Generate a trace with job_count initially queued jobs followed by
+    request_count resource requests, each followed by a new job submission to
+    keep the queue length steady.
+    """
+
+    resources = [make_resource(i) for i in range(resource_count)]
+    jobs = [make_job(i, user_count) for i in range(job_count +
+                                                   request_count)]
+    events = [['job', i] for i in range(job_count)]
+    for i in range(request_count):
+        events.append(['request', random.choice(resources)['RESOURCE_ID']])
+        events.append(['job', job_count + i])
+    return {'resources': resources, 'jobs': jobs, 'events': events}
+
+
+def load_trace(path):
+    """Load trace from JSON file in path"""
+
+    with open(path) as trace_fd:
+        trace = json.load(trace_fd)
+    for res in trace['resources']:
+        # NOTE: JSON has no tuples
+        res['RUNTIMEENVIRONMENT'] = [tuple(i) for i in
+                                     res.get('RUNTIMEENVIRONMENT', [])]
+    return trace
+
+
+def save_json(data, path):
+    """Save data as JSON in path"""
+
+    with open(path, 'w') as json_fd:
+        json.dump(data, json_fd, indent=1, sort_keys=True)
+
+
+def prepare_jobs(jobs, now):
+    """Copy jobs with the relative timestamps made absolute wrt now"""
+
+    prepared = copy.deepcopy(jobs)
+    for job in prepared:
+        for field in timestamp_fields:
+            job[field] = time.gmtime(now - job.get(field, 0))
+    return prepared
+
+
+def percentile(sorted_values, pct):
+    """Nearest rank pct percentile of the sorted_values list"""
+
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(pct / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def replay_trace(algorithm, trace, logger):
+    """Replay trace with the scheduler algorithm. Returns list of schedule
+    latencies in seconds, the number of scheduled jobs and the total replay
+    time.
+    """
+
+    scheduler = bench_scheduler(algorithms[algorithm])(
+        logger, BenchConfiguration(logger))
+    job_queue = JobQueue(logger)
+    done_queue = JobQueue(logger)
+    scheduler.attach_job_queue(job_queue)
+    scheduler.attach_done_queue(done_queue)
+    resources = dict([(res['RESOURCE_ID'], res) for res in
+                      copy.deepcopy(trace['resources'])])
+    start = time.time()
+    jobs = prepare_jobs(trace['jobs'], start)
+    latencies = []
+    scheduled = 0
+    for (kind, value) in trace['events']:
+        if kind == 'job':
+            job_queue.enqueue_job(jobs[value], job_queue.queue_length())
+            continue
+        # Timed just like the resource request handling in grid_script
+        res = resources[value]
+        before = time.time()
+        scheduler.update_resources(res)
+        scheduler.update_seen(res)
+        scheduler.expire_jobs()
+        job = scheduler.schedule(res)
+        latencies.append(time.time() - before)
+        if job:
+            scheduled += 1
+            done_queue.enqueue_job(job, done_queue.queue_length())
+    return (latencies, scheduled, time.time() - start)
+
+
+def measure_memory(algorithm, trace, logger):
+    """Replay trace with tracemalloc enabled and return the peak number of
+    bytes allocated or None if tracemalloc is unavailable.
+    """
+
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        replay_trace(algorithm, trace, logger)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_algorithm(algorithm, trace, logger, with_memory=True):
+    """Benchmark algorithm on trace and return dictionary with results"""
+
+    (latencies, scheduled, elapsed) = replay_trace(algorithm, trace, logger)
+    latencies.sort()
+    requests = len(latencies)
+    result = {'algorithm': algorithm, 'requests': requests,
+              'scheduled': scheduled, 'elapsed_secs': elapsed,
+              'requests_per_sec': requests / max(elapsed, 1e-9),
+              'mean_latency_secs': sum(latencies) / max(requests, 1),
+              'max_latency_secs': latencies and latencies[-1] or 0.0}
+    for pct in percentiles:
+        result['p%d_latency_secs' % pct] = percentile(latencies, pct)
+    if with_memory:
+        result['peak_memory_bytes'] = measure_memory(algorithm, trace,
+                                                     logger)
+    return result
+
+
+def format_result(result):
+    """Format result as a single line for the summary"""
+
+    if 'error' in result:
+        return '%-14s failed: %s' % (result['algorithm'], result['error'])
+    memory = result.get('peak_memory_bytes', None)
+    if memory is None:
+        memory_str = 'n/a'
+    else:
+        memory_str = '%.1fMB' % (memory / 1024.0 / 1024.0)
+    return '%-14s %6d/%-6d %9.1f %9.3f %9.3f %9.3f %9.3f %9s' % (
+        result['algorithm'], result['scheduled'], result['requests'],
+        result['requests_per_sec'], 1000.0 * result['p50_latency_secs'],
+        1000.0 * result['p90_latency_secs'],
+        1000.0 * result['p99_latency_secs'],
+        1000.0 * result['max_latency_secs'], memory_str)
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    selected = default_algorithms
+    job_count = 500
+    request_count = 200
+    resource_count = 50
+    seed = 42
+    with_memory = True
+    results_path = None
+    trace_path = None
+    save_trace_path = None
+    opt_args = 'a:hj:mo:q:r:s:t:w:'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-a':
+            selected = [i.strip() for i in val.split(',') if i.strip()]
+        elif opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-j':
+            job_count = int(val)
+        elif opt == '-m':
+            with_memory = False
+        elif opt == '-o':
+            results_path = val
+        elif opt == '-q':
+            request_count = int(val)
+        elif opt == '-r':
+            resource_count = int(val)
+        elif opt == '-s':
+            seed = int(val)
+        elif opt == '-t':
+            trace_path = val
+        elif opt == '-w':
+            save_trace_path = val
+        else:
+            print('Error: %s not supported!' % opt)
+
+    for algorithm in selected:
+        if algorithm not in algorithms:
+            print('Error: unknown algorithm %s - choose from %s' %
+                  (algorithm, ', '.join(sorted(algorithms))))
+            sys.exit(1)
+
+    if trace_path:
+        trace = load_trace(trace_path)
+    else:
+        random.seed(seed)
+        trace = make_trace(job_count, request_count, resource_count)
+        if save_trace_path:
+            save_json(trace, save_trace_path)
+    logger = logging.getLogger('benchscheduler')
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.ERROR)
+    print('Benchmarking %d events with %d jobs and %d resources' %
+          (len(trace['events']), len(trace['jobs']),
+           len(trace['resources'])))
+    print('%-14s %13s %9s %9s %9s %9s %9s %9s' %
+          ('algorithm', 'scheduled', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms',
+           'max ms', 'memory'))
+    results = []
+    for algorithm in selected:
+        # NOTE: the random scheduler must pick the same way in all runs
+        random.seed(seed)
+        try:
+            result = bench_algorithm(algorithm, trace, logger, with_memory)
+        except Exception as exc:
+            # NOTE: record broken algorithms as regressions and go on
+            result = {'algorithm': algorithm, 'error': '%r' % exc}
+        results.append(result)
+        print(format_result(result))
+    if results_path:
+        summary = {'timestamp': time.time(), 'seed': seed,
+                   'trace': trace_path or 'generated',
+                   'events': len(trace['events']), 'jobs': len(trace['jobs']),
+                   'resources': len(trace['resources']), 'results': results}
+        if resource is not None:
+            summary['max_rss_kb'] = resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss
+        save_json(summary, results_path)
+        print('saved results in %s' % results_path)
+    sys.exit(0)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# benchtriggerrules - Benchmark the grid_events trigger rule matching
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Benchmark the trigger rule matching used by grid_events with a synthetic
+storm of file events against a large number of vgrid trigger rules. Compares
+the precompiled TriggerRuleMatcher with the naive translate and match of all
+rule patterns for every event.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import fnmatch
+import getopt
+import os
+import random
+import re
+import sys
+import time
+
+# NOTE: __file__ is /MIG_BASE/mig/server/benchtriggerrules.py and we need
+# MIG_BASE
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from mig.shared.events import TriggerRuleMatcher
+
+files_base = '/home/mig/state/vgrid_files_home'
+extensions = ['txt', 'dat', 'csv', 'h5', 'png']
+
+
+def usage(name='benchtriggerrules.py'):
+    """Usage help"""
+
+    print("""Benchmark trigger rule matching.
+Usage:
+%(name)s [OPTIONS]
+Where OPTIONS may be one or more of:
+   -h                  Show this help
+   -e EVENTS           Number of file events to replay (default 1000)
+   -r RULES            Number of trigger rules per vgrid (default 20)
+   -s SEED             Random seed for reproducible runs (default 42)
+   -v VGRIDS           Number of vgrids with trigger rules (default 10)
+""" % {'name': name})
+
+
+def make_rules(vgrid_count, rule_count):
+    """Generate all_rules dictionary with rule_count rules in each of
+    vgrid_count vgrids using a mix of the usual trigger path patterns.
+    """
+
+    all_rules = {}
+    for i in range(vgrid_count):
+        vgrid_name = 'vgrid%d' % i
+        for j in range(rule_count):
+            ext = extensions[j % len(extensions)]
+            kind = j % 4
+            if kind == 0:
+                path = 'dir%d/*.%s' % (j, ext)
+            elif kind == 1:
+                path = 'dir%d/sub*/input_*.%s' % (j, ext)
+            elif kind == 2:
+                path = 'dir%d/data?.%s' % (j, ext)
+            else:
+                path = 'dir%d/results/summary.%s' % (j, ext)
+            target_path = os.path.join(files_base, vgrid_name, path)
+            rule = {'rule_id': '%s-%d' % (vgrid_name, j),
+                    'vgrid_name': vgrid_name, 'path': path,
+                    'changes': ['created', 'modified'],
+                    'match_recursive': (j % 3 == 0)}
+            all_rules[target_path] = all_rules.get(target_path, []) + [rule]
+    return all_rules
+
+
+def make_events(event_count, vgrid_count, rule_count):
+    """Generate event_count random event paths spread over all vgrids"""
+
+    events = []
+    for _ in range(event_count):
+        vgrid_name = 'vgrid%d' % random.randrange(vgrid_count)
+        ext = random.choice(extensions)
+        depth = random.randrange(3)
+        parts = ['dir%d' % random.randrange(rule_count)]
+        parts += ['sub%d' % random.randrange(10) for _ in range(depth)]
+        parts.append('input_%d.%s' % (random.randrange(1000), ext))
+        events.append(os.path.join(files_base, vgrid_name, *parts))
+    return events
+
+
+def naive_match(all_rules, src_path):
+    """Original per-event matching of all rule patterns"""
+
+    matches = []
+    for (target_path, rule_list) in all_rules.items():
+        recursive_regexp = fnmatch.translate(target_path)
+        direct_regexp = recursive_regexp.replace('.*', '[^/]*')
+        recursive_hit = re.match(recursive_regexp, src_path)
+        direct_hit = re.match(direct_regexp, src_path)
+        if direct_hit or recursive_hit:
+            matches.append((target_path, rule_list, bool(direct_hit)))
+    return matches
+
+
+def timed(label, func, *args):
+    """Run func with args and print the elapsed time under label"""
+
+    start = time.time()
+    result = func(*args)
+    elapsed = time.time() - start
+    print('%-32s %8.3fs' % (label, elapsed))
+    return (result, elapsed)
+
+
+def bench_naive(all_rules, events):
+    """Match all events with naive matching"""
+
+    return sum([len(naive_match(all_rules, path)) for path in events])
+
+
+def bench_matcher(matcher, events):
+    """Match all events with the precompiled matcher"""
+
+    return sum([len(matcher.match(path)) for path in events])
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    event_count = 1000
+    rule_count = 20
+    vgrid_count = 10
+    seed = 42
+    opt_args = 'he:r:s:v:'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-e':
+            event_count = int(val)
+        elif opt == '-r':
+            rule_count = int(val)
+        elif opt == '-s':
+            seed = int(val)
+        elif opt == '-v':
+            vgrid_count = int(val)
+        else:
+            print('Error: %s not supported!' % opt)
+
+    random.seed(seed)
+    all_rules = make_rules(vgrid_count, rule_count)
+    events = make_events(event_count, vgrid_count, rule_count)
+    print('Benchmarking %d events against %d trigger rules' %
+          (event_count, len(all_rules)))
+    matcher = TriggerRuleMatcher()
+    timed('compile %d rules' % len(all_rules), matcher.update, all_rules)
+    (naive_hits, naive_secs) = timed('naive match of %d events' % event_count,
+                                     bench_naive, all_rules, events)
+    (hits, secs) = timed('matcher match of %d events' % event_count,
+                         bench_matcher, matcher, events)
+    if hits != naive_hits:
+        print('Error: matcher found %d hits but naive found %d' %
+              (hits, naive_hits))
+        sys.exit(1)
+    print('%d hits, %.1f events/s naive vs %.1f events/s matcher' %
+          (hits, event_count / max(naive_secs, 1e-9),
+           event_count / max(secs, 1e-9)))
+    sys.exit(0)
@@ -52,6 +52,7 @@ try:
     from mig.shared.conf import get_configuration_object
     from mig.shared.logger import daemon_logger, register_hangup_handler
     from mig.shared.sharelinks import extract_mode_id
+    from mig.shared.ttlcache import TTLCache
     from mig.shared.validstring import valid_user_path
 except Exception as exc:
     print("Could not load migrid code from chksidroot helper!")
@@ -64,6 +65,160 @@ configuration, logger = None, None
 
 INVALID_MARKER = "_OUT_OF_BOUNDS_"
 
+# Remember verdicts for a short while since the same files are typically
+# requested many times in a row. Removed links may thus remain usable for up
+# to the ttl.
+sid_cache = TTLCache(10000, 10)
+# Log lookup latency and cache stats this often
+stats_interval = 600
+
+addr_path_pattern = re.compile(
+    r"^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})::(/.*)$")
+
+
+def expand_sid_path(configuration, client_ip, raw_path, path, sid_name,
+                    full_prefix, is_sharelink):
+    """Expand the sid link in the normalized path and check that the result
+    is inside the link target. Returns the real path if so and INVALID_MARKER
+    otherwise.
+    """
+    _logger = configuration.logger
+    is_file = False
+    if is_sharelink:
+        # Share links use Alias to map directly into sharelink_home
+        # and with first char mapping into access mode sub-dir there.
+        (access_dir, _) = extract_mode_id(configuration, sid_name)
+        real_root = os.path.join(configuration.sharelink_home,
+                                 access_dir) + os.sep
+    else:
+        # Session links are directly in webserver_home and they map
+        # either into mig_system_files for empty jobs or into specific
+        # user_home for real job input/output.
+        real_root = configuration.webserver_home.rstrip(os.sep) + os.sep
+
+    # NOTE: we cannot completely trust linked path to be safe,
+    # so we first check full prefix on normalized path above to avoid
+    # user escaping link base with e.g. SHAREID/../bla . Next we
+    # carefully expand only the SID link part and update base safely.
+
+    # We expand with readlink to only follow initial link and extract
+    # real base for use as default root.
+    link_path = os.path.join(real_root, sid_name)
+    try:
+        link_target = os.readlink(link_path).rstrip(os.sep)
+        real_target = os.path.realpath(link_path)
+    except Exception:
+        link_target = None
+        real_target = None
+    if not link_target or not os.path.exists(link_path):
+        # Only warn to avoid excessive noise from scanners
+        _logger.warning("not a valid link from %s for path %s: %s" %
+                        (client_ip, path, link_path))
+        return INVALID_MARKER
+
+    # Find default wide base root depending on target
+    if link_target.startswith(configuration.user_home):
+        user_dir = link_target.replace(configuration.user_home, '')
+        user_dir = user_dir.lstrip(os.sep).split(os.sep)[0]
+        base_path = os.path.join(configuration.user_home, user_dir)
+    elif not is_sharelink and \
+            link_target.startswith(configuration.mig_system_files):
+        base_path = configuration.mig_system_files.rstrip(os.sep)
+    else:
+        _logger.error("unexpected link target from %s for path %s: %s"
+                      % (client_ip, path, link_target))
+        return INVALID_MARKER
+
+    # We only expand to actual root dir if it is inside wide base root
+    if real_target and real_target.startswith(base_path):
+        is_file = not os.path.isdir(real_target)
+        base_path = real_target
+    else:
+        _logger.warning("could not narrow down base root link from %s: %s" %
+                        (client_ip, link_target))
+
+    # We manually expand sid base.
+    _logger.debug("found target %s for link %s" % (link_target, link_path))
+    # Single file sharelinks use direct link to file. If so we
+    # manually expand to direct target. Otherwise we only replace
+    # that prefix of path to translate it to a sharelink dir path.
+    if is_file:
+        _logger.debug("found single file link: %s" % path)
+        path = link_target
+    else:
+        _logger.debug("found directory link: %s" % path)
+        path = path.replace(full_prefix, link_target, 1)
+
+    real_path = os.path.realpath(path)
+    _logger.info("check path from %s in base %s or chroot: %s" %
+                 (client_ip, base_path, path))
+    # Exact match to sid dir does not make sense as we expect a file
+    # IMPORTANT: use path and not real_path here in order to test both
+    if not valid_user_path(configuration, path, base_path,
+                           allow_equal=is_file, apache_scripts=True):
+        _logger.error("request from %s is outside sid chroot %s: %s (%s)" %
+                      (client_ip, base_path, raw_path, real_path))
+        return INVALID_MARKER
+    return real_path
+
+
+def check_sid_root(configuration, client_ip, path):
+    """Check that path is a valid path inside a share or session link and
+    return the real path if so. Otherwise return INVALID_MARKER.
+    """
+    _logger = configuration.logger
+    raw_path = path
+    if not os.path.isabs(path):
+        _logger.error("not an absolute path from %s: %s" % (client_ip, path))
+        return INVALID_MARKER
+    # NOTE: extract sid dir before ANY expansion to avoid escape
+    #       with e.g. /PATH/TO/OWNID/../OTHERID/somefile.txt
+    # Where sid may be share link or session link id.
+    doc_root = configuration.webserver_home
+    sharelink_prefix = os.path.join(doc_root, 'share_redirect')
+    session_prefix = os.path.join(doc_root, 'sid_redirect')
+    is_sharelink = False
+    # Make sure absolute but unexpanded path is inside sid dir
+    if path.startswith(sharelink_prefix):
+        # Build proper root base terminated with a single slash
+        root = sharelink_prefix.rstrip(os.sep) + os.sep
+        is_sharelink = True
+    elif path.startswith(session_prefix):
+        # Build proper root base terminated with a single slash
+        root = session_prefix.rstrip(os.sep) + os.sep
+    else:
+        # Only warn to avoid excessive noise from scanners
+        _logger.warning("got path from %s with invalid root: %s" %
+                        (client_ip, path))
+        return INVALID_MARKER
+    # Extract sid name as first component after root base
+    sid_name = path.replace(root, "").lstrip(os.sep)
+    sid_name = sid_name.split(os.sep, 1)[0]
+    _logger.debug("found sid dir: %s" % sid_name)
+    # Save full prefix of link path
+    full_prefix = os.path.join(root, sid_name)
+    # Make sure absolute/normalized but unexpanded path is inside base.
+    # Only prevents path itself outside base - not illegal linking
+    # outside base, which is checked later.
+    path = os.path.abspath(path)
+    if not path.startswith(full_prefix):
+        _logger.error("got path from %s outside sid base: %s" %
+                      (client_ip, path))
+        return INVALID_MARKER
+
+    real_path = sid_cache.get(path, None)
+    if real_path is None:
+        real_path = expand_sid_path(configuration, client_ip, raw_path, path,
+                                    sid_name, full_prefix, is_sharelink)
+        sid_cache.put(path, real_path)
+    elif real_path == INVALID_MARKER:
+        _logger.warning("cached invalid sid path from %s: %s" %
+                        (client_ip, raw_path))
+    if real_path != INVALID_MARKER:
+        _logger.info("found valid sid chroot path from %s: %s" %
+                     (client_ip, real_path))
+    return real_path
+
 if __name__ == '__main__':
     configuration = get_configuration_object()
     verbose = False
@@ -97,152 +252,39 @@ unless it is available in mig/server/MiGserver.conf
 
     chksidroot_stdin = sys.stdin
 
-    addr_path_pattern = re.compile(
-        "^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})::(/.*)$")
     keep_running = True
+    lookups, lookup_secs, max_lookup_secs = 0, 0.0, 0.0
+    last_stats = time.time()
     if verbose:
         print('Reading commands from sys stdin')
     while keep_running:
         try:
             client_ip = "UNKNOWN"
             line = chksidroot_stdin.readline()
-            raw_line = raw_path = path = line.strip()
+            if not line:
+                # NOTE: apache closed the pipe
+                break
+            lookup_start = time.time()
+            path = line.strip()
             # New line format is ${CLIENT_IP}::${PATH}
             # try to parse and update client_ip and path
-            match = addr_path_pattern.match(raw_line)
+            match = addr_path_pattern.match(path)
             if match:
                 client_ip = match.group(1)
-                raw_path = path = match.group(2)
+                path = match.group(2)
             logger.info("chksidroot from %s got path: %s" % (client_ip, path))
-            if not os.path.isabs(path):
-                logger.error("not an absolute path from %s: %s" %
-                             (client_ip, path))
-                print(INVALID_MARKER)
-                continue
-            # NOTE: extract sid dir before ANY expansion to avoid escape
-            #       with e.g. /PATH/TO/OWNID/../OTHERID/somefile.txt
-            # Where sid may be share link or session link id.
-            doc_root = configuration.webserver_home
-            sharelink_prefix = os.path.join(doc_root, 'share_redirect')
-            session_prefix = os.path.join(doc_root, 'sid_redirect')
-            is_sharelink = False
-            is_file = False
-            # Make sure absolute but unexpanded path is inside sid dir
-            if path.startswith(sharelink_prefix):
-                # Build proper root base terminated with a single slash
-                root = sharelink_prefix.rstrip(os.sep) + os.sep
-                is_sharelink = True
-            elif path.startswith(session_prefix):
-                # Build proper root base terminated with a single slash
-                root = session_prefix.rstrip(os.sep) + os.sep
-            else:
-                # Only warn to avoid excessive noise from scanners
-                logger.warning("got path from %s with invalid root: %s" %
-                               (client_ip, path))
-                print(INVALID_MARKER)
-                continue
-            # Extract sid name as first component after root base
-            sid_name = path.replace(root, "").lstrip(os.sep)
-            sid_name = sid_name.split(os.sep, 1)[0]
-            logger.debug("found sid dir: %s" % sid_name)
-            # Save full prefix of link path
-            full_prefix = os.path.join(root, sid_name)
-            # Make sure absolute/normalized but unexpanded path is inside base.
-            # Only prevents path itself outside base - not illegal linking
-            # outside base, which is checked later.
-            path = os.path.abspath(path)
-            if not path.startswith(full_prefix):
-                logger.error("got path from %s outside sid base: %s" %
-                             (client_ip, path))
-                print(INVALID_MARKER)
-                continue
-            if is_sharelink:
-                # Share links use Alias to map directly into sharelink_home
-                # and with first char mapping into access mode sub-dir there.
-                (access_dir, _) = extract_mode_id(configuration, sid_name)
-                real_root = os.path.join(configuration.sharelink_home,
-                                         access_dir) + os.sep
-            else:
-                # Session links are directly in webserver_home and they map
-                # either into mig_system_files for empty jobs or into specific
-                # user_home for real job input/output.
-                real_root = configuration.webserver_home.rstrip(os.sep) + \
-                    os.sep
-
-            # NOTE: we cannot completely trust linked path to be safe,
-            # so we first check full prefix on normalized path above to avoid
-            # user escaping link base with e.g. SHAREID/../bla . Next we
-            # carefully expand only the SID link part and update base safely.
-
-            # We expand with readlink to only follow initial link and extract
-            # real base for use as default root.
-            link_path = os.path.join(real_root, sid_name)
-            try:
-                link_target = os.readlink(link_path).rstrip(os.sep)
-                real_target = os.path.realpath(link_path)
-            except Exception as exc:
-                link_target = None
-                real_target = None
-            if not link_target or not os.path.exists(link_path):
-                # Only warn to avoid excessive noise from scanners
-                logger.warning("not a valid link from %s for path %s: %s" %
-                               (client_ip, path, link_path))
-                print(INVALID_MARKER)
-                continue
-
-            # Find default wide base root depending on target
-            if link_target.startswith(configuration.user_home):
-                user_dir = link_target.replace(configuration.user_home, '')
-                user_dir = user_dir.lstrip(os.sep).split(os.sep)[0]
-                base_path = os.path.join(configuration.user_home, user_dir)
-            elif not is_sharelink and \
-                    link_target.startswith(configuration.mig_system_files):
-                base_path = configuration.mig_system_files.rstrip(os.sep)
-            else:
-                logger.error("unexpected link target from %s for path %s: %s"
-                             % (client_ip, path, link_target))
-                print(INVALID_MARKER)
-                continue
-
-            # We only expand to actual root dir if it is inside wide base root
-            if real_target and real_target.startswith(base_path):
-                is_file = not os.path.isdir(real_target)
-                base_path = real_target
-            else:
-                logger.warning("could not narrow down base root link from %s: %s" %
-                               (client_ip, link_target))
-
-            # We manually expand sid base.
-            logger.debug("found target %s for link %s" % (link_target,
-                                                          link_path))
-            # Single file sharelinks use direct link to file. If so we
-            # manually expand to direct target. Otherwise we only replace
-            # that prefix of path to translate it to a sharelink dir path.
-            if is_file:
-                logger.debug("found single file link: %s" % path)
-                path = link_target
-            else:
-                logger.debug("found directory link: %s" % path)
-                path = path.replace(full_prefix, link_target, 1)
-
-            real_path = os.path.realpath(path)
-            logger.info("check path from %s in base %s or chroot: %s" %
-                        (client_ip, base_path, path))
-            # Exact match to sid dir does not make sense as we expect a file
-            # IMPORTANT: use path and not real_path here in order to test both
-            if not valid_user_path(configuration, path, base_path,
-                                   allow_equal=is_file, apache_scripts=True):
-                logger.error("request from %s is outside sid chroot %s: %s (%s)" %
-                             (client_ip, base_path, raw_path, real_path))
-                print(INVALID_MARKER)
-                continue
-            logger.info("found valid sid chroot path from %s: %s" %
-                        (client_ip, real_path))
-            print(real_path)
-
-            # Throttle down a bit to yield
-
-            time.sleep(0.01)
+            print(check_sid_root(configuration, client_ip, path))
+
+            lookup_time = time.time() - lookup_start
+            lookups += 1
+            lookup_secs += lookup_time
+            max_lookup_secs = max(max_lookup_secs, lookup_time)
+            if time.time() - last_stats > stats_interval:
+                last_stats = time.time()
+                logger.info("%d lookups with avg %.6fs (max %.6fs)" %
+                            (lookups, lookup_secs / lookups, max_lookup_secs))
+                logger.info("sid cache: %s" % sid_cache.format_stats())
+                sid_cache.purge_expired()
         except KeyboardInterrupt:
             keep_running = False
         except Exception as exc:
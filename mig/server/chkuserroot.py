@@ -53,6 +53,8 @@ try:
     from mig.shared.base import client_dir_id
     from mig.shared.conf import get_configuration_object
     from mig.shared.logger import daemon_logger, register_hangup_handler
+    from mig.shared.ttlcache import TTLCache
+    from mig.shared.userdb import default_db_path
     from mig.shared.validstring import valid_user_path
 except Exception as exc:
     print("Could not load migrid code from chkuserroot helper!")
@@ -65,6 +67,95 @@ configuration, logger = None, None
 
 INVALID_MARKER = "_OUT_OF_BOUNDS_"
 
+# Remember path and account verdicts for a short while since the same files
+# are typically requested many times in a row. Account verdicts are dropped
+# on any user DB change.
+path_cache = TTLCache(10000, 10)
+account_cache = TTLCache(1000, 60)
+_user_db_stamp = {'mtime': None}
+# Log lookup latency and cache stats this often
+stats_interval = 600
+
+addr_path_pattern = re.compile(
+    r"^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})::(/.*)$")
+
+
+def cached_account_accessible(configuration, user_id):
+    """Check if user_id account is accessible using the account cache"""
+    try:
+        db_mtime = os.path.getmtime(default_db_path(configuration))
+    except OSError:
+        db_mtime = None
+    if db_mtime != _user_db_stamp['mtime']:
+        account_cache.clear()
+        _user_db_stamp['mtime'] = db_mtime
+    accessible = account_cache.get(user_id, None)
+    if accessible is None:
+        accessible = check_account_accessible(configuration, user_id, 'https')
+        account_cache.put(user_id, accessible)
+    return accessible
+
+
+def check_user_root(configuration, client_ip, path):
+    """Check that path is a valid path inside an accessible user home and
+    return the real path if so. Otherwise return INVALID_MARKER.
+    """
+    _logger = configuration.logger
+    raw_path = path
+    if not os.path.isabs(path):
+        _logger.error("not an absolute path from %s: %s" % (client_ip, path))
+        return INVALID_MARKER
+    # NOTE: extract home dir before ANY expansion to avoid escape
+    #       with e.g. /PATH/TO/OWNUSER/../OTHERUSER/somefile.txt
+    root = configuration.user_home.rstrip(os.sep) + os.sep
+    if not path.startswith(root):
+        # Only warn to avoid excessive noise from scanners
+        _logger.warning("got path from %s with invalid root: %s" %
+                        (client_ip, path))
+        return INVALID_MARKER
+    # Extract name of home as first component after root base
+    home_dir = path.replace(root, "").lstrip(os.sep)
+    home_dir = home_dir.split(os.sep, 1)[0]
+    _logger.debug("found home dir: %s" % home_dir)
+    user_id = client_dir_id(home_dir)
+    # No need to expand home_path here - done in valid_user_path
+    home_path = os.path.join(root, home_dir) + os.sep
+    # Make sure absolute/normalized but unexpanded path is inside home.
+    # Only prevents path itself outside home - not illegal linking
+    # outside home, which is checked later.
+    path = os.path.abspath(path)
+    if not path.startswith(home_path):
+        _logger.error("got path from %s outside user home: %s" %
+                      (client_ip, raw_path))
+        return INVALID_MARKER
+
+    # NOTE: the cached verdict covers the link expansion and chroot check
+    verdict = path_cache.get((home_path, path), None)
+    if verdict is None:
+        real_path = os.path.realpath(path)
+        _logger.debug("check path %s in home %s or chroot" % (path,
+                                                              home_path))
+        # Exact match to user home does not make sense as we expect a file
+        # IMPORTANT: use path and not real_path here in order to test both
+        valid = valid_user_path(configuration, path, home_path,
+                                allow_equal=False, apache_scripts=True)
+        verdict = (valid, real_path)
+        path_cache.put((home_path, path), verdict)
+    (valid, real_path) = verdict
+    if not valid:
+        _logger.error("path from %s outside user chroot %s: %s (%s)" %
+                      (client_ip, home_path, raw_path, real_path))
+        return INVALID_MARKER
+    elif not cached_account_accessible(configuration, user_id):
+        # Only warn to avoid excessive noise from scanners
+        _logger.warning("path from %s in inaccessible %s account: %s (%s)"
+                        % (client_ip, user_id, raw_path, real_path))
+        return INVALID_MARKER
+
+    _logger.info("found valid user chroot path from %s: %s" %
+                 (client_ip, real_path))
+    return real_path
+
 if __name__ == '__main__':
     configuration = get_configuration_object()
     verbose = False
@@ -98,79 +189,41 @@ unless it is available in mig/server/MiGserver.conf
 
     chkuserroot_stdin = sys.stdin
 
-    addr_path_pattern = re.compile(
-        "^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})::(/.*)$")
     keep_running = True
+    lookups, lookup_secs, max_lookup_secs = 0, 0.0, 0.0
+    last_stats = time.time()
     if verbose:
         print('Reading commands from sys stdin')
     while keep_running:
         try:
             client_ip = "UNKNOWN"
             line = chkuserroot_stdin.readline()
-            raw_line = raw_path = path = line.strip()
+            if not line:
+                # NOTE: apache closed the pipe
+                break
+            lookup_start = time.time()
+            path = line.strip()
             # New line format is ${CLIENT_IP}::${PATH}
             # try to parse and update client_ip and path
-            match = addr_path_pattern.match(raw_line)
+            match = addr_path_pattern.match(path)
             if match:
                 client_ip = match.group(1)
-                raw_path = path = match.group(2)
+                path = match.group(2)
             logger.info("chkuserroot from %s got path: %s" % (client_ip, path))
-            if not os.path.isabs(path):
-                logger.error("not an absolute path from %s: %s" %
-                             (client_ip, path))
-                print(INVALID_MARKER)
-                continue
-            # NOTE: extract home dir before ANY expansion to avoid escape
-            #       with e.g. /PATH/TO/OWNUSER/../OTHERUSER/somefile.txt
-            root = configuration.user_home.rstrip(os.sep) + os.sep
-            if not path.startswith(root):
-                # Only warn to avoid excessive noise from scanners
-                logger.warning("got path from %s with invalid root: %s" %
-                               (client_ip, path))
-                print(INVALID_MARKER)
-                continue
-            # Extract name of home as first component after root base
-            home_dir = path.replace(root, "").lstrip(os.sep)
-            home_dir = home_dir.split(os.sep, 1)[0]
-            logger.debug("found home dir: %s" % home_dir)
-            user_id = client_dir_id(home_dir)
-            # No need to expand home_path here - done in valid_user_path
-            home_path = os.path.join(root, home_dir) + os.sep
-            # Make sure absolute/normalized but unexpanded path is inside home.
-            # Only prevents path itself outside home - not illegal linking
-            # outside home, which is checked later.
-            path = os.path.abspath(path)
-            if not path.startswith(home_path):
-                logger.error("got path from %s outside user home: %s" %
-                             (client_ip, raw_path))
-                print(INVALID_MARKER)
-                continue
-
-            real_path = os.path.realpath(path)
-            logger.debug("check path %s in home %s or chroot" % (path,
-                                                                 home_path))
-            # Exact match to user home does not make sense as we expect a file
-            # IMPORTANT: use path and not real_path here in order to test both
-            if not valid_user_path(configuration, path, home_path,
-                                   allow_equal=False, apache_scripts=True):
-                logger.error("path from %s outside user chroot %s: %s (%s)" %
-                             (client_ip, home_path, raw_path, real_path))
-                print(INVALID_MARKER)
-                continue
-            elif not check_account_accessible(configuration, user_id, 'https'):
-                # Only warn to avoid excessive noise from scanners
-                logger.warning("path from %s in inaccessible %s account: %s (%s)"
-                               % (client_ip, user_id, raw_path, real_path))
-                print(INVALID_MARKER)
-                continue
-
-            logger.info("found valid user chroot path from %s: %s" %
-                        (client_ip, real_path))
-            print(real_path)
-
-            # Throttle down a bit to yield
-
-            time.sleep(0.01)
+            print(check_user_root(configuration, client_ip, path))
+
+            lookup_time = time.time() - lookup_start
+            lookups += 1
+            lookup_secs += lookup_time
+            max_lookup_secs = max(max_lookup_secs, lookup_time)
+            if time.time() - last_stats > stats_interval:
+                last_stats = time.time()
+                logger.info("%d lookups with avg %.6fs (max %.6fs)" %
+                            (lookups, lookup_secs / lookups, max_lookup_secs))
+                logger.info("path cache: %s" % path_cache.format_stats())
+                logger.info("account cache: %s" %
+                            account_cache.format_stats())
+                path_cache.purge_expired()
         except KeyboardInterrupt:
             keep_running = False
         except Exception as exc:
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# feasibility - incremental job and resource fit matrix for the schedulers
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Incremental feasibility matrix of queued jobs against resources.
+
+The static part of the scheduler job_fits_resource check only depends on the
+job requirements and the resource capabilities, so it is kept here in bulk
+form instead of being repeated for every job and resource pair on every
+resource request.
+
+Each job is assigned a row with its numeric requirements and a requirement
+class covering the remaining fields: resource patterns, architecture, job
+type, sandbox, platform and runtime environments. Queued jobs tend to share a
+small number of such classes, so each class only needs to be checked once per
+resource. The fit mask of a resource is then the numeric comparison of all
+rows against the resource capabilities combined with the class results.
+Masks are cached per resource and only recalculated when the resource changes,
+whereas rows are updated in the cached masks as jobs come and go. A JobQueue
+with the index attached adds and removes rows on enqueue and dequeue so that
+the index never needs a full sync against the queue.
+
+NumPy is used for the bulk comparisons if available and plain lists otherwise.
+The vgrid access check depends on the current vgrid memberships and remains a
+per pair check in the scheduler.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import fnmatch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mig.shared.resource import anon_resource_id
+
+# Numeric job requirements compared with a simple less than or equal test
+numeric_fields = ['NODECOUNT', 'CPUCOUNT', 'CPUTIME', 'DISK', 'MEMORY']
+
+# Sentinels making missing job fields always fit and missing resource fields
+# only fit jobs without that requirement. Invalid job values never fit.
+_NO_REQ = -2**62
+_NO_CAP = _NO_REQ + 1
+_BAD_REQ = 2**62
+
+
+def _clamp(value, low, high):
+    """Limit value to the range from low to high so that it fits the int64
+    arrays regardless of what the job or resource specified.
+    """
+    return max(low, min(value, high))
+
+
+def _job_requirements(job):
+    """Extract tuple of numeric requirements and requirement class of job"""
+    reqs = []
+    for field in numeric_fields:
+        if field not in job:
+            reqs.append(_NO_REQ)
+            continue
+        try:
+            reqs.append(_clamp(int(job[field]), _NO_REQ, _BAD_REQ))
+        except (TypeError, ValueError, OverflowError):
+            reqs.append(_BAD_REQ)
+    req_class = (tuple(job.get('RESOURCE', None) or []),
+                 job.get('ARCHITECTURE', '') or '',
+                 job.get('JOBTYPE', None), job.get('SANDBOX', None),
+                 job.get('PLATFORM', None),
+                 tuple(sorted(set(job.get('RUNTIMEENVIRONMENT', [])))))
+    return (tuple(reqs), req_class)
+
+
+def _resource_signature(res):
+    """Extract tuple of all resource fields affecting the static fit"""
+    public_id = res['RESOURCE_ID']
+    if res.get('ANONYMOUS', True):
+        public_id = anon_resource_id(public_id)
+    caps = []
+    for field in numeric_fields:
+        try:
+            caps.append(_clamp(int(res[field]), _NO_CAP, _BAD_REQ - 1))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            caps.append(_NO_CAP)
+    env_names = frozenset([name for (name, _) in
+                           res.get('RUNTIMEENVIRONMENT', [])])
+    return (public_id, res.get('ARCHITECTURE', None),
+            res.get('JOBTYPE', 'batch'), res.get('SANDBOX', False),
+            res.get('PLATFORM', ''), env_names, tuple(caps))
+
+
+def _class_fits(req_class, signature):
+    """Check if jobs of req_class fit resource with signature apart from the
+    numeric requirements. Mirrors the checks in job_fits_resource.
+    """
+    (patterns, arch, jobtype, sandbox, platform, env_names) = req_class
+    (public_id, res_arch, res_jobtype, res_sandbox, res_platform,
+     res_env_names, _) = signature
+    if patterns:
+        for pattern in patterns:
+            if fnmatch.fnmatch(public_id, pattern):
+                break
+        else:
+            return False
+    if arch and arch != res_arch:
+        return False
+    # Keyword all matches any job type and batch is a subset of bulk
+    if jobtype is not None and res_jobtype != 'all' and \
+            not (res_jobtype == 'bulk' and jobtype == 'batch') and \
+            jobtype != res_jobtype:
+        return False
+    # Do not schedule non-sandbox jobs on a sandbox resource
+    if sandbox is not None and not sandbox and res_sandbox:
+        return False
+    if platform is not None and platform.upper() != res_platform.upper():
+        return False
+    for name in env_names:
+        if name not in res_env_names:
+            return False
+    return True
+
+
+class FeasibilityIndex(object):
+
+    """Static fit masks of the queued jobs for each known resource"""
+
+    def __init__(self, logger, use_numpy=True):
+        """Init empty index using NumPy arrays if available and allowed"""
+
+        self.logger = logger
+        self.use_numpy = use_numpy and numpy is not None
+        self._rows = {}
+        self._free_rows = []
+        self._size = 0
+        self._capacity = 0
+        self._reqs = []
+        self._classes = []
+        self._live = []
+        self._class_ids = {}
+        self._class_keys = []
+        self._masks = {}
+        if self.use_numpy:
+            self._grow(1024)
+
+    def __len__(self):
+        """Number of indexed jobs"""
+
+        return len(self._rows)
+
+    def _grow(self, capacity):
+        """Make room for at least capacity rows in NumPy mode"""
+
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, 2 * self._capacity)
+        reqs = numpy.zeros((capacity, len(numeric_fields)), dtype=numpy.int64)
+        classes = numpy.zeros(capacity, dtype=numpy.int32)
+        live = numpy.zeros(capacity, dtype=bool)
+        if self._capacity:
+            reqs[:self._capacity] = self._reqs
+            classes[:self._capacity] = self._classes
+            live[:self._capacity] = self._live
+        (self._reqs, self._classes, self._live) = (reqs, classes, live)
+        for cached in self._masks.values():
+            mask = numpy.zeros(capacity, dtype=bool)
+            mask[:self._capacity] = cached['mask']
+            cached['mask'] = mask
+        self._capacity = capacity
+
+    def _class_id(self, req_class):
+        """Lookup or assign id of req_class"""
+
+        class_id = self._class_ids.get(req_class, None)
+        if class_id is None:
+            class_id = self._class_ids[req_class] = len(self._class_keys)
+            self._class_keys.append(req_class)
+        return class_id
+
+    def _update_pending(self, cached):
+        """Fill in the rows added since the cached mask was calculated"""
+
+        rows = cached['pending']
+        if not rows:
+            return
+        cached['pending'] = []
+        class_fits = cached['class_fits']
+        while len(class_fits) < len(self._class_keys):
+            class_fits.append(_class_fits(self._class_keys[len(class_fits)],
+                                          cached['signature']))
+        caps = cached['signature'][-1]
+        mask = cached['mask']
+        if self.use_numpy:
+            rows = numpy.array(rows, dtype=numpy.int64)
+            class_array = numpy.array(class_fits, dtype=bool)
+            mask[rows] = self._live[rows] & \
+                class_array[self._classes[rows]] & \
+                (self._reqs[rows] <=
+                 numpy.array(caps, dtype=numpy.int64)).all(axis=1)
+            return
+        for row in rows:
+            fits = self._live[row] and class_fits[self._classes[row]]
+            if fits:
+                for (req, cap) in zip(self._reqs[row], caps):
+                    if req > cap:
+                        fits = False
+                        break
+            mask[row] = fits
+
+    def add_job(self, job):
+        """Add job to index and mark it for update in the cached masks.
+        Returns job row.
+        """
+
+        job_id = job['JOB_ID']
+        row = self._rows.get(job_id, None)
+        if row is not None:
+            return row
+        (reqs, req_class) = _job_requirements(job)
+        class_id = self._class_id(req_class)
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = self._size
+            self._size += 1
+            if self.use_numpy:
+                self._grow(self._size)
+            else:
+                self._reqs.append(None)
+                self._classes.append(None)
+                self._live.append(False)
+                for cached in self._masks.values():
+                    cached['mask'].append(False)
+        self._reqs[row] = reqs
+        self._classes[row] = class_id
+        self._live[row] = True
+        self._rows[job_id] = row
+        # NOTE: masks are updated in bulk on next use
+        for cached in self._masks.values():
+            cached['pending'].append(row)
+        return row
+
+    def remove_job(self, job_id):
+        """Remove job with job_id from index"""
+
+        row = self._rows.pop(job_id, None)
+        if row is None:
+            return
+        # NOTE: the stale mask entries are refreshed if the row is reused
+        self._live[row] = False
+        self._free_rows.append(row)
+
+    def sync_jobs(self, jobs):
+        """Make the index contain exactly the jobs in the jobs list"""
+
+        job_ids = set([job['JOB_ID'] for job in jobs])
+        for job_id in [i for i in self._rows if i not in job_ids]:
+            self.remove_job(job_id)
+        for job in jobs:
+            if job['JOB_ID'] not in self._rows:
+                self.add_job(job)
+
+    def job_row(self, job_id):
+        """Lookup row of job_id in the masks or None if not indexed"""
+
+        return self._rows.get(job_id, None)
+
+    def _calculate_mask(self, signature):
+        """Calculate a new cached mask of all rows for resource signature"""
+
+        class_fits = [_class_fits(req_class, signature) for req_class in
+                      self._class_keys]
+        caps = signature[-1]
+        if self.use_numpy:
+            size = self._size
+            class_array = numpy.array(class_fits, dtype=bool)
+            mask = numpy.zeros(self._capacity, dtype=bool)
+            mask[:size] = self._live[:size] & \
+                class_array[self._classes[:size]] & \
+                (self._reqs[:size] <=
+                 numpy.array(caps, dtype=numpy.int64)).all(axis=1)
+        else:
+            mask = []
+            for row in range(self._size):
+                fits = self._live[row] and class_fits[self._classes[row]]
+                if fits:
+                    for (req, cap) in zip(self._reqs[row], caps):
+                        if req > cap:
+                            fits = False
+                            break
+                mask.append(fits)
+        return {'signature': signature, 'class_fits': class_fits,
+                'mask': mask, 'pending': []}
+
+    def fit_mask(self, res):
+        """Get mask of the rows fitting res. The mask is indexed by job_row
+        and recalculated only if the resource changed since last call.
+        """
+
+        res_id = res['RESOURCE_ID']
+        signature = _resource_signature(res)
+        cached = self._masks.get(res_id, None)
+        if cached is None or cached['signature'] != signature:
+            cached = self._masks[res_id] = self._calculate_mask(signature)
+        else:
+            self._update_pending(cached)
+        return cached['mask']
+
+    def fits(self, job, res):
+        """Check static fit of a single job and resource. Returns None if job
+        is not indexed.
+        """
+
+        row = self.job_row(job['JOB_ID'])
+        if row is None:
+            return None
+        return bool(self.fit_mask(res)[row])
+
+    def remove_resource(self, res_id):
+        """Drop cached mask for resource with res_id"""
+
+        self._masks.pop(res_id, None)
@@ -46,7 +46,6 @@ import signal
 import sys
 import tempfile
 import time
-import threading
 
 try:
     from watchdog.observers import Observer
@@ -78,13 +77,14 @@ from mig.shared.cmdapi import parse_command_args
 from mig.shared.conf import get_configuration_object
 from mig.shared.defaults import crontab_name, atjobs_name, cron_output_dir, \
     cron_log_name, cron_log_size, cron_log_cnt, csrf_field
-from mig.shared.events import get_time_expand_map, parse_crontab, cron_match, \
-    parse_atjobs, at_remain
+from mig.shared.events import get_time_expand_map, parse_crontab, \
+    parse_atjobs, CronSchedule
 from mig.shared.fileio import makedirs_rec
 from mig.shared.handlers import get_csrf_limit, make_csrf_token
 from mig.shared.job import fill_mrsl_template, new_job
 from mig.shared.logger import daemon_logger, register_hangup_handler
 from mig.shared.output import txt_format
+from mig.shared.workerpool import WorkerPool
 
 # Global cron entry dictionaries with crontabs for all users
 
@@ -99,9 +99,16 @@ shared_state['base_dir'] = None
 shared_state['base_dir_len'] = 0
 shared_state['crontab_inotify'] = None
 shared_state['crontab_handler'] = None
+shared_state['cron_schedule'] = None
+shared_state['cron_pool'] = None
+
+# Log schedule and worker stats this often
+stats_interval = 600
 
 _cron_event = '_cron_event'
 stop_running = multiprocessing.Event()
+# Set on stop and whenever the schedule changes to wake up the main loop
+schedule_changed = multiprocessing.Event()
 (configuration, logger) = (None, None)
 
 
@@ -110,6 +117,7 @@ def stop_handler(sig, frame):
     # Print blank line to avoid mix with Ctrl-C line
     print('')
     stop_running.set()
+    schedule_changed.set()
 
 
 def run_command(
@@ -294,6 +302,9 @@ class MiGCrontabEventHandler(PatternMatchingEventHandler):
             # Replace crontabs for this user
 
             all_crontabs[src_path] = cur_crontab
+            shared_state['cron_schedule'].update(src_path, 'crontab',
+                                                 cur_crontab)
+            schedule_changed.set()
             logger.debug('(%s) all crontabs: %s' % (pid, all_crontabs))
         elif os.path.basename(src_path) == atjobs_name:
             logger.debug('(%s) %s -> Updating atjobs for: %s' % (pid,
@@ -316,6 +327,9 @@ class MiGCrontabEventHandler(PatternMatchingEventHandler):
             # Replace atjobs for this user
 
             all_atjobs[src_path] = cur_atjobs
+            shared_state['cron_schedule'].update(src_path, 'atjobs',
+                                                 cur_atjobs)
+            schedule_changed.set()
             logger.debug('(%s) all atjobs: %s' % (pid, all_atjobs))
         else:
             logger.debug('(%s) %s skipping non-cron file: %s' % (pid,
@@ -427,28 +441,16 @@ def __handle_cronjob(configuration, client_id, timestamp, crontab_entry):
 
 
 def run_handler(configuration, client_id, timestamp, crontab_entry):
-    """Run crontab entry for client_id in a separate thread"""
+    """Queue crontab entry for client_id for execution in the worker pool"""
 
     pid = multiprocessing.current_process().pid
-
-    # TODO: Replace try/catch with an event queue or thread pool setup
-
-    waiting_for_thread_resources = True
-    while waiting_for_thread_resources:
-        try:
-            worker = \
-                threading.Thread(target=__handle_cronjob,
-                                 args=(configuration, client_id,
-                                       timestamp, crontab_entry))
-            worker.daemon = True
-            worker.start()
-            waiting_for_thread_resources = False
-        except threading.ThreadError as exc:
-
-            # logger.debug('(%s) Waiting for thread resources to handle crontab: %s'
-            #              % (pid, crontab_entry))
-
-            time.sleep(1)
+    if not shared_state['cron_pool'].submit(__handle_cronjob, configuration,
+                                            client_id, timestamp,
+                                            crontab_entry, block=False):
+        logger.error('(%s) cron worker queue full - skip %s for %s' %
+                     (pid, crontab_entry['command'], client_id))
+        return False
+    return True
 
 
 def monitor(configuration):
@@ -472,6 +474,15 @@ def monitor(configuration):
     crontab_monitor_home = shared_state['base_dir']
     recursive_crontab_monitor = True
 
+    # Next run times of all entries and workers to run them
+
+    shared_state['cron_schedule'] = CronSchedule(configuration)
+    shared_state['cron_pool'] = WorkerPool('cron',
+                                           configuration.user_cron_workers,
+                                           logger,
+                                           configuration.user_cron_queue_size)
+    shared_state['cron_pool'].start()
+
     crontab_monitor = Observer()
     crontab_pattern = os.path.join(crontab_monitor_home, '*', crontab_name)
     atjobs_pattern = os.path.join(crontab_monitor_home, '*', atjobs_name)
@@ -524,66 +535,82 @@ def monitor(configuration):
     # logger.debug('(%s) loaded initial crontabs:\n%s' % (pid,
     # all_crontab_files))
 
+    cron_schedule = shared_state['cron_schedule']
+    cron_pool = shared_state['cron_pool']
+    cron_stats = {'fired': 0, 'skipped': 0, 'lag_secs': 0.0,
+                  'max_lag_secs': 0.0}
+    last_stats = time.time()
     while not stop_running.is_set():
         try:
-            loop_start = datetime.datetime.now()
-            loop_minute = loop_start.replace(second=0, microsecond=0)
-            logger.debug('main loop started with %d crontabs and %d atjobs' %
-                         (len(all_crontabs), len(all_atjobs)))
-            for (crontab_path, user_crontab) in all_crontabs.items():
-                client_dir = os.path.basename(os.path.dirname(crontab_path))
-                client_id = client_dir_id(client_dir)
-                for entry in user_crontab:
-                    logger.debug('inspect cron entry for %s: %s' %
-                                 (client_id, entry))
-                    if cron_match(configuration, loop_minute, entry):
-                        logger.info('run matching cron entry: %s' % entry)
-                        run_handler(configuration, client_id, loop_minute,
-                                    entry)
-            # NOTE: we need a copy of all_atjobs to avoid errors on inline edit
-            for (atjobs_path, user_atjobs) in list(all_atjobs.items()):
-                client_dir = os.path.basename(os.path.dirname(atjobs_path))
+            now = datetime.datetime.now()
+            now_minute = now.replace(second=0, microsecond=0)
+            due = cron_schedule.pop_due(now_minute)
+            if due:
+                logger.debug('main loop found %d due of %d entries' %
+                             (len(due), len(cron_schedule)))
+            for (when, entry_path, kind, entry) in due:
+                client_dir = os.path.basename(os.path.dirname(entry_path))
                 client_id = client_dir_id(client_dir)
-                remaining = []
-                for entry in user_atjobs:
-                    logger.debug('inspect atjobs entry for %s: %s' %
-                                 (client_id, entry))
-                    remain_mins = at_remain(configuration, loop_minute, entry)
-                    if remain_mins == 0:
-                        logger.info('run matching at entry: %s' % entry)
-                        run_handler(configuration, client_id, loop_minute,
-                                    entry)
-                    elif remain_mins > 0:
-                        remaining.append(entry)
+                if kind == 'atjobs':
+                    # NOTE: atjobs only run once so clean up as we go
+                    remaining = [i for i in all_atjobs.get(entry_path, [])
+                                 if i != entry]
+                    if remaining:
+                        all_atjobs[entry_path] = remaining
                     else:
-                        logger.info('removing expired at job: %s' % entry)
-                # Update remaining jobs to clean up expired
-                if remaining:
-                    all_atjobs[atjobs_path] = remaining
-                else:
-                    del all_atjobs[atjobs_path]
+                        all_atjobs.pop(entry_path, None)
+                if when < now_minute:
+                    # NOTE: like before we do not run entries late
+                    logger.warning('skip %s entry for %s missed at %s: %s' %
+                                   (kind, client_id, when, entry))
+                    cron_stats['skipped'] += 1
+                    continue
+                lag = (datetime.datetime.now() - when).total_seconds()
+                cron_stats['fired'] += 1
+                cron_stats['lag_secs'] += lag
+                cron_stats['max_lag_secs'] = max(cron_stats['max_lag_secs'],
+                                                 lag)
+                logger.info('run matching %s entry: %s' % (kind, entry))
+                run_handler(configuration, client_id, now_minute, entry)
+            if time.time() - last_stats > stats_interval:
+                last_stats = time.time()
+                logger.info('(%s) cron schedule: %d entries, %d run with '
+                            'avg lag %.3fs (max %.3fs), %d missed' %
+                            (pid, len(cron_schedule), cron_stats['fired'],
+                             cron_stats['lag_secs'] /
+                             max(1, cron_stats['fired']),
+                             cron_stats['max_lag_secs'],
+                             cron_stats['skipped']))
+                logger.info('(%s) %s' % (pid, cron_pool.format_stats()))
         except KeyboardInterrupt:
             print('(%s) caught interrupt' % pid)
             stop_running.set()
+            schedule_changed.set()
         except Exception as exc:
             logger.error('unexpected exception in monitor: %s' % exc)
             import traceback
             print(traceback.format_exc())
 
-        # Throttle down until next minute
-
-        loop_time = (datetime.datetime.now() - loop_start).seconds
-        if loop_time > 60:
-            logger.warning('(%s) loop did not finish before next tick: %s' %
-                           (os.getpid(), loop_time))
-            loop_time = 59
-        # Target sleep until start of next minute
-        sleep_time = max(60 - (loop_time + loop_start.second), 1)
-        # TODO: this debug log never shows up - conflict with user info log?
-        #       at least it does if changed to info.
-        logger.debug('main loop sleeping %ds' % sleep_time)
-        # print('main loop sleeping %ds' % sleep_time)
-        time.sleep(sleep_time)
+        # Sleep until start of next minute or the next scheduled entry if
+        # later. Updates always schedule entries in the following minutes and
+        # wake us up so that we can recalculate the sleep before they are due.
+
+        now = datetime.datetime.now()
+        next_minute = now.replace(second=0, microsecond=0) + \
+            datetime.timedelta(minutes=1)
+        next_time = cron_schedule.next_time()
+        if next_time is not None and next_time > next_minute:
+            wake_time = next_time
+        else:
+            wake_time = next_minute
+        # NOTE: wake up at least hourly to keep an eye on clock changes
+        sleep_time = min(max((wake_time - now).total_seconds(), 0.1), 3600)
+        logger.debug('main loop sleeping %.1fs' % sleep_time)
+        schedule_changed.wait(sleep_time)
+        schedule_changed.clear()
+
+    crontab_monitor.stop()
+    cron_pool.shutdown(wait=False)
 
     print('(%s) Exiting crontab monitor' % pid)
     logger.info('(%s) Exiting crontab monitor' % pid)
@@ -641,6 +668,7 @@ unless it is available in mig/server/MiGserver.conf
             time.sleep(1)
         except KeyboardInterrupt:
             stop_running.set()
+            schedule_changed.set()
             # NOTE: we can't be sure if SIGINT was sent to only main process
             #       so we make sure to propagate to monitor child
             print("Interrupt requested - close monitor and shutdown")
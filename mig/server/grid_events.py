@@ -35,14 +35,12 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 import datetime
-import fnmatch
 import glob
 import itertools
 import logging
 import logging.handlers
 import multiprocessing
 import os
-import re
 import shutil
 import signal
 import sys
@@ -82,8 +80,9 @@ try:
     from mig.shared.conf import get_configuration_object
     from mig.shared.defaults import valid_trigger_changes, workflows_log_name, \
         workflows_log_size, workflows_log_cnt, csrf_field, default_vgrid
-    from mig.shared.events import get_path_expand_map
-    from mig.shared.fileio import makedirs_rec, pickle, unpickle, walk
+    from mig.shared.dircache import DirCache
+    from mig.shared.events import get_path_expand_map, TriggerRuleMatcher
+    from mig.shared.fileio import makedirs_rec, pickle, walk
     from mig.shared.handlers import get_csrf_limit, make_csrf_token
     from mig.shared.job import fill_mrsl_template, new_job
     from mig.shared.listhandling import frange
@@ -93,6 +92,7 @@ try:
     from mig.shared.vgrid import vgrid_valid_entities, vgrid_add_workflow_jobs, \
         JOB_ID, JOB_CLIENT
     from mig.shared.vgridaccess import check_vgrid_access
+    from mig.shared.workerpool import WorkerPool
     from mig.shared.workflows import get_wp_map, CONF
 except ImportError as ioe:
     print("could not import mig modules!")
@@ -102,6 +102,8 @@ except ImportError as ioe:
 
 all_rules = {}
 rule_hits = {}
+# Precompiled and prefix indexed version of all_rules for event matching
+rule_matcher = TriggerRuleMatcher()
 dir_cache = {}
 
 # Global miss cache to avoid wasting energy on repeated events without triggers
@@ -119,6 +121,7 @@ shared_state['file_inotify'] = None
 shared_state['file_handler'] = None
 shared_state['rule_handler'] = None
 shared_state['rule_inotify'] = None
+shared_state['trigger_pool'] = None
 
 # Only cache rule misses for one minute at a time to catch rule updates.
 # Run complete expire cycle if miss cache exceeds expire size.
@@ -126,6 +129,16 @@ shared_state['rule_inotify'] = None
 _miss_cache_ttl = 60
 _cache_expire_size = 10000
 
+# Log trigger pool queue depth and latency stats this often in seconds
+
+_pool_stats_interval = 300
+
+# Save dir cache changes this often in seconds and scan dirs with this many
+# workers in parallel during reconcile
+
+_dir_cache_save_interval = 600
+_dir_scan_workers = 8
+
 # Rate limit helpers
 
 (_rate_limit_field, _settle_time_field) = ('rate_limit', 'settle_time')
@@ -614,10 +627,7 @@ class MiGRuleEventHandler(PatternMatchingEventHandler):
             # Remove all old rules for this vgrid and
             # leave rules for parent and sub-vgrids
 
-            for target_path in all_rules:
-                all_rules[target_path] = [i for i in
-                                          all_rules[target_path] if i['vgrid_name']
-                                          != vgrid_name]
+            for target_path in list(all_rules):
                 remain_rules = [i for i in all_rules[target_path]
                                 if i['vgrid_name'] != vgrid_name]
                 if remain_rules:
@@ -639,6 +649,9 @@ class MiGRuleEventHandler(PatternMatchingEventHandler):
                 all_rules[abs_path] = all_rules.get(abs_path, []) \
                     + [entry]
 
+            # Recompile the changed rule patterns for matching in one go
+            rule_matcher.update(all_rules)
+
             # logger.debug('(%s) all rules:\n%s' % (pid, all_rules))
         # else:
         #    logger.debug('(%s) %s skipping _NON_ rule file: %s' % (pid,
@@ -795,26 +808,19 @@ class MiGFileEventHandler(PatternMatchingEventHandler):
 
         return result
 
-    def __handle_trigger(
-        self,
-        event,
-        target_path,
-        rule,
-    ):
-        """Actually handle valid trigger for a specific event and the
-        corresponding target_path pattern and trigger rule.
+    def __limit_trigger(self, event, rule):
+        """Check settle time and rate limit for a valid trigger event and
+        record the hit in the rule history. Called when the event arrives
+        rather than when a worker picks it up, so that queued and coalesced
+        events count as well. Returns a boolean indicating if the trigger
+        should be handled.
         """
 
         pid = multiprocessing.current_process().pid
         state = event.event_type
         src_path = event.src_path
         time_stamp = event.time_stamp
-        _chain = getattr(event, '_chain', [(src_path, state)])
         rel_src = strip_base_dirs(src_path).lstrip(os.sep)
-        vgrid_prefix = os.path.join(
-            shared_state['base_dir'], rule['vgrid_name'])
-        logger.info('(%s) in handling of %s for %s %s' %
-                    (pid, rule['action'], state, rel_src))
         above_limit = False
 
         # Run settle time check first to only trigger rate limit if settled
@@ -844,41 +850,93 @@ class MiGFileEventHandler(PatternMatchingEventHandler):
             self.__workflow_info(configuration, rule['vgrid_name'],
                                  'skip %s modified access time only event'
                                  % rel_src)
-            return
+            return False
 
         # Always update here to get trigger hits even for limited events
 
         update_rule_hits(rule, src_path, state, '', time_stamp)
         if above_limit:
-            return
+            return False
         logger.info('(%s) proceed with handling of %s for %s %s'
                     % (pid, rule['action'], state, rel_src))
         self.__workflow_info(configuration, rule['vgrid_name'],
                              'handle %s for %s %s' % (rule['action'],
                                                       state, rel_src))
-        settle_secs = extract_time_in_secs(rule, _settle_time_field)
-        if settle_secs > 0.0:
-            wait_secs = settle_secs
-        else:
-            wait_secs = 0.0
+        return True
 
-            # logger.debug('(%s) no settle time for %s (%s)' % (pid,
-            #             target_path, rule))
+    def __settle_trigger(
+        self,
+        event,
+        target_path,
+        rule,
+        settle_secs,
+        coalesce_key,
+    ):
+        """Delayed re-check of settle time for a trigger. Handles the trigger
+        right away if no further events arrived on the path during the last
+        settle_secs and otherwise schedules another check for when the
+        remaining part of settle_secs has passed. No worker is held while
+        waiting.
+        """
 
-        while wait_secs > 0.0:
-            logger.info('(%s) wait %.1fs for %s file events to settle down'
-                        % (pid, wait_secs, src_path))
-            self.__workflow_info(configuration, rule['vgrid_name'],
-                                 'wait %.1fs for events on %s to settle'
-                                 % (wait_secs, rel_src))
-            time.sleep(wait_secs)
+        state = event.event_type
+        src_path = event.src_path
+        wait_secs = wait_settled(rule, src_path, state, settle_secs,
+                                 time.time())
+        if wait_secs > 0.0:
+            self.__schedule_settle(event, target_path, rule, settle_secs,
+                                   wait_secs, coalesce_key)
+            return
+        self.__handle_trigger(event, target_path, rule)
 
-            # logger.debug('(%s) slept %.1fs for %s file events to settle down'
-            #              % (pid, wait_secs, src_path))
+    def __schedule_settle(
+        self,
+        event,
+        target_path,
+        rule,
+        settle_secs,
+        wait_secs,
+        coalesce_key,
+    ):
+        """Schedule a settle time re-check for trigger in wait_secs unless one
+        is already pending for coalesce_key.
+        """
 
-            time_stamp += wait_secs
-            wait_secs = wait_settled(rule, src_path, state,
-                                     settle_secs, time_stamp)
+        pid = multiprocessing.current_process().pid
+        src_path = event.src_path
+        rel_src = strip_base_dirs(src_path).lstrip(os.sep)
+        logger.info('(%s) wait %.1fs for %s file events to settle down'
+                    % (pid, wait_secs, src_path))
+        self.__workflow_info(configuration, rule['vgrid_name'],
+                             'wait %.1fs for events on %s to settle'
+                             % (wait_secs, rel_src))
+        trigger_pool = shared_state['trigger_pool']
+        if not trigger_pool.submit_later(
+                wait_secs, self.__settle_trigger, event, target_path, rule,
+                settle_secs, coalesce_key, coalesce_key=coalesce_key):
+            logger.error('(%s) too many delayed triggers - dropping %s: %s'
+                         % (pid, src_path, trigger_pool.format_stats()))
+
+    def __handle_trigger(
+        self,
+        event,
+        target_path,
+        rule,
+    ):
+        """Actually handle valid trigger for a specific event and the
+        corresponding target_path pattern and trigger rule.
+        """
+
+        pid = multiprocessing.current_process().pid
+        state = event.event_type
+        src_path = event.src_path
+        time_stamp = event.time_stamp
+        _chain = getattr(event, '_chain', [(src_path, state)])
+        rel_src = strip_base_dirs(src_path).lstrip(os.sep)
+        vgrid_prefix = os.path.join(
+            shared_state['base_dir'], rule['vgrid_name'])
+        logger.info('(%s) in handling of %s for %s %s' %
+                    (pid, rule['action'], state, rel_src))
 
         # TODO: perhaps we should discriminate on files and dirs here?
         # TODO: logger does not actually work here, only __workflow_X logs
@@ -1131,21 +1189,19 @@ class MiGFileEventHandler(PatternMatchingEventHandler):
             # extracts vgrid_name and specific dir_cache ?
 
             vgrid_name = rel_path.split(os.sep)[0]
-            if vgrid_name not in dir_cache:
-                dir_cache[vgrid_name] = {}
-            vgrid_dir_cache = dir_cache[vgrid_name]
+            vgrid_dir_cache = get_dir_cache(configuration, vgrid_name)
 
             # logger.debug('(%s) Updating file monitor for src_path: %s, event: %s'
             #              % (pid, src_path, state))
 
             if os.path.exists(src_path) and os.path.isdir(src_path):
                 try:
-                    vgrid_dir_cache[rel_path] = {}
+                    vgrid_dir_cache.set_mtime(rel_path, 0)
                     rel_path_ctime = os.path.getctime(src_path)
                     rel_path_mtime = os.path.getmtime(src_path)
                     add_vgrid_file_monitor_watch(configuration,
                                                  rel_path)
-                    vgrid_dir_cache[rel_path]['mtime'] = rel_path_mtime
+                    vgrid_dir_cache.set_mtime(rel_path, rel_path_mtime)
 
                     # Check if sub paths or files were changed
                     # For create this occurs by eg. mkdir -p 'path/subpath/subpath2'
@@ -1155,10 +1211,8 @@ class MiGFileEventHandler(PatternMatchingEventHandler):
                         if ent.is_dir(follow_symlinks=True):
                             vgrid_sub_path = strip_base_dirs(ent.path)
 
-                            if not vgrid_sub_path in \
-                                    vgrid_dir_cache or \
-                                    vgrid_dir_cache[vgrid_sub_path]['mtime'] \
-                                    < rel_path_ctime:
+                            if vgrid_dir_cache.get_mtime(vgrid_sub_path,
+                                                         -1) < rel_path_ctime:
 
                                 # logger.debug('(%s) %s -> Dispatch DirCreatedEvent for: %s'
                                 #         % (pid, src_path, ent.path))
@@ -1291,103 +1345,110 @@ class MiGFileEventHandler(PatternMatchingEventHandler):
 
         rule_hit = False
 
-        # Each target_path pattern has one or more rules associated
-
-        for (target_path, rule_list) in all_rules.items():
+        # Each target_path pattern has one or more rules associated and the
+        # matcher only returns the ones where the pattern matches src_path
 
-            # Do not use ordinary fnmatch as it lets '*' match anything
-            # including '/' which leads to greedy matching in subdirs
+        for (target_path, rule_list, direct_hit) in \
+                rule_matcher.match(src_path):
 
-            recursive_regexp = fnmatch.translate(target_path)
-            direct_regexp = recursive_regexp.replace('.*', '[^/]*')
-            recursive_hit = re.match(recursive_regexp, src_path)
-            direct_hit = re.match(direct_regexp, src_path)
+            # logger.debug('(%s) matched %s for %s (direct %s)' % (pid,
+            #             src_path, target_path, direct_hit))
 
-            if direct_hit or recursive_hit:
+            for rule in rule_list:
 
-                # logger.debug('(%s) matched %s for %s and/or %s' % (pid,
-                #             src_path, direct_regexp, recursive_regexp))
+                # Rules may listen for only file or dir events and with
+                # recursive directory search
 
-                for rule in rule_list:
+                if is_directory and not rule.get('match_dirs',
+                                                 False):
 
-                    # Rules may listen for only file or dir events and with
-                    # recursive directory search
+                    # logger.debug('(%s) skip event %s handling for dir: %s'
+                    #              % (pid, rule['rule_id'], src_path))
 
-                    if is_directory and not rule.get('match_dirs',
-                                                     False):
-
-                        # logger.debug('(%s) skip event %s handling for dir: %s'
-                        #              % (pid, rule['rule_id'], src_path))
+                    continue
+                if not is_directory and not rule.get('match_files',
+                                                     True):
 
-                        continue
-                    if not is_directory and not rule.get('match_files',
-                                                         True):
+                    # logger.debug('(%s) skip %s event handling for file: %s'
+                    #             % (pid, rule['rule_id'], src_path))
 
-                        # logger.debug('(%s) skip %s event handling for file: %s'
-                        #             % (pid, rule['rule_id'], src_path))
+                    continue
+                if not direct_hit and not rule.get('match_recursive',
+                                                   False):
 
-                        continue
-                    if not direct_hit and not rule.get('match_recursive',
-                                                       False):
+                    # logger.debug('(%s) skip %s recurse event handling for: %s'
+                    #              % (pid, rule['rule_id'], src_path))
 
-                        # logger.debug('(%s) skip %s recurse event handling for: %s'
-                        #              % (pid, rule['rule_id'], src_path))
+                    continue
+                if not state in rule['changes']:
 
-                        continue
-                    if not state in rule['changes']:
+                    # logger.debug('(%s) skip %s %s event handling for: %s'
+                    #         % (pid, rule['rule_id'], state,
+                    #        src_path))
 
-                        # logger.debug('(%s) skip %s %s event handling for: %s'
-                        #         % (pid, rule['rule_id'], state,
-                        #        src_path))
+                    continue
 
-                        continue
+                # IMPORTANT: keep this vgrid access check last!
+                # It is far more computationally expensive than the simple
+                # checks above. We particularly want to filter the common
+                # storm of events from the system_imagesettings_dir_deleted
+                # trigger for '*' but only on dirs, before it gets here.
 
-                    # IMPORTANT: keep this vgrid access check last!
-                    # It is far more computationally expensive than the simple
-                    # checks above. We particularly want to filter the common
-                    # storm of events from the system_imagesettings_dir_deleted
-                    # trigger for '*' but only on dirs, before it gets here.
+                # User may have been removed from vgrid - log and ignore
 
-                    # User may have been removed from vgrid - log and ignore
+                # logger.debug('(%s) check valid user %s in %s for %s' % \
+                #              (pid, rule['run_as'], rule['vgrid_name'],
+                #               rule['rule_id']))
 
-                    # logger.debug('(%s) check valid user %s in %s for %s' % \
-                    #              (pid, rule['run_as'], rule['vgrid_name'],
-                    #               rule['rule_id']))
+                if not check_vgrid_access(configuration, rule['run_as'],
+                                          rule['vgrid_name']):
+                    logger.warning('(%s) no such user in vgrid: %s'
+                                   % (pid, rule['run_as']))
+                    continue
 
-                    if not check_vgrid_access(configuration, rule['run_as'],
-                                              rule['vgrid_name']):
-                        logger.warning('(%s) no such user in vgrid: %s'
-                                       % (pid, rule['run_as']))
-                        continue
+                logger.info('(%s) trigger %s for src_path: %s -> %s'
+                            % (pid, rule['action'], src_path,
+                                rule))
 
-                    logger.info('(%s) trigger %s for src_path: %s -> %s'
-                                % (pid, rule['action'], src_path,
-                                    rule))
+                rule_hit = True
 
-                    rule_hit = True
+                # Settle time and rate limit accounting happens here so that
+                # every event counts even if it is later coalesced.
 
-                    # TODO: Replace try/catch with an event queue or thread
-                    #       pool setup
+                if not self.__limit_trigger(event, rule):
+                    continue
 
-                    waiting_for_thread_resources = True
-                    while waiting_for_thread_resources:
-                        try:
-                            worker = \
-                                threading.Thread(target=self.__handle_trigger,
-                                                 args=(event, target_path, rule))
-                            worker.daemon = True
-                            worker.start()
-                            waiting_for_thread_resources = False
-                        except threading.ThreadError as exc:
+                # Triggers with a settle time are re-checked by the pool timer
+                # once it passed instead of occupying a worker while waiting.
 
-                            # logger.debug('(%s) Waiting for thread resources to handle trigger: %s'
-                            #              % (pid, event))
+                # Any identical event for the same path and rule still
+                # waiting in the pool makes this one a duplicate.
 
-                            time.sleep(1)
+                trigger_pool = shared_state['trigger_pool']
+                coalesce_key = (rule['vgrid_name'], rule['rule_id'], state,
+                                src_path)
+                settle_secs = extract_time_in_secs(rule, _settle_time_field)
+                if settle_secs > 0.0:
+                    self.__schedule_settle(event, target_path, rule,
+                                           settle_secs, settle_secs,
+                                           coalesce_key)
+                    continue
 
-            # else:
-            #    logger.debug('(%s) skip %s with no matching rules'
-            #                 % (pid, target_path))
+                # Hand off to the bounded trigger pool. When the queue is full
+                # the task is deferred to the bounded set of delayed tasks in
+                # the pool timer, which waits for room, so that the event
+                # source is never blocked here.
+
+                if not trigger_pool.submit(self.__handle_trigger, event,
+                                           target_path, rule, block=False,
+                                           coalesce_key=coalesce_key):
+                    logger.warning('(%s) trigger queue full - deferring: %s'
+                                   % (pid, trigger_pool.format_stats()))
+                    if not trigger_pool.submit_later(
+                            0.0, self.__handle_trigger, event, target_path,
+                            rule, coalesce_key=coalesce_key):
+                        logger.error('(%s) too many delayed triggers - '
+                                     'dropping %s' % (pid, src_path))
 
         # Finally update rule miss cache for this event
 
@@ -1474,9 +1535,10 @@ def add_vgrid_file_monitor_watch(configuration, path):
     return True
 
 
-def add_vgrid_file_monitor(configuration, vgrid_name, path):
+def add_vgrid_file_monitor(configuration, vgrid_name, path, new_dirs=None):
     """Add file monitor for all dirs and subdirs in *path*, using the
-    global dir_cache.
+    global dir_cache. If the optional new_dirs list is provided any subdirs
+    not yet in the cache are appended there instead of recursively added.
     """
 
     pid = multiprocessing.current_process().pid
@@ -1492,13 +1554,13 @@ def add_vgrid_file_monitor(configuration, vgrid_name, path):
         vgrid_files_path_mtime = os.path.getmtime(vgrid_files_path)
 
         # NOTE: make sure cache entry always gets initialized before use
-        vgrid_dir_cache[path] = vgrid_dir_cache.get(path, {})
-        vgrid_dir_cache[path]['mtime'] = vgrid_dir_cache[path].get('mtime', 0)
+        if not path in vgrid_dir_cache:
+            vgrid_dir_cache.set_mtime(path, 0)
 
         try:
             add_vgrid_file_monitor_watch(configuration, path)
 
-            if vgrid_files_path_mtime != vgrid_dir_cache[path]['mtime']:
+            if vgrid_files_path_mtime != vgrid_dir_cache.get_mtime(path):
 
                 # Traverse dirs for subdirs created since last run
 
@@ -1507,37 +1569,36 @@ def add_vgrid_file_monitor(configuration, vgrid_name, path):
                         vgrid_sub_path = strip_base_dirs(ent.path)
                         # Force utf8 everywhere to avoid encoding issues
                         vgrid_sub_path = force_utf8(vgrid_sub_path)
-                        if not vgrid_sub_path in vgrid_dir_cache:
+                        if vgrid_sub_path in vgrid_dir_cache:
+                            continue
+                        if new_dirs is not None:
+                            new_dirs.append(vgrid_sub_path)
+                        else:
                             retval &= add_vgrid_file_monitor(configuration,
                                                              vgrid_name,
                                                              vgrid_sub_path)
 
-                vgrid_dir_cache[path]['mtime'] = vgrid_files_path_mtime
+                vgrid_dir_cache.set_mtime(path, vgrid_files_path_mtime)
         except OSError as exc:
             # If we get an OSError, src_path was most likely deleted
             # after os.path.exists check or somehow not accessible
 
             logger.warning('(%s) add_vgrid_file_monitor failed on %s: %s' %
                            (pid, path, exc))
-            del vgrid_dir_cache[path]
+            vgrid_dir_cache.remove(path)
             return False
 
     return retval
 
 
-def add_vgrid_file_monitors(configuration, vgrid_name):
-    """Add file monitors for all dirs and subdirs for *vgrid_name*, using the
-    global dir_cache.
+def reconcile_vgrid_subtree(configuration, vgrid_name, paths):
+    """Add file monitors for the dirs in *paths* from one top-level subtree
+    of *vgrid_name* and any new subdirs found below them. Removes dirs that
+    no longer exist from the global dir_cache.
     """
 
-    pid = multiprocessing.current_process().pid
-
     vgrid_dir_cache = dir_cache[vgrid_name]
-
-    vgrid_dir_cache_keys = list(vgrid_dir_cache)
-    for path in vgrid_dir_cache_keys:
-        # Make sure we only have utf8 everywhere to avoid encoding issues
-        path = force_utf8(path)
+    for path in paths:
         vgrid_files_path = os.path.join(configuration.vgrid_files_home,
                                         path)
         if os.path.exists(vgrid_files_path):
@@ -1547,145 +1608,113 @@ def add_vgrid_file_monitors(configuration, vgrid_name):
             # logger.debug('(%s) Removing deleted dir: %s from dir_cache'
             #             % (pid, path))
 
-            del vgrid_dir_cache[path]
-
+            vgrid_dir_cache.remove(path)
     return True
 
 
-def generate_vgrid_dir_cache(configuration, vgrid_base_path):
-    """Generate directory cache for *vgrid_base_path*, using the global
-    dir_cache.
+def add_vgrid_file_monitors(configuration, vgrid_name):
+    """Add file monitors for all dirs and subdirs for *vgrid_name*, using the
+    global dir_cache. The vgrid root is handled first and then all top-level
+    subtrees are reconciled in parallel, because the run time is dominated by
+    filesystem latency on big vgrids.
     """
 
     pid = multiprocessing.current_process().pid
 
-    vgrid_path = os.path.join(configuration.vgrid_files_home,
-                              vgrid_base_path)
-
-    if vgrid_base_path not in dir_cache:
-        dir_cache[vgrid_base_path] = {}
-
-    vgrid_dir_cache = dir_cache[vgrid_base_path]
-
-    # Add VGrid root to directory cache
+    vgrid_dir_cache = get_dir_cache(configuration, vgrid_name)
 
-    vgrid_dir_cache[vgrid_base_path] = {}
-    vgrid_dir_cache[vgrid_base_path]['mtime'] = \
-        os.path.getmtime(vgrid_path)
+    # Group cached dirs on top-level subtree and find any new top-level dirs.
+    # NOTE: subtrees are relative to the vgrid root to also split nested ones
 
-    # logger.debug('(%s) Updating dir_cache %s: %s' % (pid,
-    #             vgrid_base_path,
-    #             vgrid_dir_cache[vgrid_base_path]['mtime']))
+    subtrees = vgrid_dir_cache.subtrees(vgrid_name)
+    new_dirs = []
+    add_vgrid_file_monitor(configuration, vgrid_name, vgrid_name, new_dirs)
+    for path in new_dirs:
+        subtrees[path] = subtrees.get(path, []) + [path]
 
-    # Add VGrid subdirs to directory cache
-
-    for (root, dir_names, _) in walk(vgrid_path, followlinks=True):
-        for dir_name in dir_names:
-            dir_path = os.path.join(root, dir_name)
-            dir_cache_path = strip_base_dirs(dir_path)
-            if dir_cache_path not in vgrid_dir_cache:
-                vgrid_dir_cache[dir_cache_path] = {}
-                vgrid_dir_cache[dir_cache_path]['mtime'] = \
-                    os.path.getmtime(dir_path)
-
-                # logger.debug('(%s) Updating dir_cache %s: %s' % (pid,
-                #             dir_cache_path,
-                #             vgrid_dir_cache[dir_cache_path]['mtime']))
+    scan_pool = WorkerPool('dirscan', _dir_scan_workers, logger)
+    scan_pool.start()
+    for (top_path, paths) in subtrees.items():
+        # NOTE: parents before children to only scan new dirs once
+        paths.sort()
+        scan_pool.submit(reconcile_vgrid_subtree, configuration, vgrid_name,
+                         paths)
+    scan_pool.shutdown()
+    logger.info('(%s) reconciled %d dirs in %d subtrees for %s' %
+                (pid, len(vgrid_dir_cache), len(subtrees), vgrid_name))
 
     return True
 
 
-def load_dir_cache(configuration, vgrid_name):
-    """Load directory cache for *vgrid_name*, into the global dir_cache"""
-
-    result = True
+def reconcile_file_monitors(configuration, vgrid_name):
+    """Add file monitors for *vgrid_name* and save the resulting dir cache.
+    Meant to run in the background after activation.
+    """
 
     pid = multiprocessing.current_process().pid
+    add_monitor_t1 = time.time()
+    add_vgrid_file_monitors(configuration, vgrid_name)
+    add_monitor_t2 = time.time()
+    print('(%s) ready to handle triggers for: %s in %s secs'
+          % (pid, vgrid_name, add_monitor_t2 - add_monitor_t1))
+    logger.info('(%s) ready to handle triggers for: %s in %s secs'
+                % (pid, vgrid_name, add_monitor_t2 - add_monitor_t1))
+    save_dir_cache(vgrid_name)
+
+
+def get_dir_cache(configuration, vgrid_name):
+    """Get directory cache for *vgrid_name* from the global dir_cache. Creates
+    an empty cache if not already loaded.
+    """
 
-    vgrid_home_path = os.path.join(configuration.vgrid_home, vgrid_name)
-    vgrid_dir_cache_filename = '.%s.dir_cache' \
-        % configuration.vgrid_triggers
-    vgrid_dir_cache_filepath = os.path.join(vgrid_home_path,
-                                            vgrid_dir_cache_filename)
-
-    # logger.debug('(%s) loading dir cache for: %s from: %s' % (pid,
-    #             vgrid_name, vgrid_dir_cache_filename))
-
-    # Load dir cache or generate new cache
-
-    if os.path.exists(vgrid_dir_cache_filepath):
-
-        # cache_t1 = time.time()
-
-        loaded_dir_cache = unpickle(vgrid_dir_cache_filepath, logger,
-                                    allow_missing=False)
-
-        # cache_t2 = time.time()
-        # logger.debug('(%s) Loaded vgrid_dir_cache for: %s in %s secs'
-        #             % (pid, vgrid_name, (cache_t2 - cache_t1))
-
-        if loaded_dir_cache is False:
-            generate_cache = True
-            logger.error('(%s) Failed to load vgrid_dir_cache for: %s from file: %s'
-                         % (pid, vgrid_name, vgrid_dir_cache_filepath))
-        else:
-            generate_cache = False
-            # TODO: once all caches are migrated we can remove this loop again
-            # Make sure we only have utf8 everywhere to avoid encoding issues
-            for old_path in [i for i in loaded_dir_cache if i != force_utf8(i)]:
-                print("NOTE: forcing old cache entry %s to utf8" % [old_path])
-                new_path = force_utf8(old_path)
-                entry = loaded_dir_cache[old_path]
-                del loaded_dir_cache[old_path]
-                loaded_dir_cache[new_path] = entry
-
-            dir_cache[vgrid_name] = loaded_dir_cache
-    else:
-        generate_cache = True
-
-    if generate_cache:
-        logger.info('(%s) Force generation of vgrid_dir_cache for: %s' %
-                    (pid, vgrid_name))
+    if vgrid_name not in dir_cache:
+        vgrid_home_path = os.path.join(configuration.vgrid_home, vgrid_name)
+        dir_cache_filename = '.%s.dir_cache' % configuration.vgrid_triggers
+        dir_cache_filepath = os.path.join(vgrid_home_path, dir_cache_filename)
+        # TODO: once all caches are migrated we can remove legacy_key again
+        # Make sure we only have utf8 everywhere to avoid encoding issues
+        dir_cache[vgrid_name] = DirCache(dir_cache_filepath, logger,
+                                         legacy_path=dir_cache_filepath,
+                                         legacy_key=force_utf8)
+    return dir_cache[vgrid_name]
 
-        # cache_t1 = time.time()
 
-        dir_cache[vgrid_name] = {}
-        generate_vgrid_dir_cache(configuration, vgrid_name)
+def load_dir_cache(configuration, vgrid_name):
+    """Load directory cache for *vgrid_name*, into the global dir_cache.
+    The cache is loaded lazily from the snapshot and delta log if available
+    and otherwise left empty for add_vgrid_file_monitors to fill while
+    adding the monitors, so that no separate full scan is needed.
+    """
 
-        # cache_t2 = time.time()
-        # logger.debug('(%s) Generated new dir_cache for: %s in %s secs'
-        #             % (pid, vgrid_name, (cache_t2 - cache_t1))
+    pid = multiprocessing.current_process().pid
 
-        result = save_dir_cache(vgrid_name)
+    vgrid_dir_cache = get_dir_cache(configuration, vgrid_name)
+    if not vgrid_dir_cache.load():
+        logger.info('(%s) no vgrid_dir_cache for: %s - build on activation'
+                    % (pid, vgrid_name))
 
-    return result
+    return True
 
 
 def save_dir_cache(vgrid_name):
-    """Save directory cache for *vgrid_name*, from the global dir_cache"""
+    """Save directory cache changes for *vgrid_name*, from the global
+    dir_cache.
+    """
 
     pid = multiprocessing.current_process().pid
 
     result = True
 
-    dir_cache_filename = '.%s.dir_cache' % configuration.vgrid_triggers
     vgrid_dir_cache = dir_cache.get(vgrid_name, None)
 
     if vgrid_dir_cache is not None:
-        vgrid_home_path = os.path.join(configuration.vgrid_home,
-                                       vgrid_name)
-        dir_cache_filepath = os.path.join(vgrid_home_path,
-                                          dir_cache_filename)
-        vgrid_dir_cache_keys = [key for key in vgrid_dir_cache if key == vgrid_name
-                                or key.startswith('%s%s' % (vgrid_name,
-                                                            os.sep))]
-        if len(vgrid_dir_cache_keys) == 0:
+        if len(vgrid_dir_cache) == 0:
             logger.info('(%s) no dirs in cache for: %s' % (pid,
                                                            vgrid_name))
         else:
-            logger.info('(%s) saving cache for: %s to file: %s' %
-                        (pid, vgrid_name, dir_cache_filepath))
-            pickle(vgrid_dir_cache, dir_cache_filepath, logger)
+            logger.info('(%s) saving cache changes for: %s' %
+                        (pid, vgrid_name))
+            result = vgrid_dir_cache.save()
 
     return result
 
@@ -1886,6 +1915,15 @@ def monitor(configuration, vgrid_name):
                          % (pid, vgrid_name))
             stop_running.set()
 
+    # Bounded pool of workers to handle triggers for this monitor process
+
+    shared_state['trigger_pool'] = WorkerPool(
+        'triggers', configuration.user_events_workers, logger,
+        max_queue=configuration.user_events_queue_size,
+        max_delayed=configuration.user_events_queue_size)
+    shared_state['trigger_pool'].start()
+    last_pool_stats = time.time()
+
     activated = False
     while not stop_running.is_set():
 
@@ -1897,16 +1935,15 @@ def monitor(configuration, vgrid_name):
 
         if not activated:
             if active_targets(configuration, vgrid_name, file_monitor_home):
-                # Start paths in vgrid_dir_cache to monitor
+                # Start paths in vgrid_dir_cache to monitor in the background
+                # so that events in already watched dirs get handled at once
                 print('(%s) init trigger handling for: %s' % (pid, vgrid_name))
-                add_monitor_t1 = time.time()
-                add_vgrid_file_monitors(configuration, vgrid_name)
-                add_monitor_t2 = time.time()
-                print('(%s) ready to handle triggers for: %s in %s secs'
-                      % (pid, vgrid_name, add_monitor_t2 - add_monitor_t1))
-                logger.info('(%s) ready to handle triggers for: %s in %s secs'
-                            % (pid, vgrid_name, add_monitor_t2
-                               - add_monitor_t1))
+                reconciler = threading.Thread(target=reconcile_file_monitors,
+                                              args=(configuration,
+                                                    vgrid_name))
+                reconciler.daemon = True
+                reconciler.start()
+                last_cache_save = time.time()
                 activated = True
             else:
                 # Variable per-process delay to avoid thrashing
@@ -1917,6 +1954,16 @@ def monitor(configuration, vgrid_name):
 
         # Once past the activation we just sleep in a responsive loop
 
+        if activated and last_pool_stats + _pool_stats_interval < time.time():
+            last_pool_stats = time.time()
+            pool_stats = shared_state['trigger_pool'].format_stats()
+            logger.info('(%s) %s' % (pid, pool_stats))
+
+        if activated and \
+                last_cache_save + _dir_cache_save_interval < time.time():
+            last_cache_save = time.time()
+            save_dir_cache(vgrid_name)
+
         try:
 
             # Throttle down
@@ -1927,6 +1974,9 @@ def monitor(configuration, vgrid_name):
             logger.info('(%s) caught interrupt' % pid)
             stop_running.set()
 
+    # Let workers finish queued triggers but do not wait for long settle times
+    shared_state['trigger_pool'].shutdown(wait=False)
+
     # Only save cache if rules were actually activated so dirs were monitored
     if activated:
         print('(%s) Saving cache for vgrid: %s' % (pid, vgrid_name))
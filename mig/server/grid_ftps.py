@@ -103,7 +103,7 @@ from mig.shared.griddaemons.ftps import default_max_user_hits, \
     update_login_map, login_map_lookup, hit_rate_limit, expire_rate_limit, \
     check_twofactor_session, validate_auth_attempt
 from mig.shared.logger import daemon_logger, register_hangup_handler
-from mig.shared.pwcrypto import make_simple_hash
+from mig.shared.pwcrypto import make_simple_hash, make_creds_cache
 from mig.shared.tlsserver import hardened_openssl_context
 from mig.shared.useradm import check_password_hash
 from mig.shared.validstring import possible_user_id, possible_sharelink_id
@@ -241,6 +241,9 @@ class MiGUserAuthorizer(DummyAuthorizer):
             self.last_expire = time.time()
             expire_rate_limit(configuration, "ftps",
                               expire_delay=self.min_expire_delay)
+            daemon_conf['hash_cache'].purge_expired()
+            logger.info("password hash cache: %s" %
+                        daemon_conf['hash_cache'].format_stats())
         if hit_rate_limit(configuration, 'ftps', client_ip, username,
                           max_user_hits=max_user_hits):
             exceeded_rate_limit = True
@@ -581,7 +584,7 @@ unless it is available in mig/server/MiGserver.conf
         'users': [],
         'shares': [],
         'login_map': {},
-        'hash_cache': {},
+        'hash_cache': make_creds_cache(),
         'time_stamp': 0,
         'logger': logger,
         'nossl': nossl,
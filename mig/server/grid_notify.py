@@ -46,7 +46,8 @@ from mig.shared.defaults import ignore_file_names
 from mig.shared.fileio import unpickle, delete_file
 from mig.shared.logger import daemon_logger, \
     register_hangup_handler
-from mig.shared.notification import send_email
+from mig.shared.maildelivery import flush_mail_spool
+from mig.shared.notification import send_email_batch
 
 
 stop_running = multiprocessing.Event()
@@ -106,6 +107,7 @@ def send_notifications(configuration):
     logger = configuration.logger
     # logger.debug("send_notifications")
     result = []
+    batch = []
     for (client_id, client_dict) in received_notifications.items():
         timestamp = client_dict.get('timestamp', 0)
 
@@ -130,12 +132,14 @@ def send_notifications(configuration):
         notify_message = "Found %s new events since: %s\n\n" \
             % (total_events, timestr) \
             + notify_message
-        status = send_email(
-            recipient,
-            subject,
-            notify_message,
-            logger,
-            configuration)
+        batch.append((client_id, total_events, recipient, subject,
+                      notify_message))
+
+    # Send all notifications in one go on a single connection
+    statuses = send_email_batch([entry[2:] for entry in batch], logger,
+                                configuration)
+    for (entry, status) in zip(batch, statuses):
+        (client_id, total_events, recipient) = entry[:3]
         if status:
             logger.info("Send email with %s events to: %s"
                         % (total_events, recipient))
@@ -230,6 +234,11 @@ def handle_notifications(configuration):
                                 notified_users=notified_users,
                                 timestamp=last_notification - 84600)
             received_notifications.clear()
+            # Retry any mails spooled after temporary delivery errors
+            (sent, left) = flush_mail_spool(configuration)
+            if sent or left:
+                logger.info("Delivered %d spooled email(s) with %d left"
+                            % (sent, left))
             logger.debug("----- Sleeping %s seconds -----" % notify_interval)
             time.sleep(notify_interval)
     except Exception as err:
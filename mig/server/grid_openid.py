@@ -108,7 +108,7 @@ try:
         validate_auth_attempt
     from mig.shared.htmlgen import openid_page_template
     from mig.shared.logger import daemon_logger, register_hangup_handler
-    from mig.shared.pwcrypto import make_simple_hash
+    from mig.shared.pwcrypto import make_simple_hash, make_creds_cache
     from mig.shared.safeinput import valid_distinguished_name, valid_password, \
         valid_path, valid_ascii, valid_job_id, valid_base_url, valid_url, \
         valid_complex_url, html_escape, InputException
@@ -267,9 +267,9 @@ class OpenIDHTTPServer(HTTPServer):
 
     min_expire_delay = 120
     last_expire = time.time()
-    # NOTE: We do not enable hash and scramble cache here since it is hardly
-    #       any gain and it potentially introduces a race
-    hash_cache, scramble_cache = None, None
+    # NOTE: the shared credential caches are thread-safe and keyed on the
+    #       saved hash or scramble so password changes take effect at once
+    hash_cache, scramble_cache = make_creds_cache(), make_creds_cache()
 
     def __init__(self, *args, **kwargs):
         HTTPServer.__init__(self, *args, **kwargs)
@@ -318,11 +318,12 @@ class OpenIDHTTPServer(HTTPServer):
             self.last_expire = time.time()
             expire_rate_limit(configuration, "openid",
                               expire_delay=self.min_expire_delay)
-            if self.hash_cache:
-                self.hash_cache.clear()
-            if self.scramble_cache:
-                self.scramble_cache.clear()
-            logger.debug("Expired old rate limits and scramble cache")
+            self.hash_cache.purge_expired()
+            self.scramble_cache.purge_expired()
+            logger.debug("Expired old rate limits and credential caches")
+            logger.info("password hash cache: %s - scramble cache: %s" %
+                        (self.hash_cache.format_stats(),
+                         self.scramble_cache.format_stats()))
 
     def setOpenIDServer(self, oidserver):
         """Override openid attribute"""
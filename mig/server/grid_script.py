@@ -40,9 +40,14 @@ import threading
 import os
 import signal
 import copy
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from mig.server import jobscriptgenerator
 from mig.server.jobqueue import JobQueue
+from mig.server.queuejournal import QueueJournal
 from mig.shared.base import client_id_dir, generate_https_urls
 from mig.shared.conf import get_configuration_object, get_resource_exe
 from mig.shared.defaults import default_vgrid, maxfill_fields
@@ -52,9 +57,11 @@ from mig.shared.gridscript import clean_grid_stdin, \
     remove_jobrequest_pending_files, check_mrsl_files, requeue_job, \
     server_cleanup, load_queue, save_queue, load_schedule_cache, \
     save_schedule_cache, arc_job_status, clean_arc_job
+from mig.shared.jobindex import update_job_index
 from mig.shared.notification import notify_user_thread
 from mig.shared.resadm import atomic_resource_exe_restart, put_exe_pgid
 from mig.shared.vgrid import job_fits_res_vgrid, validated_vgrid_list
+from mig.shared.workerpool import WorkerPool
 from mig.shared.workflows import create_workflow_job_history_file
 
 try:
@@ -65,6 +72,17 @@ except ImportError as ime:
 
 (configuration, logger) = (None, None)
 (job_queue, executing_queue, scheduler) = (None, None, None)
+queue_journal = None
+
+# Number of workers for the concurrent read-only requests
+
+command_workers = 4
+
+# All access to the queues and scheduler must hold queue_lock
+
+queue_lock = threading.RLock()
+command_lines = queue.Queue()
+command_pool = None
 (job_time_out_thread, job_time_out_stop) = (None, None)
 
 
@@ -106,22 +124,20 @@ def time_out_jobs(stop_event):
                 time.sleep(1)
                 continue
 
-            qlen = executing_queue.queue_length()
+            # NOTE: 'Main' may modify executing_queue at any time so we
+            #       inspect a snapshot taken with queue_lock held.
+
+            with queue_lock:
+                executing_jobs = [executing_queue.get_job(i) for i in
+                                  range(executing_queue.queue_length())]
+            qlen = len(executing_jobs)
             if qlen == 0:
                 logger.info('No jobs in executing_queue')
             else:
                 logger.info('time_out_jobs(): %d job(s) in queue' % qlen)
 
-                # TODO: this is a race - 'Main' may modify executing_queue at
-                # any time!
-                # Especially since we ask it to remove the job we just looked
-                # at and then look at the next index, so we may skip jobs
-                # if it removes the job before we dequeue next index.
-                # We should use locking or at least remove from back to
-                # make it slightly better.
-
                 for i in range(0, qlen):
-                    job = executing_queue.get_job(i)
+                    job = executing_jobs[i]
                     if not job:
                         logger.warning(
                             'time-out RC? found empty job in slot %d!' % i)
@@ -186,8 +202,9 @@ def time_out_jobs(stop_event):
                                 msg = '(failed inside ARC)'
                             else:
                                 msg = None
-                            exec_job = executing_queue.dequeue_job_by_id(
-                                job['JOB_ID'])
+                            with queue_lock:
+                                exec_job = executing_queue.dequeue_job_by_id(
+                                    job['JOB_ID'])
                             if exec_job:
                                 # job was still there, clean up here
                                 # (otherwise, someone else picked it up in
@@ -228,16 +245,30 @@ def graceful_shutdown():
         # make sure queue gets saved even if timeout thread goes haywire
 
         job_time_out_thread.join(5)
+
+        # NOTE: we are called without queue_lock so that any pending pool
+        #       tasks and the time out thread can take it and finish.
+
+        if command_pool:
+            command_pool.shutdown(timeout=5)
+            logger.info(command_pool.format_stats())
         print('graceful_shutdown: saving state')
-        if job_queue and not save_queue(job_queue, job_queue_path,
-                                        logger):
-            logger.warning('failed to save job queue')
-        if executing_queue and not save_queue(executing_queue,
-                                              executing_queue_path, logger):
-            logger.warning('failed to save executing queue')
-        if scheduler and not save_schedule_cache(scheduler.get_cache(),
-                                                 schedule_cache_path, logger):
-            logger.warning('failed to save scheduler cache')
+        with queue_lock:
+            if queue_journal and not queue_journal.compact(
+                    journaled_queues,
+                    {'schedule_cache': scheduler.get_cache()}):
+                logger.warning('failed to compact queue journal')
+            if job_queue and not save_queue(job_queue, job_queue_path,
+                                            logger):
+                logger.warning('failed to save job queue')
+            if executing_queue and not save_queue(executing_queue,
+                                                  executing_queue_path,
+                                                  logger):
+                logger.warning('failed to save executing queue')
+            if scheduler and not save_schedule_cache(scheduler.get_cache(),
+                                                     schedule_cache_path,
+                                                     logger):
+                logger.warning('failed to save scheduler cache')
         print('graceful_shutdown: saved state; now blocking for timeout thread')
 
         # Now make sure timeout thread finishes
@@ -249,589 +280,589 @@ def graceful_shutdown():
     sys.exit(0)
 
 
-# ## Main ###
-# register ctrl+c signal handler to shutdown system cleanly
+def read_grid_stdin(stdin_path, command_lines):
+    """Read requests from the grid_stdin pipe and queue them for the main
+    dispatcher. The pipe is opened read-write so that readline blocks while
+    no writers are connected instead of returning EOF and forcing us to poll.
+    Reading in a separate thread also keeps the pipe drained while slow
+    requests are handled, so writers don't block on a full pipe.
+    """
 
-signal.signal(signal.SIGINT, clean_shutdown)
+    try:
+        stdin_pipe = open(stdin_path, 'r+')
+    except Exception as exc:
+        logger.error('failed to open grid_stdin %s for reading: %s' %
+                     (stdin_path, exc))
+        command_lines.put('SHUTDOWN\n')
+        return
+    while True:
+        line = stdin_pipe.readline()
+        if line:
+            command_lines.put(line)
+
+
+def handle_userjobfile(strip_line, cap_line, linelist):
+    """Put newly submitted user job in queue"""
+
+    # *********                *********
+    # *********     USER JOB   *********
+    # *********                *********
+
+    print(cap_line)
+    logger.info(cap_line)
+
+    # add to queue
+
+    file_userjob = configuration.mrsl_files_dir\
+        + strip_line.replace('USERJOBFILE ', '') + '.mRSL'
+    dict_userjob = unpickle_and_change_status(
+        file_userjob, 'QUEUED', logger)
+
+    if not dict_userjob:
+        logger.error('Could not unpickle and change status. '
+                     + 'Job not enqueued!')
+        return
+    update_job_index(configuration, dict_userjob, logger)
+
+    # Set owner to be able to do per-user job statistics
+
+    user_str = strip_line.replace('USERJOBFILE ', '')
+    (user_id, filename) = user_str.split(os.sep)
+
+    dict_userjob['OWNER'] = user_id
+    dict_userjob['MIGRATE_COUNT'] = "0"
+
+    # ARC jobs: directly submit, and put in executing_queue
+    if dict_userjob['JOBTYPE'] == 'arc':
+        if not configuration.arc_clusters:
+            logger.error('ARC backend disabled - ignore %s' %
+                         dict_userjob)
+            return
+        logger.debug('ARC Job')
+        (arc_job, msg) = jobscriptgenerator.create_arc_job(
+            dict_userjob, configuration, logger)
+        if not arc_job:
+            # something has gone wrong
+            logger.error('Job NOT submitted (%s)' % msg)
+            # discard this job (as FAILED, including message)
+            # see gridscript::requeue_job for how to do this...
+
+            dict_userjob['STATUS'] = 'FAILED'
+            dict_userjob['FAILED_TIMESTAMP'] = time.gmtime()
+            # and create an execution history (basically empty)
+            hist = (
+                {'QUEUED_TIMESTAMP': dict_userjob['QUEUED_TIMESTAMP'],
+                 'EXECUTING_TIMESTAMP': dict_userjob['FAILED_TIMESTAMP'],
+                 'FAILED_TIMESTAMP': dict_userjob['FAILED_TIMESTAMP'],
+                 'FAILED_MESSAGE': ('ARC Submission failed: %s' % msg),
+                 'UNIQUE_RESOURCE_NAME': 'ARC', })
+            dict_userjob['EXECUTION_HISTORY'] = [hist]
+
+            # should also notify the user (if requested)
+            # not implented for this branch.
 
-# Allow e.g. logrotate to force log re-open after rotates
-signal.signal(signal.SIGHUP, hangup_handler)
+        else:
+            # all fine, job is now in some ARC queue
+            logger.debug('Job submitted (%s,%s)' %
+                         (arc_job['SESSIONID'], arc_job['ARCID']))
+            # set some job fields for job status retrieval, and
+            # put in exec.queue for job status queries and timeout
+            dict_userjob['SESSIONID'] = arc_job['SESSIONID']
+            # abuse these two fields,
+            # expected by timeout thread to be there anyway
+            dict_userjob['UNIQUE_RESOURCE_NAME'] = 'ARC'
+            dict_userjob['EXE'] = arc_job['ARCID']
 
-configuration = get_configuration_object()
-logger = configuration.logger
+            # this one is used by the timeout thread as well
+            # We put in a wild guess, 10 minutes. Perhaps not enough
+            dict_userjob['EXECUTION_DELAY'] = 600
 
-if not configuration.site_enable_jobs:
-    err_msg = "Job support is disabled in configuration!"
-    logger.error(err_msg)
-    print(err_msg)
-    sys.exit(1)
+            # set to executing even though it is kind-of wrong...
+            dict_userjob['STATUS'] = 'EXECUTING'
+            dict_userjob['EXECUTING_TIMESTAMP'] = time.gmtime()
+            executing_queue.enqueue_job(dict_userjob,
+                                        executing_queue.queue_length())
 
-print("""
-Running main grid 'daemon'.
+        # Either way, save the job mrsl.
+        # Status is EXECUTING or FAILED
+        pickle(dict_userjob, file_userjob, logger)
+        update_job_index(configuration, dict_userjob, logger)
 
-Set the MIG_CONF environment to the server configuration path
-unless it is available in the default path
-mig/server/MiGserver.conf
-""")
-logger.info('Starting MiG server')
+        # go on with scheduling loop (do not use scheduler magic below)
+        return
 
-# Load queues from file dump if available
+    # following: non-ARC code
 
-job_queue_path = os.path.join(configuration.mig_system_files,
-                              'job_queue.pickle')
-executing_queue_path = os.path.join(configuration.mig_system_files,
-                                    'executing_queue.pickle')
-schedule_cache_path = os.path.join(configuration.mig_system_files,
-                                   'schedule_cache.pickle')
-only_new_jobs = True
-job_queue = load_queue(job_queue_path, logger)
-executing_queue = load_queue(executing_queue_path, logger)
-if not job_queue or not executing_queue:
-    logger.warning('Could not load queues from previous run')
-    only_new_jobs = False
-    job_queue = JobQueue(logger)
-    executing_queue = JobQueue(logger)
-else:
-    logger.info('Loaded queues from previous run')
+    # put job in queue
 
-# Always use an empty done queue after restart
+    job_queue.enqueue_job(dict_userjob, job_queue.queue_length())
 
-done_queue = JobQueue(logger)
+    user_dict = {}
+    user_dict['USER_ID'] = user_id
 
-schedule_cache = load_schedule_cache(schedule_cache_path, logger)
-if not schedule_cache:
-    logger.warning('Could not load schedule cache from previous run')
-else:
-    logger.info('Loaded schedule cache from previous run')
+    # Update list of users - create user if new
 
-logger.info('starting scheduler ' + configuration.sched_alg)
-if configuration.sched_alg == 'FirstFit':
-    from mig.server.firstfitscheduler import FirstFitScheduler
-    scheduler = FirstFitScheduler(logger, configuration)
-elif configuration.sched_alg == 'BestFit':
-    from mig.server.bestfitscheduler import BestFitScheduler
-    scheduler = BestFitScheduler(logger, configuration)
-elif configuration.sched_alg == 'FairFit':
-    from mig.server.fairfitscheduler import FairFitScheduler
-    scheduler = FairFitScheduler(logger, configuration)
-elif configuration.sched_alg == 'MaxThroughput':
-    from mig.server.maxthroughputscheduler import MaxThroughputScheduler
-    scheduler = MaxThroughputScheduler(logger, configuration)
-elif configuration.sched_alg == 'Random':
-    from mig.server.randomscheduler import RandomScheduler
-    scheduler = RandomScheduler(logger, configuration)
-elif configuration.sched_alg == 'FIFO':
-    from mig.server.fifoscheduler import FIFOScheduler
-    scheduler = FIFOScheduler(logger, configuration)
-else:
-    from mig.server.firstfitscheduler import FirstFitScheduler
-    print('Unknown sched_alg %s - using FirstFit scheduler'
-          % configuration.sched_alg)
-    scheduler = FirstFitScheduler(logger, configuration)
+    scheduler.update_users(user_dict)
+    user_dict = scheduler.find_user(user_dict)
+    user_dict['QUEUE_HIST'].pop(0)
+    user_dict['QUEUE_HIST'].append(dict_userjob)
+    scheduler.update_seen(user_dict)
 
-scheduler.attach_job_queue(job_queue)
-scheduler.attach_done_queue(done_queue)
-if schedule_cache:
-    scheduler.set_cache(schedule_cache)
 
-# redirect grid_stdin to sys.stdin
+def handle_serverjobfile(strip_line, cap_line, linelist):
+    """Put migrated server job in queue"""
 
-try:
-    if not os.path.exists(configuration.grid_stdin):
-        logger.info('creating grid_script input pipe %s'
-                    % configuration.grid_stdin)
-        try:
-            os.mkfifo(configuration.grid_stdin)
-        except Exception as err:
-            logger.error('Could not create missing grid_stdin fifo: '
-                         + '%s exception: %s '
-                         % (configuration.grid_stdin, err))
-    grid_stdin = open(configuration.grid_stdin, 'r')
-except Exception:
-    logger.error('failed to open grid_stdin! %s' % sys.exc_info()[0])
-    sys.exit(1)
+    # *********                  *********
+    # *********     SERVER JOB   *********
+    # *********                  *********
 
-logger.info('cleaning pipe')
-clean_grid_stdin(grid_stdin)
+    print(cap_line)
+    logger.info(cap_line)
 
-# Make sure empty job home exists
+    # add to queue
 
-empty_home = os.path.join(configuration.user_home,
-                          configuration.empty_job_name)
-if not os.path.exists(empty_home):
-    logger.info('creating empty job home dir %s' % empty_home)
-    try:
-        os.mkdir(empty_home)
-    except Exception as exc:
-        logger.error('failed to create empty job home dir %s: %s'
-                     % (empty_home, exc))
+    file_serverjob = configuration.mrsl_files_dir\
+        + strip_line.replace('SERVERJOBFILE ', '') + '.mRSL'
+    dict_serverjob = unpickle(file_serverjob, logger)
+    if dict_serverjob is False:
+        logger.error(
+            'Could not unpickle migrated job - not put into queue!')
+        return
 
-msg = 'Checking for mRSL files with status parse or queued'
-print(msg)
-logger.info(msg)
-check_mrsl_files(configuration, job_queue, executing_queue,
-                 only_new_jobs, logger)
+    # put job in queue
 
-msg = 'Cleaning up after pending job requests'
-print(msg)
-remove_jobrequest_pending_files(configuration)
+    job_queue.enqueue_job(dict_serverjob, job_queue.queue_length())
 
-# start the timer function to check if cputime is exceeded
 
-logger.info('starting time_out_jobs()')
-job_time_out_stop = threading.Event()
-job_time_out_thread = threading.Thread(target=time_out_jobs,
-                                       args=(job_time_out_stop, ))
-job_time_out_thread.start()
+def handle_jobschedule(strip_line, cap_line, linelist):
+    """Dump schedule values of queued job to mRSL for job status"""
 
-msg = 'Starting main loop'
-print(msg)
-logger.info(msg)
+    # *********                     *********
+    # *********     SCHEDULE DUMP   *********
+    # *********                     *********
 
-# main loop
+    print(cap_line)
+    logger.info(cap_line)
 
-loop_counter = 0
-last_read_from_grid_stdin_empty = False
+    if len(linelist) != 2:
+        logger.error('Invalid job schedule request %s' % linelist)
+        return
 
-# print "%d" % executing_queue.queue_length()
-# print "%d" % job_queue.queue_length()
-# print "%d" % done_queue.queue_length()
+    # read values
 
-# TODO: perhaps we should run the pipe reader as main thread
-#   and then spawn threads for actual handling. It should of
-#   course still be thread safe.
+    job_id = linelist[1]
 
-while True:
-    line = grid_stdin.readline()
-    strip_line = line.strip()
-    cap_line = strip_line.upper()
-    linelist = strip_line.split(' ')
-    if strip_line == '':
-        if last_read_from_grid_stdin_empty:
-            time.sleep(1)
-        last_read_from_grid_stdin_empty = True
+    # find job in queue and dump schedule values to mRSL for job status
 
-        # no reason to investigate content of line
+    job_dict = job_queue.get_job_by_id(job_id)
+    if not job_dict:
+        logger.info('Job is not in waiting queue - no schedule to update')
+        return
 
-        continue
-    else:
-        last_read_from_grid_stdin_empty = False
+    client_dir = client_id_dir(job_dict['USER_CERT'])
+    file_serverjob = configuration.mrsl_files_dir + client_dir\
+        + os.sep + job_id + '.mRSL'
+    dict_serverjob = unpickle(file_serverjob, logger)
+    if dict_serverjob is False:
+        logger.error('Could not unpickle job - not updating schedule!')
+        return
 
-    if cap_line.find('USERJOBFILE ') == 0:
+    # update and save schedule
 
-        # *********                *********
-        # *********     USER JOB   *********
-        # *********                *********
+    scheduler.copy_schedule(job_dict, dict_serverjob)
+    pickle(dict_serverjob, file_serverjob, logger)
 
-        print(cap_line)
-        logger.info(cap_line)
 
-        # add to queue
+def handle_resourcerequest(strip_line, cap_line, linelist):
+    """Schedule and hand out a job to requesting resource"""
 
-        file_userjob = configuration.mrsl_files_dir\
-            + strip_line.replace('USERJOBFILE ', '') + '.mRSL'
-        dict_userjob = unpickle_and_change_status(
-            file_userjob, 'QUEUED', logger)
+    # *********                       *********
+    # *********    RESOURCE REQUEST   *********
+    # *********                       *********
 
-        if not dict_userjob:
-            logger.error('Could not unpickle and change status. '
-                         + 'Job not enqueued!')
-            continue
+    print(cap_line)
+    logger.info(cap_line)
+    logger.info('RESOURCEREQUEST: %d job(s) in the queue.' %
+                job_queue.queue_length())
 
-        # Set owner to be able to do per-user job statistics
+    if len(linelist) != 8:
+        logger.error('Invalid resource request %s' % linelist)
+        return
 
-        user_str = strip_line.replace('USERJOBFILE ', '')
-        (user_id, filename) = user_str.split(os.sep)
+    # read values
 
-        dict_userjob['OWNER'] = user_id
-        dict_userjob['MIGRATE_COUNT'] = "0"
+    exe = linelist[1]
+    unique_resource_name = linelist[2]
+    cputime = linelist[3]
+    nodecount = linelist[4]
+    localjobname = linelist[5]
+    execution_delay = linelist[6]
+    exe_pgid = linelist[7]
+    last_job_failed = False
 
-        # ARC jobs: directly submit, and put in executing_queue
-        if dict_userjob['JOBTYPE'] == 'arc':
-            if not configuration.arc_clusters:
-                logger.error('ARC backend disabled - ignore %s' %
-                             dict_userjob)
-                continue
-            logger.debug('ARC Job')
-            (arc_job, msg) = jobscriptgenerator.create_arc_job(
-                dict_userjob, configuration, logger)
-            if not arc_job:
-                # something has gone wrong
-                logger.error('Job NOT submitted (%s)' % msg)
-                # discard this job (as FAILED, including message)
-                # see gridscript::requeue_job for how to do this...
-
-                dict_userjob['STATUS'] = 'FAILED'
-                dict_userjob['FAILED_TIMESTAMP'] = time.gmtime()
-                # and create an execution history (basically empty)
-                hist = (
-                    {'QUEUED_TIMESTAMP': dict_userjob['QUEUED_TIMESTAMP'],
-                     'EXECUTING_TIMESTAMP': dict_userjob['FAILED_TIMESTAMP'],
-                     'FAILED_TIMESTAMP': dict_userjob['FAILED_TIMESTAMP'],
-                     'FAILED_MESSAGE': ('ARC Submission failed: %s' % msg),
-                     'UNIQUE_RESOURCE_NAME': 'ARC', })
-                dict_userjob['EXECUTION_HISTORY'] = [hist]
-
-                # should also notify the user (if requested)
-                # not implented for this branch.
+    # read resource config file
 
-            else:
-                # all fine, job is now in some ARC queue
-                logger.debug('Job submitted (%s,%s)' %
-                             (arc_job['SESSIONID'], arc_job['ARCID']))
-                # set some job fields for job status retrieval, and
-                # put in exec.queue for job status queries and timeout
-                dict_userjob['SESSIONID'] = arc_job['SESSIONID']
-                # abuse these two fields,
-                # expected by timeout thread to be there anyway
-                dict_userjob['UNIQUE_RESOURCE_NAME'] = 'ARC'
-                dict_userjob['EXE'] = arc_job['ARCID']
-
-                # this one is used by the timeout thread as well
-                # We put in a wild guess, 10 minutes. Perhaps not enough
-                dict_userjob['EXECUTION_DELAY'] = 600
-
-                # set to executing even though it is kind-of wrong...
-                dict_userjob['STATUS'] = 'EXECUTING'
-                dict_userjob['EXECUTING_TIMESTAMP'] = time.gmtime()
-                executing_queue.enqueue_job(dict_userjob,
-                                            executing_queue.queue_length())
+    res_file = os.path.join(configuration.resource_home,
+                            unique_resource_name, 'config')
+    resource_config = unpickle(res_file, logger)
+    if resource_config is False:
+        logger.error('error unpickling resource config for %s'
+                     % unique_resource_name)
+        return
 
-            # Either way, save the job mrsl.
-            # Status is EXECUTING or FAILED
-            pickle(dict_userjob, file_userjob, logger)
+    sandboxed = resource_config.get('SANDBOX', False)
 
-            # go on with scheduling loop (do not use scheduler magic below)
-            continue
+    # Write the PGID of EXE to PGID file
 
-        # following: non-ARC code
+    (status, msg) = put_exe_pgid(
+        configuration.resource_home,
+        unique_resource_name,
+        exe,
+        exe_pgid,
+        logger,
+        sandboxed,
+    )
+    if status:
+        logger.info(msg)
+    else:
+        logger.error(
+            'Problem writing EXE PGID to file, job request aborted: %s'
+            % msg)
 
-        # put job in queue
+        # we cannot create and dispatch job without pgid written to file!
 
-        job_queue.enqueue_job(dict_userjob, job_queue.queue_length())
+        return
 
-        user_dict = {}
-        user_dict['USER_ID'] = user_id
+    job_dict = None
 
-        # Update list of users - create user if new
+    # mark job failed if resource requests a new job and
+    # previously dispatched job is not marked done yet
 
-        scheduler.update_users(user_dict)
-        user_dict = scheduler.find_user(user_dict)
-        user_dict['QUEUE_HIST'].pop(0)
-        user_dict['QUEUE_HIST'].append(dict_userjob)
-        scheduler.update_seen(user_dict)
-    elif cap_line.find('SERVERJOBFILE ') == 0:
+    last_req_file = os.path.join(configuration.resource_home,
+                                 unique_resource_name,
+                                 'last_request.%s' % exe)
+    last_req = unpickle(last_req_file, logger)
+    if last_req is False:
 
-        # *********                  *********
-        # *********     SERVER JOB   *********
-        # *********                  *********
+        # last_req could not be pickled, this is probably
+        # because it is the first request from the resource
 
-        print(cap_line)
-        logger.info(cap_line)
+        last_req = {'EMPTY_JOB': True}
 
-        # add to queue
+    if last_req.get('EMPTY_JOB', False) or not last_req.get('USER_CERT',
+                                                            None):
 
-        file_serverjob = configuration.mrsl_files_dir\
-            + strip_line.replace('SERVERJOBFILE ', '') + '.mRSL'
-        dict_serverjob = unpickle(file_serverjob, logger)
-        if dict_serverjob is False:
-            logger.error(
-                'Could not unpickle migrated job - not put into queue!')
-            continue
+        # Dequeue empty job and cleanup (if not already done in FINISH)
+        # This is done to avoid them stacking up in the executing_queue
+        # in case of a faulty resource who keeps requesting jobs
+
+        job_dict = \
+            executing_queue.dequeue_job_by_id(last_req.get(
+                'JOB_ID', ''), log_errors=False)
+        if job_dict:
+            logger.info('last job was an empty job which did not finish')
+            if not server_cleanup(
+                job_dict['SESSIONID'],
+                job_dict['IOSESSIONID'],
+                job_dict['LOCALJOBNAME'],
+                job_dict['JOB_ID'],
+                configuration,
+                logger,
+            ):
+                logger.error('could not clean up MiG server')
+        else:
+            logger.info('last job was an empty job which already finished')
+    else:
+
+        # open the mRSL file belonging to the last request
+        # and check if the status is FINISHED or CANCELED.
+
+        last_job_ok_status_list = ['FINISHED', 'CANCELED']
+        client_dir = client_id_dir(last_req['USER_CERT'])
+        filenamelast = os.path.join(configuration.mrsl_files_dir,
+                                    client_dir,
+                                    last_req['JOB_ID'] + '.mRSL')
+        job_dict = unpickle(filenamelast, logger)
+        if job_dict:
+            if job_dict['STATUS'] not in last_job_ok_status_list:
+                last_job_failed = True
+                exe_job = \
+                    executing_queue.get_job_by_id(job_dict['JOB_ID'
+                                                           ])
+                if exe_job:
+
+                    # Ignore missing fields
+
+                    (last_res, last_exe) = ('', '')
+                    if 'UNIQUE_RESOURCE_NAME' in exe_job:
+                        last_res = exe_job['UNIQUE_RESOURCE_NAME']
+                    if 'EXE' in exe_job:
+                        last_exe = exe_job['EXE']
+
+                if exe_job and last_res == unique_resource_name\
+                        and last_exe == exe:
+                    logger.info(
+                        '%s:%s requested job and was NOT done with last %s'
+                        % (unique_resource_name, exe, job_dict['JOB_ID']))
+                    print('YOU ARE NOT DONE WITH %s' % job_dict['JOB_ID'])
+
+                    # Clear any scheduling data for exe_job before requeue
+
+                    scheduler.clear_schedule(exe_job)
+                    requeue_job(
+                        exe_job,
+                        'RESOURCE DIED',
+                        job_queue,
+                        executing_queue,
+                        configuration,
+                        logger,
+                    )
+                else:
+                    logger.info(
+                        '%s:%s requested job but last %s was rescheduled'
+                        % (unique_resource_name, exe, job_dict['JOB_ID']))
+                    print('YOUR LAST JOB %s WAS RESCHEDULED'
+                          % job_dict['JOB_ID'])
+            else:
+                logger.info('%s requested job and previous was done'
+                            % unique_resource_name)
+                print('OK, last job %s was done' % job_dict['JOB_ID'])
 
-        # put job in queue
+    # Now update resource config fields with requested attributes
 
-        job_queue.enqueue_job(dict_serverjob, job_queue.queue_length())
-    elif cap_line.find('JOBSCHEDULE ') == 0:
+    resource_config['CPUTIME'] = cputime
 
-        # *********                     *********
-        # *********     SCHEDULE DUMP   *********
-        # *********                     *********
+    # overwrite execution_delay attribute
 
-        print(cap_line)
-        logger.info(cap_line)
+    resource_config['EXECUTION_DELAY'] = execution_delay
 
-        if len(linelist) != 2:
-            logger.error('Invalid job schedule request %s' % linelist)
-            continue
+    # overwrite number of available nodes (a pbs resource might not
+    # want a job for all nodes)
 
-        # read values
+    resource_config['NODECOUNT'] = nodecount
+    resource_config['RESOURCE_ID'] = '%s_%s'\
+        % (unique_resource_name, exe)
 
-        job_id = linelist[1]
+    # specify vgrid
 
-        # find job in queue and dump schedule values to mRSL for job status
+    (status, exe_conf) = get_resource_exe(resource_config, exe,
+                                          logger)
+    if not status:
+        logger.error('could not get exe configuration for resource!')
+        return
 
-        job_dict = job_queue.get_job_by_id(job_id)
-        if not job_dict:
-            logger.info('Job is not in waiting queue - no schedule to update')
-            continue
-
-        client_dir = client_id_dir(job_dict['USER_CERT'])
-        file_serverjob = configuration.mrsl_files_dir + client_dir\
-            + os.sep + job_id + '.mRSL'
-        dict_serverjob = unpickle(file_serverjob, logger)
-        if dict_serverjob is False:
-            logger.error('Could not unpickle job - not updating schedule!')
-            continue
-
-        # update and save schedule
-
-        scheduler.copy_schedule(job_dict, dict_serverjob)
-        pickle(dict_serverjob, file_serverjob, logger)
-    elif cap_line.find('RESOURCEREQUEST ') == 0:
-
-        # *********                       *********
-        # *********    RESOURCE REQUEST   *********
-        # *********                       *********
-
-        print(cap_line)
-        logger.info(cap_line)
-        logger.info('RESOURCEREQUEST: %d job(s) in the queue.' %
-                    job_queue.queue_length())
-
-        if len(linelist) != 8:
-            logger.error('Invalid resource request %s' % linelist)
-            continue
-
-        # read values
-
-        exe = linelist[1]
-        unique_resource_name = linelist[2]
-        cputime = linelist[3]
-        nodecount = linelist[4]
-        localjobname = linelist[5]
-        execution_delay = linelist[6]
-        exe_pgid = linelist[7]
-        last_job_failed = False
-
-        # read resource config file
-
-        res_file = os.path.join(configuration.resource_home,
-                                unique_resource_name, 'config')
-        resource_config = unpickle(res_file, logger)
-        if resource_config is False:
-            logger.error('error unpickling resource config for %s'
-                         % unique_resource_name)
-            continue
-
-        sandboxed = resource_config.get('SANDBOX', False)
-
-        # Write the PGID of EXE to PGID file
-
-        (status, msg) = put_exe_pgid(
-            configuration.resource_home,
-            unique_resource_name,
-            exe,
-            exe_pgid,
-            logger,
-            sandboxed,
-        )
-        if status:
-            logger.info(msg)
-        else:
-            logger.error(
-                'Problem writing EXE PGID to file, job request aborted: %s'
-                % msg)
+    last_request_dict = {'RESOURCE_CONFIG': resource_config,
+                         'CREATED_TIME': datetime.datetime.now(),
+                         'STATUS': ''}
 
-            # we cannot create and dispatch job without pgid written to file!
+    # find the vgrid that should receive the job request
 
-            continue
+    last_vgrid = 0
+    if not exe_conf.get('vgrid', ''):
 
-        job_dict = None
+        # fall back to default vgrid
 
-        # mark job failed if resource requests a new job and
-        # previously dispatched job is not marked done yet
+        exe_conf['vgrid'] = [default_vgrid]
 
-        last_req_file = os.path.join(configuration.resource_home,
-                                     unique_resource_name,
-                                     'last_request.%s' % exe)
-        last_req = unpickle(last_req_file, logger)
-        if last_req is False:
+    if isinstance(exe_conf['vgrid'], basestring):
+        exe_conf['vgrid'] = list(exe_conf['vgrid'])
+    exe_vgrids = exe_conf['vgrid']
 
-            # last_req could not be pickled, this is probably
-            # because it is the first request from the resource
+    if 'LAST_VGRID' in last_req:
 
-            last_req = {'EMPTY_JOB': True}
+        # index of last vgrid found
 
-        if last_req.get('EMPTY_JOB', False) or not last_req.get('USER_CERT',
-                                                                None):
+        last_vgrid_index = last_req['LAST_VGRID']
 
-            # Dequeue empty job and cleanup (if not already done in FINISH)
-            # This is done to avoid them stacking up in the executing_queue
-            # in case of a faulty resource who keeps requesting jobs
+        # make sure the index is within bounds (some vgrids
+        # might have been removed from conf since last run)
 
-            job_dict = \
-                executing_queue.dequeue_job_by_id(last_req.get(
-                    'JOB_ID', ''), log_errors=False)
-            if job_dict:
-                logger.info('last job was an empty job which did not finish')
-                if not server_cleanup(
-                    job_dict['SESSIONID'],
-                    job_dict['IOSESSIONID'],
-                    job_dict['LOCALJOBNAME'],
-                    job_dict['JOB_ID'],
-                    configuration,
-                    logger,
-                ):
-                    logger.error('could not clean up MiG server')
-            else:
-                logger.info('last job was an empty job which already finished')
-        else:
+        res_vgrid_count = len(exe_vgrids)
+        if last_vgrid_index + 1 > res_vgrid_count - 1:
 
-            # open the mRSL file belonging to the last request
-            # and check if the status is FINISHED or CANCELED.
-
-            last_job_ok_status_list = ['FINISHED', 'CANCELED']
-            client_dir = client_id_dir(last_req['USER_CERT'])
-            filenamelast = os.path.join(configuration.mrsl_files_dir,
-                                        client_dir,
-                                        last_req['JOB_ID'] + '.mRSL')
-            job_dict = unpickle(filenamelast, logger)
-            if job_dict:
-                if job_dict['STATUS'] not in last_job_ok_status_list:
-                    last_job_failed = True
-                    exe_job = \
-                        executing_queue.get_job_by_id(job_dict['JOB_ID'
-                                                               ])
-                    if exe_job:
-
-                        # Ignore missing fields
-
-                        (last_res, last_exe) = ('', '')
-                        if 'UNIQUE_RESOURCE_NAME' in exe_job:
-                            last_res = exe_job['UNIQUE_RESOURCE_NAME']
-                        if 'EXE' in exe_job:
-                            last_exe = exe_job['EXE']
-
-                    if exe_job and last_res == unique_resource_name\
-                            and last_exe == exe:
-                        logger.info(
-                            '%s:%s requested job and was NOT done with last %s'
-                            % (unique_resource_name, exe, job_dict['JOB_ID']))
-                        print('YOU ARE NOT DONE WITH %s' % job_dict['JOB_ID'])
-
-                        # Clear any scheduling data for exe_job before requeue
-
-                        scheduler.clear_schedule(exe_job)
-                        requeue_job(
-                            exe_job,
-                            'RESOURCE DIED',
-                            job_queue,
-                            executing_queue,
-                            configuration,
-                            logger,
-                        )
-                    else:
-                        logger.info(
-                            '%s:%s requested job but last %s was rescheduled'
-                            % (unique_resource_name, exe, job_dict['JOB_ID']))
-                        print('YOUR LAST JOB %s WAS RESCHEDULED'
-                              % job_dict['JOB_ID'])
-                else:
-                    logger.info('%s requested job and previous was done'
-                                % unique_resource_name)
-                    print('OK, last job %s was done' % job_dict['JOB_ID'])
+            # out of bounds, use index 0
 
-        # Now update resource config fields with requested attributes
+            pass
+        else:
 
-        resource_config['CPUTIME'] = cputime
+            # within bounds
 
-        # overwrite execution_delay attribute
+            last_vgrid = last_vgrid_index + 1
 
-        resource_config['EXECUTION_DELAY'] = execution_delay
+    # The scheduler checks the vgrids in the order as they appear in
+    # the list, so to be fair the order of the vgrids in the list
+    # should be cycled according to the last_request
 
-        # overwrite number of available nodes (a pbs resource might not
-        # want a job for all nodes)
+    vgrids_in_prioritized_order = []
 
-        resource_config['NODECOUNT'] = nodecount
-        resource_config['RESOURCE_ID'] = '%s_%s'\
-            % (unique_resource_name, exe)
+    list_indices = [(last_vgrid + i) % len(exe_vgrids) for i in range(len(exe_vgrids))]
+    for index in list_indices:
 
-        # specify vgrid
+        # replace "" with default_vgrid
 
-        (status, exe_conf) = get_resource_exe(resource_config, exe,
-                                              logger)
-        if not status:
-            logger.error('could not get exe configuration for resource!')
-            continue
+        add_vgrid = exe_conf['vgrid'][index]
+        if add_vgrid == '':
+            add_vgrid = default_vgrid
+        vgrids_in_prioritized_order.append(add_vgrid)
+    logger.info('vgrids in prioritized order: %s (last %s)'
+                % (vgrids_in_prioritized_order, last_vgrid))
 
-        last_request_dict = {'RESOURCE_CONFIG': resource_config,
-                             'CREATED_TIME': datetime.datetime.now(),
-                             'STATUS': ''}
+    # set found values
 
-        # find the vgrid that should receive the job request
+    resource_config['VGRID'] = vgrids_in_prioritized_order
+    resource_config['LAST_VGRID'] = last_vgrid
+    last_request_dict['LAST_VGRID'] = last_vgrid
 
-        last_vgrid = 0
-        if not exe_conf.get('vgrid', ''):
+    # Update list of resources
 
-            # fall back to default vgrid
+    scheduler.update_resources(resource_config)
+    scheduler.update_seen(resource_config)
 
-            exe_conf['vgrid'] = [default_vgrid]
+    if job_queue.queue_length() == 0 or last_job_failed or nodecount < 1:
 
-        if isinstance(exe_conf['vgrid'], basestring):
-            exe_conf['vgrid'] = list(exe_conf['vgrid'])
-        exe_vgrids = exe_conf['vgrid']
+        # No jobs: Create 'empty' job script and double sleep time if
+        # repeated empty job
 
-        if 'LAST_VGRID' in last_req:
+        if 'EMPTY_JOB' not in last_req:
+            sleep_factor = 1.0
+        else:
+            sleep_factor = 2.0
+        print('N')
+        (empty_job, msg) = jobscriptgenerator.create_empty_job(
+            unique_resource_name,
+            exe,
+            cputime,
+            sleep_factor,
+            localjobname,
+            execution_delay,
+            configuration,
+            logger,
+        )
+        (new_job, msg) = \
+            jobscriptgenerator.create_job_script(
+            unique_resource_name,
+            exe,
+            empty_job,
+            resource_config,
+            localjobname,
+            configuration,
+            logger,
+        )
+        if new_job:
+            last_request_dict['JOB_ID'] = empty_job['JOB_ID']
+            last_request_dict['STATUS'] = 'No jobs in queue'
+            if last_job_failed:
+                last_request_dict['STATUS'] = \
+                    'Last job failed - forced empty job'
+            last_request_dict['EXECUTING_TIMESTAMP'] = time.gmtime()
+            last_request_dict['EXECUTION_DELAY'] = \
+                empty_job['EXECUTION_DELAY']
+            last_request_dict['UNIQUE_RESOURCE_NAME'] = \
+                unique_resource_name
+            last_request_dict['PUBLICNAME'] = resource_config.get(
+                'PUBLICNAME', 'HIDDEN')
+            last_request_dict['EXE'] = exe
+            last_request_dict['RESOURCE_CONFIG'] = resource_config
+            last_request_dict['LOCALJOBNAME'] = localjobname
+            last_request_dict['SESSIONID'] = new_job['SESSIONID']
+            last_request_dict['IOSESSIONID'] = new_job['IOSESSIONID']
+            last_request_dict['CPUTIME'] = empty_job['CPUTIME']
+            last_request_dict['EMPTY_JOB'] = True
+
+            executing_queue.enqueue_job(last_request_dict,
+                                        executing_queue.queue_length())
+            logger.info('empty job script created')
+        else:
+            msg = 'Failed to create job script: %s' % msg
+            print(msg)
+            logger.error(msg)
+            return
+    else:
 
-            # index of last vgrid found
+        # there are jobs in the queue
 
-            last_vgrid_index = last_req['LAST_VGRID']
+        # Expire outdated jobs - expire_jobs removes them from queue
+        # and returns them in a list: handle the file update here.
 
-            # make sure the index is within bounds (some vgrids
-            # might have been removed from conf since last run)
+        expired_jobs = scheduler.expire_jobs()
+        for expired in expired_jobs:
 
-            res_vgrid_count = len(exe_vgrids)
-            if last_vgrid_index + 1 > res_vgrid_count - 1:
+            # tell the user about the expired job - we do not wait for
+            # notification to finish but hope for the best since this
+            # script is long running.
+            # The thread only writes a message to the notify pipe so it
+            # finishes immediately if the notify daemon is listening and
+            # blocks indefinitely otherwise.
 
-                # out of bounds, use index 0
+            notify_user_thread(
+                expired,
+                generate_https_urls(configuration,
+                                    '%(auto_base)s/%(auto_bin)s/ls.py',
+                                    {}),
+                'EXPIRED',
+                logger,
+                False,
+                configuration,
+            )
+            client_dir = client_id_dir(expired['USER_CERT'])
+            expired_file = configuration.mrsl_files_dir + client_dir\
+                + os.sep + expired['JOB_ID'] + '.mRSL'
 
-                pass
-            else:
+            expired_dict = unpickle_and_change_status(expired_file,
+                                                      'EXPIRED', logger)
+            if not expired_dict:
+                logger.error('Could not unpickle and change status. '
 
-                # within bounds
+                             + 'Job could not be officially expired!'
+                             )
+                continue
+            update_job_index(configuration, expired_dict, logger)
 
-                last_vgrid = last_vgrid_index + 1
+        # Remove references to expired jobs
 
-        # The scheduler checks the vgrids in the order as they appear in
-        # the list, so to be fair the order of the vgrids in the list
-        # should be cycled according to the last_request
+        expired_jobs = []
 
-        vgrids_in_prioritized_order = []
+        # Schedule and create appropriate job script
+        # loop until a non-cancelled job is scheduled (fixes small
+        # race condition if a job has not been dequeued after the
+        # status in the mRSL file has been changed to FROZEN or CANCELED)
 
-        list_indices = [(last_vgrid + i) % len(exe_vgrids) for i in range(len(exe_vgrids))]
-        for index in list_indices:
+        while True:
+            job_dict = scheduler.schedule(resource_config)
+            if not job_dict:
+                break
 
-            # replace "" with default_vgrid
+            client_dir = client_id_dir(job_dict['USER_CERT'])
+            mrsl_filename = configuration.mrsl_files_dir\
+                + client_dir + '/' + job_dict['JOB_ID'] + '.mRSL'
+            dummy_dict = unpickle(mrsl_filename, logger)
 
-            add_vgrid = exe_conf['vgrid'][index]
-            if add_vgrid == '':
-                add_vgrid = default_vgrid
-            vgrids_in_prioritized_order.append(add_vgrid)
-        logger.info('vgrids in prioritized order: %s (last %s)'
-                    % (vgrids_in_prioritized_order, last_vgrid))
+            # The job status should be "QUEUED" at this point
 
-        # set found values
+            if dummy_dict is False:
+                logger.error('error unpickling mrsl in %s'
+                             % mrsl_filename)
+                continue
 
-        resource_config['VGRID'] = vgrids_in_prioritized_order
-        resource_config['LAST_VGRID'] = last_vgrid
-        last_request_dict['LAST_VGRID'] = last_vgrid
+            if dummy_dict['STATUS'] == 'QUEUED':
+                break
 
-        # Update list of resources
+        if not job_dict:
 
-        scheduler.update_resources(resource_config)
-        scheduler.update_seen(resource_config)
+            # no jobs in the queue fits the resource!
 
-        if job_queue.queue_length() == 0 or last_job_failed or nodecount < 1:
+            print('X')
+            logger.info('No jobs in the queue can be executed by '
+                        + 'resource, queue length: %s'
+                        % job_queue.queue_length())
 
-            # No jobs: Create 'empty' job script and double sleep time if
+            # Create 'empty' job script and double sleep time if
             # repeated empty job
 
             if 'EMPTY_JOB' not in last_req:
                 sleep_factor = 1.0
             else:
                 sleep_factor = 2.0
-            print('N')
             (empty_job, msg) = jobscriptgenerator.create_empty_job(
                 unique_resource_name,
                 exe,
@@ -854,19 +885,19 @@ while True:
             )
             if new_job:
                 last_request_dict['JOB_ID'] = empty_job['JOB_ID']
-                last_request_dict['STATUS'] = 'No jobs in queue'
-                if last_job_failed:
-                    last_request_dict['STATUS'] = \
-                        'Last job failed - forced empty job'
-                last_request_dict['EXECUTING_TIMESTAMP'] = time.gmtime()
+                last_request_dict['STATUS'] = \
+                    'No jobs in queue can be executed by resource'
+                last_request_dict['EXECUTING_TIMESTAMP'] = \
+                    time.gmtime()
                 last_request_dict['EXECUTION_DELAY'] = \
-                    empty_job['EXECUTION_DELAY']
+                    execution_delay
                 last_request_dict['UNIQUE_RESOURCE_NAME'] = \
                     unique_resource_name
                 last_request_dict['PUBLICNAME'] = resource_config.get(
                     'PUBLICNAME', 'HIDDEN')
                 last_request_dict['EXE'] = exe
-                last_request_dict['RESOURCE_CONFIG'] = resource_config
+                last_request_dict['RESOURCE_CONFIG'] = \
+                    resource_config
                 last_request_dict['LOCALJOBNAME'] = localjobname
                 last_request_dict['SESSIONID'] = new_job['SESSIONID']
                 last_request_dict['IOSESSIONID'] = new_job['IOSESSIONID']
@@ -876,848 +907,1057 @@ while True:
                 executing_queue.enqueue_job(last_request_dict,
                                             executing_queue.queue_length())
                 logger.info('empty job script created')
-            else:
-                msg = 'Failed to create job script: %s' % msg
-                print(msg)
-                logger.error(msg)
-                continue
         else:
 
-            # there are jobs in the queue
-
-            # Expire outdated jobs - expire_jobs removes them from queue
-            # and returns them in a list: handle the file update here.
-
-            expired_jobs = scheduler.expire_jobs()
-            for expired in expired_jobs:
-
-                # tell the user about the expired job - we do not wait for
-                # notification to finish but hope for the best since this
-                # script is long running.
-                # The thread only writes a message to the notify pipe so it
-                # finishes immediately if the notify daemon is listening and
-                # blocks indefinitely otherwise.
-
-                notify_user_thread(
-                    expired,
-                    generate_https_urls(configuration,
-                                        '%(auto_base)s/%(auto_bin)s/ls.py',
-                                        {}),
-                    'EXPIRED',
-                    logger,
-                    False,
-                    configuration,
-                )
-                client_dir = client_id_dir(expired['USER_CERT'])
-                expired_file = configuration.mrsl_files_dir + client_dir\
-                    + os.sep + expired['JOB_ID'] + '.mRSL'
-
-                if not unpickle_and_change_status(expired_file,
-                                                  'EXPIRED', logger):
-                    logger.error('Could not unpickle and change status. '
-
-                                 + 'Job could not be officially expired!'
-                                 )
-                    continue
-
-            # Remove references to expired jobs
-
-            expired_jobs = []
-
-            # Schedule and create appropriate job script
-            # loop until a non-cancelled job is scheduled (fixes small
-            # race condition if a job has not been dequeued after the
-            # status in the mRSL file has been changed to FROZEN or CANCELED)
-
-            while True:
-                job_dict = scheduler.schedule(resource_config)
-                if not job_dict:
-                    break
-
-                client_dir = client_id_dir(job_dict['USER_CERT'])
-                mrsl_filename = configuration.mrsl_files_dir\
-                    + client_dir + '/' + job_dict['JOB_ID'] + '.mRSL'
-                dummy_dict = unpickle(mrsl_filename, logger)
-
-                # The job status should be "QUEUED" at this point
-
-                if dummy_dict is False:
-                    logger.error('error unpickling mrsl in %s'
-                                 % mrsl_filename)
-                    continue
-
-                if dummy_dict['STATUS'] == 'QUEUED':
-                    break
-
-            if not job_dict:
-
-                # no jobs in the queue fits the resource!
-
-                print('X')
-                logger.info('No jobs in the queue can be executed by '
-                            + 'resource, queue length: %s'
-                            % job_queue.queue_length())
-
-                # Create 'empty' job script and double sleep time if
-                # repeated empty job
+            # a job has been scheduled to be executed on this
+            # resource: change status in the mRSL file
 
-                if 'EMPTY_JOB' not in last_req:
-                    sleep_factor = 1.0
-                else:
-                    sleep_factor = 2.0
-                (empty_job, msg) = jobscriptgenerator.create_empty_job(
-                    unique_resource_name,
-                    exe,
-                    cputime,
-                    sleep_factor,
-                    localjobname,
-                    execution_delay,
-                    configuration,
-                    logger,
-                )
+            client_dir = client_id_dir(job_dict['USER_CERT'])
+            mrsl_filename = os.path.join(configuration.mrsl_files_dir,
+                                         client_dir,
+                                         job_dict['JOB_ID'] + '.mRSL')
+            mrsl_dict = unpickle(mrsl_filename, logger)
+            if mrsl_dict:
                 (new_job, msg) = \
                     jobscriptgenerator.create_job_script(
                     unique_resource_name,
                     exe,
-                    empty_job,
+                    job_dict,
                     resource_config,
                     localjobname,
                     configuration,
                     logger,
                 )
                 if new_job:
-                    last_request_dict['JOB_ID'] = empty_job['JOB_ID']
-                    last_request_dict['STATUS'] = \
-                        'No jobs in queue can be executed by resource'
-                    last_request_dict['EXECUTING_TIMESTAMP'] = \
-                        time.gmtime()
-                    last_request_dict['EXECUTION_DELAY'] = \
-                        execution_delay
-                    last_request_dict['UNIQUE_RESOURCE_NAME'] = \
-                        unique_resource_name
-                    last_request_dict['PUBLICNAME'] = resource_config.get(
-                        'PUBLICNAME', 'HIDDEN')
-                    last_request_dict['EXE'] = exe
-                    last_request_dict['RESOURCE_CONFIG'] = \
-                        resource_config
-                    last_request_dict['LOCALJOBNAME'] = localjobname
-                    last_request_dict['SESSIONID'] = new_job['SESSIONID']
-                    last_request_dict['IOSESSIONID'] = new_job['IOSESSIONID']
-                    last_request_dict['CPUTIME'] = empty_job['CPUTIME']
-                    last_request_dict['EMPTY_JOB'] = True
-
-                    executing_queue.enqueue_job(last_request_dict,
-                                                executing_queue.queue_length())
-                    logger.info('empty job script created')
-            else:
 
-                # a job has been scheduled to be executed on this
-                # resource: change status in the mRSL file
-
-                client_dir = client_id_dir(job_dict['USER_CERT'])
-                mrsl_filename = os.path.join(configuration.mrsl_files_dir,
-                                             client_dir,
-                                             job_dict['JOB_ID'] + '.mRSL')
-                mrsl_dict = unpickle(mrsl_filename, logger)
-                if mrsl_dict:
-                    (new_job, msg) = \
-                        jobscriptgenerator.create_job_script(
-                        unique_resource_name,
-                        exe,
-                        job_dict,
-                        resource_config,
-                        localjobname,
-                        configuration,
-                        logger,
-                    )
-                    if new_job:
-
-                        # mrsl_dict now contains entire job_dict with updates
-
-                        # Fix legacy VGRID fields
-
-                        mrsl_dict['VGRID'] = validated_vgrid_list(
-                            configuration, mrsl_dict)
-
-                        # Select actual VGrid to use
-
-                        (match, active_job_vgrid, active_res_vgrid) = \
-                            job_fits_res_vgrid(mrsl_dict['VGRID'],
-                                               vgrids_in_prioritized_order)
-
-                        # Write executing details to mRSL file
-
-                        mrsl_dict['STATUS'] = 'EXECUTING'
-                        mrsl_dict['EXECUTING_TIMESTAMP'] = time.gmtime()
-                        mrsl_dict['EXECUTION_DELAY'] = execution_delay
-                        mrsl_dict['UNIQUE_RESOURCE_NAME'] = \
-                            unique_resource_name
-                        mrsl_dict['PUBLICNAME'] = resource_config.get(
-                            'PUBLICNAME', 'HIDDEN')
-                        mrsl_dict['EXE'] = exe
-                        mrsl_dict['RESOURCE_VGRID'] = active_res_vgrid
-                        mrsl_dict['RESOURCE_CONFIG'] = resource_config
-                        mrsl_dict['LOCALJOBNAME'] = localjobname
-                        mrsl_dict['SESSIONID'] = new_job['SESSIONID']
-                        mrsl_dict['IOSESSIONID'] = new_job['IOSESSIONID']
-                        mrsl_dict['MOUNTSSHPUBLICKEY'] = new_job['MOUNTSSHPUBLICKEY']
-                        mrsl_dict['MOUNTSSHPRIVATEKEY'] = new_job['MOUNTSSHPRIVATEKEY']
-
-                        # pickle the new version
-
-                        pickle(mrsl_dict, mrsl_filename, logger)
-
-                        last_request_dict['STATUS'] = 'Job assigned'
-                        last_request_dict['CPUTIME'] = \
-                            new_job['CPUTIME']
-                        last_request_dict['EXECUTION_DELAY'] = \
-                            execution_delay
-                        last_request_dict['NODECOUNT'] = \
-                            new_job['NODECOUNT']
-
-                        # job id and user_cert is used to check if the current
-                        # job is done when a resource requests a new job
-
-                        last_request_dict['JOB_ID'] = new_job['JOB_ID']
-                        last_request_dict['USER_CERT'] = new_job['USER_CERT']
-
-                        # Save actual VGrid for fair VGrid cycling
-
-                        try:
-                            vgrid_index = vgrids_in_prioritized_order.index(
-                                active_res_vgrid)
-                        except Exception:
-
-                            # fall back to simple increment
-
-                            vgrid_index = last_vgrid
-                        last_request_dict['LAST_VGRID'] = vgrid_index
-
-                        print('Job assigned ' + new_job['JOB_ID'])
-                        logger.info('Job %s assigned to %s execution unit %s'
-                                    % (new_job['JOB_ID'],
-                                       unique_resource_name, exe))
-
-                        if 'WORKFLOW_TRIGGER_ID' in new_job:
-                            created, msg = create_workflow_job_history_file(
-                                configuration,
-                                new_job['VGRID'][0],
-                                new_job['SESSIONID'],
-                                new_job['JOB_ID'],
-                                mrsl_dict['WORKFLOW_TRIGGER_ID'],
-                                mrsl_dict['WORKFLOW_TRIGGER_PATH'],
-                                mrsl_dict['WORKFLOW_TRIGGER_TIME'],
-                                mrsl_dict['WORKFLOW_PATTERN_NAME'],
-                                mrsl_dict['WORKFLOW_PATTERN_ID'],
-                                mrsl_dict['WORKFLOW_RECIPES'],
-                            )
-
-                            if not created:
-                                logger.error("Could not create job history "
-                                             "file %s for job %s. %s"
-                                             % (new_job['SESSIONID'],
-                                                new_job['JOB_ID'], msg))
-                            # else:
-                            #     logger.debug("Created new history file at: "
-                            #                  "%s" % msg)
-                        # else:
-                        #     logger.debug("Skipping history creation for "
-                        #                  "job %s" % new_job['JOB_ID'])
+                    # mrsl_dict now contains entire job_dict with updates
 
-                        # put job in executing queue - with maxfilled values
+                    # Fix legacy VGRID fields
 
-                        active_job = copy.deepcopy(mrsl_dict)
-                        for name in maxfill_fields:
-                            active_job[name] = new_job[name]
+                    mrsl_dict['VGRID'] = validated_vgrid_list(
+                        configuration, mrsl_dict)
 
-                        executing_queue.enqueue_job(active_job,
-                                                    executing_queue.queue_length())
+                    # Select actual VGrid to use
 
-                        print('executing_queue length %d'
-                              % executing_queue.queue_length())
-                    else:
+                    (match, active_job_vgrid, active_res_vgrid) = \
+                        job_fits_res_vgrid(mrsl_dict['VGRID'],
+                                           vgrids_in_prioritized_order)
 
-                        # put original job in back in job queue
+                    # Write executing details to mRSL file
 
-                        job_queue.enqueue_job(job_dict,
-                                              job_queue.queue_length())
-                        msg = 'error creating new job script, job requeued'
-                        print(msg)
-                        logger.error(msg)
-                else:
-                    logger.error('error unpickling mRSL: %s'
-                                 % mrsl_filename)
+                    mrsl_dict['STATUS'] = 'EXECUTING'
+                    mrsl_dict['EXECUTING_TIMESTAMP'] = time.gmtime()
+                    mrsl_dict['EXECUTION_DELAY'] = execution_delay
+                    mrsl_dict['UNIQUE_RESOURCE_NAME'] = \
+                        unique_resource_name
+                    mrsl_dict['PUBLICNAME'] = resource_config.get(
+                        'PUBLICNAME', 'HIDDEN')
+                    mrsl_dict['EXE'] = exe
+                    mrsl_dict['RESOURCE_VGRID'] = active_res_vgrid
+                    mrsl_dict['RESOURCE_CONFIG'] = resource_config
+                    mrsl_dict['LOCALJOBNAME'] = localjobname
+                    mrsl_dict['SESSIONID'] = new_job['SESSIONID']
+                    mrsl_dict['IOSESSIONID'] = new_job['IOSESSIONID']
+                    mrsl_dict['MOUNTSSHPUBLICKEY'] = new_job['MOUNTSSHPUBLICKEY']
+                    mrsl_dict['MOUNTSSHPRIVATEKEY'] = new_job['MOUNTSSHPRIVATEKEY']
+
+                    # pickle the new version
+
+                    pickle(mrsl_dict, mrsl_filename, logger)
+                    update_job_index(configuration, mrsl_dict, logger)
+
+                    last_request_dict['STATUS'] = 'Job assigned'
+                    last_request_dict['CPUTIME'] = \
+                        new_job['CPUTIME']
+                    last_request_dict['EXECUTION_DELAY'] = \
+                        execution_delay
+                    last_request_dict['NODECOUNT'] = \
+                        new_job['NODECOUNT']
 
-        pickle(last_request_dict, last_req_file, logger)
+                    # job id and user_cert is used to check if the current
+                    # job is done when a resource requests a new job
 
-        # Save last_request_dict to vgrid_home/vgrid_name to make
-        # seperate vgrid monitors possible
+                    last_request_dict['JOB_ID'] = new_job['JOB_ID']
+                    last_request_dict['USER_CERT'] = new_job['USER_CERT']
 
-        # contains names on vgrids where last_request_dict should
-        # be saved unmodified
+                    # Save actual VGrid for fair VGrid cycling
 
-        original_last_request_dict_vgrids = []
+                    try:
+                        vgrid_index = vgrids_in_prioritized_order.index(
+                            active_res_vgrid)
+                    except Exception:
 
-        # contains names on vgrids where last_request_dict should
-        # be overwritten with a "Executing job for another vgrid"
-        # version
+                        # fall back to simple increment
 
-        executing_in_other_vgrids = []
+                        vgrid_index = last_vgrid
+                    last_request_dict['LAST_VGRID'] = vgrid_index
 
-        # if empty_job:
-        # empty job, make sure this job request is seen on monitors
-        # for all vgrids this resource is in
-        #    original_last_request_dict_vgrids = vgrids_in_prioritized_order
+                    print('Job assigned ' + new_job['JOB_ID'])
+                    logger.info('Job %s assigned to %s execution unit %s'
+                                % (new_job['JOB_ID'],
+                                   unique_resource_name, exe))
 
-        # TODO: must detect if it is a real or empty job.
-        # problem: after a job has been executed in a
-        # vgrid and the resource gets an empty job the monitor
-        # says "executing in other vgrid" which of course should
-        # be no jobs in grid queue can be executed by resource.
+                    if 'WORKFLOW_TRIGGER_ID' in new_job:
+                        created, msg = create_workflow_job_history_file(
+                            configuration,
+                            new_job['VGRID'][0],
+                            new_job['SESSIONID'],
+                            new_job['JOB_ID'],
+                            mrsl_dict['WORKFLOW_TRIGGER_ID'],
+                            mrsl_dict['WORKFLOW_TRIGGER_PATH'],
+                            mrsl_dict['WORKFLOW_TRIGGER_TIME'],
+                            mrsl_dict['WORKFLOW_PATTERN_NAME'],
+                            mrsl_dict['WORKFLOW_PATTERN_ID'],
+                            mrsl_dict['WORKFLOW_RECIPES'],
+                        )
 
-        if job_dict:
+                        if not created:
+                            logger.error("Could not create job history "
+                                         "file %s for job %s. %s"
+                                         % (new_job['SESSIONID'],
+                                            new_job['JOB_ID'], msg))
+                        # else:
+                        #     logger.debug("Created new history file at: "
+                        #                  "%s" % msg)
+                    # else:
+                    #     logger.debug("Skipping history creation for "
+                    #                  "job %s" % new_job['JOB_ID'])
+
+                    # put job in executing queue - with maxfilled values
+
+                    active_job = copy.deepcopy(mrsl_dict)
+                    for name in maxfill_fields:
+                        active_job[name] = new_job[name]
+
+                    executing_queue.enqueue_job(active_job,
+                                                executing_queue.queue_length())
+
+                    print('executing_queue length %d'
+                          % executing_queue.queue_length())
+                else:
 
-            # real job scheduled!
+                    # put original job in back in job queue
 
-            if 'VGRID' in job_dict:
-                original_last_request_dict_vgrids += job_dict['VGRID']
+                    job_queue.enqueue_job(job_dict,
+                                          job_queue.queue_length())
+                    msg = 'error creating new job script, job requeued'
+                    print(msg)
+                    logger.error(msg)
             else:
+                logger.error('error unpickling mRSL: %s'
+                             % mrsl_filename)
+
+    pickle(last_request_dict, last_req_file, logger)
+
+    # Save last_request_dict to vgrid_home/vgrid_name to make
+    # seperate vgrid monitors possible
 
-                # no vgrid specified, this means default vgrid.
+    # contains names on vgrids where last_request_dict should
+    # be saved unmodified
 
-                original_last_request_dict_vgrids.append([default_vgrid])
+    original_last_request_dict_vgrids = []
 
-            # overwrite last_request_dict for vgrids that
-            # the resource is in but not executing the job
+    # contains names on vgrids where last_request_dict should
+    # be overwritten with a "Executing job for another vgrid"
+    # version
 
-            logger.info('job: %s' % job_dict)
-            for res_vgrid in vgrids_in_prioritized_order:
-                if res_vgrid not in original_last_request_dict_vgrids:
-                    executing_in_other_vgrids.append(res_vgrid)
+    executing_in_other_vgrids = []
+
+    # if empty_job:
+    # empty job, make sure this job request is seen on monitors
+    # for all vgrids this resource is in
+    #    original_last_request_dict_vgrids = vgrids_in_prioritized_order
+
+    # TODO: must detect if it is a real or empty job.
+    # problem: after a job has been executed in a
+    # vgrid and the resource gets an empty job the monitor
+    # says "executing in other vgrid" which of course should
+    # be no jobs in grid queue can be executed by resource.
+
+    if job_dict:
+
+        # real job scheduled!
+
+        if 'VGRID' in job_dict:
+            original_last_request_dict_vgrids += job_dict['VGRID']
         else:
 
-            # empty job, make sure this job request is seen on monitors
-            # for all vgrids this resource is in
-
-            original_last_request_dict_vgrids = \
-                vgrids_in_prioritized_order
-
-        # save monitor_last_request files
-        # for vgrid_monitor in original_last_request_dict_vgrids:
-        # loop all vgrids where this resource is taking jobs
-
-        for vgrid_name in vgrids_in_prioritized_order:
-            logger.info("vgrid_name: '%s' org '%s' exe '%s'"
-                        % (vgrid_name,
-                            original_last_request_dict_vgrids,
-                            executing_in_other_vgrids))
-
-            monitor_last_request_file = configuration.vgrid_home\
-                + os.sep + vgrid_name + os.sep\
-                + 'monitor_last_request_' + unique_resource_name + '_'\
-                + exe
-
-            if vgrid_name in original_last_request_dict_vgrids:
-                pickle(last_request_dict, monitor_last_request_file,
-                       logger)
-                logger.info('vgrid_name: %s status: %s' % (vgrid_name,
-                                                           last_request_dict['STATUS']))
-            elif vgrid_name in executing_in_other_vgrids:
-
-                # create modified last_request_dict and save
-
-                new_last_request_dict = copy.deepcopy(last_request_dict)
-                new_last_request_dict['STATUS'] = \
-                    'Executing job for another vgrid'
-                logger.info('vgrid_name: %s status: %s' % (vgrid_name,
-                                                           new_last_request_dict['STATUS']))
-                pickle(new_last_request_dict,
-                       monitor_last_request_file, logger)
-            else:
+            # no vgrid specified, this means default vgrid.
 
-                # we should never enter this else, vgrid_name must be in
-                # original_last_request_dict_vgrids or
-                # executing_in_other_vgrids
+            original_last_request_dict_vgrids.append([default_vgrid])
 
-                logger.error(
-                    'Entered else condition that never should be entered ' +
-                    'during creation of last_request_dict in grid_script!' +
-                    " vgrid_name: '%s' not in '%s' or '%s'"
-                    % (vgrid_name, original_last_request_dict_vgrids,
-                       executing_in_other_vgrids))
+        # overwrite last_request_dict for vgrids that
+        # the resource is in but not executing the job
 
-        # delete requestnewjob lock
+        logger.info('job: %s' % job_dict)
+        for res_vgrid in vgrids_in_prioritized_order:
+            if res_vgrid not in original_last_request_dict_vgrids:
+                executing_in_other_vgrids.append(res_vgrid)
+    else:
 
-        lock_file = os.path.join(configuration.resource_home,
-                                 unique_resource_name,
-                                 'jobrequest_pending.%s' % exe)
-        try:
-            os.remove(lock_file)
-        except OSError as ose:
-            logger.error('Error removing %s: %s' % (lock_file, ose))
+        # empty job, make sure this job request is seen on monitors
+        # for all vgrids this resource is in
+
+        original_last_request_dict_vgrids = \
+            vgrids_in_prioritized_order
+
+    # save monitor_last_request files
+    # for vgrid_monitor in original_last_request_dict_vgrids:
+    # loop all vgrids where this resource is taking jobs
+
+    for vgrid_name in vgrids_in_prioritized_order:
+        logger.info("vgrid_name: '%s' org '%s' exe '%s'"
+                    % (vgrid_name,
+                        original_last_request_dict_vgrids,
+                        executing_in_other_vgrids))
+
+        monitor_last_request_file = configuration.vgrid_home\
+            + os.sep + vgrid_name + os.sep\
+            + 'monitor_last_request_' + unique_resource_name + '_'\
+            + exe
+
+        if vgrid_name in original_last_request_dict_vgrids:
+            pickle(last_request_dict, monitor_last_request_file,
+                   logger)
+            logger.info('vgrid_name: %s status: %s' % (vgrid_name,
+                                                       last_request_dict['STATUS']))
+        elif vgrid_name in executing_in_other_vgrids:
+
+            # create modified last_request_dict and save
+
+            new_last_request_dict = copy.deepcopy(last_request_dict)
+            new_last_request_dict['STATUS'] = \
+                'Executing job for another vgrid'
+            logger.info('vgrid_name: %s status: %s' % (vgrid_name,
+                                                       new_last_request_dict['STATUS']))
+            pickle(new_last_request_dict,
+                   monitor_last_request_file, logger)
+        else:
+
+            # we should never enter this else, vgrid_name must be in
+            # original_last_request_dict_vgrids or
+            # executing_in_other_vgrids
+
+            logger.error(
+                'Entered else condition that never should be entered ' +
+                'during creation of last_request_dict in grid_script!' +
+                " vgrid_name: '%s' not in '%s' or '%s'"
+                % (vgrid_name, original_last_request_dict_vgrids,
+                   executing_in_other_vgrids))
+
+    # delete requestnewjob lock
+
+    lock_file = os.path.join(configuration.resource_home,
+                             unique_resource_name,
+                             'jobrequest_pending.%s' % exe)
+    try:
+        os.remove(lock_file)
+    except OSError as ose:
+        logger.error('Error removing %s: %s' % (lock_file, ose))
+
+    # Experimental pricing code
+    # TODO: update price *after* publishing status so that price fits delay?
+
+    if configuration.enable_server_dist:
+        scheduler.update_price(resource_config)
+
+
+def handle_resourcefinishedjob(strip_line, cap_line, linelist):
+    """Clean up after resource finished a job"""
+
+    # *********                       *********
+    # *********    RESOURCE FINISHED  *********
+    # *********                       *********
+    # format: RESOURCEFINISHEDJOB RESOURCE_ID/LOCALJOBNAME
+
+    print(cap_line)
+    logger.info(cap_line)
+    logger.info('RESOURCEFINISHEDJOB: %d job(s) in the queue.' %
+                job_queue.queue_length())
+
+    if len(linelist) != 5:
+        logger.error('Invalid resourcefinishedjob request')
+        return
+
+    # read values
+
+    res_name = linelist[1]
+    exe_name = linelist[2]
+    sessionid = linelist[3]
+    job_id = linelist[4]
+
+    msg = 'RESOURCEFINISHEDJOB: %s:%s finished job %s id %s'\
+        % (res_name, exe_name, sessionid, job_id)
+    job_dict = executing_queue.get_job_by_id(job_id)
+
+    if not job_dict:
+        msg += \
+            ', but job is not in executing queue, ignoring result.'
+    elif job_dict['UNIQUE_RESOURCE_NAME'] != res_name\
+            or job_dict['EXE'] != exe_name:
+        msg += \
+            ', but job is being executed by %s:%s, ignoring result.'\
+            % (job_dict['UNIQUE_RESOURCE_NAME'], job_dict['EXE'])
+    elif job_dict['UNIQUE_RESOURCE_NAME'] == 'ARC':
+        if not configuration.arc_clusters:
+            logger.error('ARC backend disabled - ignore %s' %
+                         job_dict)
+            return
+        msg += (', which is an ARC job (ID %s).' % job_dict['EXE'])
+
+        # remove from the executing queue
+        executing_queue.dequeue_job_by_id(job_id)
+
+        # job status has been checked by put script already
+        # we need to clean up the job remainder (links, queue, and ARC
+        # side)
+        clean_arc_job(job_dict, 'FINISHED', None,
+                      configuration, logger, False)
+        msg += 'ARC job completed'
+
+    else:
+
+        # Clean up the server for files associated with the finished job
+
+        if not server_cleanup(
+            job_dict['SESSIONID'],
+            job_dict['IOSESSIONID'],
+            job_dict['LOCALJOBNAME'],
+            job_id,
+            configuration,
+            logger,
+        ):
+            logger.error('could not clean up MiG server')
+
+        if configuration.enable_server_dist\
+                and 'EMPTY_JOB' not in job_dict:
 
-        # Experimental pricing code
-        # TODO: update price *after* publishing status so that price fits delay?
+            # TODO: we should probably support resources migrating and
+            # handing back job as first contact with new server
+            # Still not sure if we need finished handling at all, though...
 
-        if configuration.enable_server_dist:
-            scheduler.update_price(resource_config)
-    elif cap_line.find('RESOURCEFINISHEDJOB ') == 0:
+            scheduler.finished_job(res_name, job_dict)
 
-        # *********                       *********
-        # *********    RESOURCE FINISHED  *********
-        # *********                       *********
-        # format: RESOURCEFINISHEDJOB RESOURCE_ID/LOCALJOBNAME
+        executing_queue.dequeue_job_by_id(job_id)
+        msg += '%s removed from executing queue.' % job_id
 
-        print(cap_line)
-        logger.info(cap_line)
-        logger.info('RESOURCEFINISHEDJOB: %d job(s) in the queue.' %
-                    job_queue.queue_length())
+    # print msg
 
-        if len(linelist) != 5:
-            logger.error('Invalid resourcefinishedjob request')
-            continue
+    logger.info(msg)
 
-        # read values
 
-        res_name = linelist[1]
-        exe_name = linelist[2]
-        sessionid = linelist[3]
-        job_id = linelist[4]
+def handle_restartexefailed(strip_line, cap_line, linelist):
+    """Retry resource exe restart after failure"""
 
-        msg = 'RESOURCEFINISHEDJOB: %s:%s finished job %s id %s'\
-            % (res_name, exe_name, sessionid, job_id)
-        job_dict = executing_queue.get_job_by_id(job_id)
+    # *********                       *********
+    # *********   RESTART EXE FAILED  *********
+    # *********                       *********
+
+    print(cap_line)
+    logger.info(cap_line)
+    logger.info(
+        'Before restart exe failed: %d job(s) in the executing queue.' %
+        executing_queue.queue_length())
+
+    if len(linelist) != 4:
+        logger.error('Invalid restart exe failed request')
+        return
+
+    # read values
+
+    res_name = linelist[1]
+    exe_name = linelist[2]
+
+    logger.info('Restart exe failed: adding retry job for %s %s'
+                % (res_name, exe_name))
+    (retry_job, msg) = jobscriptgenerator.create_restart_job(
+        res_name,
+        exe_name,
+        300,
+        1,
+        'RESTART-EXE-FAILED',
+        0,
+        configuration,
+        logger,
+    )
+    executing_queue.enqueue_job(retry_job,
+                                executing_queue.queue_length())
+    logger.info(
+        'After restart exe failed: %d job(s) in the executing queue.' %
+        executing_queue.queue_length())
+
+
+def handle_jobaction(strip_line, cap_line, linelist):
+    """Change state of queued or executing job"""
+
+    # *********                       *********
+    # *********   JOB STATE CHANGE    *********
+    # *********                       *********
+
+    print(cap_line)
+    logger.info(cap_line)
+    logger.info('Job action: %d job(s) in the queue.' %
+                job_queue.queue_length())
+
+    if len(linelist) != 6:
+        logger.error('Invalid job action request')
+        return
+
+    # read values
+
+    job_id = linelist[1]
+    original_status = linelist[2]
+    new_status = linelist[3]
+    unique_resource_name = linelist[4]
+    exe = linelist[5]
+
+    # read resource config file
+
+    res_file = os.path.join(configuration.resource_home,
+                            unique_resource_name, 'config')
+    resource_config = unpickle(res_file, logger)
+
+    other_status_list = ['PARSE']
+    queued_status_list = ['QUEUED', 'RETRY', 'FROZEN']
+    executing_status_list = ['EXECUTING']
+
+    # Only cancel is accepted for non-queued states
+
+    if original_status not in queued_status_list and \
+            new_status != 'CANCELED':
+        logger.error('change to %s not supported for jobs in %s states'
+                     % (new_status, ', '.join(other_status_list)))
+
+    if original_status in other_status_list:
+        pass
+    elif original_status in queued_status_list:
+        if new_status == 'CANCELED':
+            job_dict = job_queue.dequeue_job_by_id(job_id)
+        else:
+            job_dict = job_queue.get_job_by_id(job_id)
+            if not job_dict:
+                logger.warning("Couldn't find job in queue: %s" % job_id)
+                return
+            # NOTE: reset schedule through update_job to journal it as well
+            scheduler.clear_schedule(job_dict)
+            job_queue.update_job(job_id, scheduler.fill_schedule(
+                {'STATUS': new_status}))
+    elif original_status in executing_status_list:
+
+        # Retrieve job_dict
+
+        num_executing_jobs_before = executing_queue.queue_length()
+        job_dict = executing_queue.dequeue_job_by_id(job_id)
+        num_executing_jobs_after = executing_queue.queue_length()
+        logger.info('Number of jobs in executing queue. '
+                    + 'Before cancel: %s. After cancel: %s'
+                    % (num_executing_jobs_before,
+                        num_executing_jobs_after))
 
         if not job_dict:
-            msg += \
-                ', but job is not in executing queue, ignoring result.'
-        elif job_dict['UNIQUE_RESOURCE_NAME'] != res_name\
-                or job_dict['EXE'] != exe_name:
-            msg += \
-                ', but job is being executed by %s:%s, ignoring result.'\
-                % (job_dict['UNIQUE_RESOURCE_NAME'], job_dict['EXE'])
-        elif job_dict['UNIQUE_RESOURCE_NAME'] == 'ARC':
+
+            # We are seeing a race in the handling of executing jobs - do
+            # nothing. Job timeout must have just killed the job we are
+            # trying to cancel
+
+            logger.info(
+                'Cancel job: Could not get job_dict for executing job')
+            return
+
+        # special treatment of ARC jobs: delete two links and cancel job
+        # in ARC
+        if unique_resource_name == 'ARC':
             if not configuration.arc_clusters:
                 logger.error('ARC backend disabled - ignore %s' %
                              job_dict)
-                continue
-            msg += (', which is an ARC job (ID %s).' % job_dict['EXE'])
+                return
 
             # remove from the executing queue
             executing_queue.dequeue_job_by_id(job_id)
 
-            # job status has been checked by put script already
-            # we need to clean up the job remainder (links, queue, and ARC
-            # side)
-            clean_arc_job(job_dict, 'FINISHED', None,
-                          configuration, logger, False)
-            msg += 'ARC job completed'
+            # job status has been set by the cancel request already, but
+            # we need to kill the ARC job, or clean it (if already
+            # finished), and clean up the job remainder links
+            clean_arc_job(job_dict, 'CANCELED', None,
+                          configuration, logger, True)
+
+            logger.debug('ARC job completed')
+            return
 
-        else:
+        if not server_cleanup(
+            job_dict['SESSIONID'],
+            job_dict['IOSESSIONID'],
+            job_dict['LOCALJOBNAME'],
+            job_dict['JOB_ID'],
+            configuration,
+            logger,
+        ):
+            logger.error('could not clean up MiG server')
+
+        if not resource_config.get('SANDBOX', False):
+            logger.info(
+                'Killing running job with atomic_resource_exe_restart')
+            (status, msg) = \
+                atomic_resource_exe_restart(unique_resource_name,
+                                            exe, configuration, logger)
+
+            if status:
+                logger.info('atomic_resource_exe_restart ok: res %s:%s'
+                            % (unique_resource_name, exe))
+            else:
+                logger.error(
+                    'atomic_resource_exe_restart FAILED: %s res %s:%s'
+                    % (msg, unique_resource_name, exe))
+
+                # kill_job_by_exe_restart(unique_resource_name, exe,
+                #                        configuration, logger)
+                # Make sure we do not loose exes even if restart fails
+
+                retry_message = 'RESTARTEXEFAILED %s %s %s\n'\
+                    % (unique_resource_name, exe, job_id)
+                send_message_to_grid_script(retry_message, logger,
+                                            configuration)
+
+
+def handle_jobtimeout(strip_line, cap_line, linelist):
+    """Requeue or fail executing job after timeout"""
 
-            # Clean up the server for files associated with the finished job
+    print(cap_line)
+    logger.info(cap_line)
+    logger.info('job timeout: %d job(s) in the executing queue.' %
+                executing_queue.queue_length())
+
+    if len(linelist) != 4:
+        logger.error('Invalid timeout job request')
+        return
+
+    # read values
+
+    unique_resource_name = linelist[1]
+    exe_name = linelist[2]
+    jobid = linelist[3]
+
+    msg = 'JOBTIMEOUT: %s timed out.' % jobid
+    print(msg)
+    logger.info(msg)
+
+    # read resource config file
+
+    res_file = os.path.join(configuration.resource_home,
+                            unique_resource_name, 'config')
+    resource_config = unpickle(res_file, logger)
+
+    # Retrieve job_dict
+
+    job_dict = executing_queue.get_job_by_id(jobid)
+
+    # special treatment of ARC jobs: delete two links and
+    # clean job in ARC system, do not retry.
+    if job_dict and unique_resource_name == 'ARC':
+        if not configuration.arc_clusters:
+            logger.error('ARC backend disabled - ignore %s' %
+                         job_dict)
+            return
+
+        # remove from the executing queue
+        executing_queue.dequeue_job_by_id(jobid)
+
+        # job status has been set by the cancel request already, but
+        # we need to kill the ARC job, or clean it (if already finished),
+        # and clean up the job remainder links
+        clean_arc_job(job_dict, 'FAILED', 'Job timed out',
+                      configuration, logger, True)
+
+        logger.debug('ARC job timed out, removed')
+        return
+
+    # Execution information is removed from job_dict in
+    # requeue_job - save here
+
+    exe = ''
+    if job_dict:
+        exe = job_dict['EXE']
+
+    # Check if job has already been rescheduled due to resource
+    # failure. Important to match both unique resource and exe
+    # name to avoid problems when job is rescheduled to another
+    # exe on same resource.
+
+    # IMPORTANT: both empty and real jobs may require exe
+    # restart on time out. If frontend script can't deliver
+    # status file within time frame (network outage etc) the
+    # session id will be invalidated resulting in rejection
+    # and no automatic restart of exe.
+
+    if job_dict and unique_resource_name\
+            == job_dict['UNIQUE_RESOURCE_NAME'] and exe_name == exe:
+        if 'EMPTY_JOB' in job_dict:
+
+            # Empty job timed out, cleanup server and
+            # remove from Executing queue
 
             if not server_cleanup(
                 job_dict['SESSIONID'],
                 job_dict['IOSESSIONID'],
                 job_dict['LOCALJOBNAME'],
-                job_id,
+                job_dict['JOB_ID'],
                 configuration,
                 logger,
             ):
                 logger.error('could not clean up MiG server')
 
-            if configuration.enable_server_dist\
-                    and 'EMPTY_JOB' not in job_dict:
+            executing_queue.dequeue_job_by_id(job_dict['JOB_ID'])
+        else:
 
-                # TODO: we should probably support resources migrating and
-                # handing back job as first contact with new server
-                # Still not sure if we need finished handling at all, though...
+            # Real job, requeue job
 
-                scheduler.finished_job(res_name, job_dict)
+            # Clear any scheduling data for exe_job before requeue
 
-            executing_queue.dequeue_job_by_id(job_id)
-            msg += '%s removed from executing queue.' % job_id
+            scheduler.clear_schedule(job_dict)
+            requeue_job(
+                job_dict,
+                'JOB TIMEOUT',
+                job_queue,
+                executing_queue,
+                configuration,
+                logger,
+            )
 
-        # print msg
+        # Restart non-sandbox resources for all timed out jobs
 
-        logger.info(msg)
-    elif cap_line.find('RESTARTEXEFAILED') == 0:
-
-        # *********                       *********
-        # *********   RESTART EXE FAILED  *********
-        # *********                       *********
-
-        print(cap_line)
-        logger.info(cap_line)
-        logger.info(
-            'Before restart exe failed: %d job(s) in the executing queue.' %
-            executing_queue.queue_length())
-
-        if len(linelist) != 4:
-            logger.error('Invalid restart exe failed request')
-            continue
-
-        # read values
-
-        res_name = linelist[1]
-        exe_name = linelist[2]
-        job_id = linelist[3]
-
-        logger.info('Restart exe failed: adding retry job for %s %s'
-                    % (res_name, exe_name))
-        (retry_job, msg) = jobscriptgenerator.create_restart_job(
-            res_name,
-            exe_name,
-            300,
-            1,
-            'RESTART-EXE-FAILED',
-            0,
-            configuration,
-            logger,
-        )
-        executing_queue.enqueue_job(retry_job,
-                                    executing_queue.queue_length())
-        logger.info(
-            'After restart exe failed: %d job(s) in the executing queue.' %
-            executing_queue.queue_length())
-    elif cap_line.find('JOBACTION') == 0:
+        if not resource_config.get('SANDBOX', False):
 
-        # *********                       *********
-        # *********   JOB STATE CHANGE    *********
-        # *********                       *********
+            # TODO: atomic_resource_exe_restart is not always effective
+            # The imada resources have been seen to hang in wait for input
+            # files loop across an atomic_resource_exe_restart run
+            # (server PGID was 'starting').
 
-        print(cap_line)
-        logger.info(cap_line)
-        logger.info('Job action: %d job(s) in the queue.' %
-                    job_queue.queue_length())
+            (status, msg) = \
+                atomic_resource_exe_restart(unique_resource_name,
+                                            exe, configuration, logger)
+            if status:
+                logger.info('atomic_resource_exe_restart ok: res %s:%s'
+                            % (unique_resource_name, exe))
+            else:
+                logger.error(
+                    'atomic_resource_exe_restart FAILED: %s, res %s:%s'
+                    % (msg, unique_resource_name, exe))
 
-        if len(linelist) != 6:
-            logger.error('Invalid job action request')
-            continue
+                # Make sure we do not loose exes even if restart fails
 
-        # read values
+                retry_message = 'RESTARTEXEFAILED %s %s %s\n'\
+                    % (unique_resource_name, exe_name,
+                       job_dict['JOB_ID'])
+                send_message_to_grid_script(retry_message, logger,
+                                            configuration)
+                logger.info('requested restart exe retry attempt')
 
-        job_id = linelist[1]
-        original_status = linelist[2]
-        new_status = linelist[3]
-        unique_resource_name = linelist[4]
-        exe = linelist[5]
 
-        # read resource config file
+def handle_jobqueueinfo(strip_line, cap_line, linelist):
+    """Show job queue contents"""
 
-        res_file = os.path.join(configuration.resource_home,
-                                unique_resource_name, 'config')
-        resource_config = unpickle(res_file, logger)
+    details = linelist[1:]
+    if not details:
+        details.append('JOB_ID')
 
-        other_status_list = ['PARSE']
-        queued_status_list = ['QUEUED', 'RETRY', 'FROZEN']
-        executing_status_list = ['EXECUTING']
+    # NOTE: runs in command pool so only lock while formatting
 
-        # Only cancel is accepted for non-queued states
+    with queue_lock:
+        queue_lines = job_queue.format_queue(details)
+    logger.info('--- DISPLAYING JOB QUEUE INFORMATION ---\n%s' %
+                '\n'.join(queue_lines))
+    print('Queue:')
+    print('\n'.join(queue_lines))
 
-        if original_status not in queued_status_list and \
-                new_status != 'CANCELED':
-            logger.error('change to %s not supported for jobs in %s states'
-                         % (new_status, ', '.join(other_status_list)))
 
-        if original_status in other_status_list:
-            pass
-        elif original_status in queued_status_list:
-            if new_status == 'CANCELED':
-                job_dict = job_queue.dequeue_job_by_id(job_id)
-            else:
-                job_dict = job_queue.get_job_by_id(job_id)
-                if not job_dict:
-                    logger.warning("Couldn't find job in queue: %s" % job_id)
-                    continue
-                scheduler.clear_schedule(job_dict)
-                job_dict['STATUS'] = new_status
-        elif original_status in executing_status_list:
-
-            # Retrieve job_dict
-
-            num_executing_jobs_before = executing_queue.queue_length()
-            job_dict = executing_queue.dequeue_job_by_id(job_id)
-            num_executing_jobs_after = executing_queue.queue_length()
-            logger.info('Number of jobs in executing queue. '
-                        + 'Before cancel: %s. After cancel: %s'
-                        % (num_executing_jobs_before,
-                            num_executing_jobs_after))
+def handle_dropqueued(strip_line, cap_line, linelist):
+    """Remove jobs from job queue"""
 
-            if not job_dict:
+    logger.info('--- REMOVING JOBS FROM JOB QUEUE ---')
+    job_list = linelist[1:]
+    if not job_list:
+        logger.info('No jobs specified for removal')
+    for job_id in job_list:
+        try:
+            job_queue.dequeue_job_by_id(job_id)
+            logger.info("Removed job %s from job queue" % job_id)
+        except Exception as exc:
+            logger.error("Failed to remove job %s from job queue: %s"
+                         % (job_id, exc))
 
-                # We are seeing a race in the handling of executing jobs - do
-                # nothing. Job timeout must have just killed the job we are
-                # trying to cancel
 
-                logger.info(
-                    'Cancel job: Could not get job_dict for executing job')
-                continue
+def handle_executingqueueinfo(strip_line, cap_line, linelist):
+    """Show executing queue contents"""
 
-            # special treatment of ARC jobs: delete two links and cancel job
-            # in ARC
-            if unique_resource_name == 'ARC':
-                if not configuration.arc_clusters:
-                    logger.error('ARC backend disabled - ignore %s' %
-                                 job_dict)
-                    continue
+    details = linelist[1:]
+    if not details:
+        details.append('JOB_ID')
 
-                # remove from the executing queue
-                executing_queue.dequeue_job_by_id(job_id)
+    # NOTE: runs in command pool so only lock while formatting
 
-                # job status has been set by the cancel request already, but
-                # we need to kill the ARC job, or clean it (if already
-                # finished), and clean up the job remainder links
-                clean_arc_job(job_dict, 'CANCELED', None,
-                              configuration, logger, True)
+    with queue_lock:
+        queue_lines = executing_queue.format_queue(details)
+    logger.info('--- DISPLAYING EXECUTING QUEUE INFORMATION ---\n%s' %
+                '\n'.join(queue_lines))
+    print('Queue:')
+    print('\n'.join(queue_lines))
 
-                logger.debug('ARC job completed')
-                continue
 
-            if not server_cleanup(
-                job_dict['SESSIONID'],
-                job_dict['IOSESSIONID'],
-                job_dict['LOCALJOBNAME'],
-                job_dict['JOB_ID'],
-                configuration,
-                logger,
-            ):
-                logger.error('could not clean up MiG server')
+def handle_dropexecuting(strip_line, cap_line, linelist):
+    """Remove jobs from executing queue"""
 
-            if not resource_config.get('SANDBOX', False):
-                logger.info(
-                    'Killing running job with atomic_resource_exe_restart')
-                (status, msg) = \
-                    atomic_resource_exe_restart(unique_resource_name,
-                                                exe, configuration, logger)
+    logger.info('--- REMOVING JOBS FROM EXECUTING QUEUE ---')
+    job_list = linelist[1:]
+    if not job_list:
+        logger.info('No jobs specified for removal')
+    for job_id in job_list:
+        try:
+            executing_queue.dequeue_job_by_id(job_id)
+            logger.info("Removed job %s from executing queue" % job_id)
+        except Exception as exc:
+            logger.error("Failed to remove job %s from exe queue: %s"
+                         % (job_id, exc))
 
-                if status:
-                    logger.info('atomic_resource_exe_restart ok: res %s:%s'
-                                % (unique_resource_name, exe))
-                else:
-                    logger.error(
-                        'atomic_resource_exe_restart FAILED: %s res %s:%s'
-                        % (msg, unique_resource_name, exe))
 
-                    # kill_job_by_exe_restart(unique_resource_name, exe,
-                    #                        configuration, logger)
-                    # Make sure we do not loose exes even if restart fails
+def handle_donequeueinfo(strip_line, cap_line, linelist):
+    """Show done queue contents"""
 
-                    retry_message = 'RESTARTEXEFAILED %s %s %s\n'\
-                        % (unique_resource_name, exe, job_id)
-                    send_message_to_grid_script(retry_message, logger,
-                                                configuration)
-    elif cap_line.find('JOBTIMEOUT') == 0:
+    details = linelist[1:]
+    if not details:
+        details.append('JOB_ID')
 
-        print(cap_line)
-        logger.info(cap_line)
-        logger.info('job timeout: %d job(s) in the executing queue.' %
-                    executing_queue.queue_length())
+    # NOTE: runs in command pool so only lock while formatting
 
-        if len(linelist) != 4:
-            logger.error('Invalid timeout job request')
-            continue
+    with queue_lock:
+        queue_lines = done_queue.format_queue(details)
+    logger.info('--- DISPLAYING DONE QUEUE INFORMATION ---\n%s' %
+                '\n'.join(queue_lines))
+    print('Queue:')
+    print('\n'.join(queue_lines))
 
-        # read values
 
-        unique_resource_name = linelist[1]
-        exe_name = linelist[2]
-        jobid = linelist[3]
+def handle_dropdone(strip_line, cap_line, linelist):
+    """Remove jobs from done queue"""
 
-        msg = 'JOBTIMEOUT: %s timed out.' % jobid
-        print(msg)
-        logger.info(msg)
+    logger.info('--- REMOVING JOBS FROM DONE QUEUE ---')
+    job_list = linelist[1:]
+    if not job_list:
+        logger.info('No jobs specified for removal')
+    for job_id in job_list:
+        try:
+            done_queue.dequeue_job_by_id(job_id)
+            logger.info("Removed job %s from done queue" % job_id)
+        except Exception as exc:
+            logger.error("Failed to remove job %s from exe queue: %s"
+                         % (job_id, exc))
 
-        # read resource config file
 
-        res_file = os.path.join(configuration.resource_home,
-                                unique_resource_name, 'config')
-        resource_config = unpickle(res_file, logger)
+def handle_starttimeoutthread(strip_line, cap_line, linelist):
+    """Start job time out thread"""
 
-        # Retrieve job_dict
+    global job_time_out_thread
 
-        job_dict = executing_queue.get_job_by_id(jobid)
+    logger.info('--- STARTING TIME OUT THREAD ---')
+    job_time_out_stop.clear()
+    job_time_out_thread = threading.Thread(target=time_out_jobs,
+                                           args=(job_time_out_stop, ))
+    job_time_out_thread.start()
 
-        # special treatment of ARC jobs: delete two links and
-        # clean job in ARC system, do not retry.
-        if job_dict and unique_resource_name == 'ARC':
-            if not configuration.arc_clusters:
-                logger.error('ARC backend disabled - ignore %s' %
-                             job_dict)
-                continue
 
-            # remove from the executing queue
-            executing_queue.dequeue_job_by_id(jobid)
+def handle_checktimeoutthread(strip_line, cap_line, linelist):
+    """Check job time out thread"""
 
-            # job status has been set by the cancel request already, but
-            # we need to kill the ARC job, or clean it (if already finished),
-            # and clean up the job remainder links
-            clean_arc_job(job_dict, 'FAILED', 'Job timed out',
-                          configuration, logger, True)
+    logger.info('--- CHECKING TIME OUT THREAD ---')
+    logger.info('--- TIME OUT THREAD IS ALIVE: %s ---'
+                % job_time_out_thread.is_alive())
 
-            logger.debug('ARC job timed out, removed')
-            continue
 
-        # Execution information is removed from job_dict in
-        # requeue_job - save here
+def handle_reloadconfig(strip_line, cap_line, linelist):
+    """Reload configuration"""
 
-        exe = ''
-        if job_dict:
-            exe = job_dict['EXE']
-
-        # Check if job has already been rescheduled due to resource
-        # failure. Important to match both unique resource and exe
-        # name to avoid problems when job is rescheduled to another
-        # exe on same resource.
-
-        # IMPORTANT: both empty and real jobs may require exe
-        # restart on time out. If frontend script can't deliver
-        # status file within time frame (network outage etc) the
-        # session id will be invalidated resulting in rejection
-        # and no automatic restart of exe.
-
-        if job_dict and unique_resource_name\
-                == job_dict['UNIQUE_RESOURCE_NAME'] and exe_name == exe:
-            if 'EMPTY_JOB' in job_dict:
-
-                # Empty job timed out, cleanup server and
-                # remove from Executing queue
-
-                if not server_cleanup(
-                    job_dict['SESSIONID'],
-                    job_dict['IOSESSIONID'],
-                    job_dict['LOCALJOBNAME'],
-                    job_dict['JOB_ID'],
-                    configuration,
-                    logger,
-                ):
-                    logger.error('could not clean up MiG server')
+    logger.info('--- RELOADING CONFIGURATION ---')
+    configuration.reload_config(True)
 
-                executing_queue.dequeue_job_by_id(job_dict['JOB_ID'])
-            else:
 
-                # Real job, requeue job
+def handle_shutdown(strip_line, cap_line, linelist):
+    """Shut down gracefully"""
 
-                # Clear any scheduling data for exe_job before requeue
+    logger.info('--- SAFE SHUTDOWN INITIATED ---')
+    print('--- SAFE SHUTDOWN INITIATED ---')
+    graceful_shutdown()
 
-                scheduler.clear_schedule(job_dict)
-                requeue_job(
-                    job_dict,
-                    'JOB TIMEOUT',
-                    job_queue,
-                    executing_queue,
-                    configuration,
-                    logger,
-                )
 
-            # Restart non-sandbox resources for all timed out jobs
+def handle_unknown(strip_line, cap_line, linelist):
+    """Complain about unknown request"""
 
-            if not resource_config.get('SANDBOX', False):
+    print('not understood: %s' % cap_line)
+    logger.error('not understood: %s' % cap_line)
+    time.sleep(1)
 
-                # TODO: atomic_resource_exe_restart is not always effective
-                # The imada resources have been seen to hang in wait for input
-                # files loop across an atomic_resource_exe_restart run
-                # (server PGID was 'starting').
 
-                (status, msg) = \
-                    atomic_resource_exe_restart(unique_resource_name,
-                                                exe, configuration, logger)
-                if status:
-                    logger.info('atomic_resource_exe_restart ok: res %s:%s'
-                                % (unique_resource_name, exe))
-                else:
-                    logger.error(
-                        'atomic_resource_exe_restart FAILED: %s, res %s:%s'
-                        % (msg, unique_resource_name, exe))
-
-                    # Make sure we do not loose exes even if restart fails
-
-                    retry_message = 'RESTARTEXEFAILED %s %s %s\n'\
-                        % (unique_resource_name, exe_name,
-                           job_dict['JOB_ID'])
-                    send_message_to_grid_script(retry_message, logger,
-                                                configuration)
-                    logger.info('requested restart exe retry attempt')
-    elif cap_line.find('JOBQUEUEINFO') == 0:
-
-        details = linelist[1:]
-        if not details:
-            details.append('JOB_ID')
-        logger.info('--- DISPLAYING JOB QUEUE INFORMATION ---\n%s' %
-                    '\n'.join(job_queue.format_queue(details)))
-        job_queue.show_queue(details)
-    elif cap_line.find('DROPQUEUED') == 0:
-        logger.info('--- REMOVING JOBS FROM JOB QUEUE ---')
-        job_list = linelist[1:]
-        if not job_list:
-            logger.info('No jobs specified for removal')
-        for job_id in job_list:
-            try:
-                job_queue.dequeue_job_by_id(job_id)
-                logger.info("Removed job %s from job queue" % job_id)
-            except Exception as exc:
-                logger.error("Failed to remove job %s from job queue: %s"
-                             % (job_id, exc))
-    elif cap_line.find('EXECUTINGQUEUEINFO') == 0:
-        details = linelist[1:]
-        if not details:
-            details.append('JOB_ID')
-        logger.info('--- DISPLAYING EXECUTING QUEUE INFORMATION ---\n%s' %
-                    '\n'.join(executing_queue.format_queue(details)))
-        executing_queue.show_queue(details)
-    elif cap_line.find('DROPEXECUTING') == 0:
-        logger.info('--- REMOVING JOBS FROM EXECUTING QUEUE ---')
-        job_list = linelist[1:]
-        if not job_list:
-            logger.info('No jobs specified for removal')
-        for job_id in job_list:
-            try:
-                executing_queue.dequeue_job_by_id(job_id)
-                logger.info("Removed job %s from executing queue" % job_id)
-            except Exception as exc:
-                logger.error("Failed to remove job %s from exe queue: %s"
-                             % (job_id, exc))
-    elif cap_line.find('DONEQUEUEINFO') == 0:
-        details = linelist[1:]
-        if not details:
-            details.append('JOB_ID')
-        logger.info('--- DISPLAYING DONE QUEUE INFORMATION ---\n%s' %
-                    '\n'.join(done_queue.format_queue(details)))
-        done_queue.show_queue(details)
-    elif cap_line.find('DROPDONE') == 0:
-        logger.info('--- REMOVING JOBS FROM DONE QUEUE ---')
-        job_list = linelist[1:]
-        if not job_list:
-            logger.info('No jobs specified for removal')
-        for job_id in job_list:
-            try:
-                done_queue.dequeue_job_by_id(job_id)
-                logger.info("Removed job %s from done queue" % job_id)
-            except Exception as exc:
-                logger.error("Failed to remove job %s from exe queue: %s"
-                             % (job_id, exc))
-    elif cap_line.find('STARTTIMEOUTTHREAD') == 0:
-        logger.info('--- STARTING TIME OUT THREAD ---')
-        job_time_out_stop.clear()
-        job_time_out_thread = threading.Thread(target=time_out_jobs,
-                                               args=(job_time_out_stop, ))
-        job_time_out_thread.start()
-    elif cap_line.find('CHECKTIMEOUTTHREAD') == 0:
-        logger.info('--- CHECKING TIME OUT THREAD ---')
-        logger.info('--- TIME OUT THREAD IS ALIVE: %s ---'
-                    % job_time_out_thread.is_alive())
-    elif cap_line.find('RELOADCONFIG') == 0:
-        logger.info('--- RELOADING CONFIGURATION ---')
-        configuration.reload_config(True)
-    elif cap_line.find('SHUTDOWN') == 0:
-        logger.info('--- SAFE SHUTDOWN INITIATED ---')
-        print('--- SAFE SHUTDOWN INITIATED ---')
-        graceful_shutdown()
+def dispatch_command(strip_line, cap_line, linelist):
+    """Lookup the handler for the request in grid_script_commands and either
+    hand it to the command pool or run it directly with or without queue_lock
+    held.
+    """
+
+    (handler, concurrent) = (handle_unknown, False)
+    for (prefix, command_handler, command_concurrent) in grid_script_commands:
+        if cap_line.find(prefix) == 0:
+            (handler, concurrent) = (command_handler, command_concurrent)
+            break
+    if concurrent and command_pool.submit(handler, strip_line, cap_line,
+                                          linelist, block=False):
+        return
+    if concurrent is None:
+        handler(strip_line, cap_line, linelist)
+        return
+    with queue_lock:
+        handler(strip_line, cap_line, linelist)
+
+
+# Command dispatch table with (prefix, handler, concurrent) entries checked
+# in order. Concurrent handlers must be read-only and take queue_lock
+# themselves whereas the rest run serially with queue_lock held. The ones
+# with concurrent set to None run serially and take queue_lock themselves.
+
+grid_script_commands = [
+    ('USERJOBFILE ', handle_userjobfile, False),
+    ('SERVERJOBFILE ', handle_serverjobfile, False),
+    ('JOBSCHEDULE ', handle_jobschedule, False),
+    ('RESOURCEREQUEST ', handle_resourcerequest, False),
+    ('RESOURCEFINISHEDJOB ', handle_resourcefinishedjob, False),
+    ('RESTARTEXEFAILED', handle_restartexefailed, False),
+    ('JOBACTION', handle_jobaction, False),
+    ('JOBTIMEOUT', handle_jobtimeout, False),
+    ('JOBQUEUEINFO', handle_jobqueueinfo, True),
+    ('DROPQUEUED', handle_dropqueued, False),
+    ('EXECUTINGQUEUEINFO', handle_executingqueueinfo, True),
+    ('DROPEXECUTING', handle_dropexecuting, False),
+    ('DONEQUEUEINFO', handle_donequeueinfo, True),
+    ('DROPDONE', handle_dropdone, False),
+    ('STARTTIMEOUTTHREAD', handle_starttimeoutthread, False),
+    ('CHECKTIMEOUTTHREAD', handle_checktimeoutthread, False),
+    ('RELOADCONFIG', handle_reloadconfig, False),
+    ('SHUTDOWN', handle_shutdown, None)]
+
+# ## Main ###
+# register ctrl+c signal handler to shutdown system cleanly
+
+signal.signal(signal.SIGINT, clean_shutdown)
+
+# Allow e.g. logrotate to force log re-open after rotates
+signal.signal(signal.SIGHUP, hangup_handler)
+
+configuration = get_configuration_object()
+logger = configuration.logger
+
+if not configuration.site_enable_jobs:
+    err_msg = "Job support is disabled in configuration!"
+    logger.error(err_msg)
+    print(err_msg)
+    sys.exit(1)
+
+print("""
+Running main grid 'daemon'.
+
+Set the MIG_CONF environment to the server configuration path
+unless it is available in the default path
+mig/server/MiGserver.conf
+""")
+logger.info('Starting MiG server')
+
+# Load queues from file dump if available
+
+job_queue_path = os.path.join(configuration.mig_system_files,
+                              'job_queue.pickle')
+executing_queue_path = os.path.join(configuration.mig_system_files,
+                                    'executing_queue.pickle')
+schedule_cache_path = os.path.join(configuration.mig_system_files,
+                                   'schedule_cache.pickle')
+queue_journal_path = os.path.join(configuration.mig_system_files,
+                                  'queue_journal.log')
+queue_snapshot_path = os.path.join(configuration.mig_system_files,
+                                   'queue_snapshot.pickle')
+only_new_jobs = True
+(job_queue, executing_queue, schedule_cache) = (None, None, None)
+recovered = False
+
+# Prefer recovery from queue journal since it also survives crashes
+
+if configuration.journal_compact_after > 0:
+    queue_journal = QueueJournal(queue_journal_path, queue_snapshot_path,
+                                 logger, configuration.journal_compact_after)
+    job_queue = JobQueue(logger)
+    executing_queue = JobQueue(logger)
+    (recovered, journal_extras) = queue_journal.recover(
+        {'job_queue': job_queue, 'executing_queue': executing_queue})
+    if recovered:
+        logger.info('Recovered queues from journal')
+        schedule_cache = journal_extras.get('schedule_cache', None)
     else:
-        print('not understood: %s' % cap_line)
-        logger.error('not understood: %s' % cap_line)
-        time.sleep(1)
+        (job_queue, executing_queue) = (None, None)
+
+if not job_queue or not executing_queue:
+    job_queue = load_queue(job_queue_path, logger)
+    executing_queue = load_queue(executing_queue_path, logger)
+    if not job_queue or not executing_queue:
+        logger.warning('Could not load queues from previous run')
+        only_new_jobs = False
+        job_queue = JobQueue(logger)
+        executing_queue = JobQueue(logger)
+    else:
+        logger.info('Loaded queues from previous run')
+
+journaled_queues = {'job_queue': job_queue,
+                    'executing_queue': executing_queue}
+if queue_journal:
+    for (queue_name, journaled_queue) in journaled_queues.items():
+        queue_journal.attach(journaled_queue, queue_name)
+
+# Always use an empty done queue after restart
+
+done_queue = JobQueue(logger)
+
+if not schedule_cache:
+    schedule_cache = load_schedule_cache(schedule_cache_path, logger)
+if not schedule_cache:
+    logger.warning('Could not load schedule cache from previous run')
+else:
+    logger.info('Loaded schedule cache from previous run')
+
+logger.info('starting scheduler ' + configuration.sched_alg)
+if configuration.sched_alg == 'FirstFit':
+    from mig.server.firstfitscheduler import FirstFitScheduler
+    scheduler = FirstFitScheduler(logger, configuration)
+elif configuration.sched_alg == 'BestFit':
+    from mig.server.bestfitscheduler import BestFitScheduler
+    scheduler = BestFitScheduler(logger, configuration)
+elif configuration.sched_alg == 'FairFit':
+    from mig.server.fairfitscheduler import FairFitScheduler
+    scheduler = FairFitScheduler(logger, configuration)
+elif configuration.sched_alg == 'MaxThroughput':
+    from mig.server.maxthroughputscheduler import MaxThroughputScheduler
+    scheduler = MaxThroughputScheduler(logger, configuration)
+elif configuration.sched_alg == 'Random':
+    from mig.server.randomscheduler import RandomScheduler
+    scheduler = RandomScheduler(logger, configuration)
+elif configuration.sched_alg == 'FIFO':
+    from mig.server.fifoscheduler import FIFOScheduler
+    scheduler = FIFOScheduler(logger, configuration)
+else:
+    from mig.server.firstfitscheduler import FirstFitScheduler
+    print('Unknown sched_alg %s - using FirstFit scheduler'
+          % configuration.sched_alg)
+    scheduler = FirstFitScheduler(logger, configuration)
+
+scheduler.attach_job_queue(job_queue)
+scheduler.attach_done_queue(done_queue)
+if schedule_cache:
+    scheduler.set_cache(schedule_cache)
+
+# Queues from the legacy pickles are not covered by the journal until the
+# next snapshot so write one right away to avoid losing them in a crash.
+
+if queue_journal and not recovered:
+    queue_journal.compact(journaled_queues,
+                          {'schedule_cache': scheduler.get_cache()})
+
+# redirect grid_stdin to sys.stdin
+
+try:
+    if not os.path.exists(configuration.grid_stdin):
+        logger.info('creating grid_script input pipe %s'
+                    % configuration.grid_stdin)
+        try:
+            os.mkfifo(configuration.grid_stdin)
+        except Exception as err:
+            logger.error('Could not create missing grid_stdin fifo: '
+                         + '%s exception: %s '
+                         % (configuration.grid_stdin, err))
+    grid_stdin = open(configuration.grid_stdin, 'r')
+except Exception:
+    logger.error('failed to open grid_stdin! %s' % sys.exc_info()[0])
+    sys.exit(1)
+
+logger.info('cleaning pipe')
+clean_grid_stdin(grid_stdin)
+grid_stdin.close()
+
+# Read requests in a separate thread and run read-only ones in worker pool
+
+logger.info('starting grid_stdin reader and command pool')
+grid_stdin_reader = threading.Thread(target=read_grid_stdin,
+                                     args=(configuration.grid_stdin,
+                                           command_lines))
+grid_stdin_reader.daemon = True
+grid_stdin_reader.start()
+command_pool = WorkerPool('grid_script', command_workers, logger,
+                          max_queue=command_workers * 16)
+command_pool.start()
+
+# Make sure empty job home exists
+
+empty_home = os.path.join(configuration.user_home,
+                          configuration.empty_job_name)
+if not os.path.exists(empty_home):
+    logger.info('creating empty job home dir %s' % empty_home)
+    try:
+        os.mkdir(empty_home)
+    except Exception as exc:
+        logger.error('failed to create empty job home dir %s: %s'
+                     % (empty_home, exc))
+
+msg = 'Checking for mRSL files with status parse or queued'
+print(msg)
+logger.info(msg)
+check_mrsl_files(configuration, job_queue, executing_queue,
+                 only_new_jobs, logger)
+
+msg = 'Cleaning up after pending job requests'
+print(msg)
+remove_jobrequest_pending_files(configuration)
+
+# start the timer function to check if cputime is exceeded
+
+logger.info('starting time_out_jobs()')
+job_time_out_stop = threading.Event()
+job_time_out_thread = threading.Thread(target=time_out_jobs,
+                                       args=(job_time_out_stop, ))
+job_time_out_thread.start()
+
+msg = 'Starting main loop'
+print(msg)
+logger.info(msg)
+
+# main loop
+
+loop_counter = 0
+
+# print "%d" % executing_queue.queue_length()
+# print "%d" % job_queue.queue_length()
+# print "%d" % done_queue.queue_length()
+
+while True:
+
+    # Compact queue journal into snapshot once it grows big
+
+    if queue_journal and queue_journal.needs_compaction():
+        with queue_lock:
+            queue_journal.compact(journaled_queues,
+                                  {'schedule_cache': scheduler.get_cache()})
+
+    line = command_lines.get()
+    strip_line = line.strip()
+    cap_line = strip_line.upper()
+    linelist = strip_line.split(' ')
+    if strip_line == '':
+
+        # no reason to investigate content of line
+
+        continue
+
+    dispatch_command(strip_line, cap_line, linelist)
 
     # Experimental distributed server code
 
@@ -105,12 +105,13 @@ from mig.shared.griddaemons.sftp import default_username_validator, \
 from mig.shared.logger import daemon_logger, daemon_gdp_logger, \
     register_hangup_handler
 from mig.shared.notification import send_system_notification
-from mig.shared.pwcrypto import make_simple_hash
+from mig.shared.pwcrypto import make_simple_hash, make_creds_cache
 from mig.shared.useradm import check_password_hash
 from mig.shared.validstring import possible_user_id, possible_gdp_user_id, \
     possible_job_id, possible_sharelink_id, possible_jupyter_mount_id
 from mig.shared.vgrid import in_vgrid_share
 from mig.shared.vgridaccess import is_vgrid_parent_placeholder
+from mig.shared.workerpool import WorkerPool
 from mig.shared.workflows import add_workflow_job_history_entry
 
 configuration, logger = None, None
@@ -1755,6 +1756,75 @@ def accept_client(client, addr, root_dir, host_rsa_key, conf={}):
             logger.info(msg)
 
 
+def admit_connection(conf, client_address):
+    """Register a new connection from client_address unless it would exceed
+    the limit on concurrent connections from a single address.
+    Returns a boolean indicating if the connection was admitted.
+    """
+    max_connections = conf['max_address_connections']
+    with conf['conn_lock']:
+        count = conf['conn_counts'].get(client_address, 0)
+        if 0 <= max_connections <= count:
+            return False
+        conf['conn_counts'][client_address] = count + 1
+    return True
+
+
+def release_connection(conf, client_address):
+    """Unregister a connection from client_address"""
+    with conf['conn_lock']:
+        count = conf['conn_counts'].get(client_address, 1) - 1
+        if count > 0:
+            conf['conn_counts'][client_address] = count
+        else:
+            conf['conn_counts'].pop(client_address, None)
+
+
+def handle_client(client, addr, conf):
+    """Handle a queued client connection in a pool worker and release the
+    connection slot when done.
+    """
+    try:
+        if conf['stop_running'].is_set():
+            client.close()
+            return
+        accept_client(client, addr, conf['root_dir'], conf['host_rsa_key'],
+                      conf)
+    finally:
+        release_connection(conf, addr[0])
+
+
+def active_connections(conf):
+    """Return the number of currently registered connections"""
+    with conf['conn_lock']:
+        return sum(conf['conn_counts'].values())
+
+
+def maintenance_loop(configuration, pool, min_expire_delay=300):
+    """Expire rate limits and log connection stats in the background to keep
+    it off the accept path. The pool is None if running without worker limit.
+    """
+    daemon_conf = configuration.daemon_conf
+    while not daemon_conf['stop_running'].wait(min_expire_delay):
+        try:
+            expire_rate_limit(configuration, "sftp",
+                              expire_delay=min_expire_delay)
+        except Exception as err:
+            logger.error('rate limit expire failed: %s' % err)
+        daemon_conf['hash_cache'].purge_expired()
+        logger.info('password hash cache: %s' %
+                    daemon_conf['hash_cache'].format_stats())
+        with daemon_conf['conn_lock']:
+            connections = sum(daemon_conf['conn_counts'].values())
+            addresses = len(daemon_conf['conn_counts'])
+        if pool is None:
+            pool_stats = 'no worker limit'
+        else:
+            pool_stats = pool.format_stats()
+        logger.info('%d connections from %d addresses - %s' %
+                    (connections, addresses, pool_stats))
+
+
 def start_service(configuration):
     """Service daemon"""
     daemon_conf = configuration.daemon_conf
@@ -1767,7 +1837,7 @@ def start_service(configuration):
         # Allow reuse of socket to avoid TCP time outs
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server_socket.bind((daemon_conf['address'], daemon_conf['port']))
-        server_socket.listen(10)
+        server_socket.listen(daemon_conf['listen_backlog'])
     except Exception as err:
         err_msg = 'Could not open socket: %s' % err
         logger.error(err_msg)
@@ -1779,8 +1849,20 @@ def start_service(configuration):
     logger.info("accept connections: window_size %d / max_packet_size %d" %
                 (window_size, max_packet_size))
 
-    min_expire_delay = 300
-    last_expire = time.time()
+    # NOTE: each session occupies a worker for its lifetime and excess
+    #       connections wait in the bounded queue until one is free.
+    #       A non-positive number of workers disables the limit and gives
+    #       every session its own thread like before.
+    pool = None
+    if daemon_conf['workers'] > 0:
+        pool = WorkerPool('sftp', daemon_conf['workers'], logger,
+                          max_queue=daemon_conf['queue_size'])
+        pool.start()
+    daemon_conf['conn_pool'] = pool
+    maintenance = threading.Thread(target=maintenance_loop,
+                                   args=(configuration, pool))
+    maintenance.daemon = True
+    maintenance.start()
     while True:
         client_tuple = None
         try:
@@ -1799,17 +1881,28 @@ def start_service(configuration):
             logger.warning('ignoring failed client connection for %s: %s' %
                            (client_tuple, err))
             continue
-        logger.info("Handling new session from %s %s (%d active sessions)" %
-                    (client, addr, threading.active_count()))
-        worker = threading.Thread(target=accept_client,
-                                  args=[client, addr, daemon_conf['root_dir'],
-                                        daemon_conf['host_rsa_key'],
-                                        daemon_conf])
-        worker.start()
-        if last_expire + min_expire_delay < time.time():
-            last_expire = time.time()
-            expire_rate_limit(configuration, "sftp",
-                              expire_delay=min_expire_delay)
+        if not admit_connection(daemon_conf, addr[0]):
+            logger.warning('refusing connection from %s: too many '
+                           'concurrent connections from address' % (addr, ))
+            client.close()
+            continue
+        if pool is None:
+            logger.info("Handling new session from %s %s (%d active)" %
+                        (client, addr, active_connections(daemon_conf)))
+            worker = threading.Thread(target=handle_client,
+                                      args=[client, addr, daemon_conf])
+            worker.start()
+            continue
+        stats = pool.get_stats()
+        logger.info("Handling new session from %s %s (%d active, %d queued)"
+                    % (client, addr, stats['active'], stats['queued']))
+        if not pool.submit(handle_client, client, addr, daemon_conf,
+                           block=False):
+            release_connection(daemon_conf, addr[0])
+            logger.warning('refusing connection from %s: all %d workers busy '
+                           'and %d queued' % (addr, pool.workers,
+                                              pool.max_queue))
+            client.close()
 
 
 if __name__ == "__main__":
@@ -1946,13 +2039,21 @@ i4HdbgS6M21GvqIfhN2NncJ00aJukr5L29JrKFgSCPP9BDRb9Jgy0gu1duhTv0C0
         'shares': [],
         'jupyter_mounts': [],
         'login_map': {},
-        'hash_cache': {},
+        'hash_cache': make_creds_cache(),
         'time_stamp': 0,
         'logger': logger,
         'auth_timeout': 60,
         'stop_running': threading.Event(),
         'window_size': configuration.user_sftp_window_size,
         'max_packet_size': configuration.user_sftp_max_packet_size,
+        'workers': configuration.user_sftp_workers,
+        'queue_size': configuration.user_sftp_queue_size,
+        'listen_backlog': configuration.user_sftp_listen_backlog,
+        'max_address_connections':
+        configuration.user_sftp_max_address_connections,
+        # Lock needed here due to threaded connection accounting
+        'conn_lock': threading.Lock(),
+        'conn_counts': {},
         # TODO: Add the following to configuration:
         # max_sftp_user_hits
         # max_sftp_user_abuse_hits
@@ -1982,13 +2083,21 @@ i4HdbgS6M21GvqIfhN2NncJ00aJukr5L29JrKFgSCPP9BDRb9Jgy0gu1duhTv0C0
         logger.info(info_msg)
         print(info_msg)
         configuration.daemon_conf['stop_running'].set()
-    active = threading.active_count() - 1
-    while active > 0:
-        info_msg = "Waiting for %d worker threads to finish" % active
+    pool = configuration.daemon_conf.get('conn_pool', None)
+    if pool is not None:
+        info_msg = "Waiting for %d active sessions to finish" % \
+            pool.get_stats()['active']
         logger.info(info_msg)
         print(info_msg)
-        time.sleep(1)
-        active = threading.active_count() - 1
+        pool.shutdown(wait=True)
+    else:
+        active = active_connections(configuration.daemon_conf)
+        while active > 0:
+            info_msg = "Waiting for %d worker threads to finish" % active
+            logger.info(info_msg)
+            print(info_msg)
+            time.sleep(1)
+            active = active_connections(configuration.daemon_conf)
     info_msg = "Leaving with no more workers active"
     logger.info(info_msg)
     print(info_msg)
@@ -30,23 +30,39 @@
 users.
 
 Requires rsync and lftp binaries to take care of the actual transfers.
+
+Changes to the saved transfers are picked up with inotify through the watchdog
+module if available and otherwise by periodically scanning for modified files.
+The number of concurrently running transfers is capped in total and per user
+and transfers beyond the caps are queued and started in a round-robin fashion
+across users as workers finish. Finished workers are reaped as soon as they
+exit thanks to a SIGCHLD wake up of the main loop.
 """
 
 from __future__ import print_function
 from __future__ import absolute_import
 
 from builtins import zip
+from collections import OrderedDict
 import datetime
+import fcntl
 import glob
 import logging
 import logging.handlers
 import multiprocessing
 import os
+import select
 import signal
 import sys
+import threading
 import time
 import traceback
 
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
 from mig.shared.base import client_dir_id, client_id_dir, force_native_str
 from mig.shared.conf import get_configuration_object
 from mig.shared.defaults import datatransfers_filename, transfers_log_size, \
@@ -71,6 +87,17 @@ sub_pid_map = None
 stop_running = multiprocessing.Event()
 (configuration, logger, last_update) = (None, None, 0)
 
+# Transfer IDs waiting for a free worker in FIFO order for each user
+pending_transfers = OrderedDict()
+# Users with transfers files changed since last refresh
+changed_clients = set()
+changed_lock = threading.Lock()
+# Self-pipe for waking up the main loop from signal handlers and threads
+wakeup_pipe = None
+# Full scan interval with and without the inotify change feed
+watch_scan_secs = 600
+poll_scan_secs = 30
+
 # Tune default lftp buffer size - the built-in size is 32k, but a 128k buffer
 # was experimentally determined to provide significantly better throughput on
 # fast networks:
@@ -94,6 +121,81 @@ def stop_handler(signal, frame):
     # Print blank line to avoid mix with Ctrl-C line
     print('')
     stop_running.set()
+    wake_up()
+
+
+def wake_up():
+    """Wake up the main loop. Safe to call from signal handlers and threads
+    as it just writes a byte to the non-blocking wakeup pipe.
+    """
+    if wakeup_pipe is None:
+        return
+    try:
+        os.write(wakeup_pipe[1], b'x')
+    except OSError:
+        # Pipe is full so a wake up is pending anyway
+        pass
+
+
+def child_handler(signal, frame):
+    """Signal handler to wake up main loop for reaping when a worker exits"""
+    wake_up()
+
+
+def init_wakeup_pipe():
+    """Create the non-blocking wakeup pipe"""
+    global wakeup_pipe
+    wakeup_pipe = os.pipe()
+    for pipe_fd in wakeup_pipe:
+        flags = fcntl.fcntl(pipe_fd, fcntl.F_GETFL)
+        fcntl.fcntl(pipe_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def wait_for_wakeup(timeout):
+    """Sleep until woken up or timeout seconds passed"""
+    try:
+        (ready, _, _) = select.select([wakeup_pipe[0]], [], [], timeout)
+    except (select.error, OSError):
+        # Interrupted by a signal on python2
+        return
+    if ready:
+        try:
+            while os.read(wakeup_pipe[0], 4096):
+                pass
+        except OSError:
+            pass
+
+
+def mark_changed(client_id):
+    """Mark transfers of client_id for refresh and wake up main loop"""
+    with changed_lock:
+        changed_clients.add(client_id)
+    wake_up()
+
+
+def pop_changed_clients():
+    """Return and reset the list of users with changed transfers"""
+    with changed_lock:
+        client_ids = list(changed_clients)
+        changed_clients.clear()
+    return client_ids
+
+
+class TransfersChangeHandler(object):
+
+    """Minimal watchdog event handler marking users changed when their saved
+    data transfers file is created, modified, moved or deleted.
+    """
+
+    def dispatch(self, event):
+        """Handle any file event on the watched user_settings tree"""
+
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and os.path.basename(path) == datatransfers_filename:
+                client_dir = os.path.basename(os.path.dirname(path))
+                mark_changed(client_dir_id(client_dir))
 
 
 def __transfer_log(configuration, client_id, msg, level='info'):
@@ -713,6 +815,9 @@ def wrap_run_transfer(configuration, client_id, transfer_dict):
     caught and logged. Updates state, calls the run_transfer function on input
     and finally updates state again afterwards.
     """
+    # NOTE: the inherited parent SIGCHLD handler must not interfere here
+    if hasattr(signal, 'SIGCHLD'):
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
     transfer_id = transfer_dict['transfer_id']
     transfer_dict['status'] = "ACTIVE"
     transfer_dict['exit_code'] = -1
@@ -813,33 +918,139 @@ def handle_transfer(configuration, client_id, transfer_dict):
                         transfer_dict['fqdn'], exc))
 
 
-def manage_transfers(configuration):
-    """Manage all updates of saved user data transfer requests"""
-
-    logger.debug('manage transfers')
-    old_transfers = {}
-    src_pattern = os.path.join(configuration.user_settings, '*',
-                               datatransfers_filename)
-    for transfers_path in glob.glob(src_pattern):
-        if os.path.getmtime(transfers_path) < last_update:
-            # logger.debug('skip transfer update for unchanged path: %s' % \
-            #              transfers_path)
+def refresh_transfers(configuration, client_id):
+    """Reload the saved transfers of client_id"""
+    logger.debug('loading transfers for: %s' % client_id)
+    (load_status, transfers) = load_data_transfers(configuration, client_id)
+    if not load_status:
+        logger.error('could not load transfers for %s: %s' % (client_id,
+                                                              transfers))
+        return False
+    if transfers:
+        all_transfers[client_id] = transfers
+    else:
+        all_transfers.pop(client_id, None)
+    return True
+
+
+def queue_transfer(configuration, client_id, transfer_id):
+    """Queue transfer_id of client_id for start once a worker is available"""
+    user_queue = pending_transfers.get(client_id, [])
+    if transfer_id in user_queue:
+        return False
+    user_queue.append(transfer_id)
+    pending_transfers[client_id] = user_queue
+    return True
+
+
+def running_transfers(configuration):
+    """Returns total and per-user number of running transfer workers"""
+    user_running = {}
+    total = 0
+    for (client_id, _, worker) in all_worker_transfers(configuration,
+                                                       all_workers):
+        if not worker:
             continue
-        logger.debug('handling update of transfers file: %s' % transfers_path)
-        abs_client_dir = os.path.dirname(transfers_path)
-        client_dir = os.path.basename(abs_client_dir)
-        logger.debug('extracted client dir: %s' % client_dir)
-        client_id = client_dir_id(client_dir)
-        logger.debug('loading transfers for: %s' % client_id)
-        (load_status, transfers) = load_data_transfers(configuration,
-                                                       client_id)
-        if not load_status:
-            logger.error('could not load transfer for path: %s' %
-                         transfers_path)
+        user_running[client_id] = user_running.get(client_id, 0) + 1
+        total += 1
+    return (total, user_running)
+
+
+def start_pending_transfers(configuration):
+    """Start queued transfers as long as the total and per-user caps allow.
+    Users take turns starting one transfer at a time for fairness. Returns
+    the number of started transfers.
+    """
+    max_workers = configuration.site_transfers_max_workers
+    max_user_workers = configuration.site_transfers_max_user_workers
+    (total, user_running) = running_transfers(configuration)
+    started = 0
+    progress = True
+    while pending_transfers and progress:
+        progress = False
+        for client_id in list(pending_transfers):
+            if max_workers > 0 and total >= max_workers:
+                return started
+            if max_user_workers > 0 and \
+                    user_running.get(client_id, 0) >= max_user_workers:
+                continue
+            user_queue = pending_transfers.pop(client_id)
+            transfer_id = user_queue.pop(0)
+            if user_queue:
+                # NOTE: re-insert at the end to let the other users go first
+                pending_transfers[client_id] = user_queue
+            progress = True
+            transfer_dict = all_transfers.get(client_id, {}).get(transfer_id,
+                                                                 None)
+            if not transfer_dict or transfer_dict['status'] in \
+                    ("DONE", "FAILED", "PAUSED"):
+                logger.debug('skip dropped or stopped transfer %s' %
+                             transfer_id)
+                continue
+            if get_worker_transfer(configuration, all_workers, client_id,
+                                   transfer_id):
+                continue
+            logger.info('handle %(status)s transfer %(transfer_id)s' %
+                        transfer_dict)
+            handle_transfer(configuration, client_id, transfer_dict)
+            user_running[client_id] = user_running.get(client_id, 0) + 1
+            total += 1
+            started += 1
+    if pending_transfers:
+        logger.debug('%d user(s) with transfers waiting for a free worker' %
+                     len(pending_transfers))
+    return started
+
+
+def reap_workers(configuration):
+    """Clean up all finished workers without blocking and mark the owners for
+    transfers refresh to pick up the final status. Returns the number of
+    reaped workers.
+    """
+    reaped = 0
+    for (client_id, transfer_id, worker) in \
+            all_worker_transfers(configuration, all_workers):
+        # NOTE: is_alive does a non-blocking waitpid on the worker
+        if not worker or worker.is_alive():
             continue
+        logger.info('Removing finished %s %s with pid %d' %
+                    (client_id, transfer_id, worker.pid))
+        clean_transfer(configuration, client_id, transfer_id)
+        with changed_lock:
+            changed_clients.add(client_id)
+        reaped += 1
+    return reaped
+
+
+def manage_transfers(configuration, client_ids=[], full_scan=True):
+    """Manage all updates of saved user data transfer requests. Reloads the
+    transfers of client_ids and with full_scan also those of any user with a
+    transfers file modified since the last full scan. Then queues all
+    transfers ready to run for start.
+    """
+    global last_update
 
-        old_transfers[client_id] = all_transfers.get(client_id, {})
-        all_transfers[client_id] = transfers
+    logger.debug('manage transfers')
+    refresh_ids = set(client_ids)
+    if full_scan:
+        scan_start = time.time()
+        src_pattern = os.path.join(configuration.user_settings, '*',
+                                   datatransfers_filename)
+        for transfers_path in glob.glob(src_pattern):
+            try:
+                if os.path.getmtime(transfers_path) < last_update:
+                    continue
+            except OSError:
+                # Removed in the mean time
+                pass
+            logger.debug('handling update of transfers file: %s' %
+                         transfers_path)
+            client_dir = os.path.basename(os.path.dirname(transfers_path))
+            refresh_ids.add(client_dir_id(client_dir))
+        # NOTE: allow for coarse mtime resolution
+        last_update = scan_start - 2
+    for client_id in refresh_ids:
+        refresh_transfers(configuration, client_id)
 
     for (client_id, transfers) in all_transfers.items():
         for (transfer_id, transfer_dict) in transfers.items():
@@ -849,18 +1060,17 @@ def manage_transfers(configuration):
                 # logger.debug('skip %(status)s transfer %(transfer_id)s' % \
                 #             transfer_dict)
                 continue
+            if get_worker_transfer(configuration, all_workers, client_id,
+                                   transfer_id):
+                logger.debug('wait for transfer %(transfer_id)s' %
+                             transfer_dict)
+                continue
             if transfer_status in ("ACTIVE", ):
-                if get_worker_transfer(configuration, all_workers, client_id,
-                                       transfer_id):
-                    logger.debug('wait for transfer %(transfer_id)s' %
-                                 transfer_dict)
-                    continue
-                else:
-                    logger.info('restart transfer %(transfer_id)s' %
-                                transfer_dict)
-            logger.info('handle %(status)s transfer %(transfer_id)s' %
-                        transfer_dict)
-            handle_transfer(configuration, client_id, transfer_dict)
+                logger.info('restart transfer %(transfer_id)s' %
+                            transfer_dict)
+            if queue_transfer(configuration, client_id, transfer_id):
+                logger.debug('queued %(status)s transfer %(transfer_id)s' %
+                             transfer_dict)
 
 
 if __name__ == '__main__':
@@ -914,32 +1124,47 @@ unless it is available in mig/server/MiGserver.conf
     # Ignore bogus "Instance of 'SyncManager' has no 'dict' member (no-member)"
     sub_pid_map = transfer_manager.dict()  # pylint: disable=no-member
 
+    # Wake up main loop on worker exit and transfers file changes
+    init_wakeup_pipe()
+    signal.signal(signal.SIGCHLD, child_handler)
+    transfers_observer = None
+    scan_secs = poll_scan_secs
+    if Observer is None:
+        logger.warning('watchdog not available - poll for transfer changes')
+    else:
+        try:
+            transfers_observer = Observer()
+            transfers_observer.schedule(TransfersChangeHandler(),
+                                        configuration.user_settings,
+                                        recursive=True)
+            transfers_observer.start()
+            scan_secs = watch_scan_secs
+        except Exception as exc:
+            logger.warning('could not watch transfer changes - poll: %s' %
+                           exc)
+            transfers_observer = None
+    logger.info('rescan for transfer changes every %ds' % scan_secs)
+
+    last_scan = 0
     while not stop_running.is_set():
         try:
-            manage_transfers(configuration)
+            reap_workers(configuration)
+            full_scan = (time.time() - last_scan >= scan_secs)
+            if full_scan:
+                last_scan = time.time()
+            manage_transfers(configuration, pop_changed_clients(), full_scan)
+            start_pending_transfers(configuration)
 
-            for (client_id, transfer_id, worker) in \
-                    all_worker_transfers(configuration, all_workers):
-                if not worker:
-                    continue
-                logger.debug('Checking if %s %s with pid %d is finished' %
-                             (client_id, transfer_id, worker.pid))
-                worker.join(1)
-                if worker.is_alive():
-                    logger.debug('Worker for %s %s running with pid %d' %
-                                 (client_id, transfer_id, worker.pid))
-                else:
-                    logger.info('Removing finished %s %s with pid %d' %
-                                (client_id, transfer_id, worker.pid))
-                    clean_transfer(configuration, client_id, transfer_id)
-
-            # Throttle down
-
-            time.sleep(30)
+            # Sleep until something happens or next full scan
+
+            wait_for_wakeup(max(1, last_scan + scan_secs - time.time()))
         except Exception as exc:
             print('Caught unexpected exception: %s' % exc)
             time.sleep(10)
 
+    if transfers_observer is not None:
+        transfers_observer.stop()
+
     print('Cleaning up active transfers')
     logger.info('Cleaning up workers to prepare for exit')
     for (client_id, transfer_id, worker) in \
@@ -87,7 +87,7 @@ from mig.shared.logger import daemon_logger, daemon_gdp_logger, \
     register_hangup_handler
 from mig.shared.notification import send_system_notification
 from mig.shared.pwcrypto import make_scramble, unscramble_digest, \
-    make_simple_hash, valid_login_password
+    make_simple_hash, valid_login_password, make_creds_cache
 from mig.shared.sslsession import ssl_session_token
 from mig.shared.tlsserver import hardened_ssl_context
 from mig.shared.useradm import check_password_hash, generate_password_hash, \
@@ -746,12 +746,12 @@ class MiGWsgiDAVDomainController(WsgiDAVDomainController):
         self.user_map = self.userMap = userMap
         self.last_expire = time.time()
         self.min_expire_delay = 300
-        self.hash_cache = {}
+        self.hash_cache = make_creds_cache()
         self.digest_cache = {}
 
     def _expire_caches(self):
         """Expire old entries in the hash and digest caches"""
-        self.hash_cache.clear()
+        self.hash_cache.purge_expired()
         self.digest_cache.clear()
         # logger.debug("Expired hash and digest caches")
 
@@ -120,8 +120,8 @@ from mig.shared.griddaemons.davs import get_fs_path, acceptable_chmod, \
 from mig.shared.logger import daemon_logger, daemon_gdp_logger, \
     register_hangup_handler
 from mig.shared.notification import send_system_notification
-from mig.shared.pwcrypto import make_scramble, unscramble_digest, \
-    make_simple_hash, valid_login_password
+from mig.shared.pwcrypto import make_creds_cache, make_scramble, \
+    unscramble_digest, make_simple_hash, valid_login_password
 from mig.shared.sslsession import ssl_session_token
 from mig.shared.tlsserver import hardened_ssl_context
 from mig.shared.useradm import check_password_hash, generate_password_hash, \
@@ -556,33 +556,18 @@ class MiGDomainController(SimpleDomainController):
         if flush:
             logger.debug("flushing password hash and digest caches")
             self.config['mig_dc']['hash_cache'].clear()
-            self.config['mig_dc']['hash_cache_age'].clear()
             self.config['mig_dc']['digest_cache'].clear()
             self.config['mig_dc']['digest_cache_age'].clear()
         else:
             logger.debug("expire stale entries in hash and digest caches")
 
-            # Expire password hashes after N expire runs
+            # Password hashes expire on their own in the bounded cache
             # logger.debug("expire hash caches")
-            expired = 0
-            for cache_id in list(self.config['mig_dc']['hash_cache']):
-                if self.config['mig_dc']['hash_cache_age'].get(cache_id, -1) > \
-                        max_cache_age:
-                    # logger.debug("expire aging hash cache entry for %s" %
-                    #             cache_id)
-                    del self.config['mig_dc']['hash_cache'][cache_id]
-                    expired += 1
-                    if self.config['mig_dc']['hash_cache_age'].get(cache_id,
-                                                                   False):
-                        del self.config['mig_dc']['hash_cache_age'][cache_id]
+            hash_cache = self.config['mig_dc']['hash_cache']
+            expired = hash_cache.purge_expired()
             logger.debug("expired %d hash cache entries (%d left)" %
-                         (expired, len(self.config['mig_dc']['hash_cache'])))
-
-            # Update age counters with lazy init
-            for cache_id in list(self.config['mig_dc']['hash_cache']):
-                cache_age = self.config['mig_dc']['hash_cache_age'].get(
-                    cache_id, 0)
-                self.config['mig_dc']['hash_cache_age'][cache_id] = cache_age + 1
+                         (expired, len(hash_cache)))
+            logger.info("password hash cache: %s" % hash_cache.format_stats())
 
             # Expire digests after N expire runs and for inactive sessions
             # logger.debug("expire digest caches")
@@ -697,8 +682,8 @@ class MiGDomainController(SimpleDomainController):
         else:
             authtype = 'password'
             # Lazy hash cache init - used for saving repeated hash calculation
-            hash_cache = self.config['mig_dc'].get('hash_cache', {})
-            self.config['mig_dc']['hash_cache'] = hash_cache
+            if 'hash_cache' not in self.config['mig_dc']:
+                self.config['mig_dc']['hash_cache'] = make_creds_cache()
 
         # For e.g. GDP we require all logins to match active 2FA session IP,
         # but otherwise user may freely switch net during 2FA lifetime.
@@ -1857,8 +1842,7 @@ def run(configuration):
             "root_dir": daemon_conf["root_dir"],
             "last_expire": time.time(),
             "min_expire_delay": 300,
-            "hash_cache": {},
-            "hash_cache_age": {},
+            "hash_cache": make_creds_cache(),
             "digest_cache": {},
             "digest_cache_age": {},
         },
@@ -30,6 +30,9 @@ from __future__ import print_function
 
 
 from builtins import object
+from bisect import bisect_left
+
+
 def format_job(job_dict, detail=['JOB_ID']):
 
     # Keyword all shows all values
@@ -54,24 +57,137 @@ def print_job(job_dict, detail=['JOB_ID']):
 
 class JobQueue(object):
 
-    """Simple job queue implemantation using a list"""
+    """Job queue implementation using a list for ordering with hash indexes
+    on JOB_ID, USER_CERT and UNIQUE_RESOURCE_NAME for fast lookups.
+
+    The positional API (get_job/dequeue_job with index) is kept as schedulers
+    iterate the queue by index. Lookups, duplicate checks and removal by job
+    ID use the JOB_ID index instead of scanning the entire queue, and the
+    queue position of a job is found by bisecting a parallel list of
+    increasing sequence numbers. Dequeue from the front only advances a head
+    offset into the lists, which are compacted once the dead part dominates.
+    Only the queue list and logger are pickled so that queues saved with
+    save_queue remain loadable both with and without the indexes.
+    An optional QueueJournal can be attached to record all changes and an
+    optional FeasibilityIndex to follow the queued jobs.
+    """
 
-    # TODO: change to better data structure - perhaps circular buffer
-    # or real linked list.
-    # -Must support ability to inspect a job without dequeueing it
-    # -Must support virtually unlimited queue length
-    # Built-in Queue class does *not* support inspection!
-
-    queue = None
     logger = None
+    journal = None
+    journal_name = None
+    feasibility = None
 
     def __init__(self, logger):
         """Init"""
 
-        self.queue = []
+        self._jobs = []
+        self._head = 0
         self.logger = logger
+        self._init_indexes()
         self.logger.info('initialised queue')
 
+    def _get_queue(self):
+        """List of queued jobs in order. Must be treated as read-only."""
+
+        if self._head:
+            self._compact()
+        return self._jobs
+
+    def _set_queue(self, queue):
+        """Replace queue list - indexes must be rebuilt afterwards"""
+
+        self._jobs = queue
+        self._head = 0
+
+    queue = property(_get_queue, _set_queue)
+
+    def _compact(self):
+        """Drop the dequeued entries before the head offset"""
+
+        del self._jobs[:self._head]
+        del self._order[:self._head]
+        self._head = 0
+
+    def _init_indexes(self):
+        """(Re)build the lookup indexes from the current queue list"""
+
+        if self._head:
+            del self._jobs[:self._head]
+            self._head = 0
+        self.id_index = {}
+        self.owner_index = {}
+        self.resource_index = {}
+        self._index_keys = {}
+        # NOTE: _order holds a strictly increasing sequence number for each
+        #       job in queue so that the position of a job can be found with
+        #       bisect rather than a scan through the queue.
+        self._order = []
+        self._next_order = 0
+        for job in self._jobs:
+            self._order.append(self._next_order)
+            self._add_index(job, self._next_order)
+            self._next_order += 1
+
+    def _add_index(self, job, order):
+        """Register job in all lookup indexes"""
+
+        job_id = job['JOB_ID']
+        owner = job.get('USER_CERT', None)
+        resource = job.get('UNIQUE_RESOURCE_NAME', None)
+        self.id_index[job_id] = job
+        # NOTE: remember keys as job dicts may be modified while queued
+        self._index_keys[job_id] = (order, owner, resource)
+        if owner is not None:
+            self.owner_index.setdefault(owner, {})[job_id] = job
+        if resource is not None:
+            self.resource_index.setdefault(resource, {})[job_id] = job
+
+    def _remove_index(self, job):
+        """Remove job from all lookup indexes"""
+
+        job_id = job['JOB_ID']
+        self.id_index.pop(job_id, None)
+        (_, owner, resource) = self._index_keys.pop(job_id,
+                                                    (None, None, None))
+        for (index, key) in [(self.owner_index, owner),
+                             (self.resource_index, resource)]:
+            if key is None or key not in index:
+                continue
+            index[key].pop(job_id, None)
+            if not index[key]:
+                del index[key]
+
+    def _find_index(self, jobid):
+        """Find the position of job with jobid in queue list"""
+
+        if jobid not in self._index_keys:
+            return -1
+        order = self._index_keys[jobid][0]
+        index = bisect_left(self._order, order, self._head)
+        if index < len(self._order) and self._order[index] == order:
+            return index - self._head
+        return -1
+
+    def attach_feasibility(self, feasibility):
+        """Let feasibility index follow the jobs in this queue from now on"""
+
+        feasibility.sync_jobs(self.queue)
+        self.feasibility = feasibility
+
+    def __getstate__(self):
+        """Only pickle the actual queue and logger - not the indexes"""
+
+        return {'queue': self.queue, 'logger': self.logger}
+
+    def __setstate__(self, state):
+        """Restore pickled queue and rebuild indexes. Works for pickles from
+        both this and the older index-less version.
+        """
+
+        self.logger = state.get('logger', None)
+        self._set_queue(state.get('queue', None) or [])
+        self._init_indexes()
+
     def format_queue(self, detail=['JOB_ID']):
         """Format queue contents for printing"""
 
@@ -92,7 +208,7 @@ class JobQueue(object):
     def queue_length(self):
         """Count number of jobs in queue"""
 
-        return len(self.queue)
+        return len(self._jobs) - self._head
 
     def enqueue_job(self, job, index):
         """Insert job at index in queue list"""
@@ -102,18 +218,28 @@ class JobQueue(object):
             # check if a job with that job_id is in the queue to avoid multiple occurences
 
             try:
-                for queue_job in self.queue:
-                    if queue_job['JOB_ID'] == job['JOB_ID']:
-                        self.logger.error('enqueue_job called with a job already in the queue! Skipping enqueue_job for job_id %s!'
-                                          % job['JOB_ID'])
-                        return False
+                if job['JOB_ID'] in self.id_index:
+                    self.logger.error('enqueue_job called with a job already in the queue! Skipping enqueue_job for job_id %s!'
+                                      % job['JOB_ID'])
+                    return False
             except Exception as exc:
                 self.logger.error('enqueue_job exception when checking if specified job already is in the queue: %s'
                                   % exc)
+                return False
 
-            # job must be wrapped
-
-            self.queue[index:index] = [job]
+            if index == self.queue_length():
+                self._jobs.append(job)
+                self._order.append(self._next_order)
+                self._add_index(job, self._next_order)
+                self._next_order += 1
+            else:
+                # Rare insert inside queue - renumber to keep order sorted
+                self._jobs.insert(self._head + index, job)
+                self._init_indexes()
+            if self.journal:
+                self.journal.log_enqueue(self.journal_name, job, index)
+            if self.feasibility is not None:
+                self.feasibility.add_job(job)
 
             # self.logger.info("NEW JOB! after enqueue len is %d", self.queue_length())
 
@@ -128,7 +254,7 @@ class JobQueue(object):
 
         job = None
         if self.queue_length() > index:
-            job = self.queue[index]
+            job = self._jobs[self._head + index]
         else:
             self.logger.error("get_job: Failed to get job - index %d \
             out of range! (qlen %d)", index, self.queue_length())
@@ -139,10 +265,7 @@ class JobQueue(object):
 
         job = None
         if self.queue_length() > 0:
-            for j in self.queue:
-                if j['JOB_ID'] == jobid:
-                    job = j
-                    break
+            job = self.id_index.get(jobid, None)
         elif log_errors:
             self.logger.error('get_job_by_id: Queue empty.')
 
@@ -151,13 +274,76 @@ class JobQueue(object):
                               % jobid)
         return job
 
+    def update_job(self, jobid, changes):
+        """Apply changes to the job with jobid in place and return the
+        job or None if not found.
+        """
+
+        job = self.id_index.get(jobid, None)
+        if job is None:
+            self.logger.error('update_job: Failed to get job - jobid: %s '
+                              % jobid)
+            return None
+        job.update(changes)
+        if self.journal:
+            self.journal.log_update(self.journal_name, jobid, changes)
+        return job
+
+    def update_jobs(self, job_changes):
+        """Apply the changes in job_changes values to the job with each job
+        ID key in place. Any journal gets a single record for all of them.
+        Returns the number of jobs found and updated.
+        """
+
+        found = {}
+        for (jobid, changes) in job_changes.items():
+            job = self.id_index.get(jobid, None)
+            if job is None:
+                self.logger.error('update_jobs: Failed to get job - jobid: '
+                                  '%s ' % jobid)
+                continue
+            job.update(changes)
+            found[jobid] = changes
+        if self.journal and found:
+            self.journal.log_updates(self.journal_name, found)
+        return len(found)
+
+    def get_jobs_by_owner(self, client_id):
+        """Find and return list of jobs owned by client_id in no particular
+        order.
+        """
+
+        return list(self.owner_index.get(client_id, {}).values())
+
+    def get_jobs_by_resource(self, unique_resource_name):
+        """Find and return list of jobs assigned to unique_resource_name in
+        no particular order.
+        """
+
+        return list(self.resource_index.get(unique_resource_name,
+                                            {}).values())
+
     def dequeue_job(self, index):
         """Dequeue and return job found at index in queue list"""
 
         job = None
         if self.queue_length() > index:
-            job = self.queue[index]
-            self.queue[index:index + 1] = []
+            if index == 0:
+                # NOTE: common dequeue from front just advances head and
+                #       compacts once at least half the lists are dead
+                job = self._jobs[self._head]
+                self._jobs[self._head] = None
+                self._head += 1
+                if self._head * 2 >= len(self._jobs):
+                    self._compact()
+            else:
+                job = self._jobs.pop(self._head + index)
+                self._order.pop(self._head + index)
+            self._remove_index(job)
+            if self.journal:
+                self.journal.log_dequeue(self.journal_name, job['JOB_ID'])
+            if self.feasibility is not None:
+                self.feasibility.remove_job(job['JOB_ID'])
         else:
             self.logger.error("dequeue_job: Failed to dequeue job - index %d \
             out of range! (qlen %d)", index, self.queue_length())
@@ -167,14 +353,20 @@ class JobQueue(object):
         """Dequeue and return job with id: 'jobid'"""
 
         job = None
-        index = 0
         if self.queue_length() > 0:
-            for j in self.queue:
-                if j['JOB_ID'] == jobid:
-                    job = self.queue[index]
+            job = self.id_index.get(jobid, None)
+            if job is not None:
+                index = self._find_index(jobid)
+                if index < 0:
+                    self.logger.error('dequeue_job_by_id: index mismatch for '
+                                      'jobid %s - rebuild' % jobid)
+                    self._init_indexes()
+                    job = self.id_index.get(jobid, None)
+                    index = self._find_index(jobid)
+                if index < 0:
+                    job = None
+                else:
                     self.dequeue_job(index)
-                    break
-                index += 1
         elif log_errors:
             self.logger.error('dequeue_job_by_id: Queue empty.')
 
@@ -28,7 +28,6 @@
 """Max Throughput Scheduler"""
 from __future__ import absolute_import
 
-from builtins import range
 from mig.server.scheduler import Scheduler
 
 
@@ -74,19 +73,16 @@ class MaxThroughputScheduler(Scheduler):
 
         fit_list = []
 
-        for i in range(0, qlen):
-            job = self.job_queue.get_job(i)
+        for (i, job) in self.fit_jobs(resource_conf):
 
             # Ignore job which don't match the filter requirements
 
             for (key, val) in must_match.items():
                 if key not in job or val != job[key]:
                     continue
-            self.logger.debug('Schedule treating job %d: %s' % (i,
-                                                                job['JOB_ID']))
-            if self.job_fits_resource(job, resource_conf):
-                self.logger.debug('schedule: found suitable job')
-                fit_list.append((i, job))
+            self.logger.debug('schedule: found suitable job %d: %s' %
+                              (i, job['JOB_ID']))
+            fit_list.append((i, job))
 
         if len(fit_list) == 0:
 
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# queuejournal - write-ahead journal of grid_script queue state
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Append-only journal of grid_script job queue mutations.
+
+Every enqueue, dequeue and in-queue status change on a journaled JobQueue is
+appended as a small length-prefixed record to the journal file. Periodically
+the journal is compacted by writing a snapshot of all queues and truncating
+the journal. On startup the queues are recovered by loading the snapshot and
+replaying the journal records on top of it, so that a crash loses at most the
+record being written at the time.
+
+Only changes made through the JobQueue enqueue, dequeue and update_job
+methods are journaled. Any other in-place change to a queued job, like the
+schedule fields written by the scheduler, must therefore go through
+update_job or update_jobs to survive a crash. The scheduler collects the
+schedule fields in journal_schedule and writes them with update_jobs as a
+single record per scheduling pass.
+
+Snapshot and journal carry a generation number so that a journal left over
+from before the latest snapshot is never replayed twice.
+"""
+
+from __future__ import absolute_import
+
+import os
+import struct
+import threading
+import time
+
+from mig.shared.fileio import pickle, unpickle
+from mig.shared.serial import dumps, loads
+
+# Record operations
+ENQUEUE, DEQUEUE, UPDATE, UPDATE_MANY, GENERATION = 'enqueue', 'dequeue', \
+    'update', 'update_many', 'generation'
+
+_length_format = '>I'
+_length_size = struct.calcsize(_length_format)
+
+
+class QueueJournal(object):
+
+    """Write-ahead journal with snapshot compaction for a set of named job
+    queues.
+    """
+
+    def __init__(self, journal_path, snapshot_path, logger,
+                 compact_after=10000, fsync=False):
+        """Init journal writing to journal_path and compacting into
+        snapshot_path after compact_after records.
+        """
+
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path
+        self.logger = logger
+        self.compact_after = compact_after
+        self.fsync = fsync
+        self.generation = 0
+        self.records = 0
+        self.last_compact = time.time()
+        self._journal_fd = None
+        self._lock = threading.Lock()
+
+    def _write_record(self, record):
+        """Append a single length-prefixed record to the journal"""
+
+        data = dumps(record, protocol=2)
+        with self._lock:
+            if self._journal_fd is None:
+                self._journal_fd = open(self.journal_path, 'ab')
+            self._journal_fd.write(struct.pack(_length_format, len(data)) +
+                                   data)
+            self._journal_fd.flush()
+            if self.fsync:
+                os.fsync(self._journal_fd.fileno())
+            self.records += 1
+
+    def _read_records(self):
+        """Read all complete records from the journal. A truncated record at
+        the end, e.g. after a crash during write, is ignored.
+        """
+
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records
+        with open(self.journal_path, 'rb') as journal_fd:
+            while True:
+                header = journal_fd.read(_length_size)
+                if len(header) < _length_size:
+                    break
+                (length, ) = struct.unpack(_length_format, header)
+                data = journal_fd.read(length)
+                if len(data) < length:
+                    self.logger.warning('ignoring truncated record at end '
+                                        'of journal %s' % self.journal_path)
+                    break
+                try:
+                    records.append(loads(data))
+                except Exception as exc:
+                    self.logger.warning('ignoring corrupt record at end of '
+                                        'journal %s: %s' % (self.journal_path,
+                                                            exc))
+                    break
+        return records
+
+    def attach(self, queue, name):
+        """Make queue log all future changes to this journal under name"""
+
+        queue.journal = self
+        queue.journal_name = name
+
+    def log_enqueue(self, name, job, index):
+        """Record that job was inserted at index in queue name"""
+
+        self._write_record((ENQUEUE, name, index, job))
+
+    def log_dequeue(self, name, job_id):
+        """Record that job with job_id was removed from queue name"""
+
+        self._write_record((DEQUEUE, name, job_id))
+
+    def log_update(self, name, job_id, changes):
+        """Record that fields in changes were set for job_id in queue name"""
+
+        self._write_record((UPDATE, name, job_id, changes))
+
+    def log_updates(self, name, job_changes):
+        """Record that fields in job_changes values were set for each job_id
+        key in queue name.
+        """
+
+        self._write_record((UPDATE_MANY, name, job_changes))
+
+    def needs_compaction(self):
+        """Check if enough records were written to warrant a compaction"""
+
+        return self.compact_after > 0 and self.records >= self.compact_after
+
+    def compact(self, queues, extras=None):
+        """Write a snapshot of all jobs in the queues dictionary along with
+        any extras and truncate the journal. The queues are not modified.
+        """
+
+        start = time.time()
+        snapshot = {'generation': self.generation + 1,
+                    'queues': dict([(name, queue.queue) for (name, queue) in
+                                    queues.items()]),
+                    'extras': extras or {}}
+        tmp_path = '%s.tmp' % self.snapshot_path
+        if not pickle(snapshot, tmp_path, self.logger):
+            self.logger.error('failed to write queue snapshot - keep journal')
+            return False
+        with self._lock:
+            # NOTE: rename is atomic so we always have one valid snapshot and
+            #       the generation check prevents replay of the old journal.
+            os.rename(tmp_path, self.snapshot_path)
+            if self._journal_fd is not None:
+                self._journal_fd.close()
+            self._journal_fd = open(self.journal_path, 'wb')
+            self.generation = snapshot['generation']
+            self.records = 0
+        self._write_record((GENERATION, self.generation))
+        self.records = 0
+        self.last_compact = time.time()
+        self.logger.info('compacted queue journal into %s in %.3fs' %
+                         (self.snapshot_path, self.last_compact - start))
+        return True
+
+    def recover(self, queues):
+        """Restore the jobs in the queues dictionary from snapshot and journal.
+        Returns a (success, extras) tuple where success is False if neither
+        snapshot nor journal were available.
+        """
+
+        start = time.time()
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            snapshot = unpickle(self.snapshot_path, self.logger)
+        records = self._read_records()
+        if not snapshot and not records:
+            self.logger.info('no queue snapshot or journal to recover from')
+            return (False, {})
+
+        extras = {}
+        if snapshot:
+            self.generation = snapshot.get('generation', 0)
+            extras = snapshot.get('extras', {})
+            for (name, jobs) in snapshot.get('queues', {}).items():
+                if name not in queues:
+                    continue
+                for job in jobs:
+                    queues[name].enqueue_job(job, queues[name].queue_length())
+
+        replayed = 0
+        journal_generation = 0
+        if records and records[0][0] == GENERATION:
+            journal_generation = records[0][1]
+        if records and journal_generation != self.generation:
+            self.logger.warning('skipping stale queue journal generation %s '
+                                '(snapshot has %s)' % (journal_generation,
+                                                       self.generation))
+            records = []
+        for record in records:
+            (operation, args) = (record[0], record[1:])
+            if operation == GENERATION:
+                continue
+            name = args[0]
+            queue = queues.get(name, None)
+            if queue is None:
+                continue
+            if operation == ENQUEUE:
+                (index, job) = args[1:]
+                queue.enqueue_job(job, min(index, queue.queue_length()))
+            elif operation == DEQUEUE:
+                queue.dequeue_job_by_id(args[1], log_errors=False)
+            elif operation == UPDATE:
+                job = queue.get_job_by_id(args[1], log_errors=False)
+                if job:
+                    job.update(args[2])
+            elif operation == UPDATE_MANY:
+                for (job_id, changes) in args[1].items():
+                    job = queue.get_job_by_id(job_id, log_errors=False)
+                    if job:
+                        job.update(changes)
+            replayed += 1
+        self.records = len(records)
+        self.logger.info('recovered %s from queue snapshot and %d journal '
+                         'records in %.3fs' %
+                         (', '.join(['%s: %d jobs' % (name, queue.queue_length())
+                                     for (name, queue) in queues.items()]),
+                          replayed, time.time() - start))
+        return (True, extras)
+
+    def close(self):
+        """Close journal file"""
+
+        with self._lock:
+            if self._journal_fd is not None:
+                self._journal_fd.close()
+                self._journal_fd = None
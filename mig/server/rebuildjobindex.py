@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# rebuildjobindex - index job summaries for fast job status listings
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Rebuild the job index used by the job status pages from the mRSL files of
+all or selected users. Useful after upgrade or reboot to avoid the one-time
+indexing delay on the first job listing of each user.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import getopt
+import os
+import sys
+import time
+
+from mig.shared.base import client_dir_id
+from mig.shared.conf import get_configuration_object
+from mig.shared.jobindex import rebuild_job_index
+
+
+def usage(name='rebuildjobindex.py'):
+    """Usage help"""
+
+    print("""Rebuild job index from the saved mRSL files.
+
+Usage:
+%(name)s [OPTIONS] [CLIENT_ID ...]
+Where OPTIONS may be one or more of:
+   -c CONF_FILE        Use CONF_FILE as server configuration
+   -h                  Show this help
+   -v                  Verbose output
+
+Rebuilds the index for all users with jobs unless one or more CLIENT_IDs are
+given.
+"""
+          % {'name': name})
+
+
+if '__main__' == __name__:
+    args = sys.argv[1:]
+    conf_path = None
+    verbose = False
+    opt_args = 'c:hv'
+    try:
+        (opts, args) = getopt.getopt(args, opt_args)
+    except getopt.GetoptError as err:
+        print('Error: ', err.msg)
+        usage()
+        sys.exit(1)
+
+    for (opt, val) in opts:
+        if opt == '-c':
+            conf_path = val
+        elif opt == '-h':
+            usage()
+            sys.exit(0)
+        elif opt == '-v':
+            verbose = True
+        else:
+            print('Error: %s not supported!' % opt)
+            sys.exit(1)
+
+    configuration = get_configuration_object(conf_path)
+    client_ids = args
+    if not client_ids:
+        client_ids = [client_dir_id(name) for name in
+                      os.listdir(configuration.mrsl_files_dir) if
+                      os.path.isdir(os.path.join(configuration.mrsl_files_dir,
+                                                 name))]
+
+    start = time.time()
+    (users, jobs, errors) = (0, 0, 0)
+    for client_id in client_ids:
+        try:
+            indexed = rebuild_job_index(configuration, client_id)
+        except Exception as err:
+            print('Error: failed to index jobs of %s: %s' % (client_id, err))
+            errors += 1
+            continue
+        users += 1
+        jobs += indexed
+        if verbose:
+            print('Indexed %d jobs of %s' % (indexed, client_id))
+
+    print('Indexed %d jobs of %d users in %.1fs' % (jobs, users,
+                                                   time.time() - start))
+    if errors:
+        sys.exit(1)
+    sys.exit(0)
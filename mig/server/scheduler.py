@@ -35,6 +35,7 @@ from builtins import range
 from builtins import object
 import calendar
 import fnmatch
+from collections import OrderedDict
 import re
 import time
 
@@ -43,6 +44,7 @@ import time
 from math import exp, floor
 
 # TODO: move all scheduler modules to mig/shared/scheduler/
+from mig.server.feasibility import FeasibilityIndex
 from mig.server.jobqueue import print_job
 from mig.shared import safeeval
 from mig.shared.defaults import maxfill_fields, keyword_all
@@ -50,6 +52,15 @@ from mig.shared.resource import anon_resource_id
 from mig.shared.vgrid import vgrid_access_match, validated_vgrid_list
 
 
+def _price_value(value):
+    """Convert a price replace value string to int or float"""
+
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
 class Scheduler(object):
 
     """Base scheduler class to inherit from"""
@@ -139,6 +150,10 @@ class Scheduler(object):
     simple_re = re.compile(simple_expr)
 
     illegal_price = -42.0
+
+    # Max number of compiled price expressions to keep - 0 disables caching
+
+    price_cache_size = 1024
     reschedule_interval = 1800
     __schedule_fields = {
         'SCHEDULE_TIMESTAMP': None,
@@ -163,6 +178,13 @@ class Scheduler(object):
         self.resources = {}
         self.servers = {}
         self.peers = config.peers
+        self.feasibility = FeasibilityIndex(logger)
+        self.__price_cache = OrderedDict()
+        self.price_cache_stats = {'hits': 0, 'misses': 0}
+        # Static fit masks for all resources during schedule_filter
+        self.__fit_masks = {}
+        # Schedule fields waiting to be journaled by schedule_filter
+        self.__schedule_changes = {}
         self.update_local_server()
 
     def _clone_dict(self, dictionary):
@@ -183,6 +205,8 @@ class Scheduler(object):
         # Bind supplied job_queue to this scheduler
 
         self.job_queue = job_queue
+        if job_queue is not None:
+            job_queue.attach_feasibility(self.feasibility)
         self.update_local_server()
 
     def attach_done_queue(self, done_queue):
@@ -953,6 +977,48 @@ class Scheduler(object):
         job_replace_map = {'exec_delay': repr(exec_delay)}
         return self.eval_price(job['MAXPRICE'], job_replace_map)
 
+    def compile_price(self, price_string, replace_keys):
+        """Compile price_string into a safe function taking the values of the
+        replace_keys found in price_string as positional arguments. Returns a
+        tuple with the function and the list of used keys. The compiled
+        functions are kept in a bounded LRU cache keyed on price string and
+        replace keys, so that each distinct expression is only parsed and
+        validated once. Invalid expressions raise ValueError.
+        """
+
+        cache_key = (price_string, replace_keys)
+        compiled = self.__price_cache.get(cache_key, None)
+        if compiled is not None:
+            self.price_cache_stats['hits'] += 1
+            # Move to end to mark as most recently used
+            del self.__price_cache[cache_key]
+        else:
+            self.price_cache_stats['misses'] += 1
+
+            # Substitute keys in the same order as the classic string
+            # replace to get the same expression but with variable names
+
+            expr = price_string
+            used_keys, var_names = [], []
+            for key in replace_keys:
+                if key in expr:
+                    var_name = '_price_var%d' % len(var_names)
+                    expr = expr.replace(key, var_name)
+                    used_keys.append(key)
+                    var_names.append(var_name)
+            try:
+                compiled = (safeeval.compile_math_expr(expr, var_names),
+                            used_keys)
+            except ValueError as err:
+                compiled = err
+        if self.price_cache_size > 0:
+            self.__price_cache[cache_key] = compiled
+            while len(self.__price_cache) > self.price_cache_size:
+                self.__price_cache.popitem(last=False)
+        if isinstance(compiled, ValueError):
+            raise compiled
+        return compiled
+
     def eval_price(self, price_string, replace_map):
 
         # Parse the price_string with replacements specified in replace_map
@@ -960,47 +1026,22 @@ class Scheduler(object):
 
         # The substitution and safe evaluation can be a real CPU hog.
         # Try to make the common case (simple price) fast by avoiding
-        # substitution and safe evaluation if possible.
-
-        expr = price_string
+        # evaluation if possible and otherwise reuse the compiled price
+        # function from the cache.
 
         # self.logger.debug("eval_price: %s %s" % (price_string, replace_map))
 
-        if self.float_re.match(expr):
+        if self.float_re.match(price_string):
 
             # No need to evaluate expression at all before float()
 
-            eval_func = None
-            eval_price = expr
-        elif self.simple_re.match(expr):
-
-            # Need to do simple evaluation
-
-            eval_func = safeeval.expr_eval
+            eval_price = price_string
         else:
-            for key in replace_map:
-
-                # self.logger.debug("%s : %s %s" % (price_string, key,
-                #                 replace_map[key]))
-
-                expr = expr.replace(key, replace_map[key])
-
-                # self.logger.debug("%s" % expr)
-
-            if self.simple_re.match(expr):
-
-                # No more unknown parts - simple evaluation
-
-                eval_func = safeeval.expr_eval
-            else:
-
-                # Still unknown contents - math evaluation
-
-                eval_func = safeeval.math_expr_eval
-
-        if eval_func:
             try:
-                eval_price = eval_func(expr)
+                (price_func, price_keys) = self.compile_price(
+                    price_string, tuple(replace_map))
+                eval_price = price_func(*[_price_value(replace_map[key])
+                                          for key in price_keys])
             except ValueError as err:
                 self.logger.error('eval_price: illegal price expression: %s!'
                                   % price_string)
@@ -1177,9 +1218,26 @@ class Scheduler(object):
         return (job_price, res_price)
 
     def job_fits_resource(self, job, res):
+        """Check if job fits res using the precalculated static fit masks if
+        available and the full static checks otherwise. Finally check vgrid
+        access.
+        """
 
         # self.logger.info("scheduler examines job_id %s" % job["JOB_ID"])
 
+        res_id = res['RESOURCE_ID']
+        cached = self.__fit_masks.get(res_id, None)
+        row = self.feasibility.job_row(job['JOB_ID'])
+        if cached is not None and cached[0] is res and row is not None:
+            if not cached[1][row]:
+                return False
+        elif not self.job_static_fits_resource(job, res):
+            return False
+        return self.job_vgrid_fits_resource(job, res)
+
+    def job_static_fits_resource(self, job, res):
+        """Check if job requirements fit res without considering vgrids"""
+
         res_id = res['RESOURCE_ID']
         public_id = res_id
         if res.get('ANONYMOUS', True):
@@ -1307,6 +1365,13 @@ class Scheduler(object):
 
                 return False
 
+        return True
+
+    def job_vgrid_fits_resource(self, job, res):
+        """Check if job and res share a vgrid and mark job accordingly"""
+
+        res_id = res['RESOURCE_ID']
+
         # Check VGRID
         # Force old jobs with VGRID string value to list form
 
@@ -1315,24 +1380,19 @@ class Scheduler(object):
             self.conf, job['USER_CERT'], job, res_id.split('_')[0], res)
         self.logger.info('scheduler: res and job vgrid match: %s %s' %
                          (res_vgrid, job_vgrid))
-        res_name = job_name = 'Unknown'
-        try:
-            res_name = res['RESOURCE_ID']
-            job_name = job['JOB_ID']
-        except Exception as err:
-            self.logger.error('scheduler: res or job name error: %s (%s) (%s)'
-                              % (err, res, job))
         if match:
             job['RESOURCE_VGRID'] = res_vgrid
         else:
 
             # self.logger.info("Matching VGRID lists: %s (%s) vs %s (%s)" % \
-            #                 (res["VGRID"], res_name, job["VGRID"], job_name))
+            #                 (res["VGRID"], res.get("RESOURCE_ID"),
+            #                  job["VGRID"], job.get("JOB_ID")))
 
             job['RESOURCE_VGRID'] = 'No_suitable_VGrid_found'
 
             # self.logger.info("Incompatible VGRID lists: %s (%s) vs %s (%s)" % \
-            #                 (res["VGRID"], res_name, job["VGRID"], job_name))
+            #                 (res["VGRID"], res.get("RESOURCE_ID"),
+            #                  job["VGRID"], job.get("JOB_ID")))
 
             return False
 
@@ -1340,6 +1400,33 @@ class Scheduler(object):
 
         return True
 
+    def sync_feasibility(self):
+        """Make sure the feasibility index covers all queued jobs. A job queue
+        bound with attach_job_queue keeps the index up to date itself so the
+        full sync is only needed if the job_queue was replaced directly.
+        """
+
+        if getattr(self.job_queue, 'feasibility', None) is self.feasibility:
+            return
+        self.feasibility.sync_jobs([self.job_queue.get_job(i) for i in
+                                    range(self.job_queue.queue_length())])
+
+    def fit_jobs(self, resource_conf):
+        """Return list of (index, job) tuples for all queued jobs that fit
+        the resource with resource_conf.
+        """
+
+        self.sync_feasibility()
+        jobs = [self.job_queue.get_job(i) for i in
+                range(self.job_queue.queue_length())]
+        mask = self.feasibility.fit_mask(resource_conf)
+        fit_list = []
+        for (i, job) in enumerate(jobs):
+            if mask[self.feasibility.job_row(job['JOB_ID'])] and \
+                    self.job_vgrid_fits_resource(job, resource_conf):
+                fit_list.append((i, job))
+        return fit_list
+
     def expire_jobs(self):
         """Traverse queue and remove jobs that are
         expired, i.e. jobs that have been queued for
@@ -1665,6 +1752,27 @@ class Scheduler(object):
                 dst[field] = src[field]
         return dst
 
+    def journal_schedule(self, job):
+        """Collect the schedule fields of job for any journal attached to the
+        job queue so that queue recovery restores the current schedule. The
+        collected fields are written in one go with flush_schedule_journal.
+        """
+
+        if getattr(self.job_queue, 'journal', None):
+            self.__schedule_changes[job['JOB_ID']] = dict(
+                [(field, job[field]) for field in self.__schedule_fields
+                 if field in job])
+        return job
+
+    def flush_schedule_journal(self):
+        """Write all schedule fields collected by journal_schedule as a single
+        journal record.
+        """
+
+        if self.__schedule_changes:
+            self.job_queue.update_jobs(self.__schedule_changes)
+            self.__schedule_changes = {}
+
     def clear_schedule(self, job):
         """Remove any scheduling fields from job - used e.g. after time outs"""
 
@@ -1713,6 +1821,12 @@ class Scheduler(object):
         now = time.time()
         first_request = request_res.get('FIRST_SEEN', now)
 
+        # Refresh static fit masks of all resources in bulk once and for all
+
+        self.sync_feasibility()
+        self.__fit_masks = dict([(res_id, (res, self.feasibility.fit_mask(res)))
+                                 for (res_id, res) in self.resources.items()])
+
         for i in range(local_jobs):
             best = None
             job = self.job_queue.get_job(i)
@@ -1760,12 +1874,14 @@ class Scheduler(object):
                 #                 (job_id, best))
 
                 job['SCHEDULE_HINT'] = 'STAY'
+                self.journal_schedule(job)
                 continue
             elif job['STATUS'] == 'FROZEN':
 
                 # self.logger.debug("hold frozen job %s" % job_id)
 
                 job['SCHEDULE_HINT'] = 'STAY'
+                self.journal_schedule(job)
                 continue
 
             # Found best resource if we got this far
@@ -1790,7 +1906,10 @@ class Scheduler(object):
             job['EXEC_PRICE'] = best['price']
             job['EXEC_DIFF'] = best['diff']
             job['EXEC_RAWDIFF'] = best['raw']
+            self.journal_schedule(job)
 
+        self.__fit_masks = {}
+        self.flush_schedule_journal()
         return True
 
     def returned_job(self, job):
@@ -46,6 +46,7 @@ import pycurl
 
 from mig.shared.base import client_id_dir
 from mig.shared.fileio import pickle
+from mig.shared.jobindex import update_job_index
 
 server_section = 'serverstatus'
 http_success = 200
@@ -555,6 +556,7 @@ def migrate_job(config, job, peer):
             config.logger.error('Aborting migration of job %s (%s)',
                                 job['JOB_ID'], result)
             return False
+        update_job_index(config, job, config.logger)
 
         dest = mrsl_filename
 
@@ -97,6 +97,7 @@ try:
     from mig.shared.fileio import user_chroot_exceptions
     from mig.shared.logger import daemon_logger, daemon_gdp_logger, \
         register_hangup_handler
+    from mig.shared.pwcrypto import make_creds_cache
 except ImportError:
     print("ERROR: the migrid modules must be in PYTHONPATH")
     sys.exit(1)
@@ -218,7 +219,7 @@ if __name__ == '__main__':
         'shares': [],
         'jupyter_mounts': [],
         'login_map': {},
-        'hash_cache': {},
+        'hash_cache': make_creds_cache(),
         'time_stamp': 0,
         'logger': logger,
         'stop_running': threading.Event(),
@@ -52,11 +52,12 @@ from mig.shared.httpsclient import extract_client_id
 from mig.shared.output import format_output, reject_main
 from mig.shared.returnvalues import CLIENT_ERROR
 from mig.shared.scriptinput import fieldstorage_to_dict
+from mig.shared.streaming import StreamOutput
 
 
 def init_cgi_script(environ, delayed_input=None):
     """Shared init"""
-    configuration = get_configuration_object()
+    configuration = get_configuration_object(cached=True)
     logger = configuration.logger
 
     # get and log ID of user currently logged in
@@ -105,6 +106,11 @@ def finish_cgi_script(configuration, backend, output_format, ret_code, ret_msg,
         logger.warning(
             "forced output to default coding with highlight: %s" % err_mark)
 
+    # NOTE: streamed output is written in blocks with known size if any
+    if isinstance(output, StreamOutput) and output.size is not None and \
+            not 'Content-Length' in dict(headers):
+        headers.append(('Content-Length', "%d" % output.size))
+
     header_out = '\n'.join(["%s: %s" % (key, val) for (key, val) in headers])
 
     # NOTE: we need to carefully handle byte output here as well
@@ -119,7 +125,11 @@ def finish_cgi_script(configuration, backend, output_format, ret_code, ret_msg,
         #logger.debug("write content: %s" % [output[:64], '..', output[-64:]])
         # NOTE: always output native strings to stdout but use raw buffer
         #       for byte output on py3 as explained above.
-        if sys.version_info[0] < 3 or is_default_str_coding(output):
+        if isinstance(output, StreamOutput):
+            out_handle = getattr(sys.stdout, 'buffer', sys.stdout)
+            for chunk in output.iter_chunks():
+                out_handle.write(chunk)
+        elif sys.version_info[0] < 3 or is_default_str_coding(output):
             sys.stdout.write(output)
         else:
             sys.stdout.buffer.write(output)
@@ -71,7 +71,7 @@ def init_cgiscript_possibly_with_cert(print_header=True,
     if print_header:
         cgiscript_header(content_type=content_type)
 
-    configuration = get_configuration_object()
+    configuration = get_configuration_object(cached=True)
     logger = configuration.logger
     out = CGIOutput(logger)
 
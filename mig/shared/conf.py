@@ -37,10 +37,13 @@ from mig.shared.fileio import unpickle
 
 
 def get_configuration_object(config_file=None, skip_log=False,
-                             disable_auth_log=False):
+                             disable_auth_log=False, cached=False):
     """Simple helper to call the general configuration init. Optional skip_log
     and disable_auth_log arguments are passed on to allow skipping the default
     log initialization and disabling auth log for unit tests.
+    The optional cached argument enables reuse of a compiled snapshot of the
+    configuration as long as the conf files are unchanged. It is meant for
+    the web entry points where the conf is loaded on every request.
     """
     from mig.shared.configuration import Configuration
     if config_file:
@@ -63,6 +66,10 @@ def get_configuration_object(config_file=None, skip_log=False,
         skip_log = True
         disable_auth_log = True
 
+    if cached:
+        from mig.shared.confsnapshot import load_configuration
+        return load_configuration(_config_file, skip_log, disable_auth_log)
+
     configuration = Configuration(_config_file, False, skip_log,
                                   disable_auth_log)
     return configuration
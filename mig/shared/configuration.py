@@ -549,6 +549,9 @@ _CONFIGURATION_DEFAULTS = {
     'smtp_sender': '',
     'smtp_send_as_user': False,
     'smtp_reply_to': '',
+    'smtp_pool_size': 2,
+    'smtp_rate_limit': 0,
+    'smtp_max_retries': 8,
     'user_sftp_address': '',
     'user_sftp_port': 2222,
     'user_sftp_show_address': '',
@@ -564,6 +567,10 @@ _CONFIGURATION_DEFAULTS = {
     'user_sftp_window_size': 0,
     'user_sftp_max_packet_size': 0,
     'user_sftp_max_sessions': -1,
+    'user_sftp_workers': -1,
+    'user_sftp_queue_size': 64,
+    'user_sftp_max_address_connections': -1,
+    'user_sftp_listen_backlog': 128,
     'user_sftp_subsys_address': '',
     'user_sftp_subsys_port': 22,
     'user_sftp_subsys_log': 'sftp-subsys.log',
@@ -625,7 +632,11 @@ _CONFIGURATION_DEFAULTS = {
     'user_vmproxy_key': '',
     'user_vmproxy_log': 'vmproxy.log',
     'user_events_log': 'events.log',
+    'user_events_workers': 16,
+    'user_events_queue_size': 1000,
     'user_cron_log': 'cron.log',
+    'user_cron_workers': 16,
+    'user_cron_queue_size': 1000,
     'user_transfers_log': 'transfers.log',
     'user_notify_log': 'notify.log',
     'user_auth_log': 'auth.log',
@@ -692,6 +703,7 @@ _CONFIGURATION_DEFAULTS = {
     'sched_alg': 'FirstFit',
     'expire_after': 86400,
     'job_retries': 4,
+    'journal_compact_after': 10000,
     'logfile': '',
     'loglevel': '',
     'logger_obj': None,
@@ -772,6 +784,35 @@ class Configuration:
                                disable_auth_log=disable_auth_log,
                                _config_file=config_file)
 
+    def init_loggers(self, skip_log=False):
+        """(Re)open the main, GDP and auth loggers with the log settings
+        already loaded e.g. from a configuration snapshot. Optional skip_log
+        arg must be set like when the log settings were loaded and only
+        affects GDP syslog, as the main log path is already None then.
+        """
+        if self.logger_obj:
+            self.logger_obj.reopen()
+        else:
+            self.logger_obj = Logger(self.loglevel, logfile=self.log_path)
+        self.logger = self.logger_obj.logger
+
+        syslog_gdp = None
+        if not skip_log and self.site_enable_gdp:
+            syslog_gdp = SYSLOG_GDP
+        if self.gdp_logger_obj:
+            self.gdp_logger_obj.reopen()
+        else:
+            self.gdp_logger_obj = Logger(
+                self.loglevel, syslog=syslog_gdp, app='main-gdp')
+        self.gdp_logger = self.gdp_logger_obj.logger
+
+        if self.auth_logger_obj:
+            self.auth_logger_obj.reopen()
+        else:
+            self.auth_logger_obj = Logger(
+                self.loglevel, logfile=self.user_auth_log, app='main-auth')
+        self.auth_logger = self.auth_logger_obj.logger
+
     def reload_config(self, verbose, skip_log=False, disable_auth_log=False,
                       _config_file=None):
         """Re-read and parse configuration file. Optional skip_log arg
@@ -1254,8 +1295,28 @@ location.""" % self.config_file)
                 'SITE', 'enable_events')
         else:
             self.site_enable_events = True
+        # Backend for the user, resource and vgrid entity maps: the classic
+        # pickled maps or the incremental sqlite entity store.
+        if config.has_option('SITE', 'entity_map_backend'):
+            self.site_entity_map_backend = config.get(
+                'SITE', 'entity_map_backend')
+        else:
+            self.site_entity_map_backend = 'pickle'
+        # Backend for the grid daemon rate limits and sessions: the classic
+        # pickled dicts or the shared sqlite tables in mig_system_run.
+        if config.has_option('SITE', 'daemon_state_backend'):
+            self.site_daemon_state_backend = config.get(
+                'SITE', 'daemon_state_backend')
+        else:
+            self.site_daemon_state_backend = 'pickle'
         if config.has_option('GLOBAL', 'user_events_log'):
             self.user_events_log = config.get('GLOBAL', 'user_events_log')
+        if config.has_option('GLOBAL', 'user_events_workers'):
+            self.user_events_workers = config.getint(
+                'GLOBAL', 'user_events_workers')
+        if config.has_option('GLOBAL', 'user_events_queue_size'):
+            self.user_events_queue_size = config.getint(
+                'GLOBAL', 'user_events_queue_size')
         if config.has_option('SITE', 'enable_sftp'):
             self.site_enable_sftp = config.getboolean('SITE', 'enable_sftp')
         else:
@@ -1313,6 +1374,18 @@ location.""" % self.config_file)
         if config.has_option('GLOBAL', 'user_sftp_max_sessions'):
             self.user_sftp_max_sessions = config.getint(
                 'GLOBAL', 'user_sftp_max_sessions')
+        if config.has_option('GLOBAL', 'user_sftp_workers'):
+            self.user_sftp_workers = config.getint(
+                'GLOBAL', 'user_sftp_workers')
+        if config.has_option('GLOBAL', 'user_sftp_queue_size'):
+            self.user_sftp_queue_size = config.getint(
+                'GLOBAL', 'user_sftp_queue_size')
+        if config.has_option('GLOBAL', 'user_sftp_max_address_connections'):
+            self.user_sftp_max_address_connections = config.getint(
+                'GLOBAL', 'user_sftp_max_address_connections')
+        if config.has_option('GLOBAL', 'user_sftp_listen_backlog'):
+            self.user_sftp_listen_backlog = config.getint(
+                'GLOBAL', 'user_sftp_listen_backlog')
         # NOTE: we need all sftp and sftpsubsys conf parsing done in next part
         if config.has_option('GLOBAL', 'user_sftp_subsys_address'):
             self.user_sftp_subsys_address = config.get(
@@ -1546,7 +1619,7 @@ location.""" % self.config_file)
         if auth_apps:
             self.site_twofactor_auth_apps = auth_apps
         else:
-            self.site_twofactor_auth_apps = default_twofactor_auth_apps.keys()
+            self.site_twofactor_auth_apps = list(default_twofactor_auth_apps)
         if config.has_option('SITE', 'enable_crontab'):
             self.site_enable_crontab = config.getboolean(
                 'SITE', 'enable_crontab')
@@ -1554,6 +1627,12 @@ location.""" % self.config_file)
             self.site_enable_crontab = False
         if config.has_option('GLOBAL', 'user_cron_log'):
             self.user_cron_log = config.get('GLOBAL', 'user_cron_log')
+        if config.has_option('GLOBAL', 'user_cron_workers'):
+            self.user_cron_workers = config.getint(
+                'GLOBAL', 'user_cron_workers')
+        if config.has_option('GLOBAL', 'user_cron_queue_size'):
+            self.user_cron_queue_size = config.getint(
+                'GLOBAL', 'user_cron_queue_size')
         if config.has_option('SITE', 'enable_notify'):
             self.site_enable_notify = config.getboolean(
                 'SITE', 'enable_notify')
@@ -1756,6 +1835,17 @@ location.""" % self.config_file)
         else:
             self.smtp_reply_to = 'Do NOT reply <no-reply@%s>' % \
                 self.server_fqdn
+        # Mail delivery tuning: idle connections kept open per process, max
+        # messages per second per process (0 for no limit) and delivery
+        # attempts of spooled messages before giving up.
+        if config.has_option('GLOBAL', 'smtp_pool_size'):
+            self.smtp_pool_size = config.getint('GLOBAL', 'smtp_pool_size')
+        if config.has_option('GLOBAL', 'smtp_rate_limit'):
+            self.smtp_rate_limit = config.getfloat('GLOBAL',
+                                                   'smtp_rate_limit')
+        if config.has_option('GLOBAL', 'smtp_max_retries'):
+            self.smtp_max_retries = config.getint('GLOBAL',
+                                                  'smtp_max_retries')
         if config.has_option('GLOBAL', 'notify_protocols'):
             self.notify_protocols = config.get(
                 'GLOBAL', 'notify_protocols').split()
@@ -1877,6 +1967,9 @@ location.""" % self.config_file)
 
         if config.has_option('SCHEDULER', 'job_retries'):
             self.job_retries = config.getint('SCHEDULER', 'job_retries')
+        if config.has_option('SCHEDULER', 'journal_compact_after'):
+            self.journal_compact_after = config.getint(
+                'SCHEDULER', 'journal_compact_after')
 
         if config.has_option('FEASIBILITY', 'resource_seen_within_hours'):
             self.resource_seen_within_hours = config.getint(
@@ -2376,6 +2469,17 @@ location.""" % self.config_file)
             self.site_transfer_log = config.get('SITE', 'transfer_log')
         else:
             self.site_transfer_log = "transfer.log"
+        # Caps on concurrently running transfers in total and for each user
+        if config.has_option('SITE', 'transfers_max_workers'):
+            self.site_transfers_max_workers = config.getint(
+                'SITE', 'transfers_max_workers')
+        else:
+            self.site_transfers_max_workers = 32
+        if config.has_option('SITE', 'transfers_max_user_workers'):
+            self.site_transfers_max_user_workers = config.getint(
+                'SITE', 'transfers_max_user_workers')
+        else:
+            self.site_transfers_max_user_workers = 4
         # Fall back to server_fqdn if not set or no valid entries
         if not self.site_transfers_from:
             self.site_transfers_from = [self.server_fqdn]
@@ -0,0 +1,329 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# confsnapshot - compiled configuration snapshots for fast conf loading
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Compiled snapshots of the parsed server configuration.
+
+Parsing MiGserver.conf with all the included section confs and external
+ENV and FILE sources is a noticeable part of the latency of each CGI request
+and each WSGI request used to repeat it. The parsed configuration values are
+therefore saved in a pickled snapshot together with the modification stamps
+of all the conf files and the values of any referenced environment variables.
+Later loads reuse the snapshot as long as none of those changed.
+
+The snapshots are kept in a private dir owned by the effective user and
+loaded configurations are also cached in-process for reuse across requests in
+long running WSGI processes. A SIGHUP or any conf file change forces a full
+parse and a fresh snapshot on next load.
+"""
+
+from __future__ import absolute_import
+
+import copy
+import hashlib
+import os
+import pickle
+import pwd
+import re
+import signal
+import sys
+import tempfile
+import threading
+
+from mig.shared.defaults import keyword_env, keyword_file, \
+    mig_conf_section_dirname
+
+snapshot_version = 1
+
+# Configuration attributes which hold live logger objects
+_logger_fields = ('logger_obj', 'logger', 'gdp_logger_obj', 'gdp_logger',
+                  'auth_logger_obj', 'auth_logger')
+
+# Conf options with paths to files read or checked during parsing
+_path_option_pattern = re.compile(
+    r'^\s*(include_sections|peerfile|gdp_data_categories|ca_path)\s*[=:]'
+    r'\s*(\S+)', re.MULTILINE)
+_env_pattern = re.compile(r'%s::([a-zA-Z][a-zA-Z0-9_]+)' % keyword_env)
+_file_pattern = re.compile(r'%s::([^ \n]+)' % keyword_file)
+
+_cache = {}
+_cache_lock = threading.Lock()
+_hangup_state = {'registered': False, 'reparse': False}
+
+
+def get_snapshot_dir():
+    """Private dir for configuration snapshots. Uses MIG_CONF_SNAPSHOT_DIR
+    from the environment if set and otherwise a per-user dir in shared memory
+    or the default temp dir.
+    """
+    snapshot_dir = os.environ.get('MIG_CONF_SNAPSHOT_DIR', '')
+    if not snapshot_dir:
+        base_dir = '/dev/shm'
+        if not os.path.isdir(base_dir):
+            base_dir = tempfile.gettempdir()
+        snapshot_dir = os.path.join(base_dir, 'mig-conf-snapshots-%d' %
+                                    os.geteuid())
+    return snapshot_dir
+
+
+def get_snapshot_path(config_file, skip_log=False, disable_auth_log=False):
+    """Path of the snapshot for config_file loaded with the given log flags"""
+    key = '%s:%s:%s:%s:%d.%d' % (snapshot_version,
+                                 os.path.abspath(config_file), skip_log,
+                                 disable_auth_log, sys.version_info[0],
+                                 sys.version_info[1])
+    name = 'conf-%s.pck' % hashlib.sha256(key.encode('utf8')).hexdigest()
+    return os.path.join(get_snapshot_dir(), name)
+
+
+def _is_private(path_stat):
+    """Check that stat result is for something owned by the effective user and
+    without any group or other access. Snapshots contain secrets from the conf
+    and unpickling a foreign file would allow code injection.
+    """
+    return path_stat.st_uid == os.geteuid() and \
+        not path_stat.st_mode & 0o077
+
+
+def _ensure_snapshot_dir(snapshot_dir):
+    """Create snapshot_dir if missing and check that it is private"""
+    try:
+        os.makedirs(snapshot_dir, 0o700)
+    except OSError:
+        pass
+    try:
+        return _is_private(os.lstat(snapshot_dir)) and \
+            os.path.isdir(snapshot_dir) and not os.path.islink(snapshot_dir)
+    except OSError:
+        return False
+
+
+def _read_text(path):
+    """Read text contents of path or return empty string if unavailable"""
+    try:
+        with open(path) as conf_fd:
+            return conf_fd.read()
+    except (IOError, OSError, UnicodeDecodeError):
+        return ''
+
+
+def find_config_sources(configuration):
+    """Find all files and environment variables which the parsed
+    configuration depends on. Returns a tuple with the list of paths and the
+    list of environment variable names.
+    """
+    conf_paths = [configuration.config_file]
+    include_sections = getattr(configuration, 'include_sections', None) or \
+        os.path.join(os.path.dirname(configuration.config_file),
+                     mig_conf_section_dirname)
+    paths = [configuration.config_file, include_sections]
+    if os.path.isdir(include_sections):
+        for name in sorted(os.listdir(include_sections)):
+            if not name.startswith('.') and name.endswith('.conf'):
+                conf_paths.append(os.path.join(include_sections, name))
+    paths += conf_paths[1:]
+    env_names = []
+    for conf_path in conf_paths:
+        text = _read_text(conf_path)
+        for (_, path) in _path_option_pattern.findall(text):
+            paths.append(os.path.expanduser(path))
+        for path in _file_pattern.findall(text):
+            # NOTE: any $$CACHE suffix is just a copy of the file contents
+            paths.append(path.split('$$')[0])
+        env_names += _env_pattern.findall(text)
+    return (sorted(set(paths)), sorted(set(env_names)))
+
+
+def get_source_stamps(paths):
+    """Get a dictionary mapping each of paths to a stamp which changes if the
+    file is changed, created or removed.
+    """
+    stamps = {}
+    for path in paths:
+        try:
+            path_stat = os.stat(path)
+            stamps[path] = (path_stat.st_mtime, path_stat.st_size,
+                            path_stat.st_ino)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def get_env_stamps(names):
+    """Get a dictionary mapping each environment variable in names to its
+    current value.
+    """
+    return dict([(name, os.environ.get(name, None)) for name in names])
+
+
+def is_snapshot_current(source_stamps, env_stamps):
+    """Check if the conf sources are unchanged since the stamps were taken"""
+    return get_source_stamps(list(source_stamps)) == source_stamps and \
+        get_env_stamps(list(env_stamps)) == env_stamps
+
+
+def save_snapshot(configuration, source_stamps, env_stamps, skip_log=False,
+                  disable_auth_log=False):
+    """Save a snapshot of the parsed configuration values with the source and
+    env stamps. Returns a boolean indicating success.
+    """
+    snapshot_path = get_snapshot_path(configuration.config_file, skip_log,
+                                      disable_auth_log)
+    if not _ensure_snapshot_dir(os.path.dirname(snapshot_path)):
+        return False
+    state = dict([(key, val) for (key, val) in vars(configuration).items()
+                  if key not in _logger_fields])
+    snapshot = {'version': snapshot_version,
+                'config_file': os.path.abspath(configuration.config_file),
+                'skip_log': skip_log, 'disable_auth_log': disable_auth_log,
+                'sources': source_stamps, 'envs': env_stamps,
+                'state': state}
+    tmp_path = None
+    try:
+        (tmp_fd, tmp_path) = tempfile.mkstemp(
+            dir=os.path.dirname(snapshot_path), prefix='.tmp-')
+        with os.fdopen(tmp_fd, 'wb') as snapshot_fd:
+            pickle.dump(snapshot, snapshot_fd, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, snapshot_path)
+        return True
+    except Exception as exc:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        configuration.logger.warning('could not save conf snapshot: %s' %
+                                     exc)
+        return False
+
+
+def load_snapshot(config_file, skip_log=False, disable_auth_log=False):
+    """Load a current snapshot of config_file parsed with the given log flags.
+    Returns a tuple with the restored configuration and the source and env
+    stamps or None if no valid and current snapshot is available.
+    """
+    from mig.shared.configuration import Configuration
+    snapshot_path = get_snapshot_path(config_file, skip_log,
+                                      disable_auth_log)
+    try:
+        if not _is_private(os.lstat(os.path.dirname(snapshot_path))):
+            return None
+        with open(snapshot_path, 'rb') as snapshot_fd:
+            if not _is_private(os.fstat(snapshot_fd.fileno())):
+                return None
+            snapshot = pickle.load(snapshot_fd)
+    except Exception:
+        return None
+    if not isinstance(snapshot, dict) or \
+            snapshot.get('version', None) != snapshot_version or \
+            snapshot.get('config_file', None) != \
+            os.path.abspath(config_file) or \
+            snapshot.get('skip_log', None) != skip_log or \
+            snapshot.get('disable_auth_log', None) != disable_auth_log:
+        return None
+    (source_stamps, env_stamps) = (snapshot['sources'], snapshot['envs'])
+    if not is_snapshot_current(source_stamps, env_stamps):
+        return None
+    # NOTE: parsing forces HOME to match the effective user for expanduser
+    #       and code relying on that must see the same after restore.
+    os.environ['HOME'] = pwd.getpwuid(os.geteuid())[5]
+    configuration = Configuration(None)
+    configuration.__dict__.update(snapshot['state'])
+    configuration.init_loggers(skip_log)
+    return (configuration, source_stamps, env_stamps)
+
+
+def parse_configuration(config_file, skip_log=False, disable_auth_log=False):
+    """Fully parse config_file and save a snapshot of the result. Returns a
+    tuple with the configuration and the source and env stamps.
+    """
+    from mig.shared.configuration import Configuration
+    # NOTE: take stamps before parsing so that changes during parse are seen
+    config_file = os.path.abspath(config_file)
+    pre_stamps = get_source_stamps([config_file])
+    configuration = Configuration(config_file, False, skip_log,
+                                  disable_auth_log)
+    (paths, env_names) = find_config_sources(configuration)
+    source_stamps = get_source_stamps(paths)
+    env_stamps = get_env_stamps(env_names)
+    if source_stamps.get(config_file, None) == pre_stamps[config_file]:
+        save_snapshot(configuration, source_stamps, env_stamps, skip_log,
+                      disable_auth_log)
+    return (configuration, source_stamps, env_stamps)
+
+
+def request_reload(signum=None, frame=None):
+    """Drop cached configurations and force full parse on next load. Suitable
+    for use as SIGHUP handler.
+    """
+    _hangup_state['reparse'] = True
+    _cache.clear()
+
+
+def _register_hangup_handler():
+    """Register request_reload as SIGHUP handler chained with any existing
+    handler. Only done if a callable handler is already installed, like in
+    the daemons, so that the default action of terminating e.g. CGI scripts
+    is left alone. Only possible from the main thread and silently skipped
+    e.g. in mod_wsgi where signal handling is reserved for apache.
+    """
+    if _hangup_state['registered']:
+        return
+    _hangup_state['registered'] = True
+    if threading.current_thread().name != 'MainThread':
+        return
+    try:
+        prev_handler = signal.getsignal(signal.SIGHUP)
+        if not callable(prev_handler):
+            return
+
+        def _hangup_handler(signum, frame):
+            """Request conf reload and call the previous handler"""
+            request_reload(signum, frame)
+            prev_handler(signum, frame)
+        signal.signal(signal.SIGHUP, _hangup_handler)
+    except Exception:
+        pass
+
+
+def load_configuration(config_file, skip_log=False, disable_auth_log=False):
+    """Load the configuration in config_file reusing any in-process cached
+    or saved snapshot if the conf sources are unchanged. Returns a shallow
+    copy of the cached configuration so that callers can adjust attributes
+    without affecting others.
+    """
+    _register_hangup_handler()
+    key = (os.path.abspath(config_file), skip_log, disable_auth_log)
+    with _cache_lock:
+        cached = _cache.get(key, None)
+        if cached is None or not is_snapshot_current(cached[1], cached[2]):
+            cached = None
+            if not _hangup_state['reparse']:
+                cached = load_snapshot(config_file, skip_log,
+                                       disable_auth_log)
+            if cached is None:
+                cached = parse_configuration(config_file, skip_log,
+                                             disable_auth_log)
+                _hangup_state['reparse'] = False
+            _cache[key] = cached
+    return copy.copy(cached[0])
@@ -303,6 +303,8 @@ upload_tmp_dir = '.upload-cache'
 # Please read the chunk note in wsgi handler before tuning this value above 1G!
 # 256M = 268435456
 download_block_size = 268435456
+# Streamed downloads are delivered in much smaller blocks of 1M = 1048576
+download_stream_block_size = 1048576
 wwwpublic_alias = 'public'
 public_archive_dir = 'archives'
 public_archive_index = 'published-archive.html'
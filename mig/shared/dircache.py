@@ -0,0 +1,243 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# dircache - persistent directory mtime cache for the event monitors
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+
+"""Persistent cache of directory modification times used by grid_events to
+find the vgrid directories to monitor without rescanning everything.
+
+The cache lives on disk as a compact snapshot mapping relative dir paths to
+mtime and an append-only delta log of changes since the snapshot. Saving only
+appends the changes made since the last save and the snapshot is rewritten
+when the log grows large compared to the cache. Loading reads the snapshot
+and replays the log. Legacy caches with the full {path: {'mtime': mtime}}
+dict pickled on each save are migrated on load.
+
+All methods are thread-safe so that the cache can be reconciled in parallel
+in the background while events update it.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import os
+import struct
+import threading
+import time
+
+from mig.shared.fileio import pickle, unpickle
+from mig.shared.serial import dumps, loads
+
+# Never compact the delta log before it holds this many changes
+compact_min_records = 10000
+
+_length_format = '>I'
+_length_size = struct.calcsize(_length_format)
+
+
+class DirCache(object):
+
+    """Directory mtime cache with snapshot and delta log on disk"""
+
+    def __init__(self, cache_path, logger, legacy_path=None,
+                 legacy_key=None):
+        """Init empty cache stored in cache_path with snapshot and log
+        suffixes. The optional legacy_path is used for migration if no
+        snapshot exists yet and the optional legacy_key function is then
+        applied to all paths from it e.g. to force a single string type.
+        """
+
+        self.snapshot_path = '%s.snap' % cache_path
+        self.log_path = '%s.log' % cache_path
+        self.legacy_path = legacy_path
+        self.legacy_key = legacy_key
+        self.logger = logger
+        self._mtimes = {}
+        self._changes = {}
+        self._log_records = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, path):
+        """Check if path is in cache"""
+
+        return path in self._mtimes
+
+    def __len__(self):
+        """Number of dirs in cache"""
+
+        return len(self._mtimes)
+
+    def paths(self):
+        """Return a list of all cached dir paths"""
+
+        with self._lock:
+            return list(self._mtimes)
+
+    def subtrees(self, root):
+        """Group cached paths below root on the immediate subdir of root they
+        belong to. Root may itself be nested like A/B. Returns a dict mapping
+        each such subdir to the sorted list of its cached paths.
+        """
+
+        prefix = root.rstrip(os.sep) + os.sep
+        groups = {}
+        with self._lock:
+            for path in self._mtimes:
+                if not path.startswith(prefix):
+                    continue
+                top_name = path[len(prefix):].split(os.sep)[0]
+                groups.setdefault(prefix + top_name, []).append(path)
+        for paths in groups.values():
+            paths.sort()
+        return groups
+
+    def get_mtime(self, path, default=None):
+        """Return cached mtime for path or default if not cached"""
+
+        return self._mtimes.get(path, default)
+
+    def set_mtime(self, path, mtime):
+        """Set cached mtime for path"""
+
+        with self._lock:
+            if self._mtimes.get(path, None) != mtime:
+                self._mtimes[path] = mtime
+                self._changes[path] = mtime
+
+    def remove(self, path):
+        """Remove path from cache if present"""
+
+        with self._lock:
+            if self._mtimes.pop(path, None) is not None:
+                self._changes[path] = None
+
+    def _read_log(self):
+        """Read list of change batches from the delta log ignoring any
+        truncated batch at the end after a crash.
+        """
+
+        batches = []
+        if not os.path.exists(self.log_path):
+            return batches
+        with open(self.log_path, 'rb') as log_fd:
+            while True:
+                header = log_fd.read(_length_size)
+                if len(header) < _length_size:
+                    break
+                (length, ) = struct.unpack(_length_format, header)
+                data = log_fd.read(length)
+                if len(data) < length:
+                    self.logger.warning('ignoring truncated dir cache log '
+                                        'entry in %s' % self.log_path)
+                    break
+                batches.append(loads(data))
+        return batches
+
+    def load(self):
+        """Load cache from snapshot and delta log or from any legacy cache.
+        Returns a boolean indicating if a cache was found.
+        """
+
+        start = time.time()
+        with self._lock:
+            self._mtimes, self._changes = {}, {}
+            self._log_records = 0
+            if os.path.exists(self.snapshot_path):
+                snapshot = unpickle(self.snapshot_path, self.logger)
+                if snapshot is False:
+                    return False
+                self._mtimes = snapshot
+                for batch in self._read_log():
+                    for (path, mtime) in batch:
+                        if mtime is None:
+                            self._mtimes.pop(path, None)
+                        else:
+                            self._mtimes[path] = mtime
+                    self._log_records += len(batch)
+            elif self.legacy_path and os.path.exists(self.legacy_path):
+                legacy = unpickle(self.legacy_path, self.logger)
+                if legacy is False:
+                    return False
+                self._mtimes = {}
+                forced = 0
+                for (path, entry) in legacy.items():
+                    if self.legacy_key is not None:
+                        new_path = self.legacy_key(path)
+                        if new_path != path:
+                            forced += 1
+                        path = new_path
+                    self._mtimes[path] = entry.get('mtime', 0)
+                if forced:
+                    self.logger.info('forced %d legacy dir cache paths in '
+                                     '%s' % (forced, self.legacy_path))
+                # NOTE: force snapshot in new format on next save
+                self._log_records = -1
+            else:
+                return False
+        self.logger.info('loaded dir cache with %d dirs and %d changes in '
+                         '%.3fs' % (len(self._mtimes), self._log_records,
+                                    time.time() - start))
+        return True
+
+    def _compact(self):
+        """Write full snapshot and truncate delta log. Caller holds lock."""
+
+        tmp_path = '%s.tmp' % self.snapshot_path
+        if not pickle(self._mtimes, tmp_path, self.logger):
+            return False
+        os.rename(tmp_path, self.snapshot_path)
+        open(self.log_path, 'wb').close()
+        self._changes = {}
+        self._log_records = 0
+        return True
+
+    def save(self):
+        """Append changes since last save to the delta log or compact into a
+        new snapshot if the log grew large.
+        """
+
+        with self._lock:
+            if self._log_records < 0 or \
+                    not os.path.exists(self.snapshot_path) or \
+                    self._log_records + len(self._changes) > \
+                    max(compact_min_records, len(self._mtimes) // 4):
+                return self._compact()
+            if not self._changes:
+                return True
+            batch = list(self._changes.items())
+            data = dumps(batch, protocol=2)
+            try:
+                with open(self.log_path, 'ab') as log_fd:
+                    log_fd.write(struct.pack(_length_format, len(data)) +
+                                 data)
+            except Exception as exc:
+                self.logger.error('could not save dir cache changes in %s: '
+                                  '%s' % (self.log_path, exc))
+                return False
+            self._changes = {}
+            self._log_records += len(batch)
+            return True
+
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# entitystore - SQLite backed store for the user, resource and vgrid maps
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Optional SQLite backend for the entity maps in vgridaccess.
+
+Instead of pickling the entire user, resource or vgrid map into a single file
+each entity is stored as a separate row indexed on map kind, map section and
+entity ID. Refreshes then only write the rows of the entities that actually
+changed and single entities can be looked up without loading the full map.
+The database runs in WAL mode so that readers always see the last committed
+map and never block on a refresh in progress.
+
+Flat maps like the user and resource map use the empty string as section
+whereas the vgrid map uses its __users__, __resources__ and __vgrids__ keys.
+"""
+
+from __future__ import absolute_import
+
+import os
+import sqlite3
+import threading
+
+from mig.shared.serial import dumps, loads
+
+entity_store_name = 'entity_map.db'
+# Kinds of maps with the nested sections layout
+nested_kinds = ('vgrid', )
+flat_section = ''
+
+_connections = threading.local()
+
+
+def _store_path(configuration):
+    """Path to the entity store database"""
+    return os.path.join(configuration.mig_system_files, entity_store_name)
+
+
+def _get_connection(configuration):
+    """Get a connection to the entity store for the current thread. The
+    connection is reused for later calls in the same thread, since sqlite
+    connections may not be shared between threads.
+    """
+    db_path = _store_path(configuration)
+    cached = getattr(_connections, 'cache', None)
+    if cached is None:
+        cached = _connections.cache = {}
+    conn = cached.get(db_path, None)
+    if conn is None:
+        # NOTE: autocommit mode and explicit transactions in save
+        conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS entities (
+            kind TEXT NOT NULL, section TEXT NOT NULL,
+            entity_id TEXT NOT NULL, data BLOB NOT NULL,
+            PRIMARY KEY (kind, section, entity_id))''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS map_stamps (
+            kind TEXT PRIMARY KEY NOT NULL, stamp REAL NOT NULL)''')
+        cached[db_path] = conn
+    return conn
+
+
+def close_entity_store(configuration):
+    """Close any entity store connection of the current thread"""
+    cached = getattr(_connections, 'cache', {})
+    conn = cached.pop(_store_path(configuration), None)
+    if conn is not None:
+        conn.close()
+
+
+def load_store_map(configuration, kind):
+    """Load the full map of given kind from the entity store.
+    Returns tuple with map and time stamp of last map modification just like
+    load_entity_map in vgridaccess. The time stamp is -1 if the map was never
+    saved in the store.
+    """
+    _logger = configuration.logger
+    conn = _get_connection(configuration)
+    entity_map = {}
+    row = conn.execute('SELECT stamp FROM map_stamps WHERE kind = ?',
+                       (kind, )).fetchone()
+    if row is None:
+        _logger.warning("No %s map in entity store" % kind)
+        return (entity_map, -1)
+    map_stamp = row[0]
+    for (section, entity_id, data) in conn.execute(
+            'SELECT section, entity_id, data FROM entities WHERE kind = ?',
+            (kind, )):
+        if section == flat_section:
+            entity_map[entity_id] = loads(data)
+        else:
+            entity_map[section] = entity_map.get(section, {})
+            entity_map[section][entity_id] = loads(data)
+    return (entity_map, map_stamp)
+
+
+def load_store_stamp(configuration, kind):
+    """Look up only the time stamp of last modification of the map of given
+    kind. Returns -1 if the map was never saved in the store.
+    """
+    conn = _get_connection(configuration)
+    row = conn.execute('SELECT stamp FROM map_stamps WHERE kind = ?',
+                       (kind, )).fetchone()
+    if row is None:
+        return -1
+    return row[0]
+
+
+def load_store_size(configuration, kind):
+    """Total size in bytes of the serialized entries in the map of given
+    kind as a rough estimate of its memory use when loaded.
+    """
+    conn = _get_connection(configuration)
+    row = conn.execute('SELECT SUM(LENGTH(data)) FROM entities WHERE kind = ?',
+                       (kind, )).fetchone()
+    return row[0] or 0
+
+
+def load_store_entities(configuration, kind, section, entity_ids):
+    """Load only the entity_ids entries from section of the map of given
+    kind. Returns a dictionary with the entries found.
+    """
+    conn = _get_connection(configuration)
+    if section is None:
+        section = flat_section
+    entries = {}
+    for entity_id in entity_ids:
+        row = conn.execute('''SELECT data FROM entities WHERE kind = ? AND
+        section = ? AND entity_id = ?''', (kind, section, entity_id)).fetchone()
+        if row is not None:
+            entries[entity_id] = loads(row[0])
+    return entries
+
+
+def _iter_map_entities(kind, entity_map):
+    """Iterate through (section, entity_id, entry) for all map entries"""
+    if kind in nested_kinds:
+        for (section, section_map) in entity_map.items():
+            for (entity_id, entry) in section_map.items():
+                yield (section, entity_id, entry)
+    else:
+        for (entity_id, entry) in entity_map.items():
+            yield (flat_section, entity_id, entry)
+
+
+def _lookup_map_entity(kind, entity_map, section, entity_id):
+    """Find entry for entity_id in section of entity_map or None if gone"""
+    if kind in nested_kinds:
+        return entity_map.get(section, {}).get(entity_id, None)
+    return entity_map.get(entity_id, None)
+
+
+def save_store_map(configuration, kind, entity_map, map_stamp, dirty=None):
+    """Save the map of given kind in the entity store. If dirty is provided
+    as a list of (section, entity_id) tuples only those rows are updated or
+    removed, otherwise all rows of kind are replaced. The section is ignored
+    for the flat maps. Everything is written in a single transaction so that
+    readers see either the old or the new map.
+    """
+    conn = _get_connection(configuration)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        stamp_row = conn.execute('SELECT stamp FROM map_stamps WHERE kind = ?',
+                                 (kind, )).fetchone()
+        if dirty is None or stamp_row is None:
+            conn.execute('DELETE FROM entities WHERE kind = ?', (kind, ))
+            conn.executemany('''INSERT INTO entities (kind, section,
+            entity_id, data) VALUES (?, ?, ?, ?)''',
+                             [(kind, section, entity_id,
+                               sqlite3.Binary(dumps(entry, protocol=2)))
+                              for (section, entity_id, entry) in
+                              _iter_map_entities(kind, entity_map)])
+        else:
+            for (section, entity_id) in set(dirty):
+                if kind not in nested_kinds:
+                    section = flat_section
+                entry = _lookup_map_entity(kind, entity_map, section,
+                                           entity_id)
+                if entry is None:
+                    conn.execute('''DELETE FROM entities WHERE kind = ? AND
+                    section = ? AND entity_id = ?''', (kind, section,
+                                                       entity_id))
+                else:
+                    conn.execute('''INSERT OR REPLACE INTO entities (kind,
+                    section, entity_id, data) VALUES (?, ?, ?, ?)''',
+                                 (kind, section, entity_id,
+                                  sqlite3.Binary(dumps(entry, protocol=2))))
+        conn.execute('INSERT OR REPLACE INTO map_stamps (kind, stamp) '
+                     'VALUES (?, ?)', (kind, map_stamp))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return True
@@ -30,11 +30,15 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
+from builtins import object
 import datetime
 import fnmatch
+import heapq
+import itertools
 import os
 import re
 import shlex
+import threading
 
 from mig.shared.base import client_id_dir
 from mig.shared.defaults import crontab_name, atjobs_name
@@ -51,6 +55,13 @@ crontab_expr = re.compile(crontab_pattern)
 atjobs_pattern = "^([0-9]{4})-([0-9]{2})-([0-9]{2}) ([0-9]{2}):([0-9]{2}):"
 atjobs_pattern += "([0-9]{2}) (.*)$"
 atjobs_expr = re.compile(atjobs_pattern)
+# Value range of each crontab time field in the form used by cron_match
+cron_field_ranges = {'minute': list(range(60)), 'hour': list(range(24)),
+                     'dayofmonth': list(range(1, 32)),
+                     'month': list(range(1, 13)),
+                     'dayofweek': list(range(7))}
+# Give up looking for the next cron time of impossible dates after this
+cron_search_days = 5 * 366
 
 
 def get_path_expand_map(trigger_path, rule, state_change):
@@ -81,6 +92,90 @@ def get_path_expand_map(trigger_path, rule, state_change):
     return expand_map
 
 
+def compile_trigger_pattern(target_path):
+    """Compile the recursive and direct regular expressions used to match
+    event paths against the trigger rule target_path pattern. We do not use
+    plain fnmatch as it lets '*' match anything including '/', which leads to
+    greedy matching in subdirs. Only the recursive version allows that.
+    """
+
+    recursive_regexp = fnmatch.translate(target_path)
+    direct_regexp = recursive_regexp.replace('.*', '[^/]*')
+    return (re.compile(recursive_regexp), re.compile(direct_regexp))
+
+
+def trigger_pattern_prefix(target_path):
+    """Extract the literal directory prefix of the target_path pattern. That
+    is, the part up to and including the last slash before any wildcards.
+    """
+
+    literal_len = len(target_path)
+    for wildcard in '*?[':
+        pos = target_path.find(wildcard)
+        if pos != -1:
+            literal_len = min(literal_len, pos)
+    return target_path[:target_path.rfind('/', 0, literal_len) + 1]
+
+
+class TriggerRuleMatcher(object):
+    """Match event paths against all trigger rule target path patterns.
+    Patterns are compiled once when the rules are loaded and indexed on their
+    literal directory prefix, so that each event only needs a dictionary
+    lookup for each parent directory and then regexp matching of the few
+    candidate patterns found there.
+    The index is replaced atomically on updates so that concurrent match
+    calls always see a consistent set of rules.
+    """
+
+    def __init__(self):
+        """Init empty matcher"""
+        self._compiled = {}
+        self._index = {}
+
+    def update(self, all_rules):
+        """Refresh index from the all_rules dictionary mapping target path
+        patterns to rule lists. Only new patterns are compiled.
+        """
+        compiled = {}
+        index = {}
+        for (target_path, rule_list) in all_rules.items():
+            patterns = self._compiled.get(target_path, None)
+            if patterns is None:
+                patterns = compile_trigger_pattern(target_path)
+            compiled[target_path] = patterns
+            prefix = trigger_pattern_prefix(target_path)
+            index[prefix] = index.get(prefix, []) + \
+                [(target_path, patterns, list(rule_list))]
+        (self._compiled, self._index) = (compiled, index)
+
+    def candidates(self, src_path):
+        """Return the index entries with a literal prefix matching src_path"""
+        index = self._index
+        found = list(index.get('', []))
+        pos = src_path.find('/')
+        while pos != -1:
+            found += index.get(src_path[:pos + 1], [])
+            pos = src_path.find('/', pos + 1)
+        return found
+
+    def match(self, src_path):
+        """Find all trigger rule patterns matching src_path. Returns a list of
+        (target_path, rule_list, direct_hit) tuples where direct_hit tells
+        if the match was without recursion into subdirs.
+        """
+        matches = []
+        for (target_path, patterns, rule_list) in self.candidates(src_path):
+            (recursive_expr, direct_expr) = patterns
+            direct_hit = direct_expr.match(src_path) is not None
+            if direct_hit or recursive_expr.match(src_path):
+                matches.append((target_path, rule_list, direct_hit))
+        return matches
+
+    def __len__(self):
+        """Number of indexed target path patterns"""
+        return len(self._compiled)
+
+
 def get_time_expand_map(timestamp, rule):
     """Generate a dictionary with the supported variables to be expanded and
     the actual expanded values based on datetime timestamp and crontab rule
@@ -255,6 +350,12 @@ def parse_and_save_atjobs(atjobs, client_id, configuration):
     return (status, msg)
 
 
+def cron_field_match(pattern, val):
+    """Check if the time field value val matches the crontab field pattern"""
+    # Strip any leading zeros before integer match
+    return fnmatch.fnmatch("%s" % val, pattern.lstrip('0'))
+
+
 def cron_match(configuration, cron_time, entry):
     """Check if cron_time matches the time specs in entry"""
     _logger = configuration.logger
@@ -263,14 +364,157 @@ def cron_match(configuration, cron_time, entry):
                  'dayofweek': cron_time.weekday()}
     # TODO: extend to support e.g. */5 and the likes?
     for (name, val) in time_vals.items():
-        # Strip any leading zeros before integer match
-        if not fnmatch.fnmatch("%s" % val, entry[name].lstrip('0')):
+        if not cron_field_match(entry[name], val):
             _logger.debug("cron_match failed on %s: %s vs %s" %
                           (name, val, entry[name]))
             return False
     return True
 
 
+def next_cron_time(configuration, after, entry):
+    """Find the first whole minute after the after datetime where cron_match
+    succeeds for entry. Returns None if entry never matches.
+    """
+    _logger = configuration.logger
+    allowed = {}
+    for (name, values) in cron_field_ranges.items():
+        allowed[name] = [i for i in values if cron_field_match(entry[name],
+                                                               i)]
+        if not allowed[name]:
+            _logger.debug("next_cron_time found no %s match for %s" %
+                          (name, entry[name]))
+            return None
+    start = after.replace(second=0, microsecond=0) + \
+        datetime.timedelta(minutes=1)
+    for offset in range(cron_search_days):
+        day = start + datetime.timedelta(days=offset)
+        if day.month not in allowed['month'] or \
+                day.day not in allowed['dayofmonth'] or \
+                day.weekday() not in allowed['dayofweek']:
+            continue
+        for hour in allowed['hour']:
+            if offset == 0 and hour < start.hour:
+                continue
+            for minute in allowed['minute']:
+                if offset == 0 and hour == start.hour and \
+                        minute < start.minute:
+                    continue
+                return day.replace(hour=hour, minute=minute)
+    _logger.warning("next_cron_time found no match for %s" % entry)
+    return None
+
+
+class CronSchedule(object):
+    """Priority queue of the next run time of all crontab and atjobs entries.
+    Entries are added with their source path and replaced as a whole when the
+    file changes. Replaced entries are left in the heap and just skipped once
+    they reach the top, so updates only cost the new entries. Crontab entries
+    are pushed back with their following run time when popped whereas atjobs
+    entries only run once.
+    Methods are thread-safe so that updates can come from the file monitor
+    thread while the main loop pops due entries.
+    """
+
+    def __init__(self, configuration):
+        """Init empty schedule"""
+        self.configuration = configuration
+        self._heap = []
+        self._generations = {}
+        self._entry_counts = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, when, path, generation, kind, entry):
+        """Push entry running at when on the heap"""
+        heapq.heappush(self._heap, (when, next(self._counter), path,
+                                    generation, kind, entry))
+
+    def update(self, path, kind, entries, now=None):
+        """Replace any entries from path with the crontab or atjobs entries
+        given by kind. Atjobs entries in the past are ignored.
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        now_minute = now.replace(second=0, microsecond=0)
+        scheduled = []
+        for entry in entries:
+            if kind == 'crontab':
+                when = next_cron_time(self.configuration, now, entry)
+            else:
+                when = entry['time_stamp']
+                if when < now_minute:
+                    when = None
+            if when is not None:
+                scheduled.append((when, entry))
+        with self._lock:
+            generation = self._generations.get(path, 0) + 1
+            self._generations[path] = generation
+            self._entry_counts[path] = len(scheduled)
+            for (when, entry) in scheduled:
+                self._push(when, path, generation, kind, entry)
+            if not scheduled:
+                del self._entry_counts[path]
+            self._compact()
+
+    def remove(self, path):
+        """Remove all entries from path"""
+        self.update(path, 'crontab', [])
+
+    def _compact(self):
+        """Rebuild heap without replaced entries if they dominate it"""
+        if len(self._heap) < 1024 or \
+                len(self._heap) < 2 * sum(self._entry_counts.values()):
+            return
+        self._heap = [i for i in self._heap if
+                      self._generations.get(i[2], 0) == i[3]]
+        heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        """Pop replaced entries off the top of the heap"""
+        while self._heap and \
+                self._generations.get(self._heap[0][2], 0) != self._heap[0][3]:
+            heapq.heappop(self._heap)
+
+    def next_time(self):
+        """Return the next run time or None if nothing is scheduled"""
+        with self._lock:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            return self._heap[0][0]
+
+    def pop_due(self, now):
+        """Pop all entries due at or before the now datetime. Returns a list
+        of (when, path, kind, entry) tuples. Crontab entries are rescheduled
+        at their next run time after now and popped atjobs entries are
+        removed from the schedule.
+        """
+        due = []
+        with self._lock:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                (when, _, path, generation, kind, entry) = \
+                    heapq.heappop(self._heap)
+                due.append((when, path, kind, entry))
+                if kind == 'crontab':
+                    next_when = next_cron_time(self.configuration, now,
+                                               entry)
+                    if next_when is not None:
+                        self._push(next_when, path, generation, kind, entry)
+                        continue
+                self._entry_counts[path] -= 1
+                if not self._entry_counts[path]:
+                    del self._entry_counts[path]
+        return due
+
+    def __len__(self):
+        """Number of scheduled entries"""
+        with self._lock:
+            return sum(self._entry_counts.values())
+
+
 def at_remain(configuration, at_time, entry):
     """Return the number of minutes remaining before entry should run"""
     _logger = configuration.logger
@@ -30,11 +30,12 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from builtins import range
+from builtins import object, range
 import errno
 import fcntl
 import os
 import shutil
+import stat
 import sys
 import tempfile
 import time
@@ -45,11 +46,12 @@ import zipfile
 #       functions are built-in and optimized similarly on python 3+
 slow_walk, slow_listdir = False, False
 if sys.version_info[0] > 2:
-    from os import walk, listdir
+    from os import walk, listdir, scandir
 else:
     try:
         from distutils.version import StrictVersion
-        from scandir import walk, listdir, __version__ as scandir_version
+        from scandir import walk, listdir, scandir, \
+            __version__ as scandir_version
         if StrictVersion(scandir_version) < StrictVersion("1.3"):
             # Important os.walk compatibility utf8 fixes were not added until 1.3
             raise ImportError(
@@ -59,6 +61,7 @@ else:
         slow_walk = slow_listdir = True
         walk = os.walk
         listdir = os.listdir
+        scandir = None
 
 try:
     from mig.shared.base import force_utf8, force_utf8_rec, force_native_str
@@ -71,6 +74,83 @@ except ImportError as ioe:
     exit(1)
 
 
+class _ListdirEntry(object):
+    """Minimal stand-in for the scandir DirEntry objects on python 2 without
+    the scandir module. Stat results are cached just like in DirEntry.
+    """
+
+    def __init__(self, dir_path, name):
+        """Init entry for name in dir_path"""
+        self.name = name
+        self.path = os.path.join(dir_path, name)
+        self._stat = {}
+
+    def stat(self, follow_symlinks=True):
+        """Cached os.stat or os.lstat of entry"""
+        if follow_symlinks not in self._stat:
+            if follow_symlinks:
+                self._stat[follow_symlinks] = os.stat(self.path)
+            else:
+                self._stat[follow_symlinks] = os.lstat(self.path)
+        return self._stat[follow_symlinks]
+
+    def is_dir(self, follow_symlinks=True):
+        """Check if entry is a dir"""
+        try:
+            return stat.S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_file(self, follow_symlinks=True):
+        """Check if entry is a file"""
+        try:
+            return stat.S_ISREG(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        """Check if entry is a symlink"""
+        try:
+            return stat.S_ISLNK(self.stat(False).st_mode)
+        except OSError:
+            return False
+
+
+def list_dir_entries(dir_path):
+    """List the contents of dir_path as DirEntry objects from scandir. These
+    carry the entry type from the directory listing where the file system
+    provides it and cache any stat call, so callers can look up type and stat
+    info of each entry with at most one stat call.
+    """
+    if scandir is None:
+        return [_ListdirEntry(dir_path, name) for name in listdir(dir_path)]
+    # NOTE: scandir keeps the dir open until exhausted so consume it at once
+    return list(scandir(dir_path))
+
+
+def fileinfo_stat(path, stat_info=None):
+    """Additional stat information for file manager. The optional stat_info
+    can be used to pass an already available os.stat result for path in order
+    to avoid another stat call.
+    """
+    file_information = {'size': 0, 'created': 0, 'modified': 0, 'accessed': 0,
+                        'ext': ''}
+    if stat_info is None:
+        try:
+            stat_info = os.stat(path)
+        except OSError:
+            return file_information
+    ext = 'dir'
+    if not stat.S_ISDIR(stat_info.st_mode):
+        ext = os.path.splitext(path)[1].lstrip('.')
+    file_information['ext'] = ext
+    file_information['size'] = stat_info.st_size
+    file_information['created'] = stat_info.st_ctime
+    file_information['modified'] = stat_info.st_mtime
+    file_information['accessed'] = stat_info.st_atime
+    return file_information
+
+
 def _auto_adjust_mode(data, mode):
     """Select suitable file open mode based on string type of data. I.e. whether
     to use binary or text mode depending on data in bytes or unicode format.
@@ -46,6 +46,7 @@ from mig.shared.init import initialize_main_variables, find_entry, \
 from mig.shared.parseflags import verbose, binary
 from mig.shared.userio import GDPIOLogError, gdp_iolog
 from mig.shared.safeinput import valid_path_pattern
+from mig.shared.streaming import make_file_stream
 from mig.shared.validstring import valid_user_path
 
 
@@ -229,6 +230,8 @@ def _main(configuration, logger, environ, op_name='', output_objects=None, clien
             output_objects.append({'object_type': 'error_text', 'text': text})
             return (output_objects, status)
 
+        # NOTE: plain single file downloads are streamed to save memory
+        stream_file = output_format == 'file' and not dst and len(match) == 1
         for abs_path in match:
             output_lines = []
             relative_path = abs_path.replace(base_dir, '')
@@ -239,7 +242,11 @@ def _main(configuration, logger, environ, op_name='', output_objects=None, clien
                           'accessed',
                           [relative_path])
 
-                if force_file:
+                if stream_file:
+                    # NOTE: stream single file download without reading it
+                    content = make_file_stream(abs_path)
+                    lines = []
+                elif force_file:
                     content = read_file(abs_path, logger, mode=src_mode)
                     lines = [content]
                 else:
@@ -303,6 +310,11 @@ def _main(configuration, logger, environ, op_name='', output_objects=None, clien
                     dst_mode = "ab+"
                 else:
                     dst_mode = "a+"
+            elif stream_file:
+                download_marker = start_download(configuration, abs_path, [],
+                                                 size=content['size'])
+                start_entry.update(download_marker)
+                output_objects.append(content)
             else:
                 entry = {'object_type': 'file_output',
                          'lines': output_lines,
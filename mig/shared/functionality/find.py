@@ -36,7 +36,7 @@ import os
 from mig.shared import returnvalues
 from mig.shared.base import client_id_dir
 from mig.shared.defaults import csrf_field
-from mig.shared.fileio import walk
+from mig.shared.fileio import fileinfo_stat, walk
 from mig.shared.functional import validate_input_and_cert
 from mig.shared.handlers import get_csrf_limit, make_csrf_token
 from mig.shared.init import initialize_main_variables
@@ -52,27 +52,6 @@ def signature():
     defaults = {'path': ['.'], 'flags': [''], 'pattern': ['*']}
     return ['dir_listings', defaults]
 
-# TODO: refactor to fileio and use from here and in ls?
-
-
-def fileinfo_stat(path):
-    """Additional stat information for file manager"""
-    file_information = {'size': 0, 'created': 0, 'modified': 0, 'accessed': 0,
-                        'ext': ''}
-    if os.path.exists(path):
-        ext = 'dir'
-        if not os.path.isdir(path):
-            ext = os.path.splitext(path)[1].lstrip('.')
-        file_information['ext'] = ext
-        try:
-            file_information['size'] = os.path.getsize(path)
-            file_information['created'] = os.path.getctime(path)
-            file_information['modified'] = os.path.getmtime(path)
-            file_information['accessed'] = os.path.getatime(path)
-        except OSError as ose:
-            pass
-    return file_information
-
 
 def main(client_id, user_arguments_dict):
     """Main function used by front end"""
@@ -32,7 +32,6 @@ changes.
 from __future__ import absolute_import
 
 import os
-import glob
 
 from mig.shared import returnvalues
 from mig.shared.base import client_id_dir
@@ -42,7 +41,7 @@ from mig.shared.fileio import unpickle, unpickle_and_change_status, \
 from mig.shared.functional import validate_input_and_cert, REJECT_UNSET
 from mig.shared.handlers import safe_handler, get_csrf_limit
 from mig.shared.init import initialize_main_variables
-from mig.shared.validstring import valid_user_path
+from mig.shared.jobindex import match_job_ids, update_job_index
 
 
 # Valid actions and the corresponding new job state
@@ -107,7 +106,7 @@ CSRF-filtered POST requests to prevent unintended updates'''
                                      client_dir)) + os.sep
 
     status = returnvalues.OK
-    filelist = []
+    cleaned_patterns = []
     for pattern in patterns:
         pattern = pattern.strip()
 
@@ -115,41 +114,20 @@ CSRF-filtered POST requests to prevent unintended updates'''
 
         if pattern == all_jobs:
             pattern = '*'
+        cleaned_patterns.append(pattern)
 
-        # Check directory traversal attempts before actual handling to avoid
-        # leaking information about file system layout while allowing
-        # consistent error messages
+    # Match job IDs in the job index rather than with globbing in the mRSL
+    # dir. Only the IDs of own jobs are indexed so patterns can never match
+    # anything outside base_dir.
 
-        unfiltered_match = glob.glob(base_dir + pattern + '.mRSL')
-        match = []
-        for server_path in unfiltered_match:
-            # IMPORTANT: path must be expanded to abs for proper chrooting
-            abs_path = os.path.abspath(server_path)
-            if not valid_user_path(configuration, abs_path, base_dir, True):
-
-                # out of bounds - save user warning for later to allow
-                # partial match:
-                # ../*/* is technically allowed to match own files.
-
-                logger.error(
-                    '%s tried to use %s %s outside own home! (pattern %s)'
-                    % (client_id, op_name, abs_path, pattern))
-                continue
-
-            # Insert valid job files in filelist for later treatment
-
-            match.append(abs_path)
-
-        # Now actually treat list of allowed matchings and notify if no
-        # (allowed) match
-
-        if not match:
-            output_objects.append({'object_type': 'error_text', 'text':
-                                   '%s: You do not have any matching job IDs!'
-                                   % pattern})
-            status = returnvalues.CLIENT_ERROR
-        else:
-            filelist += match
+    (job_ids, unmatched) = match_job_ids(configuration, client_id,
+                                         cleaned_patterns)
+    for pattern in unmatched:
+        output_objects.append({'object_type': 'error_text', 'text':
+                               '%s: You do not have any matching job IDs!'
+                               % pattern})
+        status = returnvalues.CLIENT_ERROR
+    filelist = [base_dir + job_id + '.mRSL' for job_id in job_ids]
 
     # job state change is hard on the server, limit
 
@@ -220,11 +198,15 @@ jobs!''' % (job_id, action)
         # file is repickled to ensure newest information is used, job_dict
         # might be old if another script has modified the file.
 
-        if not unpickle_and_change_status(filepath, new_state, logger):
+        changed_dict = unpickle_and_change_status(filepath, new_state,
+                                                  logger)
+        if not changed_dict:
             output_objects.append({'object_type': 'error_text', 'text':
                                    'Job status could not be changed to %s!'
                                    % new_state})
             status = returnvalues.SYSTEM_ERROR
+        else:
+            update_job_index(configuration, changed_dict, logger)
 
         # Avoid key error and make sure grid_script gets expected number of
         # arguments
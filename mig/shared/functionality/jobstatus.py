@@ -29,7 +29,6 @@
 
 from __future__ import absolute_import
 
-import glob
 import os
 import time
 
@@ -42,10 +41,10 @@ from mig.shared.handlers import get_csrf_limit, make_csrf_token
 from mig.shared.htmlgen import html_post_helper
 from mig.shared.init import initialize_main_variables
 from mig.shared.job import get_job_ids_with_specified_project_name
+from mig.shared.jobindex import query_job_index, job_summary, \
+    summary_time_fields, sort_keys
 from mig.shared.mrslparser import expand_variables
 from mig.shared.parseflags import verbose, sorted, interactive
-from mig.shared.resource import anon_resource_id
-from mig.shared.validstring import valid_user_path
 
 try:
     from mig.shared import arcwrapper
@@ -60,27 +59,16 @@ def signature():
     defaults = {
         'job_id': ['*'],
         'max_jobs': ['1000000'],
+        'offset': ['0'],
+        'status': [],
+        'sort': [''],
+        'order': ['asc'],
         'flags': [''],
         'project_name': [],
     }
     return ['jobs', defaults]
 
 
-def sort(paths, new_first=True):
-    """Sort list of paths after modification time. The new_first
-    argument specifies if the newest ones should be at the front
-    of the resulting list.
-    """
-
-    mtime = os.path.getmtime
-    # NOTE: switched to use key instead of cmp to support both python 2 and 3
-    # https://portingguide.readthedocs.io/en/latest/comparisons.html#the-cmp-argument
-    paths.sort(key=lambda i: mtime(i))
-    if new_first:
-        paths = paths[::-1]
-    return paths
-
-
 def main(client_id, user_arguments_dict):
     """Main function used by front end"""
 
@@ -103,9 +91,24 @@ def main(client_id, user_arguments_dict):
 
     flags = ''.join(accepted['flags'])
     max_jobs = int(accepted['max_jobs'][-1])
+    offset = max(0, int(accepted['offset'][-1]))
+    states = [i.strip().upper() for i in accepted['status'] if i.strip()]
+    sort_by = accepted['sort'][-1].strip().lower()
+    reverse = accepted['order'][-1].strip().lower() == 'desc'
     order = 'unsorted '
     if sorted(flags):
+        # NOTE: legacy sorted flag means newest changes first
+        (sort_by, reverse) = ('modified', True)
+    if sort_by:
         order = 'sorted '
+    else:
+        sort_by = 'job_id'
+    if sort_by not in sort_keys:
+        output_objects.append(
+            {'object_type': 'error_text', 'text':
+             'Invalid sort key %r (only %s supported)' %
+             (sort_by, ', '.join(sort_keys))})
+        return (output_objects, returnvalues.CLIENT_ERROR)
     patterns = accepted['job_id']
     project_names = accepted['project_name']
 
@@ -148,7 +151,7 @@ def main(client_id, user_arguments_dict):
 contact the site admins.''' % configuration.short_title})
         return (output_objects, returnvalues.CLIENT_ERROR)
 
-    filelist = []
+    cleaned_patterns = []
     for pattern in patterns:
         pattern = pattern.strip()
 
@@ -156,89 +159,64 @@ contact the site admins.''' % configuration.short_title})
 
         if pattern == all_jobs:
             pattern = '*'
+        cleaned_patterns.append(pattern)
 
-        # Check directory traversal attempts before actual handling to
-        # avoid leaking information about file system layout while
-        # allowing consistent error messages
-
-        unfiltered_match = glob.glob(base_dir + pattern + '.mRSL')
-        match = []
-        for server_path in unfiltered_match:
-            # IMPORTANT: path must be expanded to abs for proper chrooting
-            abs_path = os.path.abspath(server_path)
-            if not valid_user_path(configuration, abs_path, base_dir, True):
-
-                # out of bounds - save user warning for later to allow
-                # partial match:
-                # ../*/* is technically allowed to match own files.
-
-                logger.warning('%s tried to %s restricted path %s ! (%s)'
-                               % (client_id, op_name, abs_path, pattern))
-                continue
-
-            # Insert valid job files in filelist for later treatment
-
-            match.append(abs_path)
+    # Look up matching jobs and their summaries in the job index rather than
+    # loading every single mRSL file. Only the IDs of own jobs are indexed so
+    # patterns can never match anything outside base_dir.
 
-        # Now actually treat list of allowed matchings and notify if no
-        # (allowed) match....
+    (total, matches, unmatched) = query_job_index(
+        configuration, client_id, cleaned_patterns, states, sort_by, reverse,
+        offset, max(0, max_jobs))
+    for pattern in unmatched:
+        output_objects.append(
+            {'object_type': 'error_text', 'text':
+             '%s: You do not have any matching job IDs!' % pattern})
+        status = returnvalues.CLIENT_ERROR
 
-        if not match:
-            output_objects.append(
-                {'object_type': 'error_text', 'text':
-                 '%s: You do not have any matching job IDs!' % pattern})
-            status = returnvalues.CLIENT_ERROR
+    if offset > 0 or (max_jobs > 0 and max_jobs < total):
+        if offset > 0:
+            shown = 'jobs %d to %d' % (min(offset + 1, total),
+                                       offset + len(matches))
         else:
-            filelist += match
-
-    if sorted(flags):
-        sort(filelist)
-
-    if max_jobs > 0 and max_jobs < len(filelist):
+            shown = 'first %d' % max_jobs
         output_objects.append(
             {'object_type': 'text', 'text':
-             'Only showing first %d of the %d matching jobs as requested'
-             % (max_jobs, len(filelist))})
-        filelist = filelist[:max_jobs]
+             'Only showing %s of the %d matching jobs as requested'
+             % (shown, total)})
 
     # Iterate through jobs and list details for each
 
     job_list = {'object_type': 'job_list', 'jobs': []}
 
-    for filepath in filelist:
+    for (job_id, job_dict) in matches:
 
-        # Extract job_id from filepath (replace doesn't modify filepath)
+        # Only load the full mRSL file for details not in the summary
 
-        mrsl_file = filepath.replace(base_dir, '')
-        job_id = mrsl_file.replace('.mRSL', '')
-        job_dict = unpickle(filepath, logger)
-        if not job_dict:
-            status = returnvalues.CLIENT_ERROR
+        if verbose(flags) or (configuration.arc_clusters and
+                              job_dict.get('UNIQUE_RESOURCE_NAME',
+                                           'unset') == 'ARC' and
+                              job_dict['STATUS'] == 'EXECUTING'):
+            mrsl_file = job_id + '.mRSL'
+            full_dict = unpickle(base_dir + mrsl_file, logger)
+            if not full_dict:
+                status = returnvalues.CLIENT_ERROR
 
-            output_objects.append(
-                {'object_type': 'error_text', 'text':
-                 'No such job: %s (could not load mRSL file %s)' %
-                 (job_id, mrsl_file)})
-            continue
+                output_objects.append(
+                    {'object_type': 'error_text', 'text':
+                     'No such job: %s (could not load mRSL file %s)' %
+                     (job_id, mrsl_file)})
+                continue
 
-        # Expand any job variables before use
-        job_dict = expand_variables(job_dict)
+            # Expand any job variables before use
+            full_dict = expand_variables(full_dict)
+            full_dict.update(job_summary(full_dict))
+            job_dict = full_dict
 
         job_obj = {'object_type': 'job', 'job_id': job_id}
         job_obj['status'] = job_dict['STATUS']
 
-        time_fields = [
-            'VERIFIED',
-            'VERIFIED_TIMESTAMP',
-            'RECEIVED_TIMESTAMP',
-            'QUEUED_TIMESTAMP',
-            'SCHEDULE_TIMESTAMP',
-            'EXECUTING_TIMESTAMP',
-            'FINISHED_TIMESTAMP',
-            'FAILED_TIMESTAMP',
-            'CANCELED_TIMESTAMP',
-        ]
-        for name in time_fields:
+        for name in summary_time_fields:
             if name in job_dict:
 
                 # time objects cannot be marshalled, asctime if timestamp
@@ -284,12 +262,8 @@ contact the site admins.''' % configuration.short_title})
                     job_obj['execute'] = '%s ...' % command_line[:252]
                 else:
                     job_obj['execute'] = command_line
-            res_conf = job_dict.get('RESOURCE_CONFIG', {})
-            if 'RESOURCE_ID' in res_conf:
-                public_id = res_conf['RESOURCE_ID']
-                if res_conf.get('ANONYMOUS', True):
-                    public_id = anon_resource_id(public_id)
-                job_obj['resource'] = public_id
+            if 'RESOURCE' in job_dict:
+                job_obj['resource'] = job_dict['RESOURCE']
             if job_dict.get('PUBLICNAME', False):
                 job_obj['resource'] += ' (alias %(PUBLICNAME)s)' % job_dict
             if 'RESOURCE_VGRID' in job_dict:
@@ -331,8 +305,8 @@ contact the site admins.''' % configuration.short_title})
         if 'SCHEDULE_HINT' in job_dict:
             job_obj['schedule_hint'] = job_dict['SCHEDULE_HINT']
         # We should not show raw schedule_targets due to lack of anonymization
-        if 'SCHEDULE_TARGETS' in job_dict:
-            job_obj['schedule_hits'] = len(job_dict['SCHEDULE_TARGETS'])
+        if 'SCHEDULE_HITS' in job_dict:
+            job_obj['schedule_hits'] = job_dict['SCHEDULE_HITS']
         if 'EXPECTED_DELAY' in job_dict:
             # Catch None value
             if not job_dict['EXPECTED_DELAY']:
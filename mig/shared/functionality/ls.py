@@ -39,6 +39,7 @@ import time
 from mig.shared import returnvalues
 from mig.shared.base import client_id_dir, invisible_path
 from mig.shared.defaults import seafile_ro_dirname, trash_destdir, csrf_field
+from mig.shared.fileio import fileinfo_stat, list_dir_entries
 from mig.shared.functional import validate_input
 from mig.shared.handlers import get_csrf_limit, make_csrf_token
 from mig.shared.htmlgen import fancy_upload_js, fancy_upload_html, confirm_js, \
@@ -57,10 +58,32 @@ from mig.shared.vgrid import in_vgrid_share, in_vgrid_priv_web, in_vgrid_pub_web
 def signature():
     """Signature of the main function"""
     defaults = {'flags': [''], 'path': ['.'], 'share_id': [''],
-                'current_dir': ['.']}
+                'current_dir': ['.'], 'sort': ['name'], 'order': ['asc'],
+                'offset': ['0'], 'limit': ['0']}
     return ['dir_listings', defaults]
 
 
+# Supported sort orders for directory contents and their sort key functions
+# on DirEntry objects. Only the name order can be decided without stat calls.
+def _stat_key(field):
+    """Make sort key function for the given stat field of a DirEntry"""
+    def _key(entry):
+        try:
+            return (getattr(entry.stat(), field), entry.name)
+        except OSError:
+            return (0, entry.name)
+    return _key
+
+
+sort_keys = {'name': lambda entry: entry.name,
+             'size': _stat_key('st_size'),
+             'modified': _stat_key('st_mtime'),
+             'created': _stat_key('st_ctime'),
+             'accessed': _stat_key('st_atime'),
+             'ext': lambda entry: (os.path.splitext(entry.name)[1],
+                                   entry.name)}
+
+
 def select_all_javascript():
     """javascript to select all html checkboxes"""
     return """
@@ -111,36 +134,21 @@ function selectedFilesAction() {
     """
 
 
-def fileinfo_stat(path):
-    """Additional stat information for file manager"""
-    file_information = {'size': 0, 'created': 0, 'modified': 0, 'accessed': 0,
-                        'ext': ''}
-    if os.path.exists(path):
-        ext = 'dir'
-        if not os.path.isdir(path):
-            ext = os.path.splitext(path)[1].lstrip('.')
-        file_information['ext'] = ext
-        try:
-            file_information['size'] = os.path.getsize(path)
-            file_information['created'] = os.path.getctime(path)
-            file_information['modified'] = os.path.getmtime(path)
-            file_information['accessed'] = os.path.getatime(path)
-        except OSError as ose:
-            pass
-    return file_information
-
-
-def long_format(path):
-    """output extra info like filesize about the file located at path"""
+def long_format(path, stat_info=None):
+    """output extra info like filesize about the file located at path. The
+    optional stat_info can be used to pass an already available os.stat result
+    for path in order to avoid another stat call.
+    """
     format_line = ''
     perms = ''
 
     # Make a single stat call and extract all info from it
 
-    try:
-        stat_info = os.stat(path)
-    except Exception:
-        return 'Internal error: stat failed!'
+    if stat_info is None:
+        try:
+            stat_info = os.stat(path)
+        except Exception:
+            return 'Internal error: stat failed!'
 
     mode = stat_info.st_mode
     if stat.S_ISDIR(mode):
@@ -176,8 +184,11 @@ def handle_file(
     file_with_dir,
     actual_file,
     flags='',
+    stat_info=None,
 ):
-    """handle a file"""
+    """handle a file. The optional stat_info is the os.stat result for
+    actual_file if already available.
+    """
 
     # Build entire line before printing to avoid newlines
 
@@ -198,11 +209,17 @@ def handle_file(
         'flags': flags,
         'special': special,
     }
+    if stat_info is None and (long_list(flags) or file_info(flags)):
+        try:
+            stat_info = os.stat(actual_file)
+        except OSError:
+            pass
+
     if long_list(flags):
-        file_obj['long_format'] = long_format(actual_file)
+        file_obj['long_format'] = long_format(actual_file, stat_info)
 
     if file_info(flags):
-        file_obj['file_info'] = fileinfo_stat(actual_file)
+        file_obj['file_info'] = fileinfo_stat(actual_file, stat_info)
 
     listing.append(file_obj)
 
@@ -214,8 +231,13 @@ def handle_dir(
     dirname_with_dir,
     actual_dir,
     flags='',
+    stat_info=None,
+    real_dir=None,
 ):
-    """handle a dir"""
+    """handle a dir. The optional stat_info is the os.stat result and the
+    optional real_dir is the expanded real path for actual_dir if already
+    available.
+    """
 
     # Recursion can get here when called without explicit invisible files
 
@@ -223,7 +245,8 @@ def handle_dir(
         return
     special = ''
     extra_class = ''
-    real_dir = os.path.realpath(actual_dir)
+    if real_dir is None:
+        real_dir = os.path.realpath(actual_dir)
     abs_dir = os.path.abspath(actual_dir)
     # If we followed a symlink it is not a plain dir
     if real_dir != abs_dir:
@@ -284,15 +307,69 @@ def handle_dir(
         'extra_class': extra_class,
     }
 
+    if stat_info is None and (long_list(flags) or file_info(flags)):
+        try:
+            stat_info = os.stat(actual_dir)
+        except OSError:
+            pass
+
     if long_list(flags):
-        dir_obj['actual_dir'] = long_format(actual_dir)
+        dir_obj['actual_dir'] = long_format(actual_dir, stat_info)
 
     if file_info(flags):
-        dir_obj['file_info'] = fileinfo_stat(actual_dir)
+        dir_obj['file_info'] = fileinfo_stat(actual_dir, stat_info)
 
     listing.append(dir_obj)
 
 
+def _handle_entries(
+    configuration,
+    listing,
+    base_dir,
+    real_path,
+    relative_path,
+    entries,
+    flags='',
+    add_dots=True,
+):
+    """Add listing entries for the DirEntry objects in entries from the
+    real_path dir. Reuses the type and any stat info cached in each entry and
+    only expands symlinked entries to find their real path.
+    """
+
+    want_stat = long_list(flags) or file_info(flags)
+
+    # listdir does not include '.' and '..' - add manually
+    # to ease navigation
+
+    if add_dots and all(flags):
+        handle_dir(configuration, listing, '.', relative_path,
+                   real_path, flags)
+        handle_dir(configuration, listing, '..',
+                   os.path.dirname(relative_path),
+                   os.path.dirname(real_path), flags)
+    real_base = os.path.realpath(real_path)
+    for entry in entries:
+        name = entry.name
+        path = real_path + os.sep + name
+        rel_path = path.replace(base_dir, '')
+        stat_info = None
+        if want_stat:
+            try:
+                stat_info = entry.stat()
+            except OSError:
+                pass
+        if entry.is_file():
+            handle_file(configuration, listing, name, rel_path, path,
+                        flags, stat_info)
+        else:
+            real_dir = None
+            if not entry.is_symlink():
+                real_dir = real_base + os.sep + name
+            handle_dir(configuration, listing, name, rel_path, path,
+                       flags, stat_info, real_dir)
+
+
 def handle_ls(
     configuration,
     output_objects,
@@ -301,8 +378,17 @@ def handle_ls(
     real_path,
     flags='',
     depth=0,
+    sort_by='name',
+    reverse=False,
+    offset=0,
+    limit=0,
+    page_info=None,
 ):
-    """Recursive function to emulate GNU ls (-R)"""
+    """Recursive function to emulate GNU ls (-R). Directory contents are
+    sorted by the sort_by key from sort_keys and optionally limited to the
+    limit entries from offset in non-recursive mode. The total number of
+    entries is saved in the optional page_info dictionary in that case.
+    """
 
     _logger = configuration.logger
     op_name = 'ls'
@@ -332,70 +418,54 @@ def handle_ls(
     if os.path.isfile(real_path):
         handle_file(configuration, listing, base_name, relative_path,
                     real_path, flags)
-    else:
-        try:
-            contents = os.listdir(real_path)
-        except Exception as exc:
-            _logger.error('%s failed on %r: %s' % (op_name, real_path, exc))
-            output_objects.append({'object_type': 'error_text', 'text':
-                                   'Failed to list contents of %r' % base_name
-                                   })
-            return (output_objects, returnvalues.SYSTEM_ERROR)
-
-        # Filter out dot files unless '-a' is used
-
-        if not all(flags):
-            contents = [i for i in contents if not i.startswith('.')]
-        contents.sort()
-
-        if not recursive(flags) or depth < 0:
-
-            # listdir does not include '.' and '..' - add manually
-            # to ease navigation
-
-            if all(flags):
-                handle_dir(configuration, listing, '.', relative_path,
-                           real_path, flags)
-                handle_dir(configuration, listing, '..',
-                           os.path.dirname(relative_path),
-                           os.path.dirname(real_path), flags)
-            for name in contents:
-                path = real_path + os.sep + name
-                rel_path = path.replace(base_dir, '')
-                if os.path.isfile(path):
-                    handle_file(configuration, listing, name, rel_path, path,
-                                flags)
-                else:
-                    handle_dir(configuration, listing, name, rel_path, path,
-                               flags)
+        return
+
+    # NOTE: a single scandir pass provides names, types and cached stats
+    try:
+        entries = list_dir_entries(real_path)
+    except Exception as exc:
+        _logger.error('%s failed on %r: %s' % (op_name, real_path, exc))
+        output_objects.append({'object_type': 'error_text', 'text':
+                               'Failed to list contents of %r' % base_name
+                               })
+        return (output_objects, returnvalues.SYSTEM_ERROR)
+
+    # Filter out dot files unless '-a' is used
+
+    if not all(flags):
+        entries = [i for i in entries if not i.name.startswith('.')]
+    entries.sort(key=sort_keys.get(sort_by, sort_keys['name']),
+                 reverse=reverse)
+
+    if not recursive(flags):
+        if page_info is not None:
+            page_info['total'] = len(entries)
+        if limit > 0:
+            page = entries[offset:offset + limit]
         else:
+            page = entries[offset:]
+        _handle_entries(configuration, listing, base_dir, real_path,
+                        relative_path, page, flags, offset == 0)
+        return
 
-            # Force pure content listing first by passing a negative depth
+    # Pure content listing first and then recurse into sub dirs
 
+    _handle_entries(configuration, listing, base_dir, real_path,
+                    relative_path, entries, flags)
+    for entry in entries:
+        if entry.is_dir():
             handle_ls(
                 configuration,
                 output_objects,
                 listing,
                 base_dir,
-                real_path,
+                real_path + os.sep + entry.name,
                 flags,
-                -1,
+                depth + 1,
+                sort_by,
+                reverse,
             )
 
-            for name in contents:
-                path = real_path + os.sep + name
-                rel_path = path.replace(base_dir, '')
-                if os.path.isdir(path):
-                    handle_ls(
-                        configuration,
-                        output_objects,
-                        listing,
-                        base_dir,
-                        path,
-                        flags,
-                        depth + 1,
-                    )
-
 
 def main(client_id, user_arguments_dict, environ=None):
     """Main function used by front end"""
@@ -422,6 +492,20 @@ def main(client_id, user_arguments_dict, environ=None):
     pattern_list = accepted['path']
     current_dir = accepted['current_dir'][-1].lstrip('/')
     share_id = accepted['share_id'][-1]
+    sort_by = accepted['sort'][-1]
+    reverse = accepted['order'][-1] == 'desc'
+    try:
+        offset = max(0, int(accepted['offset'][-1]))
+        limit = max(0, int(accepted['limit'][-1]))
+    except ValueError as err:
+        output_objects.append({'object_type': 'error_text', 'text':
+                               'Invalid offset or limit: %s' % err})
+        return (output_objects, returnvalues.CLIENT_ERROR)
+    if sort_by not in sort_keys:
+        output_objects.append({'object_type': 'error_text', 'text':
+                               'Invalid sort order: %s (allowed: %s)' %
+                               (sort_by, ', '.join(sorted(sort_keys)))})
+        return (output_objects, returnvalues.CLIENT_ERROR)
 
     status = returnvalues.OK
 
@@ -706,11 +790,16 @@ Action on paths selected below
             else:
                 relative_path = abs_path.replace(base_dir, '')
             entries = []
+            page_info = {}
             dir_listing = {
                 'object_type': 'dir_listing',
                 'relative_path': relative_path,
                 'entries': entries,
                 'flags': flags,
+                'sort': sort_by,
+                'order': accepted['order'][-1],
+                'offset': offset,
+                'limit': limit,
             }
             try:
                 gdp_iolog(configuration,
@@ -726,7 +815,11 @@ Action on paths selected below
                                                             relative_path)})
                 continue
             handle_ls(configuration, output_objects, entries, base_dir,
-                      abs_path, flags, 0)
+                      abs_path, flags, 0, sort_by, reverse, offset, limit,
+                      page_info)
+            # NOTE: total number of entries lets clients request more pages
+            if 'total' in page_info:
+                dir_listing['total_entries'] = page_info['total']
             dir_listings.append(dir_listing)
 
     output_objects.append({'object_type': 'html_form', 'text': """<br/>
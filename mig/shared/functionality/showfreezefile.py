@@ -36,10 +36,11 @@ import os
 
 from mig.shared import returnvalues
 from mig.shared.base import client_id_dir
-from mig.shared.fileio import read_file, read_file_lines
+from mig.shared.fileio import read_file_lines
 from mig.shared.freezefunctions import is_frozen_archive
 from mig.shared.functional import validate_input_and_cert, REJECT_UNSET
 from mig.shared.init import initialize_main_variables
+from mig.shared.streaming import make_file_stream
 from mig.shared.validstring import valid_user_path
 
 
@@ -111,20 +112,19 @@ archive dir.'''})
     output_lines = []
     try:
         if force_file:
-            # NOTE: we need to preserve binary data
-            output_lines = [read_file(abs_path, logger, mode='rb')]
+            # NOTE: stream binary data to avoid loading big files in memory
+            entry = make_file_stream(abs_path)
         else:
             output_lines += read_file_lines(abs_path, logger, mode='r')
-        entry = {'object_type': 'file_output',
-                 'lines': output_lines,
-                 'wrap_binary': True,
-                 'wrap_targets': ['lines']}
+            entry = {'object_type': 'file_output',
+                     'lines': output_lines,
+                     'wrap_binary': True,
+                     'wrap_targets': ['lines']}
 
         # NOTE: override normal delivery if download was requested
         if force_file:
-            logger.info('return %db from archive private file %s of size %db' %
-                        (len(output_lines[0]), abs_path,
-                         os.path.getsize(abs_path)))
+            logger.info('stream archive private file %s of size %db' %
+                        (abs_path, entry['size']))
             # Cut away all the usual web page formatting to show only contents
             # Insert explicit content type for a better client experience and
             # to make sure clients don't break download early because they
@@ -136,8 +136,7 @@ archive dir.'''})
             output_objects = [{'object_type': 'start',
                                'headers': [
                                    ('Content-Type', content_type),
-                                   ('Content-Length', "%d" %
-                                    len(output_lines[0])),
+                                   ('Content-Length', "%d" % entry['size']),
                                    ('Content-Disposition',
                                     'attachment; filename="%s";' %
                                     os.path.basename(abs_path))
@@ -32,6 +32,8 @@ import time
 import traceback
 from mig.shared.fileio import pickle, unpickle, acquire_file_lock, \
     release_file_lock, touch
+from mig.shared.griddaemons.statedb import use_state_db, db_user_hits, \
+    db_update_rate_limit, db_expire_rate_limit
 
 default_max_user_hits, default_fail_cache = 5, 120
 default_user_abuse_hits = 25
@@ -147,12 +149,16 @@ def hit_rate_limit(configuration, proto, client_address, client_id,
     logger = configuration.logger
     refuse = False
 
-    _rate_limits = _load_rate_limits(configuration, proto)
-    _address_limits = _rate_limits.get(client_address, {})
-    _proto_limits = _address_limits.get(proto, {})
-    _user_limits = _proto_limits.get(client_id, {})
-    proto_hits = _proto_limits.get('hits', 0)
-    user_hits = _user_limits.get('hits', 0)
+    if use_state_db(configuration):
+        (proto_hits, user_hits) = db_user_hits(configuration, proto,
+                                               client_address, client_id)
+    else:
+        _rate_limits = _load_rate_limits(configuration, proto)
+        _address_limits = _rate_limits.get(client_address, {})
+        _proto_limits = _address_limits.get(proto, {})
+        _user_limits = _proto_limits.get(client_id, {})
+        proto_hits = _proto_limits.get('hits', 0)
+        user_hits = _user_limits.get('hits', 0)
     if user_hits >= max_user_hits:
         refuse = True
 
@@ -214,6 +220,25 @@ def update_rate_limit(configuration, proto, client_address, client_id,
     if not secret:
         secret = timestamp
 
+    if use_state_db(configuration):
+        try:
+            ((old_proto_hits, old_user_hits, _), (proto_hits, user_hits, _),
+             secret_hits) = db_update_rate_limit(configuration, proto,
+                                                 client_address, client_id,
+                                                 login_success, secret,
+                                                 timestamp)
+            # NOTE: limits are kept per proto so address and proto hits match
+            address_hits = proto_hits
+        except Exception as exc:
+            logger.error("update %s Rate limit failed: %s" % (proto, exc))
+            logger.info(traceback.format_exc())
+        if user_hits != old_user_hits:
+            logger.info("update %s rate limit" % proto
+                        + " %s for %s" % (status[login_success],
+                                          client_address)
+                        + " from %d to %d hits" % (old_user_hits, user_hits))
+        return (address_hits, proto_hits, user_hits, secret_hits)
+
     rate_limits_lock = _acquire_rate_limits_lock(
         configuration, proto, exclusive=True)
     _rate_limits = _load_rate_limits(configuration, proto, do_lock=False)
@@ -329,6 +354,20 @@ def expire_rate_limit(configuration, proto,
                      % (-expired, expire_delay))
         return expired
 
+    if use_state_db(configuration):
+        # NOTE: the timestamp index limits the work to the expired entries
+        try:
+            expired = db_expire_rate_limit(configuration, proto,
+                                           now - fail_cache)
+        except Exception as exc:
+            logger.error("expire rate limit failed: %s" % exc)
+            logger.info(traceback.format_exc())
+        if expired:
+            logger.info("expire %s rate limit expired %d items" % (proto,
+                                                                   expired))
+        _set_last_expire(configuration, proto)
+        return expired
+
     rate_limits_lock = _acquire_rate_limits_lock(
         configuration, proto, exclusive=True)
     _rate_limits = _load_rate_limits(configuration, proto, do_lock=False)
@@ -40,6 +40,9 @@ from mig.shared.base import brief_list
 from mig.shared.defaults import io_session_timeout, io_session_stale
 from mig.shared.fileio import pickle, unpickle, acquire_file_lock, \
     release_file_lock
+from mig.shared.griddaemons.statedb import use_state_db, db_open_session, \
+    db_get_session, db_open_sessions, db_count_sessions, db_close_sessions, \
+    db_clear_sessions
 
 _sessions_filename = "sessions.pck"
 
@@ -109,6 +112,8 @@ def _save_sessions(configuration,
 def clear_sessions(configuration, proto, do_lock=True):
     """Clear sessions"""
     logger = configuration.logger
+    if use_state_db(configuration):
+        return db_clear_sessions(configuration, proto)
     return _save_sessions(configuration, proto, {}, do_lock=do_lock)
 
 
@@ -134,6 +139,18 @@ def track_open_session(configuration,
     result = None
     if not session_id:
         session_id = "%s:%s" % (client_address, client_port)
+    if use_state_db(configuration):
+        try:
+            result = db_open_session(configuration, proto, client_id,
+                                     session_id, client_address, client_port,
+                                     authorized, time.time())
+            logger.debug("tracking open %s session %s for %r" %
+                         (proto, session_id, client_id))
+        except Exception as exc:
+            result = None
+            logger.error("track open %s session %s for %r failed: %s" %
+                         (proto, session_id, client_id, exc))
+        return result
     if do_lock:
         sessions_lock = _acquire_sessions_lock(
             configuration, proto, exclusive=True)
@@ -185,6 +202,8 @@ def get_active_session(configuration,
     #              % (proto, client_id, session_id) \
     #              + " do_lock: %s" % do_lock)
     result = None
+    if use_state_db(configuration):
+        return db_get_session(configuration, proto, client_id, session_id)
     _active_sessions = _load_sessions(configuration, proto, do_lock=do_lock)
     result = _active_sessions.get(client_id, {}).get(proto,
                                                      {}).get(session_id, {})
@@ -200,6 +219,8 @@ def get_open_sessions(configuration, proto, client_id=None, do_lock=True):
     # logger.debug("proto: '%s', client_id: %s, do_lock: %s"
     #              % (proto, client_id, do_lock))
     result = {}
+    if use_state_db(configuration):
+        return db_open_sessions(configuration, proto, client_id=client_id)
     _active_sessions = _load_sessions(configuration, proto, do_lock=do_lock)
     # logger.debug("__active_sessions: %s" % __active_sessions)
     if client_id is not None:
@@ -224,6 +245,14 @@ def track_close_session_list(configuration, proto, session_list, do_lock=True):
     if not session_list:
         return result
 
+    if use_state_db(configuration):
+        result = db_close_sessions(configuration, proto,
+                                   [(i['client_id'], i['session_id'],
+                                     i['timestamp']) for i in session_list])
+        logger.debug("track close session list for proto %s returns %s" %
+                     (proto, brief_list([i['session_id'] for i in result])))
+        return result
+
     # Lock for critical section with load, update and save sessions
     if do_lock:
         sessions_lock = _acquire_sessions_lock(configuration, proto,
@@ -288,6 +317,29 @@ def track_close_session(configuration,
     if not session_id:
         session_id = "%s:%s" % (client_address, client_port)
 
+    if use_state_db(configuration):
+        try:
+            closed = db_close_sessions(configuration, proto,
+                                       [(client_id, session_id, timestamp)])
+            if closed:
+                result = closed[0]
+                logger.debug("tracking close %s session %s for %r" %
+                             (proto, session_id, client_id))
+            else:
+                # NOTE: like below a session with other timestamp is returned
+                result = db_get_session(configuration, proto, client_id,
+                                        session_id)
+                if not result:
+                    logger.warning("track close session: %r NOT found for "
+                                   "proto: '%s', client: '%s'" %
+                                   (session_id, proto, client_id))
+        except Exception as exc:
+            result = None
+            logger.error("track close session failed for client: %s with "
+                         "session id: %s, error: %s" % (client_id, session_id,
+                                                        exc))
+        return result
+
     if do_lock:
         sessions_lock = _acquire_sessions_lock(
             configuration, proto, exclusive=True)
@@ -345,6 +397,17 @@ def track_close_expired_sessions(
     # logger.debug(msg)
     result = {}
     session_timeout = io_session_timeout.get(proto, 0)
+    if use_state_db(configuration):
+        # NOTE: the timestamp index limits the lookup to the expired sessions
+        expired_sessions = db_open_sessions(
+            configuration, proto, client_id=client_id,
+            older_than=time.time() - session_timeout)
+        for closed_session in db_close_sessions(
+                configuration, proto,
+                [(i['client_id'], i['session_id'], i['timestamp']) for i in
+                 expired_sessions.values()]):
+            result[closed_session['session_id']] = closed_session
+        return result
     if do_lock:
         sessions_lock = _acquire_sessions_lock(
             configuration, proto, exclusive=True)
@@ -381,6 +444,9 @@ def active_sessions(configuration,
     """Look up how many active proto sessions client_id has running"""
     logger = configuration.logger
 
+    if use_state_db(configuration):
+        return db_count_sessions(configuration, proto, client_id)
+
     open_sessions = get_open_sessions(configuration,
                                       proto,
                                       client_id=client_id,
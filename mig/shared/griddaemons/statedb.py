@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# statedb - shared rate limit and session tables for the grid daemons
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Optional SQLite backend for the grid daemon rate limits and sessions.
+
+The classic backend keeps a pickled dictionary per protocol in mig_system_run
+and loads and saves it in full under a file lock on every login attempt. This
+backend instead keeps a row per rate limit secret and per session in a small
+database next to those pickles. The database is memory mapped and runs in WAL
+mode, so all daemon processes and the web backends share the same tables with
+indexed lookups and single row updates. Expiry uses the timestamp index to
+visit only the entries old enough to expire.
+
+As mig_system_run is typically on tmpfs the tables live in memory but survive
+daemon restarts just like the pickles.
+"""
+
+from __future__ import absolute_import
+
+import os
+import sqlite3
+import threading
+
+state_db_name = 'daemon_state.db'
+# Let sqlite memory map up to this many bytes of the database
+state_db_mmap_size = 64 * 1024 * 1024
+
+_connections = threading.local()
+
+
+def use_state_db(configuration):
+    """Check if configuration selects the sqlite state backend"""
+    return getattr(configuration, 'site_daemon_state_backend',
+                   'pickle') == 'sqlite'
+
+
+def _state_db_path(configuration):
+    """Path to the daemon state database"""
+    return os.path.join(configuration.mig_system_run, state_db_name)
+
+
+def get_state_db(configuration):
+    """Get a connection to the daemon state database for the current thread.
+    The connection is reused for later calls in the same thread, since sqlite
+    connections may not be shared between threads.
+    """
+    db_path = _state_db_path(configuration)
+    cached = getattr(_connections, 'cache', None)
+    if cached is None:
+        cached = _connections.cache = {}
+    conn = cached.get(db_path, None)
+    if conn is None:
+        # NOTE: autocommit mode and explicit transactions for updates
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA mmap_size=%d' % state_db_mmap_size)
+        conn.execute('''CREATE TABLE IF NOT EXISTS rate_limits (
+            proto TEXT NOT NULL, address TEXT NOT NULL,
+            client_id TEXT NOT NULL, secret TEXT NOT NULL,
+            hits INTEGER NOT NULL, timestamp REAL NOT NULL,
+            PRIMARY KEY (proto, address, client_id, secret))''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS rate_limits_expire
+            ON rate_limits (proto, timestamp)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS sessions (
+            proto TEXT NOT NULL, client_id TEXT NOT NULL,
+            session_id TEXT NOT NULL, ip_addr TEXT, tcp_port INTEGER,
+            authorized INTEGER NOT NULL, timestamp REAL NOT NULL,
+            PRIMARY KEY (proto, client_id, session_id))''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS sessions_expire
+            ON sessions (proto, timestamp)''')
+        cached[db_path] = conn
+    return conn
+
+
+def close_state_db(configuration):
+    """Close any state database connection of the current thread"""
+    cached = getattr(_connections, 'cache', {})
+    conn = cached.pop(_state_db_path(configuration), None)
+    if conn is not None:
+        conn.close()
+
+
+def _count_hits(conn, proto, address, client_id=None):
+    """Count (hits, fails) for address or for client_id from address"""
+    if client_id is None:
+        row = conn.execute('''SELECT COUNT(*), SUM(hits) FROM rate_limits
+        WHERE proto = ? AND address = ?''', (proto, address)).fetchone()
+    else:
+        row = conn.execute('''SELECT COUNT(*), SUM(hits) FROM rate_limits
+        WHERE proto = ? AND address = ? AND client_id = ?''',
+                           (proto, address, client_id)).fetchone()
+    return (row[0], row[1] or 0)
+
+
+def db_user_hits(configuration, proto, address, client_id):
+    """Returns (proto_hits, user_hits) for client_id from address where hits
+    are the number of distinct failed secrets.
+    """
+    conn = get_state_db(configuration)
+    (proto_hits, _) = _count_hits(conn, proto, address)
+    (user_hits, _) = _count_hits(conn, proto, address, client_id)
+    return (proto_hits, user_hits)
+
+
+def db_update_rate_limit(configuration, proto, address, client_id,
+                         login_success, secret, timestamp):
+    """Register a login attempt for client_id from address. A success clears
+    all failures for the user whereas a failure increments hits for secret.
+    Returns tuple with old and new (proto_hits, user_hits, user_fails) and the
+    new secret_hits.
+    """
+    conn = get_state_db(configuration)
+    secret = '%s' % secret
+    secret_hits = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        (old_proto_hits, old_proto_fails) = _count_hits(conn, proto, address)
+        (old_user_hits, old_user_fails) = _count_hits(conn, proto, address,
+                                                      client_id)
+        if login_success:
+            conn.execute('''DELETE FROM rate_limits WHERE proto = ? AND
+            address = ? AND client_id = ?''', (proto, address, client_id))
+            proto_hits = old_proto_hits - old_user_hits
+            (user_hits, user_fails) = (0, 0)
+        else:
+            row = conn.execute('''SELECT hits FROM rate_limits WHERE
+            proto = ? AND address = ? AND client_id = ? AND secret = ?''',
+                               (proto, address, client_id, secret)).fetchone()
+            secret_hits = 1
+            new_hits = 1
+            if row is not None:
+                secret_hits += row[0]
+                new_hits = 0
+            conn.execute('''INSERT OR REPLACE INTO rate_limits (proto,
+            address, client_id, secret, hits, timestamp) VALUES (?, ?, ?, ?,
+            ?, ?)''', (proto, address, client_id, secret, secret_hits,
+                       timestamp))
+            proto_hits = old_proto_hits + new_hits
+            (user_hits, user_fails) = (old_user_hits + new_hits,
+                                       old_user_fails + 1)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return ((old_proto_hits, old_user_hits, old_user_fails),
+            (proto_hits, user_hits, user_fails), secret_hits)
+
+
+def db_expire_rate_limit(configuration, proto, expire_before):
+    """Remove all proto rate limit entries last updated before the
+    expire_before timestamp. Returns the number of expired entries.
+    """
+    conn = get_state_db(configuration)
+    cursor = conn.execute('''DELETE FROM rate_limits WHERE proto = ? AND
+    timestamp < ?''', (proto, expire_before))
+    return cursor.rowcount
+
+
+def _session_dict(row):
+    """Build a session dictionary like the pickled one from db row"""
+    (client_id, session_id, ip_addr, tcp_port, authorized, timestamp) = row
+    return {'session_id': session_id, 'client_id': client_id,
+            'ip_addr': ip_addr, 'tcp_port': tcp_port,
+            'authorized': bool(authorized), 'timestamp': timestamp}
+
+
+_session_fields = 'client_id, session_id, ip_addr, tcp_port, authorized, ' \
+    'timestamp'
+
+
+def db_open_session(configuration, proto, client_id, session_id, ip_addr,
+                    tcp_port, authorized, timestamp):
+    """Insert or refresh session_id for client_id and return it"""
+    conn = get_state_db(configuration)
+    conn.execute('''INSERT OR REPLACE INTO sessions (proto, %s) VALUES (?, ?,
+    ?, ?, ?, ?, ?)''' % _session_fields,
+                 (proto, client_id, session_id, ip_addr, tcp_port,
+                  int(bool(authorized)), timestamp))
+    return _session_dict((client_id, session_id, ip_addr, tcp_port,
+                          authorized, timestamp))
+
+
+def db_get_session(configuration, proto, client_id, session_id):
+    """Returns session_id of client_id or an empty dictionary if not found"""
+    conn = get_state_db(configuration)
+    row = conn.execute('''SELECT %s FROM sessions WHERE proto = ? AND
+    client_id = ? AND session_id = ?''' % _session_fields,
+                       (proto, client_id, session_id)).fetchone()
+    if row is None:
+        return {}
+    return _session_dict(row)
+
+
+def db_open_sessions(configuration, proto, client_id=None,
+                     older_than=None):
+    """Returns dictionary {session_id: session} with open proto sessions for
+    client_id or all users if None. The optional older_than timestamp limits
+    the result to sessions last updated before then.
+    """
+    conn = get_state_db(configuration)
+    query = 'SELECT %s FROM sessions WHERE proto = ?' % _session_fields
+    args = [proto]
+    if client_id is not None:
+        query += ' AND client_id = ?'
+        args.append(client_id)
+    if older_than is not None:
+        query += ' AND timestamp < ?'
+        args.append(older_than)
+    result = {}
+    for row in conn.execute(query, args):
+        session = _session_dict(row)
+        result[session['session_id']] = session
+    return result
+
+
+def db_count_sessions(configuration, proto, client_id):
+    """Returns the number of open proto sessions for client_id"""
+    conn = get_state_db(configuration)
+    row = conn.execute('''SELECT COUNT(*) FROM sessions WHERE proto = ? AND
+    client_id = ?''', (proto, client_id)).fetchone()
+    return row[0]
+
+
+def db_close_sessions(configuration, proto, session_list):
+    """Remove the sessions in session_list, which are (client_id, session_id,
+    timestamp) tuples. Sessions are only removed if timestamp is None or
+    matches the one saved. Returns list with closed session dictionaries.
+    """
+    conn = get_state_db(configuration)
+    result = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for (client_id, session_id, timestamp) in session_list:
+            row = conn.execute('''SELECT %s FROM sessions WHERE proto = ? AND
+            client_id = ? AND session_id = ?''' % _session_fields,
+                               (proto, client_id, session_id)).fetchone()
+            if row is None:
+                continue
+            session = _session_dict(row)
+            if timestamp is not None and timestamp != session['timestamp']:
+                continue
+            conn.execute('''DELETE FROM sessions WHERE proto = ? AND
+            client_id = ? AND session_id = ?''', (proto, client_id,
+                                                  session_id))
+            result.append(session)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return result
+
+
+def db_clear_sessions(configuration, proto):
+    """Remove all proto sessions"""
+    conn = get_state_db(configuration)
+    conn.execute('DELETE FROM sessions WHERE proto = ?', (proto, ))
+    return True
@@ -40,6 +40,7 @@ from tables import open_file
 import tables.exceptions
 import tables.tableextension
 
+from mig.shared.base import force_utf8
 from mig.shared.fileio import acquire_file_lock, release_file_lock
 
 __revision = '3332'
@@ -543,6 +544,26 @@ def __get_data_node_name(logger, path, name):
     return result
 
 
+def __match_condition(column_values):
+    """Build a table query condition matching all the (column, value) pairs
+    in *column_values* where value is not None. The values are passed to
+    PyTables as condition variables rather than inlined in the condition so
+    that quotes and control characters in e.g. names are matched as is.
+    Returns a (condition, condvars) tuple where condition is '' if no values
+    were given.
+    """
+
+    condition_list = []
+    condvars = {}
+    for (column, value) in column_values:
+        if value is None:
+            continue
+        var_name = '%s_value' % column
+        condition_list.append('(%s == %s)' % (column, var_name))
+        condvars[var_name] = force_utf8(value)
+    return (' & '.join(condition_list), condvars)
+
+
 def __modify_table(
     logger,
     abs_base_path,
@@ -551,9 +572,10 @@ def __modify_table(
     condition,
     overwrite,
     create,
+    condvars=None,
 ):
     """Modify table with *table_name* with
-    the entries in *settings* based on *condition*"""
+    the entries in *settings* based on *condition* and *condvars*"""
 
     result = False
 
@@ -570,6 +592,7 @@ def __modify_table(
                 setting,
                 overwrite,
                 create,
+                condvars,
             )
         __close_image_settings_file(logger, metafile)
 
@@ -609,8 +632,10 @@ def __modify_table_rows(
     modify_dict,
     overwrite=False,
     create=True,
+    condvars=None,
 ):
     """Modify *table* rows with entries in *modify_dict* based on *condition*
+    with any variables in *condvars*.
     if *overwrite* and *create* are both *True* then a new entry is added only
     if no existing entry is updated (overwritten)"""
 
@@ -618,7 +643,7 @@ def __modify_table_rows(
     updated_nrows = 0
     if overwrite:
         if condition is not None and condition != '':
-            rows = table.where(condition)
+            rows = table.where(condition, condvars)
         else:
             rows = table.iterrows()
 
@@ -640,18 +665,64 @@ def __modify_table_rows(
     return result
 
 
-def __get_row_idx_list(logger, table, condition):
-    """Get a list of row indexes from *table*, based
-    on *condition*, if condition is '' return all row indexes"""
+def __get_row_idx_list(logger, table, condition, condvars=None):
+    """Get a list of row indexes from *table*, based on *condition* with any
+    variables in *condvars*, if condition is '' return all row indexes"""
 
     if condition is None or condition == '':
         row_idx_list = [i for i in range(table.nrows)]
     else:
-        row_idx_list = table.get_where_list(condition)
+        row_idx_list = table.get_where_list(condition, condvars)
 
     return row_idx_list
 
 
+def __read_rows(
+    logger,
+    table,
+    condition,
+    offset=0,
+    limit=0,
+    columns=None,
+    condvars=None,
+):
+    """Bulk read rows from *table* matching *condition* with any variables in
+    *condvars* or all rows if condition is ''. The matching rows are read in a single request with
+    *offset* and *limit* applied first, where a limit of 0 means no limit.
+    Returns a list of dicts with the values of *columns* or of all columns if
+    None.
+    """
+
+    if limit > 0:
+        stop = offset + limit
+    else:
+        stop = None
+    if condition is None or condition == '':
+        if stop is None:
+            stop = table.nrows
+        rows = table.read(start=min(offset, table.nrows),
+                          stop=min(stop, table.nrows))
+    else:
+        row_idx_list = table.get_where_list(condition, condvars)[offset:stop]
+        if len(row_idx_list) > 0:
+            rows = table.read_coordinates(row_idx_list)
+        else:
+            rows = table.read(start=0, stop=0)
+
+    if columns is None:
+        columns = table.colnames
+    else:
+        columns = [i for i in columns if i in table.colnames]
+
+    # NOTE: extract each column in one go and zip them into entries. Values
+    #       are numpy scalars just like in single row lookups
+
+    column_values = [list(rows[name]) for name in columns]
+    logger.debug('read %d rows with %d columns' % (len(rows),
+                                                   len(columns)))
+    return [dict(zip(columns, values)) for values in zip(*column_values)]
+
+
 def __remove_row(
     logger,
     metafile,
@@ -702,19 +773,13 @@ def __remove_image_files(
     if metafile is not None:
         image_file_table = __get_image_file_meta_node(logger, metafile)
 
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         row_list = __get_row_idx_list(logger, image_file_table,
-                                      condition)
+                                      condition, condvars)
 
         logger.debug('Removing #%s row(s)' % len(row_list))
 
@@ -745,7 +810,7 @@ def __remove_image_files(
                 image_file_table = __remove_row(logger, metafile,
                                                 image_file_table, row_idx)
                 row_list = __get_row_idx_list(logger, image_file_table,
-                                              condition)
+                                              condition, condvars)
             else:
                 status = False
 
@@ -906,19 +971,13 @@ def __remove_image_volumes(
         image_volume_table = __get_image_volume_meta_node(logger,
                                                           metafile)
 
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         row_list = __get_row_idx_list(logger, image_volume_table,
-                                      condition)
+                                      condition, condvars)
 
         logger.debug('removing #%s row(s)' % len(row_list))
 
@@ -941,7 +1000,7 @@ def __remove_image_volumes(
                 image_volume_table = __remove_row(logger, metafile,
                                                   image_volume_table, row_idx)
                 row_list = __get_row_idx_list(logger,
-                                              image_volume_table, condition)
+                                              image_volume_table, condition, condvars)
             else:
                 status = False
 
@@ -1109,8 +1168,8 @@ def add_image_file_setting(
     if extension is None:
         result = False
     else:
-        condition = 'extension == b"%s"' % extension
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         result = __modify_table(
             logger,
@@ -1120,6 +1179,7 @@ def add_image_file_setting(
             condition,
             overwrite,
             create=True,
+            condvars=condvars,
         )
 
     return result
@@ -1138,10 +1198,9 @@ def update_image_file_setting(logger, abs_base_path,
 
     result = True
     extension = image_file_setting.get('extension', None)
-    condition = ''
-    if extension is not None and extension != '':
-        condition = 'extension == b"%s"' % extension
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('extension',
+                                                extension or None)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -1151,6 +1210,7 @@ def update_image_file_setting(logger, abs_base_path,
         condition,
         overwrite=True,
         create=False,
+        condvars=condvars,
     )
 
     return result
@@ -1179,12 +1239,10 @@ def remove_image_file_settings(logger, abs_base_path, extension=None):
         settings_table = __get_image_file_settings_node(logger,
                                                         metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = 'extension == b"%s"' % extension
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
-        row_list = __get_row_idx_list(logger, settings_table, condition)
+        row_list = __get_row_idx_list(logger, settings_table, condition, condvars)
 
         logger.debug('row_list: %s' % row_list)
         while status and len(row_list) > 0:
@@ -1200,7 +1258,7 @@ def remove_image_file_settings(logger, abs_base_path, extension=None):
                 settings_table = __remove_row(logger, metafile,
                                               settings_table, row_idx)
                 row_list = __get_row_idx_list(logger, settings_table,
-                                              condition)
+                                              condition, condvars)
             else:
                 status = False
 
@@ -1235,15 +1293,10 @@ def add_image_file(
     logger.debug('abs_base_path: %s, path: %s, name: %s, extension: %s'
                  % (abs_base_path, path, name, extension))
 
-    condition = ''
-    if path is not None:
-        condition = '%s & (path == b"%s")' % (condition, path)
-    if name is not None:
-        condition = '%s & (name == b"%s")' % (condition, name)
-    if extension is not None:
-        condition = '%s & (extension == b"%s")' % (condition, extension)
-    condition = condition.replace(' & ', '', 1)
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('path', path),
+                                               ('name', name),
+                                               ('extension', extension)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -1253,6 +1306,7 @@ def add_image_file(
         condition,
         overwrite,
         create=True,
+        condvars=condvars,
     )
 
     return result
@@ -1273,15 +1327,10 @@ def update_image_file(logger, abs_base_path, image_file):
     name = image_file.get('name', None)
     extension = image_file.get('extension', None)
 
-    condition = ''
-    if path is not None:
-        condition = '%s & (path == b"%s")' % (condition, path)
-    if name is not None:
-        condition = '%s & (name == b"%s")' % (condition, name)
-    if extension is not None:
-        condition = '%s & (extension == b"%s")' % (condition, extension)
-    condition = condition.replace(' & ', '', 1)
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('path', path),
+                                               ('name', name),
+                                               ('extension', extension)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -1291,6 +1340,7 @@ def update_image_file(logger, abs_base_path, image_file):
         condition,
         overwrite=True,
         create=False,
+        condvars=condvars,
     )
 
     return result
@@ -1344,8 +1394,17 @@ def get_image_file_setting(logger, abs_base_path, extension):
     return result
 
 
-def get_image_file_settings(logger, abs_base_path, extension=None):
-    """Get image file settings"""
+def get_image_file_settings(
+    logger,
+    abs_base_path,
+    extension=None,
+    offset=0,
+    limit=0,
+    columns=None,
+):
+    """Get image file settings. The optional *offset* and *limit* select a
+    page of the settings and *columns* a subset of the fields.
+    """
 
     logger.debug('abs_base_path: %s, extension: %s' % (abs_base_path,
                                                        extension))
@@ -1355,50 +1414,16 @@ def get_image_file_settings(logger, abs_base_path, extension=None):
     metafile = __open_image_settings_file(logger, abs_base_path)
 
     if metafile is not None:
-        result = []
         image_settings_table = __get_image_file_settings_node(logger,
                                                               metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = 'extension == b"%s" ' % extension
-        logger.debug('condition: %s' % condition)
-
-        row_list = __get_row_idx_list(logger, image_settings_table,
-                                      condition)
-        logger.debug('row_list len: %s' % len(row_list))
-
-        for row_idx in row_list:
-            entry = {}
-            entry['extension'] = \
-                image_settings_table[row_idx]['extension']
-            entry['settings_status'] = \
-                image_settings_table[row_idx]['settings_status']
-            entry['settings_update_progress'] = \
-                image_settings_table[row_idx]['settings_update_progress'
-                                              ]
-            entry['settings_recursive'] = \
-                image_settings_table[row_idx]['settings_recursive']
-            entry['image_type'] = \
-                image_settings_table[row_idx]['image_type']
-            entry['data_type'] = \
-                image_settings_table[row_idx]['data_type']
-            entry['offset'] = image_settings_table[row_idx]['offset']
-            entry['x_dimension'] = \
-                image_settings_table[row_idx]['x_dimension']
-            entry['y_dimension'] = \
-                image_settings_table[row_idx]['y_dimension']
-            entry['preview_image_extension'] = \
-                image_settings_table[row_idx]['preview_image_extension']
-            entry['preview_x_dimension'] = \
-                image_settings_table[row_idx]['preview_x_dimension']
-            entry['preview_y_dimension'] = \
-                image_settings_table[row_idx]['preview_y_dimension']
-            entry['preview_cutoff_min'] = \
-                image_settings_table[row_idx]['preview_cutoff_min']
-            entry['preview_cutoff_max'] = \
-                image_settings_table[row_idx]['preview_cutoff_max']
-            result.append(entry)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
+
+        result = __read_rows(logger, image_settings_table, condition,
+                             offset, limit, columns,
+                             condvars=condvars)
+        logger.debug('row_list len: %s' % len(result))
 
         __close_image_settings_file(logger, metafile)
 
@@ -1415,16 +1440,12 @@ def get_image_file_settings_count(logger, abs_base_path,
         image_settings_table = __get_image_file_settings_node(logger,
                                                               metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         if len(condition) > 0:
             row_list = __get_row_idx_list(logger, image_settings_table,
-                                          condition)
+                                          condition, condvars)
             result = len(row_list)
         else:
             result = image_settings_table.nrows
@@ -1470,8 +1491,14 @@ def get_image_files(
     name=None,
     extension=None,
     data_entries=None,
+    offset=0,
+    limit=0,
+    columns=None,
 ):
-    """Get list of image file entries"""
+    """Get list of image file entries. The optional *offset* and *limit*
+    select a page of the entries and *columns* a subset of the meta data
+    fields.
+    """
 
     logger.debug("abs_base_path: '%s', path: '%s', name: '%s', extension: '%s'"
                  % (abs_base_path, path, name, extension))
@@ -1481,59 +1508,19 @@ def get_image_files(
     metafile = __open_image_settings_file(logger, abs_base_path)
     if metafile is not None:
         image_file_table = __get_image_file_meta_node(logger, metafile)
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
-
-        row_list = __get_row_idx_list(logger, image_file_table,
-                                      condition)
-        logger.debug('#rows: %s' % len(row_list))
-        result = []
-        for row_idx in row_list:
-            entry = {}
-            entry['image_type'] = image_file_table[row_idx]['image_type'
-                                                            ]
-            entry['base_path'] = image_file_table[row_idx]['base_path']
-            entry['path'] = image_file_table[row_idx]['path']
-            entry['name'] = image_file_table[row_idx]['name']
-            entry['extension'] = image_file_table[row_idx]['extension']
-            entry['data_type'] = image_file_table[row_idx]['data_type']
-            entry['offset'] = image_file_table[row_idx]['offset']
-            entry['x_dimension'] = \
-                image_file_table[row_idx]['x_dimension']
-            entry['y_dimension'] = \
-                image_file_table[row_idx]['y_dimension']
-            entry['min_value'] = image_file_table[row_idx]['min_value']
-            entry['max_value'] = image_file_table[row_idx]['max_value']
-            entry['mean_value'] = image_file_table[row_idx]['mean_value'
-                                                            ]
-            entry['median_value'] = \
-                image_file_table[row_idx]['median_value']
-            entry['file_md5sum'] = \
-                image_file_table[row_idx]['file_md5sum']
-            entry['preview_image_filename'] = \
-                image_file_table[row_idx]['preview_image_filename']
-            entry['preview_image_extension'] = \
-                image_file_table[row_idx]['preview_image_extension']
-            entry['preview_cutoff_min'] = \
-                image_file_table[row_idx]['preview_cutoff_min']
-            entry['preview_cutoff_max'] = \
-                image_file_table[row_idx]['preview_cutoff_max']
-            entry['preview_data_type'] = \
-                image_file_table[row_idx]['preview_data_type']
-            entry['preview_x_dimension'] = \
-                image_file_table[row_idx]['preview_x_dimension']
-            entry['preview_y_dimension'] = \
-                image_file_table[row_idx]['preview_y_dimension']
-            entry['preview_image_scale'] = \
-                image_file_table[row_idx]['preview_image_scale']
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
+
+        # Preview data lookup requires path and name
+
+        if columns is not None and data_entries is not None:
+            columns = list(columns) + ['path', 'name']
+        result = __read_rows(logger, image_file_table, condition, offset,
+                             limit, columns, condvars=condvars)
+        logger.debug('#rows: %s' % len(result))
+        for entry in result:
             entry['preview_data'] = None
             entry['preview_image'] = None
             entry['preview_histogram'] = None
@@ -1550,7 +1537,6 @@ def get_image_files(
                     entry['preview_histogram'] = to_ndarray(logger,
                                                             __get_image_file_preview_histogram_data(logger,
                                                                                                     metafile, entry['path'], entry['name']))
-            result.append(entry)
     __close_image_settings_file(logger, metafile)
 
     return result
@@ -1569,20 +1555,14 @@ def get_image_file_count(
     metafile = __open_image_settings_file(logger, abs_base_path)
     if metafile:
         image_file_table = __get_image_file_meta_node(logger, metafile)
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         if len(condition) > 0:
             row_list = __get_row_idx_list(logger, image_file_table,
-                                          condition)
+                                          condition, condvars)
             result = len(row_list)
         else:
             result = image_file_table.nrows
@@ -1837,8 +1817,8 @@ def add_image_volume_setting(
     if extension is None:
         result = False
     else:
-        condition = 'extension == b"%s"' % extension
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         result = __modify_table(
             logger,
@@ -1848,6 +1828,7 @@ def add_image_volume_setting(
             condition,
             overwrite,
             create=True,
+            condvars=condvars,
         )
 
     return result
@@ -1913,15 +1894,10 @@ def add_image_volume(
     name = image_volume.get('name', None)
     extension = image_volume.get('extension', None)
 
-    condition = ''
-    if path is not None:
-        condition = '%s & (path == b"%s")' % (condition, path)
-    if name is not None:
-        condition = '%s & (name == b"%s")' % (condition, name)
-    if extension is not None:
-        condition = '%s & (extension == b"%s")' % (condition, extension)
-    condition = condition.replace(' & ', '', 1)
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('path', path),
+                                               ('name', name),
+                                               ('extension', extension)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -1931,6 +1907,7 @@ def add_image_volume(
         condition,
         overwrite,
         create=True,
+        condvars=condvars,
     )
 
     return result
@@ -1952,15 +1929,10 @@ def update_image_volume(logger, abs_base_path, image_volume):
     name = image_volume.get('name', None)
     extension = image_volume.get('extension', None)
 
-    condition = ''
-    if path is not None:
-        condition = '%s & (path == b"%s")' % (condition, path)
-    if name is not None:
-        condition = '%s & (name == b"%s")' % (condition, name)
-    if extension is not None:
-        condition = '%s & (extension == b"%s")' % (condition, extension)
-    condition = condition.replace(' & ', '', 1)
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('path', path),
+                                               ('name', name),
+                                               ('extension', extension)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -1970,6 +1942,7 @@ def update_image_volume(logger, abs_base_path, image_volume):
         condition,
         overwrite=True,
         create=False,
+        condvars=condvars,
     )
 
     return result
@@ -1989,10 +1962,9 @@ def update_image_volume_setting(logger, abs_base_path,
     result = True
 
     extension = image_volume_setting.get('extension', None)
-    condition = ''
-    if extension is not None and extension != '':
-        condition = 'extension == b"%s"' % extension
-    logger.debug('condition: %s' % condition)
+    (condition, condvars) = __match_condition([('extension',
+                                                extension or None)])
+    logger.debug('condition: %s %s' % (condition, condvars))
 
     result = __modify_table(
         logger,
@@ -2002,6 +1974,7 @@ def update_image_volume_setting(logger, abs_base_path,
         condition,
         overwrite=True,
         create=False,
+        condvars=condvars,
     )
 
     return result
@@ -2026,65 +1999,37 @@ def get_image_volume_setting(logger, abs_base_path, extension):
     return result
 
 
-def get_image_volume_settings(logger, abs_base_path, extension=None):
-    """Get image volume settings"""
+def get_image_volume_settings(
+    logger,
+    abs_base_path,
+    extension=None,
+    offset=0,
+    limit=0,
+    columns=None,
+):
+    """Get image volume settings. The optional *offset* and *limit* select a
+    page of the settings and *columns* a subset of the fields.
+    """
 
     logger.debug('abs_base_path: %s, extension: %s' % (abs_base_path,
                                                        extension))
+
     result = None
 
     metafile = __open_image_settings_file(logger, abs_base_path)
+
     if metafile is not None:
-        result = []
         image_settings_table = __get_image_volume_settings_node(logger,
                                                                 metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = 'extension == b"%s" ' % extension
-        logger.debug('condition: %s' % condition)
-
-        row_list = __get_row_idx_list(logger, image_settings_table,
-                                      condition)
-        logger.debug('row_list len: %s' % len(row_list))
-        for row_idx in row_list:
-            entry = {}
-            entry['extension'] = \
-                image_settings_table[row_idx]['extension']
-            entry['settings_status'] = \
-                image_settings_table[row_idx]['settings_status']
-            entry['settings_update_progress'] = \
-                image_settings_table[row_idx]['settings_update_progress'
-                                              ]
-            entry['settings_recursive'] = \
-                image_settings_table[row_idx]['settings_recursive']
-            entry['image_type'] = \
-                image_settings_table[row_idx]['image_type']
-            entry['volume_type'] = \
-                image_settings_table[row_idx]['volume_type']
-            entry['data_type'] = \
-                image_settings_table[row_idx]['data_type']
-            entry['volume_slice_filepattern'] = \
-                image_settings_table[row_idx]['volume_slice_filepattern'
-                                              ]
-            entry['offset'] = image_settings_table[row_idx]['offset']
-            entry['x_dimension'] = \
-                image_settings_table[row_idx]['x_dimension']
-            entry['y_dimension'] = \
-                image_settings_table[row_idx]['y_dimension']
-            entry['z_dimension'] = \
-                image_settings_table[row_idx]['z_dimension']
-            entry['preview_x_dimension'] = \
-                image_settings_table[row_idx]['preview_x_dimension']
-            entry['preview_y_dimension'] = \
-                image_settings_table[row_idx]['preview_y_dimension']
-            entry['preview_z_dimension'] = \
-                image_settings_table[row_idx]['preview_z_dimension']
-            entry['preview_cutoff_min'] = \
-                image_settings_table[row_idx]['preview_cutoff_min']
-            entry['preview_cutoff_max'] = \
-                image_settings_table[row_idx]['preview_cutoff_max']
-            result.append(entry)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
+
+        result = __read_rows(logger, image_settings_table, condition,
+                             offset, limit, columns,
+                             condvars=condvars)
+        logger.debug('row_list len: %s' % len(result))
+
         __close_image_settings_file(logger, metafile)
 
     return result
@@ -2100,16 +2045,12 @@ def get_image_volume_settings_count(logger, abs_base_path,
         image_settings_table = __get_image_volume_settings_node(logger,
                                                                 metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         if len(condition) > 0:
             row_list = __get_row_idx_list(logger, image_settings_table,
-                                          condition)
+                                          condition, condvars)
             result = len(row_list)
         else:
             result = image_settings_table.nrows
@@ -2154,8 +2095,14 @@ def get_image_volumes(
     name=None,
     extension=None,
     data_entries=None,
+    offset=0,
+    limit=0,
+    columns=None,
 ):
-    """Get list of image volume entries"""
+    """Get list of image volume entries. The optional *offset* and *limit*
+    select a page of the entries and *columns* a subset of the meta data
+    fields.
+    """
 
     result = None
 
@@ -2166,66 +2113,20 @@ def get_image_volumes(
     if metafile is not None:
         image_volume_table = __get_image_volume_meta_node(logger,
                                                           metafile)
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
-
-        row_list = __get_row_idx_list(logger, image_volume_table,
-                                      condition)
-        logger.debug('#rows: %s' % len(row_list))
-        result = []
-        for row_idx in row_list:
-            entry = {}
-            entry['image_type'] = \
-                image_volume_table[row_idx]['image_type']
-            entry['volume_type'] = \
-                image_volume_table[row_idx]['volume_type']
-            entry['base_path'] = image_volume_table[row_idx]['base_path'
-                                                             ]
-            entry['path'] = image_volume_table[row_idx]['path']
-            entry['name'] = image_volume_table[row_idx]['name']
-            entry['extension'] = image_volume_table[row_idx]['extension'
-                                                             ]
-            entry['data_type'] = image_volume_table[row_idx]['data_type'
-                                                             ]
-            entry['offset'] = image_volume_table[row_idx]['offset']
-            entry['x_dimension'] = \
-                image_volume_table[row_idx]['x_dimension']
-            entry['y_dimension'] = \
-                image_volume_table[row_idx]['y_dimension']
-            entry['z_dimension'] = \
-                image_volume_table[row_idx]['z_dimension']
-            entry['min_value'] = image_volume_table[row_idx]['min_value'
-                                                             ]
-            entry['max_value'] = image_volume_table[row_idx]['max_value'
-                                                             ]
-            entry['mean_value'] = \
-                image_volume_table[row_idx]['mean_value']
-            entry['median_value'] = \
-                image_volume_table[row_idx]['median_value']
-            entry['file_md5sum'] = \
-                image_volume_table[row_idx]['file_md5sum']
-            entry['preview_xdmf_filename'] = \
-                image_volume_table[row_idx]['preview_xdmf_filename']
-            entry['preview_data_type'] = \
-                image_volume_table[row_idx]['preview_data_type']
-            entry['preview_x_dimension'] = \
-                image_volume_table[row_idx]['preview_x_dimension']
-            entry['preview_y_dimension'] = \
-                image_volume_table[row_idx]['preview_y_dimension']
-            entry['preview_z_dimension'] = \
-                image_volume_table[row_idx]['preview_z_dimension']
-            entry['preview_cutoff_min'] = \
-                image_volume_table[row_idx]['preview_cutoff_min']
-            entry['preview_cutoff_max'] = \
-                image_volume_table[row_idx]['preview_cutoff_max']
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
+
+        # Preview data lookup requires path and name
+
+        if columns is not None and data_entries is not None:
+            columns = list(columns) + ['path', 'name']
+        result = __read_rows(logger, image_volume_table, condition,
+                             offset, limit, columns,
+                             condvars=condvars)
+        logger.debug('#rows: %s' % len(result))
+        for entry in result:
             entry['preview_data'] = None
             entry['preview_histogram'] = None
             if data_entries is not None:
@@ -2237,8 +2138,6 @@ def get_image_volumes(
                     logger.info('Volume histogram _NOT_ implemented yet'
                                 )
                     entry['preview_histogram'] = None
-
-            result.append(entry)
     __close_image_settings_file(logger, metafile)
 
     return result
@@ -2259,20 +2158,14 @@ def get_image_volume_count(
         image_volume_table = __get_image_volume_meta_node(logger,
                                                           metafile)
 
-        condition = ''
-        if path is not None:
-            condition = '%s & (path == b"%s")' % (condition, path)
-        if name is not None:
-            condition = '%s & (name == b"%s")' % (condition, name)
-        if extension is not None:
-            condition = '%s & (extension == b"%s")' % (condition,
-                                                       extension)
-        condition = condition.replace(' & ', '', 1)
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('path', path),
+                                                   ('name', name),
+                                                   ('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
         if len(condition) > 0:
             row_list = __get_row_idx_list(logger, image_volume_table,
-                                          condition)
+                                          condition, condvars)
             result = len(row_list)
         else:
             result = image_volume_table.nrows
@@ -2306,12 +2199,10 @@ def remove_image_volume_settings(logger, abs_base_path, extension=None):
         settings_table = __get_image_volume_settings_node(logger,
                                                           metafile)
 
-        condition = ''
-        if extension is not None:
-            condition = 'extension == b"%s"' % extension
-        logger.debug('condition: %s' % condition)
+        (condition, condvars) = __match_condition([('extension', extension)])
+        logger.debug('condition: %s %s' % (condition, condvars))
 
-        row_list = __get_row_idx_list(logger, settings_table, condition)
+        row_list = __get_row_idx_list(logger, settings_table, condition, condvars)
 
         logger.debug('row_list: %s' % row_list)
         while status and len(row_list) > 0:
@@ -2327,7 +2218,7 @@ def remove_image_volume_settings(logger, abs_base_path, extension=None):
                 settings_table = __remove_row(logger, metafile,
                                               settings_table, row_idx)
                 row_list = __get_row_idx_list(logger, settings_table,
-                                              condition)
+                                              condition, condvars)
             else:
                 status = False
 
@@ -80,17 +80,19 @@ def find_entry(output_objects, kind):
     return None
 
 
-def start_download(configuration, path, output):
+def start_download(configuration, path, output, size=None):
     """Helper to set the headers required to force a file download instead of
     plain output delivery. Automatically detects mimetype of path and sets
-    content size to size of output.
+    content size to size of output unless the optional size is provided for
+    streamed output.
     """
     _logger = configuration.logger
     (content_type, _) = mimetypes.guess_type(path)
     if not content_type:
         content_type = 'application/octet-stream'
     # NOTE: we need to set content length to fit binary data
-    size = sum([len(line) for line in output])
+    if size is None:
+        size = sum([len(line) for line in output])
     _logger.debug('force %s output for %s of size %d' % (content_type, path,
                                                          size))
     return make_start_entry([('Content-Length', "%d" % size),
@@ -122,7 +124,7 @@ def initialize_main_variables(client_id, op_title=True, op_header=True,
     shared/functionality. This function should be called in most cases.
     """
 
-    configuration = get_configuration_object()
+    configuration = get_configuration_object(cached=True)
     logger = configuration.logger
     output_objects = []
     start_entry = make_start_entry()
@@ -0,0 +1,409 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# jobindex - per-user index of job summaries for the job status pages
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Index of job summaries to list the jobs of a user without loading every
+single mRSL file.
+
+The index keeps a row per job with the status, the sort keys and a pickled
+summary of the mRSL fields shown in job listings. It lives in a small sqlite
+database in mig_system_run shared by grid_script and the web backends, and
+the summaries are refreshed whenever those save a job with a changed status.
+
+The jobs of a user are indexed on first use, so sites can start using it
+without preparation and the index may be lost e.g. on reboot. The rebuild
+helper can be used from the rebuildjobindex script to index all users in
+advance or to repair the index.
+"""
+
+from __future__ import absolute_import
+
+import calendar
+import fnmatch
+import os
+import sqlite3
+import threading
+import time
+
+from mig.shared.base import client_id_dir
+from mig.shared.defaults import final_states
+from mig.shared.fileio import unpickle
+from mig.shared.resource import anon_resource_id
+from mig.shared.serial import dumps, loads
+
+job_index_name = 'job_index.db'
+
+# Time fields included in the summary
+summary_time_fields = [
+    'VERIFIED',
+    'VERIFIED_TIMESTAMP',
+    'RECEIVED_TIMESTAMP',
+    'QUEUED_TIMESTAMP',
+    'SCHEDULE_TIMESTAMP',
+    'EXECUTING_TIMESTAMP',
+    'FINISHED_TIMESTAMP',
+    'FAILED_TIMESTAMP',
+    'CANCELED_TIMESTAMP',
+]
+# Other fields copied to the summary as is
+summary_plain_fields = ['STATUS', 'SCHEDULE_HINT', 'EXPECTED_DELAY',
+                        'RESOURCE_VGRID', 'PUBLICNAME', 'UNIQUE_RESOURCE_NAME']
+# Valid sort keys mapped to the corresponding column position
+sort_keys = {'job_id': 0, 'status': 1, 'received': 2, 'modified': 3}
+
+# Max number of variables in a single sqlite query
+_max_query_args = 500
+
+_connections = threading.local()
+
+
+def _job_index_path(configuration):
+    """Path to the job index database"""
+    return os.path.join(configuration.mig_system_run, job_index_name)
+
+
+def _mrsl_path(configuration, client_id, job_id):
+    """Path to the mRSL file of job_id owned by client_id"""
+    return os.path.join(configuration.mrsl_files_dir,
+                        client_id_dir(client_id), job_id + '.mRSL')
+
+
+def get_job_index(configuration):
+    """Get a connection to the job index database for the current thread"""
+    db_path = _job_index_path(configuration)
+    cached = getattr(_connections, 'cache', None)
+    if cached is None:
+        cached = _connections.cache = {}
+    conn = cached.get(db_path, None)
+    if conn is None:
+        # NOTE: autocommit mode and explicit transactions for bulk updates
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            client_id TEXT NOT NULL, job_id TEXT NOT NULL,
+            status TEXT NOT NULL, received REAL NOT NULL,
+            modified REAL NOT NULL, summary BLOB NOT NULL,
+            PRIMARY KEY (client_id, job_id))''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS jobs_status
+            ON jobs (client_id, status)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS indexed_users (
+            client_id TEXT PRIMARY KEY, timestamp REAL NOT NULL)''')
+        cached[db_path] = conn
+    return conn
+
+
+def close_job_index(configuration):
+    """Close any job index connection of the current thread"""
+    cached = getattr(_connections, 'cache', {})
+    conn = cached.pop(_job_index_path(configuration), None)
+    if conn is not None:
+        conn.close()
+
+
+def _epoch(value):
+    """Convert time struct value to epoch or 0 if not a time struct"""
+    try:
+        return float(calendar.timegm(value))
+    except Exception:
+        return 0.0
+
+
+def job_summary(job_dict):
+    """Extract summary of the job_dict fields used in job listings"""
+    summary = {}
+    for name in summary_time_fields + summary_plain_fields:
+        if name in job_dict:
+            summary[name] = job_dict[name]
+    if 'SCHEDULE_TARGETS' in job_dict:
+        summary['SCHEDULE_HITS'] = len(job_dict['SCHEDULE_TARGETS'])
+    res_conf = job_dict.get('RESOURCE_CONFIG', None) or {}
+    if 'RESOURCE_ID' in res_conf:
+        public_id = res_conf['RESOURCE_ID']
+        if res_conf.get('ANONYMOUS', True):
+            public_id = anon_resource_id(public_id)
+        summary['RESOURCE'] = public_id
+    # NOTE: expand job variables like mrslparser without touching job_dict
+    outputfiles = []
+    for path in job_dict.get('OUTPUTFILES', None) or []:
+        path = path.replace('+JOBID+', job_dict.get('JOB_ID', '+JOBID+'))
+        path = path.replace('+JOBNAME+', job_dict.get('JOBNAME', '+JOBNAME+'))
+        outputfiles.append(path)
+    summary['OUTPUTFILES'] = outputfiles
+    return summary
+
+
+def _job_row(client_id, job_id, job_dict, modified):
+    """Build jobs table row for job_dict"""
+    summary = job_summary(job_dict)
+    return (client_id, job_id, summary.get('STATUS', ''),
+            _epoch(summary.get('RECEIVED_TIMESTAMP', None)), modified,
+            sqlite3.Binary(dumps(summary, protocol=2)))
+
+
+def _save_rows(conn, rows):
+    """Insert or replace jobs table rows"""
+    conn.executemany('''INSERT OR REPLACE INTO jobs (client_id, job_id,
+    status, received, modified, summary) VALUES (?, ?, ?, ?, ?, ?)''', rows)
+
+
+def is_user_indexed(configuration, client_id):
+    """Check if the jobs of client_id are indexed"""
+    conn = get_job_index(configuration)
+    row = conn.execute('SELECT 1 FROM indexed_users WHERE client_id = ?',
+                       (client_id, )).fetchone()
+    return row is not None
+
+
+def invalidate_job_index(configuration, client_id):
+    """Drop the index of client_id jobs to force a rebuild on next use"""
+    conn = get_job_index(configuration)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM indexed_users WHERE client_id = ?',
+                     (client_id, ))
+        conn.execute('DELETE FROM jobs WHERE client_id = ?', (client_id, ))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def rebuild_job_index(configuration, client_id):
+    """Index all mRSL files of client_id from scratch. Returns the number of
+    indexed jobs.
+    Jobs may be saved and indexed concurrently while the files are scanned,
+    so rows written since the scan started are never replaced by the scanned
+    version or removed if the scan did not find the job.
+    """
+    _logger = configuration.logger
+    base_dir = os.path.join(configuration.mrsl_files_dir,
+                            client_id_dir(client_id))
+    scan_start = time.time()
+    rows = []
+    try:
+        names = os.listdir(base_dir)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith('.mRSL'):
+            continue
+        mrsl_path = os.path.join(base_dir, name)
+        job_id = name[:-len('.mRSL')]
+        try:
+            modified = os.path.getmtime(mrsl_path)
+        except OSError:
+            continue
+        job_dict = unpickle(mrsl_path, _logger)
+        if not job_dict:
+            continue
+        rows.append(_job_row(client_id, job_id, job_dict, modified))
+    scanned_ids = set([row[1] for row in rows])
+    conn = get_job_index(configuration)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        gone_ids = [row[0] for row in conn.execute(
+            'SELECT job_id FROM jobs WHERE client_id = ?', (client_id, ))
+            if row[0] not in scanned_ids]
+        conn.executemany('''DELETE FROM jobs WHERE client_id = ? AND
+        job_id = ? AND modified < ?''', [(client_id, job_id, scan_start)
+                                        for job_id in gone_ids])
+        # NOTE: keep any newer row and only add or replace older ones
+        conn.executemany('''INSERT OR IGNORE INTO jobs (client_id, job_id,
+        status, received, modified, summary) VALUES (?, ?, ?, ?, ?, ?)''',
+                         rows)
+        conn.executemany('''UPDATE jobs SET status = ?, received = ?,
+        modified = ?, summary = ? WHERE client_id = ? AND job_id = ? AND
+        modified <= ?''', [row[2:] + row[:2] + (row[4], ) for row in rows])
+        conn.execute('''INSERT OR REPLACE INTO indexed_users (client_id,
+        timestamp) VALUES (?, ?)''', (client_id, time.time()))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    _logger.info('indexed %d jobs of %s' % (len(rows), client_id))
+    return len(rows)
+
+
+def update_job_index(configuration, job_dict, logger=None):
+    """Refresh the index entry for job_dict after it was saved with changes.
+    Never raises an exception as the index is only a cache of the mRSL files.
+    Instead any errors are logged and the index of the job owner is dropped
+    to make it rebuild on next use. Returns a boolean indicating success.
+    """
+    if logger is None:
+        logger = configuration.logger
+    client_id = job_dict.get('USER_CERT', None)
+    job_id = job_dict.get('JOB_ID', None)
+    if not client_id or not job_id:
+        logger.warning('cannot index job without owner and ID: %s' %
+                       job_id)
+        return False
+    try:
+        try:
+            modified = os.path.getmtime(_mrsl_path(configuration, client_id,
+                                                   job_id))
+        except OSError:
+            modified = time.time()
+        conn = get_job_index(configuration)
+        _save_rows(conn, [_job_row(client_id, job_id, job_dict, modified)])
+        return True
+    except Exception as exc:
+        logger.error('could not update job index for %s: %s' % (job_id, exc))
+    try:
+        invalidate_job_index(configuration, client_id)
+    except Exception as exc:
+        logger.error('could not invalidate job index of %s: %s' %
+                     (client_id, exc))
+    return False
+
+
+def _refresh_summaries(configuration, client_id, summaries):
+    """Reload any non-final jobs in summaries list of (job_id, summary,
+    modified) tuples where the mRSL file changed since last indexed. Returns
+    list of (job_id, summary) tuples.
+    """
+    _logger = configuration.logger
+    result, rows = [], []
+    for (job_id, summary, modified) in summaries:
+        if summary.get('STATUS', '') not in final_states:
+            mrsl_path = _mrsl_path(configuration, client_id, job_id)
+            try:
+                changed = os.path.getmtime(mrsl_path) > modified
+            except OSError:
+                changed = False
+            job_dict = changed and unpickle(mrsl_path, _logger)
+            if job_dict:
+                row = _job_row(client_id, job_id, job_dict,
+                               os.path.getmtime(mrsl_path))
+                rows.append(row)
+                summary = job_summary(job_dict)
+        result.append((job_id, summary))
+    if rows:
+        _logger.info('refreshed %d changed jobs in index of %s' %
+                     (len(rows), client_id))
+        _save_rows(get_job_index(configuration), rows)
+    return result
+
+
+def _refresh_pending(configuration, client_id):
+    """Refresh the index rows of all non-final client_id jobs where the mRSL
+    file changed since last indexed, so that their status is current.
+    """
+    conn = get_job_index(configuration)
+    summaries = [(job_id, loads(bytes(summary)), modified) for
+                 (job_id, summary, modified) in conn.execute(
+                     '''SELECT job_id, summary, modified FROM jobs WHERE
+                     client_id = ? AND status NOT IN (%s)''' %
+                     ', '.join(['?'] * len(final_states)),
+                     [client_id] + list(final_states))]
+    _refresh_summaries(configuration, client_id, summaries)
+
+
+def _match_rows(configuration, client_id, patterns, states):
+    """Look up the index rows of client_id jobs with a job ID matching any of
+    the wildcard patterns and optionally only those with a status in states.
+    Any changed non-final jobs are refreshed first so that status filter and
+    sort keys are current.
+    Returns a tuple with the list of matching (job_id, status, received,
+    modified) rows and the list of patterns without any matches.
+    """
+    if not is_user_indexed(configuration, client_id):
+        rebuild_job_index(configuration, client_id)
+    else:
+        _refresh_pending(configuration, client_id)
+    conn = get_job_index(configuration)
+    query = '''SELECT job_id, status, received, modified FROM jobs WHERE
+    client_id = ?'''
+    args = [client_id]
+    if states:
+        query += ' AND status IN (%s)' % ', '.join(['?'] * len(states))
+        args += states
+    rows = conn.execute(query, args).fetchall()
+
+    unmatched = []
+    if patterns == ['*']:
+        return (rows, unmatched)
+    job_ids = [row[0] for row in rows]
+    known_ids = set(job_ids)
+    matched_ids = set()
+    for pattern in patterns:
+        # NOTE: plain job IDs are common e.g. for project jobs
+        if not [i for i in '*?[' if i in pattern]:
+            hits = [i for i in [pattern] if i in known_ids]
+        else:
+            hits = fnmatch.filter(job_ids, pattern)
+        if not hits:
+            unmatched.append(pattern)
+        matched_ids.update(hits)
+    return ([row for row in rows if row[0] in matched_ids], unmatched)
+
+
+def match_job_ids(configuration, client_id, patterns=['*'], states=[]):
+    """Look up the sorted IDs of client_id jobs matching any of the wildcard
+    patterns and optionally only those with a status in states without
+    loading the summaries. Returns a tuple with the list of job IDs and the
+    list of patterns without any matches.
+    """
+    (rows, unmatched) = _match_rows(configuration, client_id, patterns,
+                                    states)
+    return (sorted([row[0] for row in rows]), unmatched)
+
+
+def query_job_index(configuration, client_id, patterns=['*'], states=[],
+                    sort_by='job_id', reverse=False, offset=0, limit=0):
+    """Look up the jobs of client_id with a job ID matching any of the
+    wildcard patterns and optionally only those with a status in states.
+    The matches are sorted by sort_by and optionally reversed before offset
+    and limit are applied, where a limit of 0 means no limit.
+    Returns a tuple with the total number of matches, the list of (job_id,
+    summary) tuples for the selected jobs and the list of patterns without
+    any matches.
+    """
+    (matches, unmatched) = _match_rows(configuration, client_id, patterns,
+                                       states)
+    sort_pos = sort_keys[sort_by]
+    # NOTE: use job ID as secondary key for stable ordering
+    matches.sort(key=lambda row: (row[sort_pos], row[0]), reverse=reverse)
+    total = len(matches)
+    if limit > 0:
+        matches = matches[offset:offset + limit]
+    else:
+        matches = matches[offset:]
+
+    conn = get_job_index(configuration)
+    page_ids = [row[0] for row in matches]
+    found = {}
+    for start in range(0, len(page_ids), _max_query_args):
+        chunk = page_ids[start:start + _max_query_args]
+        for (job_id, summary) in conn.execute(
+                '''SELECT job_id, summary FROM jobs WHERE
+                client_id = ? AND job_id IN (%s)''' %
+                ', '.join(['?'] * len(chunk)), [client_id] + chunk):
+            found[job_id] = (job_id, loads(bytes(summary)))
+    # NOTE: _match_rows already refreshed any changed jobs
+    summaries = [found[job_id] for job_id in page_ids if job_id in found]
+    return (total, summaries, unmatched)
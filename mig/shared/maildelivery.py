@@ -0,0 +1,370 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# maildelivery - pooled, rate limited and spooled smtp delivery
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+
+"""Mail delivery with pooled SMTP connections, a rate limit and a retry spool.
+
+Each process keeps a small pool of open connections to the configured SMTP
+server so that repeated sends skip the TCP and TLS handshakes, and batches of
+messages are delivered over a single connection. Pooled connections idle for
+longer than smtp_idle_secs are replaced as servers tend to drop them anyway.
+An optional smtp_rate_limit caps the number of messages sent per second from
+each process.
+
+Messages failing with a transient error like a lost connection or a 4xx reply
+are saved in a spool directory in mig_system_run and retried with exponential
+back off by flush_mail_spool, which grid_notify runs periodically. Thus mails
+are only spooled when site_enable_notify is set. Permanent errors like refused
+recipients are not retried. Spool file names start with the time of the next
+retry so that entries which are not yet due are skipped without reading them.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+
+from mig.shared.fileio import delete_file, makedirs_rec, pickle, unpickle
+
+mail_spool_name = 'mail_spool'
+# Replace pooled connections idle for longer than this many seconds
+smtp_idle_secs = 60
+# First retry delay of spooled messages, doubled for each failed attempt
+spool_retry_secs = 60
+
+_pools = {}
+_pools_lock = threading.Lock()
+_limiters = {}
+
+
+class SMTPPool(object):
+
+    """Thread-safe pool of idle connections to a single SMTP server"""
+
+    def __init__(self, server, size, logger):
+        """Init empty pool keeping at most size idle connections to server"""
+
+        self.server = server
+        self.size = size
+        self.logger = logger
+        self._idle = []
+        self._lock = threading.Lock()
+        self.stats = {'connects': 0, 'reuses': 0}
+
+    def acquire(self):
+        """Get a connection from the pool or a new one if none is idle.
+        Returns a tuple with the connection and a boolean indicating if it
+        was reused.
+        """
+
+        now = time.time()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self.stats['connects'] += 1
+                    break
+                (conn, last_used) = self._idle.pop()
+                if now - last_used < smtp_idle_secs:
+                    self.stats['reuses'] += 1
+                    return (conn, True)
+            self._close(conn)
+        conn = smtplib.SMTP(self.server)
+        conn.set_debuglevel(0)
+        return (conn, False)
+
+    def release(self, conn, broken=False):
+        """Return conn to the pool or close it if broken or pool is full"""
+
+        if not broken:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((conn, time.time()))
+                    return
+        self._close(conn)
+
+    def _close(self, conn):
+        """Close conn ignoring errors from already dropped connections"""
+
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        """Close all idle connections"""
+
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for (conn, _) in idle:
+            self._close(conn)
+
+
+class RateLimiter(object):
+
+    """Simple token bucket limiting events to rate per second"""
+
+    def __init__(self, rate):
+        """Init limiter allowing rate events per second with bursts of up to
+        one second worth of events.
+        """
+
+        self.rate = float(rate)
+        self._tokens = self.rate
+        self._stamp = time.time()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next event is allowed"""
+
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.rate, self._tokens +
+                                   (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+def get_smtp_pool(configuration):
+    """Get the shared connection pool for the configured SMTP server"""
+
+    server = configuration.smtp_server
+    with _pools_lock:
+        pool = _pools.get(server, None)
+        if pool is None:
+            pool = _pools[server] = SMTPPool(
+                server, configuration.smtp_pool_size, configuration.logger)
+    return pool
+
+
+def close_smtp_pools():
+    """Close all pooled connections, e.g. before a process exits"""
+
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+def _rate_limit(configuration):
+    """Wait for the configured rate limit if any"""
+
+    rate = configuration.smtp_rate_limit
+    if rate <= 0:
+        return
+    with _pools_lock:
+        limiter = _limiters.get(rate, None)
+        if limiter is None:
+            limiter = _limiters[rate] = RateLimiter(rate)
+    limiter.wait()
+
+
+def is_transient_error(err):
+    """Check if err is worth retrying later. Connection problems and 4xx
+    replies are transient whereas e.g. refused recipients are permanent.
+    """
+
+    # NOTE: SMTPException inherits from socket.error on python3
+    if isinstance(err, (smtplib.SMTPServerDisconnected,
+                        smtplib.SMTPConnectError)):
+        return True
+    if isinstance(err, smtplib.SMTPResponseException):
+        return 400 <= err.smtp_code < 500
+    if isinstance(err, smtplib.SMTPException):
+        return False
+    return isinstance(err, socket.error)
+
+
+def deliver_mails(configuration, mails, spool=None):
+    """Deliver mails over a single pooled connection. Each mail is a tuple
+    with sender address, recipient address list and message string.
+    Mails failing with transient errors are saved for retry in the spool
+    if spool is True. The default is to spool only when the notify daemon
+    flushing the spool is enabled. Returns a list with a status for each mail,
+    which is 'sent', 'partial' if only some recipients were accepted,
+    'spooled', 'deferred' for transient errors with spool explicitly False or
+    'failed' for permanent or unspooled errors.
+    """
+
+    _logger = configuration.logger
+    can_spool = spool
+    if spool is None:
+        # NOTE: only grid_notify flushes the spool so no retry without it
+        can_spool = configuration.site_enable_notify
+    pool = get_smtp_pool(configuration)
+    results = []
+    (conn, reused) = (None, False)
+    for (sender, recipients, message) in mails:
+        _rate_limit(configuration)
+        status = 'failed'
+        for attempt in (1, 2):
+            try:
+                if conn is None:
+                    (conn, reused) = pool.acquire()
+                errors = conn.sendmail(sender, recipients, message)
+                if errors:
+                    _logger.warning('Email only sent to some recipients, '
+                                    'refused: %s' % errors)
+                    status = 'partial'
+                else:
+                    status = 'sent'
+                break
+            except Exception as err:
+                broken = is_transient_error(err)
+                if broken and conn is not None:
+                    pool.release(conn, broken=True)
+                    conn = None
+                # NOTE: a reused connection may have been dropped by server
+                if broken and reused and attempt == 1:
+                    reused = False
+                    continue
+                if broken and spool is False:
+                    _logger.warning('Sending email to %s deferred: %s' %
+                                    (', '.join(recipients), err))
+                    status = 'deferred'
+                elif broken and can_spool and \
+                        spool_mail(configuration, sender, recipients,
+                                   message):
+                    _logger.warning('Spooled email to %s for retry: %s' %
+                                    (', '.join(recipients), err))
+                    status = 'spooled'
+                else:
+                    _logger.error('Sending email to %s through %s failed!: %s'
+                                  % (', '.join(recipients),
+                                     configuration.smtp_server, err))
+                break
+        results.append(status)
+    if conn is not None:
+        pool.release(conn)
+    return results
+
+
+def _spool_dir(configuration):
+    """Path to the mail spool directory"""
+
+    return os.path.join(configuration.mig_system_run, mail_spool_name)
+
+
+def spool_mail(configuration, sender, recipients, message, attempts=1):
+    """Save mail in the spool for later delivery by flush_mail_spool. The
+    file name starts with the next retry time to allow cheap due checks.
+    """
+
+    _logger = configuration.logger
+    spool_dir = _spool_dir(configuration)
+    if not makedirs_rec(spool_dir, configuration):
+        return False
+    next_retry = time.time() + spool_retry_secs * 2 ** (attempts - 1)
+    entry = {'sender': sender, 'recipients': recipients,
+             'message': message, 'attempts': attempts,
+             'next_retry': next_retry}
+    # NOTE: zero padded so that sorted names are in retry order
+    name = '%017.6f-%s' % (next_retry, uuid.uuid4().hex)
+    tmp_path = os.path.join(spool_dir, '.%s' % name)
+    # NOTE: write to hidden temp file and rename to never flush partial files
+    if not pickle(entry, tmp_path, _logger):
+        return False
+    os.rename(tmp_path, os.path.join(spool_dir, name))
+    return True
+
+
+def flush_mail_spool(configuration, max_mails=1000):
+    """Retry delivery of up to max_mails due spooled mails in a single batch.
+    Mails failing again with a transient error are kept with increased back
+    off until they reach smtp_max_retries attempts. Returns a tuple with the
+    number of mails sent and the number of mails left in the spool.
+    """
+
+    _logger = configuration.logger
+    spool_dir = _spool_dir(configuration)
+    try:
+        names = sorted([i for i in os.listdir(spool_dir)
+                        if not i.startswith('.')])
+    except OSError:
+        return (0, 0)
+    now = time.time()
+    due = []
+    for name in names:
+        if len(due) >= max_mails:
+            break
+        try:
+            next_retry = float(name.split('-', 1)[0])
+        except ValueError:
+            _logger.warning('Ignoring malformed mail spool entry: %s' % name)
+            continue
+        # NOTE: names are sorted by retry time so the rest is not due either
+        if next_retry > now:
+            break
+        path = os.path.join(spool_dir, name)
+        entry = unpickle(path, _logger)
+        if entry:
+            due.append((path, entry))
+    if not due:
+        return (0, len(names))
+    results = deliver_mails(configuration,
+                            [(entry['sender'], entry['recipients'],
+                              entry['message']) for (_, entry) in due],
+                            spool=False)
+    (sent, removed) = (0, 0)
+    for ((path, entry), status) in zip(due, results):
+        if status == 'sent':
+            sent += 1
+            removed += 1
+        elif status == 'partial':
+            removed += 1
+            _logger.warning('Spooled email only partially delivered to %s'
+                            % ', '.join(entry['recipients']))
+        elif status == 'deferred' and \
+                entry['attempts'] < configuration.smtp_max_retries:
+            if spool_mail(configuration, entry['sender'],
+                          entry['recipients'], entry['message'],
+                          entry['attempts'] + 1):
+                _logger.info('Retry email to %s later' %
+                             ', '.join(entry['recipients']))
+            else:
+                continue
+        else:
+            removed += 1
+            _logger.error('Giving up on spooled email to %s after %d attempts'
+                          % (', '.join(entry['recipients']),
+                             entry['attempts']))
+        delete_file(path, _logger)
+    return (sent, len(names) - removed)
@@ -38,6 +38,7 @@ from mig.shared.base import client_id_dir
 from mig.shared.conf import get_configuration_object
 from mig.shared.defaults import default_vgrid, any_vgrid, src_dst_sep
 from mig.shared.fileio import unpickle, pickle, send_message_to_grid_script
+from mig.shared.jobindex import update_job_index
 from mig.shared.mrslkeywords import get_keywords_dict as mrsl_get_keywords_dict
 from mig.shared.parser import parse as core_parse, check_types
 from mig.shared.refunctions import is_runtime_environment
@@ -340,6 +341,8 @@ environment '%s', therefore the job can not be run on any resources.""" %
 
         return (True, '')
 
+    update_job_index(configuration, global_dict, logger)
+
     # tell 'grid_script'
 
     message = 'USERJOBFILE %s/%s\n' % (client_dir, job_id)
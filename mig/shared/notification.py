@@ -33,7 +33,6 @@ from __future__ import absolute_import
 import datetime
 import os
 import pickle
-import smtplib
 import threading
 import time
 from email.encoders import encode_base64
@@ -56,6 +55,7 @@ from mig.shared.defaults import email_keyword_list, job_output_dir, \
     transfer_output_dir, keyword_auto, cert_auto_extend_days, \
     oid_auto_extend_days
 from mig.shared.fileio import send_message_to_grid_notify
+from mig.shared.maildelivery import deliver_mails
 from mig.shared.safeinput import is_valid_simple_email
 from mig.shared.settings import load_settings
 from mig.shared.url import quote, urlencode
@@ -560,7 +560,7 @@ def send_instant_message(
         return False
 
 
-def send_email(
+def build_email(
     recipients,
     subject,
     message,
@@ -569,7 +569,9 @@ def send_email(
     files=[],
     custom_sender=None
 ):
-    """Send message to recipients by email:
+    """Build email with message to recipients for use in send_email and
+    send_email_batch. Returns a tuple with the envelope sender, the list of
+    recipient addresses and the message string or None on errors.
     Force utf8 encoding to avoid accented characters appearing garbled.
 
     The optional custom_sender can be used to set the email sender in one of
@@ -588,7 +590,6 @@ def send_email(
     https://code.activestate.com/recipes/578150-sending-non-ascii-emails-from-python-3/
     """
 
-    _logger = configuration.logger
     gpg_sign = False
     if configuration.site_gpg_passphrase is not None:
         if gnupg is None:
@@ -654,22 +655,58 @@ def send_email(
             mime_msg.attach(part)
         logger.debug('sending email from %s to %s:\n%s' %
                      (from_email, recipients, mime_msg.as_string()))
-        server = smtplib.SMTP(configuration.smtp_server)
-        server.set_debuglevel(0)
-        errors = server.sendmail(sender_email,
-                                 recipients_list, mime_msg.as_string())
-        server.quit()
-        if errors:
-            _logger.warning('Partial error(s) sending email: %s'
-                            % errors)
-            return False
-        else:
-            logger.debug('Email was sent to %s' % recipients)
-            return True
+        return (sender_email, recipients_list, mime_msg.as_string())
     except Exception as err:
-        logger.error('Sending email to %s through %s failed!: %s'
-                     % (recipients, configuration.smtp_server, err))
+        logger.error('Building email to %s failed!: %s' % (recipients, err))
+        return None
+
+
+def send_email(
+    recipients,
+    subject,
+    message,
+    logger,
+    configuration,
+    files=[],
+    custom_sender=None
+):
+    """Send message to recipients by email. Please refer to build_email for
+    the details about the optional files and custom_sender arguments.
+    Delivery uses a pooled connection and messages hitting temporary errors
+    are spooled for automatic retry if the notify daemon is enabled. Returns
+    True only if the message was actually sent.
+    """
+    mail = build_email(recipients, subject, message, logger, configuration,
+                       files, custom_sender)
+    if mail is None:
         return False
+    status = deliver_mails(configuration, [mail])[0]
+    if status != 'sent':
+        logger.warning('Email to %s was not sent but %s' % (recipients,
+                                                            status))
+        return False
+    return True
+
+
+def send_email_batch(email_list, logger, configuration):
+    """Send a batch of emails over a single pooled connection. Each entry in
+    email_list is a tuple of recipients, subject and message as used in
+    send_email. Returns a list of boolean status for each entry, which is
+    True if the message was sent or spooled for retry. The latter only
+    happens with the notify daemon enabled, which owns the spool.
+    """
+    mails, results = [], []
+    for (recipients, subject, message) in email_list:
+        mail = build_email(recipients, subject, message, logger,
+                           configuration)
+        results.append(mail is not None)
+        if mail is not None:
+            mails.append(mail)
+    statuses = deliver_mails(configuration, mails)
+    for (index, built) in enumerate(results):
+        if built:
+            results[index] = (statuses.pop(0) in ('sent', 'spooled'))
+    return results
 
 
 def notify_user(
@@ -98,6 +98,8 @@ file_not_found = {'object_type': 'file_not_found', 'required': ['name'
                                                                 ], 'optional': []}
 file_output = {'object_type': 'file_output', 'required': ['lines'],
                'optional': ['path']}
+file_stream = {'object_type': 'file_stream', 'required': ['stream'],
+               'optional': ['size', 'path']}
 environment = {'object_type': 'environment', 'required':
                ['name', 'example', 'description'], 'optional': []}
 software = {'object_type': 'software', 'required':
@@ -425,6 +427,7 @@ valid_types_list = [
     html_form,
     dir_listings,
     file_output,
+    file_stream,
     runtimeenvironment,
     runtimeenvironments,
     peer,
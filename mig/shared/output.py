@@ -57,6 +57,7 @@ from mig.shared.objecttypes import validate
 from mig.shared.prettyprinttable import pprint_table
 from mig.shared.pwcrypto import sorted_hash_algos
 from mig.shared.safeinput import html_escape
+from mig.shared.streaming import StreamOutput
 
 
 row_name = ('even', 'odd')
@@ -2733,7 +2734,13 @@ def file_format(configuration, ret_val, ret_msg, out_obj):
 
     _logger = configuration.logger
 
-    # TODO: use wsgi file_wrapper helper here if out_obj has wsgi entry?
+    # NOTE: streamed output is handed on as is for chunked delivery in the
+    #       CGI and WSGI glue, which may use the wsgi file_wrapper helper.
+    stream_entry = find_entry(out_obj, 'file_stream')
+    if stream_entry is not None:
+        return StreamOutput(stream_entry['stream'],
+                            stream_entry.get('size', None),
+                            stream_entry.get('path', None))
 
     # NOTE: we expect binary data here and must use it consistently
     file_content = b''
@@ -37,6 +37,7 @@ import time
 from mig.shared.base import client_id_dir
 from mig.shared.defaults import job_output_dir
 from mig.shared.fileio import send_message_to_grid_script, pickle, unpickle
+from mig.shared.jobindex import update_job_index
 
 
 def template_fits_file(template, filename, allowed_time=3.0):
@@ -201,6 +202,7 @@ def migrated_job(filename, client_id, configuration):
 
     if not pickle(job, mrsl_filename, configuration.logger):
         return (False, 'Fatal error: Could not write ' + filename)
+    update_job_index(configuration, job, logger)
 
     # tell 'grid_script'
 
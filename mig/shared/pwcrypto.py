@@ -44,6 +44,7 @@ import time
 
 from mig.shared.base import force_utf8, force_native_str, mask_creds, string_snippet
 from mig.shared.defaults import keyword_auto, RESET_TOKEN_TTL
+from mig.shared.ttlcache import TTLCache
 
 
 try:
@@ -80,6 +81,11 @@ HASH_FUNCTION = 'sha256'  # Must be in hashlib.
 # python -m timeit -s 'import passwords as p' 'p.make_hash("something")'
 COST_FACTOR = 10000
 
+# Successful password checks are remembered in the daemon credential caches
+# for this many seconds and for at most this many entries.
+CREDS_CACHE_TTL = 3600
+CREDS_CACHE_ENTRIES = 10000
+
 # AESGCM helpers to build the Additional Authenticated Data (AAD) values.
 # Please note that the values increase on a daily basis by default so the
 # encryption values will always change at least with that rate even for the
@@ -114,6 +120,29 @@ def best_crypt_salt(configuration):
     return salt_data
 
 
+def make_creds_cache(max_entries=CREDS_CACHE_ENTRIES, ttl=CREDS_CACHE_TTL):
+    """Create a bounded and thread-safe cache for use as the hash_cache,
+    digest_cache or scramble_cache argument in the check functions below.
+    The cache keys include the saved credential so entries are automatically
+    invalidated when the user changes credentials. The cache get_stats and
+    format_stats methods provide the hit rate for monitoring.
+    """
+    return TTLCache(max_entries, ttl)
+
+
+def _creds_cache_hit(creds_cache, key):
+    """Check if creds_cache holds a verified entry for key"""
+    if not isinstance(creds_cache, (dict, TTLCache)):
+        return False
+    return creds_cache.get(key, False) is True
+
+
+def _creds_cache_add(creds_cache, key):
+    """Save key as verified in creds_cache if enabled"""
+    if isinstance(creds_cache, (dict, TTLCache)):
+        creds_cache[key] = True
+
+
 def make_hash(password, _urandom=urandom):
     """Generate a random salt and return a new hash for the password."""
     # NOTE: urandom already returns bytes as required for base64 encode
@@ -132,8 +161,9 @@ def check_hash(configuration, service, username, password, hashed,
                hash_cache=None, strict_policy=True, allow_legacy=False):
     """Check a password against an existing hash. First make sure the provided
     password satisfies the local password policy. The optional hash_cache
-    dictionary argument can be used to cache recent lookups to save time in
-    e.g. webdav where each operation triggers hash check.
+    argument from make_creds_cache or a plain dictionary can be used to cache
+    recent lookups to save time in e.g. webdav where each operation triggers
+    hash check.
     The optional boolean strict_policy argument decides whether or not the site
     password policy is enforced. It is used to disable checks for e.g.
     sharelinks where the policy is not guaranteed to apply.
@@ -144,11 +174,10 @@ def check_hash(configuration, service, username, password, hashed,
     _logger = configuration.logger
     # NOTE: hashlib works with bytes
     hash_bytes = force_utf8(hashed)
-    pw_hash = make_simple_hash(password)
-    if isinstance(hash_cache, dict) and \
-            hash_cache.get(pw_hash, None) == hash_bytes:
-
-        # _logger.debug("got cached hash: %s" % [hash_cache.get(pw_hash, None)])
+    # NOTE: key on saved hash, too, to invalidate on password change
+    cache_key = (make_simple_hash(password), hash_bytes)
+    if _creds_cache_hit(hash_cache, cache_key):
+        # _logger.debug("got cached hash for %s" % username)
         return True
     # We check policy AFTER cache lookup since it is already verified for those
     if strict_policy:
@@ -184,9 +213,8 @@ def check_hash(configuration, service, username, password, hashed,
     for char_a, char_b in zip(hash_a, hash_b):
         diff |= byte_xlator(char_a) ^ byte_xlator(char_b)
     match = (diff == 0)
-    if isinstance(hash_cache, dict) and match:
-        hash_cache[pw_hash] = hash_bytes
-        # print("cached hash: %s" % hash_cache.get(pw_hash, None))
+    if match:
+        _creds_cache_add(hash_cache, cache_key)
     return match
 
 
@@ -222,8 +250,9 @@ def check_digest(configuration, service, realm, username, password, digest,
                  allow_legacy=False):
     """Check credentials against an existing digest. First make sure the
     provided password satisfies the local password policy. The optional
-    digest_cache dictionary argument can be used to cache recent lookups to
-    save time in e.g. webdav where each operation triggers digest check.
+    digest_cache argument from make_creds_cache or a plain dictionary can be
+    used to cache recent lookups to save time in e.g. webdav where each
+    operation triggers digest check.
     The optional boolean strict_policy argument changes warnings about password
     policy incompliance to unconditional rejects.
     The optional boolean allow_legacy argument extends the strict_policy check
@@ -232,10 +261,9 @@ def check_digest(configuration, service, realm, username, password, digest,
     """
     _logger = configuration.logger
     merged_creds = ':'.join([realm, username, password])
-    creds_hash = make_simple_hash(merged_creds)
-    if isinstance(digest_cache, dict) and \
-            digest_cache.get(creds_hash, None) == digest:
-        # print("got cached digest: %s" % digest_cache.get(creds_hash, None))
+    cache_key = (make_simple_hash(merged_creds), digest)
+    if _creds_cache_hit(digest_cache, cache_key):
+        # print("got cached digest for %s" % username)
         return True
     # We check policy AFTER cache lookup since it is already verified for those
     try:
@@ -248,9 +276,8 @@ def check_digest(configuration, service, realm, username, password, digest,
     # NOTE: we need to get computed bytes back to native format
     computed = force_native_str(make_digest(realm, username, password, salt))
     match = (computed == digest)
-    if isinstance(digest_cache, dict) and match:
-        digest_cache[creds_hash] = digest
-        # print("cached digest: %s" % digest_cache.get(creds_hash, None))
+    if match:
+        _creds_cache_add(digest_cache, cache_key)
     return match
 
 
@@ -291,8 +318,9 @@ def check_scramble(configuration, service, username, password, scrambled,
                    allow_legacy=False):
     """Make sure provided password satisfies local password policy and check
     match against existing scrambled password. The optional scramble_cache
-    dictionary argument can be used to cache recent lookups to save time in
-    e.g. openid where each operation triggers check.
+    argument from make_creds_cache or a plain dictionary can be used to cache
+    recent lookups to save time in e.g. openid where each operation triggers
+    check.
 
     NOTE: we force strict password policy here since we may find weak legacy
     passwords in the user DB and they would easily give full account access.
@@ -301,9 +329,10 @@ def check_scramble(configuration, service, username, password, scrambled,
     accepted. Use only during active log in checks.
     """
     _logger = configuration.logger
-    if isinstance(scramble_cache, dict) and \
-            scramble_cache.get(password, None) == scrambled:
-        # print("got cached scramble: %s" % scramble_cache.get(password, None))
+    # NOTE: never keep the plain password around as cache key
+    cache_key = (make_simple_hash(password), scrambled)
+    if _creds_cache_hit(scramble_cache, cache_key):
+        # print("got cached scramble for %s" % username)
         return True
     # We check policy AFTER cache lookup since it is already verified for those
     try:
@@ -316,9 +345,8 @@ def check_scramble(configuration, service, username, password, scrambled,
     # NOTE: we need to get computed back from bytes to native string format
     computed = force_native_str(make_scramble(password, salt))
     match = (computed == scrambled)
-    if isinstance(scramble_cache, dict) and match:
-        scramble_cache[password] = scrambled
-        # print("cached digest: %s" % scramble_cache.get(password, None))
+    if match:
+        _creds_cache_add(scramble_cache, cache_key)
     return match
 
 
@@ -44,8 +44,14 @@ Also try hard not to use the shell invocation if at all possible.
 
 from future.utils import raise_
 
+import ast
 import dis
+import math
 import subprocess
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
 
 # expose STDOUT and PIPE as vars
 subprocess_stdout, subprocess_pipe = subprocess.STDOUT, subprocess.PIPE
@@ -289,6 +295,84 @@ def math_expr_eval(expr):
     return eval(c)
 
 
+# Syntax tree nodes allowed in compiled math expressions. Power and sequences
+# are left out on purpose since e.g. 9**9**9 or [1]*10**10 would let anyone
+# with a price field hang or exhaust the memory of the evaluating daemon.
+_math_expr_nodes = tuple([getattr(ast, i) for i in [
+    'Expression', 'BinOp', 'UnaryOp', 'Call', 'Name', 'Load', 'Num',
+    'Constant', 'Add', 'Sub', 'Mult', 'Div', 'FloorDiv', 'Mod', 'UAdd',
+    'USub'] if hasattr(ast, i)])
+_math_expr_skip_names = ['pow']
+
+
+def _math_expr_globals():
+    """Namespace with the math functions and constants in _math_names except
+    the ones in _math_expr_skip_names.
+    """
+
+    namespace = {'__builtins__': {}}
+    for name in _math_names:
+        if name in _math_expr_skip_names:
+            continue
+        for module in (math, builtins):
+            if hasattr(module, name):
+                namespace[name] = getattr(module, name)
+                break
+    return namespace
+
+
+def compile_math_expr(expr, var_names=[]):
+    """compile_math_expr(math_expression, var_names) -> function
+
+    Safe compilation of a math expression for repeated evaluation
+
+    Validates a string that contains an expression that only uses numeric
+    constants, arithmetic, the functions from math_expr_eval and the
+    variables in var_names. Returns a function taking the values of
+    var_names as positional arguments and returning the expression value.
+    The expression is parsed and validated only once so it is suitable for
+    caching. Invalid or unsafe expressions raise ValueError.
+
+    >>> compile_math_expr(\"2*x+1\", [\"x\"])(3)
+    7
+    >>> compile_math_expr(\"__import__('sys').modules\")
+    Traceback (most recent call last):
+    ...
+    ValueError: name '__import__' not allowed
+    """
+
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except (SyntaxError, TypeError, ValueError):
+        raise_(ValueError, '%r is not a valid expression' % expr)
+
+    namespace = _math_expr_globals()
+    for node in ast.walk(tree):
+        if not isinstance(node, _math_expr_nodes):
+            raise_(ValueError, 'node %s not allowed' % type(node).__name__)
+        if isinstance(node, ast.Name) and node.id not in var_names and \
+                node.id not in namespace:
+            raise_(ValueError, 'name %r not allowed' % node.id)
+        if isinstance(node, ast.Call) and \
+                (not isinstance(node.func, ast.Name) or node.keywords or
+                 getattr(node, 'starargs', None) or
+                 getattr(node, 'kwargs', None)):
+            raise_(ValueError, 'only simple function calls allowed')
+        if not isinstance(getattr(node, 'value', 0), (int, float)) or \
+                not isinstance(getattr(node, 'n', 0), (int, float)):
+            raise_(ValueError, 'only numeric constants allowed')
+
+    code = compile(tree, '<expression>', 'eval')
+    var_names = list(var_names)
+
+    def math_expr_func(*values):
+        """Evaluate compiled expression with values for var_names"""
+        local_vars = dict(zip(var_names, values))
+        return eval(code, namespace, local_vars)
+
+    return math_expr_func
+
+
 def subprocess_check_output(command, stdin=None, stdout=None, stderr=None,
                             env=None, cwd=None,
                             only_sanitized_variables=False):
@@ -69,7 +69,7 @@ from mig.shared.defaults import src_dst_sep, username_charset, \
 from mig.shared.listhandling import frange
 from mig.shared.validstring import valid_user_path, silent_email_validator
 from mig.shared.valuecheck import lines_value_checker, \
-    max_jobs_value_checker
+    max_jobs_value_checker, limit_value_checker, order_value_checker
 
 VALID_WORKFLOW_ATTRIBUTES = [
     'persistence_id',
@@ -1835,6 +1835,7 @@ def guess_type(name):
         for key in (
             'max_jobs',
             'lines',
+            'limit',
             'cputime',
             'size',
             'software_entries',
@@ -1863,6 +1864,12 @@ def guess_type(name):
             __type_map[key] = valid_date
         for key in ('offset', ):
             __type_map[key] = valid_integer
+        # Listing sort keys like job_id or modified and asc/desc sort order
+        for key in ('sort', ):
+            __type_map[key] = lambda x: valid_alphanumeric(
+                x, max_length=32, extra_chars='_')
+        for key in ('order', ):
+            __type_map[key] = lambda x: valid_ascii(x, max_length=4)
         for key in (
             'fqdn',
             'unique_resource_name',
@@ -2099,6 +2106,10 @@ def guess_value(name):
             __value_map[key] = lines_value_checker
         for key in ('max_jobs', ):
             __value_map[key] = max_jobs_value_checker
+        for key in ('limit', ):
+            __value_map[key] = limit_value_checker
+        for key in ('order', ):
+            __value_map[key] = order_value_checker
 
     # Return value checker from __value_map with fall back to id function
 
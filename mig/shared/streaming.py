@@ -0,0 +1,161 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# streaming - streamed file delivery for the CGI and WSGI glue
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Streamed delivery of file output from the functionality backends.
+
+Backends usually hand over the complete output in the output objects, which
+means that file downloads are read fully into memory before delivery. For
+file output the backends may instead add a file_stream object with an open
+file or an iterable of byte chunks. The file output formatter then passes it
+on wrapped in a StreamOutput object so that the CGI and WSGI glue can send it
+in blocks with constant memory use. Open files with a known size can also be
+served partially to support HTTP Range requests.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import os
+
+from mig.shared.defaults import download_stream_block_size
+
+
+def make_file_stream(path):
+    """Open the file in path for streamed output and return a file_stream
+    output object with the file handle and size.
+    """
+    file_handle = open(path, 'rb')
+    size = os.fstat(file_handle.fileno()).st_size
+    return {'object_type': 'file_stream', 'stream': file_handle, 'size': size,
+            'path': path}
+
+
+def parse_byte_range(range_value, size):
+    """Parse the value of a HTTP Range header for content of size bytes.
+    Returns a tuple with the first and last byte of the requested range or
+    None if the header should be ignored and the full content delivered. That
+    is the case for malformed values and requests for multiple ranges.
+    Raises ValueError if the range is valid but cannot be satisfied.
+    """
+    (unit, _, spec) = range_value.strip().partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    (first, sep, last) = spec.strip().partition('-')
+    (first, last) = (first.strip(), last.strip())
+    if not sep or not (first or last) or \
+            not (first or '0').isdigit() or not (last or '0').isdigit():
+        return None
+    if not first:
+        # NOTE: suffix range of the last bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError('empty suffix range %r' % range_value)
+        return (max(0, size - suffix), size - 1)
+    start = int(first)
+    if last:
+        end = min(int(last), size - 1)
+        if end < start:
+            if int(last) < start:
+                return None
+            raise ValueError('range %r outside %d bytes' % (range_value, size))
+    else:
+        end = size - 1
+    if start >= size:
+        raise ValueError('range %r outside %d bytes' % (range_value, size))
+    return (start, end)
+
+
+class StreamOutput(object):
+
+    """Formatted output to be delivered as a stream of byte chunks"""
+
+    def __init__(self, stream, size=None, path=None):
+        """Wrap stream, which is either an open binary file or an iterable of
+        byte chunks. The optional size is the total number of bytes.
+        """
+
+        self.stream = stream
+        self.size = size
+        self.path = path
+
+    def __len__(self):
+        """Total size in bytes or 0 if unknown"""
+
+        return self.size or 0
+
+    def is_file(self):
+        """Check if stream is a real open file suitable for sendfile"""
+
+        try:
+            self.stream.fileno()
+            return True
+        except Exception:
+            return False
+
+    def seekable(self):
+        """Check if stream allows delivery of partial content"""
+
+        if self.size is None or not hasattr(self.stream, 'seek'):
+            return False
+        try:
+            return self.stream.seekable()
+        except AttributeError:
+            return True
+
+    def iter_chunks(self, start=0, length=None,
+                    block_size=download_stream_block_size):
+        """Generator yielding at most length bytes of content from start in
+        chunks of at most block_size bytes. The stream is closed when done.
+        """
+
+        try:
+            if not hasattr(self.stream, 'read'):
+                for chunk in self.stream:
+                    yield chunk
+                return
+            if start:
+                self.stream.seek(start)
+            remain = length
+            while remain is None or remain > 0:
+                want = block_size
+                if remain is not None:
+                    want = min(block_size, remain)
+                chunk = self.stream.read(want)
+                if not chunk:
+                    break
+                if remain is not None:
+                    remain -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        """Close underlying stream if possible"""
+
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,162 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# ttlcache - bounded in-process cache with entry expiry
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Bounded in-process cache where entries expire after a fixed time.
+
+Used by long running helpers and daemons to remember the result of expensive
+lookups for a short while without growing without bound. The least recently
+used entry is evicted when the cache is full and entries older than the ttl
+are treated as missing. Simple hit, miss, expiry and eviction counters are
+kept for monitoring.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache(object):
+
+    """Thread-safe LRU cache of at most max_entries entries, which each
+    expire ttl seconds after they were inserted.
+    """
+
+    def __init__(self, max_entries, ttl):
+        """Init empty cache"""
+
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.expired = self.evictions = 0
+
+    def get(self, key, default=None):
+        """Lookup value for key or return default if missing or expired"""
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return default
+            # NOTE: move to end as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Insert value for key and evict the least recently used entries if
+        above the size limit.
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        """Check if key has a valid entry without touching the counters"""
+
+        with self._lock:
+            entry = self._entries.get(key, None)
+            return entry is not None and entry[0] > time.time()
+
+    def __getitem__(self, key):
+        """Dictionary style lookup raising KeyError on miss"""
+
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """Dictionary style insert"""
+
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        """Dictionary style removal of key"""
+
+        self.invalidate(key)
+
+    def __len__(self):
+        """Number of entries including any expired but not yet purged"""
+
+        with self._lock:
+            return len(self._entries)
+
+    def invalidate(self, key):
+        """Remove any entry for key"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self):
+        """Remove all expired entries and return how many were removed"""
+
+        now = time.time()
+        with self._lock:
+            stale = [key for (key, entry) in self._entries.items()
+                     if entry[0] <= now]
+            for key in stale:
+                del self._entries[key]
+            self.expired += len(stale)
+        return len(stale)
+
+    def clear(self):
+        """Remove all entries but keep the counters"""
+
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return a dictionary with cache counters and usage"""
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'expired': self.expired, 'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'max_entries': self.max_entries, 'ttl': self.ttl}
+
+    def format_stats(self):
+        """Format stats as a single line for logging"""
+
+        return '%(entries)d/%(max_entries)d entries, %(hits)d hits, ' \
+            '%(misses)d misses, %(expired)d expired, %(evictions)d ' \
+            'evicted' % self.get_stats()
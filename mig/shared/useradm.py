@@ -2790,8 +2790,8 @@ def check_password_hash(configuration, service, username, password,
     More information about sane password handling is available at:
     https://exyr.org/2011/hashing-passwords/
 
-    The optional hash_cache dictionary argument can be used to cache lookups
-    and speed up repeated use.
+    The optional hash_cache argument from pwcrypto.make_creds_cache can be used
+    to cache lookups and speed up repeated use.
     The optional boolean strict_policy argument switches password policy checks
     on/off. Should only be disabled for sharelinks and similar where policy is
     not guaranteed to apply.
@@ -2826,8 +2826,8 @@ def check_password_scramble(configuration, service, username, password,
     the clear when we can't avoid saving the actual password instead of just a
     hash.
 
-    The optional scramble_cache dictionary argument can be used to cache
-    lookups and speed up repeated use.
+    The optional scramble_cache argument from pwcrypto.make_creds_cache can be
+    used to cache lookups and speed up repeated use.
     The optional boolean strict_policy argument switches warnings about
     password policy incompliance to fatal errors. Always enabled here since it
     is only used for real user logins, and never sharelinks.
@@ -2858,8 +2858,8 @@ def check_password_digest(configuration, service, realm, username, password,
     """Return a boolean indicating if offered password matches stored_digest
     information.
 
-    The optional digest_cache dictionary argument can be used to cache lookups
-    and speed up repeated use.
+    The optional digest_cache argument from pwcrypto.make_creds_cache can be
+    used to cache lookups and speed up repeated use.
     The optional boolean strict_policy argument switches warnings about
     password policy incompliance to fatal errors. Should only be disabled for
     sharelinks.
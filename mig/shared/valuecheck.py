@@ -46,3 +46,16 @@ def max_jobs_value_checker(value_string):
         raise ValueError('max_jobs: out of range')
 
 
+def limit_value_checker(value_string):
+    """Value checker for the limit variables where 0 means no limit"""
+
+    value = int(value_string)
+    if value < 0 or value > 1000000:
+        raise ValueError('limit: out of range')
+
+
+def order_value_checker(value_string):
+    """Value checker for the sort order variables"""
+
+    if value_string.strip().lower() not in ('asc', 'desc'):
+        raise ValueError('order: must be asc or desc')
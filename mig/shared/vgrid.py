@@ -58,6 +58,9 @@ from mig.shared.safeeval import subprocess_popen, subprocess_pipe, \
 from mig.shared.serial import load, dump
 from mig.shared.sharelinkkeywords import get_sharelink_keywords_dict
 from mig.shared.user import anon_user_id
+from mig.shared.vgridindex import INDEX_KINDS, ID_FIELDS, \
+    index_list_entities, index_has_entity, index_entity_vgrids, \
+    invalidate_vgrid_index
 from mig.shared.vgridkeywords import get_trigger_keywords_dict, \
     get_settings_keywords_dict
 
@@ -544,6 +547,16 @@ def vgrid_is_entity_in_list(
     or more parent vgrids don't have the particular entity group file.
     """
     _logger = configuration.logger
+    # Use the index directly for the common cases to avoid copying entries
+    if group in INDEX_KINDS and dict_field == ID_FIELDS.get(group, False):
+        (status, found) = index_has_entity(configuration, vgrid_name, group,
+                                           entity_id, recursive, allow_missing)
+        if not status:
+            _logger.error('unexpected status in vgrid_is_entity_in_list: %s'
+                          % found)
+            return False
+        return found
+
     # Get the list of entities of specified type (group) in vgrid (vgrid_name)
 
     (status, entries) = vgrid_list(vgrid_name, group, configuration, recursive,
@@ -1052,8 +1065,13 @@ def vgrid_list(vgrid_name, group, configuration, recursive=True,
     If allow_missing is set a missing entity file does not prevent success or
     change the output list.
     If optional replace_missing is set that value is inserted for missing entries.
+    The owners, members, resources and triggers are served from the vgrid
+    index unless filtering or replacement is requested.
     """
     _logger = configuration.logger
+    if group in INDEX_KINDS and not filter_entries and replace_missing is None:
+        return index_list_entities(configuration, vgrid_name, group, recursive,
+                                   allow_missing)
     if group == 'owners':
         name = configuration.vgrid_owners
     elif group == 'members':
@@ -1256,14 +1274,15 @@ def user_allowed_vgrids(configuration, client_id, inherited=False):
     """
 
     allowed = []
-    (status, all_vgrids) = vgrid_list_vgrids(configuration)
-    if not status:
-        return allowed
-    for vgrid in all_vgrids:
-        if vgrid_is_owner_or_member(vgrid, client_id, configuration):
-            if inherited:
-                allowed += vgrid_list_parents(vgrid, configuration)
-            allowed.append(vgrid)
+    member_vgrids = index_entity_vgrids(configuration, client_id,
+                                        ('owners', 'members'))
+    # NOTE: everybody is a member of the default vgrid
+    if not default_vgrid in member_vgrids:
+        member_vgrids.append(default_vgrid)
+    for vgrid in member_vgrids:
+        if inherited:
+            allowed += vgrid_list_parents(vgrid, configuration)
+        allowed.append(vgrid)
     return allowed
 
 
@@ -1274,13 +1293,10 @@ def res_allowed_vgrids(configuration, client_id):
     Please note that the private (non-anonymized) ID is expected here.
     """
 
-    allowed = []
-    (status, all_vgrids) = vgrid_list_vgrids(configuration)
-    if not status:
-        return allowed
-    for vgrid in all_vgrids:
-        if vgrid_is_resource(vgrid, client_id, configuration):
-            allowed.append(vgrid)
+    allowed = index_entity_vgrids(configuration, client_id, ('resources', ))
+    # NOTE: all resources are in the default vgrid
+    if not default_vgrid in allowed:
+        allowed.append(default_vgrid)
     return allowed
 
 
@@ -1537,6 +1553,9 @@ def vgrid_add_entities(configuration, vgrid_name, kind, id_list,
             release_file_lock(lock_handle)
             lock_handle = None
 
+    if kind in INDEX_KINDS:
+        invalidate_vgrid_index(configuration, vgrid_name)
+
     # NOTE: only mark entity modified AFTER main lock release to avoid blocking
     try:
         mark_nested_vgrids_modified(configuration, vgrid_name)
@@ -1670,6 +1689,9 @@ def vgrid_remove_entities(configuration, vgrid_name, kind, id_list,
             release_file_lock(lock_handle)
             lock_handle = None
 
+    if kind in INDEX_KINDS:
+        invalidate_vgrid_index(configuration, vgrid_name)
+
     # NOTE: only mark entity modified AFTER main lock release to avoid blocking
     try:
         mark_nested_vgrids_modified(configuration, vgrid_name)
@@ -1782,6 +1804,9 @@ def vgrid_set_entities(configuration, vgrid_name, kind, id_list, allow_empty):
             release_file_lock(lock_handle)
             lock_handle = None
 
+    if kind in INDEX_KINDS:
+        invalidate_vgrid_index(configuration, vgrid_name)
+
     # NOTE: only mark entity modified AFTER main lock release to avoid blocking
     try:
         mark_nested_vgrids_modified(configuration, vgrid_name)
@@ -2327,6 +2352,7 @@ def vgrid_rm_entry(configuration, vgrid):
     msg = ''
     success = remove_rec(os.path.join(configuration.vgrid_home, vgrid),
                          configuration)
+    invalidate_vgrid_index(configuration, vgrid)
     if not success:
 
         _logger.debug('Error while removing %s.' % vgrid)
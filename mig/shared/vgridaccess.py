@@ -30,9 +30,12 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
+from builtins import object
+from collections import OrderedDict
 import copy
 import fcntl
 import os
+import threading
 import time
 
 from mig.shared.base import sandbox_resource, client_id_dir, client_dir_id
@@ -40,6 +43,8 @@ from mig.shared.conf import get_all_exe_vgrids, get_all_store_vgrids, \
     get_resource_fields, get_resource_configuration
 from mig.shared.defaults import settings_filename, profile_filename, \
     default_vgrid, keyword_all, vgrid_pub_base_dir, vgrid_priv_base_dir
+from mig.shared.entitystore import entity_store_name, load_store_map, \
+    load_store_entities, load_store_size, load_store_stamp, save_store_map
 from mig.shared.fileio import acquire_file_lock, release_file_lock
 from mig.shared.modified import mark_resource_modified, mark_vgrid_modified, \
     check_users_modified, check_resources_modified, check_vgrids_modified, \
@@ -74,8 +79,110 @@ last_refresh = {USERS: 0, RESOURCES: 0, VGRIDS: 0}
 last_load = {USERS: 0, RESOURCES: 0, VGRIDS: 0}
 last_map = {USERS: {}, RESOURCES: {}, VGRIDS: {}}
 
+# Upper bound on the total size of map files kept unpickled in map_cache
+MAP_CACHE_MAX_BYTES = 256 * 1024 * 1024
 
-def load_entity_map(configuration, kind, do_lock, caching):
+
+class EntityMapCache(object):
+    """In-process LRU cache of unpickled entity maps keyed on map path and
+    validated against the mtime, ctime and size of the map file. Thus long
+    running processes like the WSGI workers and daemons only unpickle a map
+    again when it actually changed on disk. The total size is bounded using
+    the map file sizes as a rough estimate of the memory use.
+    Maps from the sqlite entity store are cached the same way using the
+    get_stamped and put_stamped methods, which validate against the stamp of
+    the last map save instead.
+    The cached maps are shared so callers must not modify them in place.
+    """
+
+    def __init__(self, max_bytes):
+        """Init empty cache holding at most max_bytes worth of maps"""
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _stat_key(self, map_stat):
+        """Validation key from os.stat result of map file"""
+        return (map_stat.st_mtime, map_stat.st_ctime, map_stat.st_size)
+
+    def get(self, map_path, map_stat):
+        """Lookup map for map_path if it is still valid for map_stat.
+        Returns None on miss.
+        """
+        return self.get_stamped(map_path, self._stat_key(map_stat))
+
+    def put(self, map_path, map_stat, entity_map):
+        """Insert entity_map loaded from map_path with map_stat and evict
+        least recently used maps if above the size limit.
+        """
+        self.put_stamped(map_path, self._stat_key(map_stat), entity_map,
+                         map_stat.st_size)
+
+    def get_stamped(self, map_key, map_stamp):
+        """Lookup map for map_key if it was cached with the same map_stamp.
+        Returns None on miss.
+        """
+        with self._lock:
+            entry = self._entries.get(map_key, None)
+            if entry is None or entry[0] != map_stamp:
+                self.misses += 1
+                return None
+            # NOTE: move to end as most recently used
+            del self._entries[map_key]
+            self._entries[map_key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def put_stamped(self, map_key, map_stamp, entity_map, size):
+        """Insert entity_map of roughly size bytes for map_key valid as long
+        as map_stamp is unchanged and evict least recently used maps if above
+        the size limit.
+        """
+        with self._lock:
+            self._discard(map_key)
+            if size > self.max_bytes:
+                return
+            self._entries[map_key] = (map_stamp, entity_map, size)
+            self._used_bytes += size
+            while self._used_bytes > self.max_bytes:
+                (oldest, _) = next(iter(self._entries.items()))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, map_key):
+        """Remove any entry for map_key. Caller must hold lock."""
+        entry = self._entries.pop(map_key, None)
+        if entry is not None:
+            self._used_bytes -= entry[2]
+
+    def clear(self):
+        """Remove all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def get_stats(self):
+        """Return a dictionary with cache counters and usage"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'used_bytes': self._used_bytes,
+                    'max_bytes': self.max_bytes}
+
+
+map_cache = EntityMapCache(MAP_CACHE_MAX_BYTES)
+
+
+def _use_entity_store(configuration):
+    """Check if site uses the sqlite entity store rather than pickled maps"""
+    return configuration.site_entity_map_backend == 'sqlite'
+
+
+def load_entity_map(configuration, kind, do_lock, caching, reuse=True):
     """Load map of given entities and their configuration. Uses a pickled
     dictionary for efficiency. The do_lock option is used to enable and
     disable locking during load.
@@ -86,8 +193,36 @@ def load_entity_map(configuration, kind, do_lock, caching):
     If the caching arg is set the last cached version will be tried first
     to limit the penalty waiting for on-going updates, but with fallback to
     the main version if no cached version exists.
+    Unless reuse is disabled any unchanged map already loaded in this process
+    is returned from the shared map_cache without unpickling it again, so the
+    result must be treated as read-only.
+    With the sqlite entity store backend there is no need for locking or
+    caching as readers always get the last committed map without waiting.
+    The map_cache still applies there with the stamp of the last map save
+    deciding if the cached map is unchanged.
     """
     _logger = configuration.logger
+    if _use_entity_store(configuration):
+        store_key = (os.path.join(configuration.mig_system_files,
+                                  entity_store_name), kind)
+        if reuse:
+            map_stamp = load_store_stamp(configuration, kind)
+            entity_map = map_cache.get_stamped(store_key, map_stamp)
+            if entity_map is not None:
+                _logger.debug("reusing unchanged %s map from entity store" %
+                              kind)
+                return (entity_map, map_stamp)
+        _logger.info("before %s map load from entity store" % kind)
+        (entity_map, map_stamp) = load_store_map(configuration, kind)
+        _logger.info("after %s map load from entity store" % kind)
+        # NOTE: empty sections have no rows so explicitly add them back
+        if kind == 'vgrid' and map_stamp != -1:
+            for section in MAP_SECTIONS:
+                entity_map[section] = entity_map.get(section, {})
+        if reuse and map_stamp != -1:
+            map_cache.put_stamped(store_key, map_stamp, entity_map,
+                                  load_store_size(configuration, kind))
+        return (entity_map, map_stamp)
     map_path = os.path.join(configuration.mig_system_files, "%s.map" % kind)
     lock_path = os.path.join(configuration.mig_system_files, "%s.lock" % kind)
     cache_map_path = os.path.join(
@@ -102,12 +237,24 @@ def load_entity_map(configuration, kind, do_lock, caching):
     if do_lock:
         lock_handle = acquire_file_lock(lock_path, exclusive=False)
     try:
-        _logger.info("before %s map load from %s" % (kind, map_path))
-        entity_map = load(map_path)
-        _logger.info("after %s map load from %s" % (kind, map_path))
-        map_stamp = os.path.getmtime(map_path)
-    except IOError:
-        _logger.warn("No %s map to load" % kind)
+        # NOTE: stat before load so that a concurrent update of an unlocked
+        #       map at worst causes a later cache miss.
+        map_stat = os.stat(map_path)
+        entity_map = None
+        if reuse:
+            entity_map = map_cache.get(map_path, map_stat)
+        if entity_map is None:
+            _logger.info("before %s map load from %s" % (kind, map_path))
+            entity_map = load(map_path)
+            _logger.info("after %s map load from %s" % (kind, map_path))
+            if reuse:
+                map_cache.put(map_path, map_stat, entity_map)
+        else:
+            _logger.debug("reusing unchanged %s map from %s" %
+                          (kind, map_path))
+        map_stamp = map_stat.st_mtime
+    except (IOError, OSError):
+        _logger.warning("No %s map to load" % kind)
         entity_map = {}
         map_stamp = -1
     if do_lock:
@@ -157,16 +304,15 @@ def _load_entity_map_before_update(configuration, kind, flush):
     real_base = configuration.mig_system_files
     map_path = os.path.join(real_base, "%s.map" % kind)
     lock_path = os.path.join(real_base, "%s.lock" % kind)
-    map_helpers = {'user': load_user_map, 'resource': load_resource_map,
-                   'vgrid': load_vgrid_map}
-    if not kind in map_helpers:
+    if not kind in ('user', 'resource', 'vgrid'):
         raise ValueError("invalid kind for load map: %s" % kind)
-    load_map = map_helpers[kind]
     # NOTE: we need exclusive lock for the entire load and update process
     lock_handle = acquire_file_lock(lock_path, exclusive=True)
     if not flush:
-        entity_map, map_stamp = load_map(configuration, do_lock=False,
-                                         caching=False)
+        # NOTE: the map is modified in place so never use the shared copy
+        entity_map, map_stamp = load_entity_map(configuration, kind,
+                                                do_lock=False, caching=False,
+                                                reuse=False)
     else:
         _logger.info("Creating empty %s map" % kind)
         entity_map = {}
@@ -175,11 +321,23 @@ def _load_entity_map_before_update(configuration, kind, flush):
 
 
 def _save_entity_map_after_update(configuration, kind, entity_map, map_stamp,
-                                  lock_handle):
+                                  lock_handle, dirty=None):
     """Helper to save entity map of given kind in the refresh process.
     With optional saving of cache if requested.
+    The optional dirty list of (section, entity ID) tuples limits the entity
+    store backend to only write the changed entities.
     """
     _logger = configuration.logger
+    if _use_entity_store(configuration):
+        _logger.info("Saving %s map changes in entity store" % kind)
+        try:
+            save_store_map(configuration, kind, entity_map, map_stamp, dirty)
+        except Exception as exc:
+            _logger.error("Could not save %s map: %s" % (kind, exc))
+            return False
+        _logger.info("Saved %s map changes in entity store" % kind)
+        return True
+
     real_base = configuration.mig_system_files
     cache_base = configuration.mig_system_run
     map_path = os.path.join(real_base, "%s.map" % kind)
@@ -191,6 +349,7 @@ def _save_entity_map_after_update(configuration, kind, entity_map, map_stamp,
     try:
         dump(entity_map, map_path)
         os.utime(map_path, (map_stamp, map_stamp))
+        map_cache.put(map_path, os.stat(map_path), entity_map)
     except Exception as exc:
         _logger.error("Could not save %s map: %s" % (kind, exc))
 
@@ -215,6 +374,8 @@ def _save_entity_map_after_update(configuration, kind, entity_map, map_stamp,
             if cache_lock_handle:
                 dump(entity_map, cache_map_path)
                 os.utime(cache_map_path, (map_stamp, map_stamp))
+                map_cache.put(cache_map_path, os.stat(cache_map_path),
+                              entity_map)
                 _logger.info("updated cache for %s map in %s" %
                              (kind, cache_map_path))
             else:
@@ -284,7 +445,8 @@ def refresh_user_map(configuration, clean=False):
 
     if dirty:
         _save_entity_map_after_update(
-            configuration, 'user', user_map, start_time, lock_handle)
+            configuration, 'user', user_map, start_time, lock_handle,
+            [(None, user) for user in dirty])
 
     last_refresh[USERS] = start_time
     release_file_lock(lock_handle)
@@ -352,7 +514,8 @@ def refresh_resource_map(configuration, clean=False):
 
     if dirty:
         _save_entity_map_after_update(
-            configuration, 'resource', resource_map, start_time, lock_handle)
+            configuration, 'resource', resource_map, start_time, lock_handle,
+            [(None, res) for res in dirty])
 
     last_refresh[RESOURCES] = start_time
     release_file_lock(lock_handle)
@@ -606,8 +769,13 @@ def refresh_vgrid_map(configuration, clean=False):
             vgrid_map[USERS][user][ALLOW] = allow
 
     if dirty:
+        # NOTE: participation updates also change entries outside dirty
+        dirty[RESOURCES] = dirty.get(RESOURCES, []) + update_res
+        dirty[USERS] = dirty.get(USERS, []) + update_user
         _save_entity_map_after_update(
-            configuration, 'vgrid', vgrid_map, start_time, lock_handle)
+            configuration, 'vgrid', vgrid_map, start_time, lock_handle,
+            [(section, entity) for (section, entities) in dirty.items()
+             for entity in entities])
 
     last_refresh[VGRIDS] = start_time
     release_file_lock(lock_handle)
@@ -814,6 +982,24 @@ def get_vgrid_map_vgrids(configuration, recursive=True, sort=True,
     return vgrid_list
 
 
+def _lookup_vgrid_entries(configuration, vgrid_names, caching=False):
+    """Look up just the raw vgrid map entries for vgrid_names. With the sqlite
+    entity store backend the entries are read directly from the store unless
+    a recent map is already in memory or a vgrid map refresh is pending.
+    Otherwise falls back to extracting them from the full vgrid map.
+    Returns a dictionary with the entries found.
+    """
+    if _use_entity_store(configuration) and \
+            last_load[VGRIDS] + MAP_CACHE_SECONDS <= time.time() and \
+            (caching or not pending_vgrids_update(configuration)):
+        return load_store_entities(configuration, 'vgrid', VGRIDS,
+                                   vgrid_names)
+    all_vgrids = _get_entity_map(configuration, VGRIDS, caching).get(VGRIDS,
+                                                                     {})
+    return dict([(name, all_vgrids[name]) for name in vgrid_names
+                 if name in all_vgrids])
+
+
 def user_vgrid_access(configuration, client_id, inherited=False,
                       recursive=True, caching=False):
     """Extract a list of vgrids that user is allowed to access either due to
@@ -828,17 +1014,27 @@ def user_vgrid_access(configuration, client_id, inherited=False,
     """
     _logger = configuration.logger
     vgrid_access = [default_vgrid]
-    vgrid_map = get_vgrid_map(configuration, recursive, caching)
-    for vgrid in vgrid_map.get(VGRIDS, {}):
-        vgrid_dict = vgrid_map[VGRIDS][vgrid]
+    # NOTE: inheritance only adds parent owners and members so we can check
+    #       the direct participation and skip the costly inherit map copy.
+    vgrid_map = get_vgrid_map(configuration, False, caching)
+    all_vgrids = vgrid_map.get(VGRIDS, {})
+    direct_access = {}
+    for vgrid in all_vgrids:
+        vgrid_dict = all_vgrids[vgrid]
         if not vgrid_dict or vgrid_dict.get(OWNERS, None) is None:
             # Probably found a recently removed vgrid in stale cache
             _logger.warning("skip stale vgrid %r in access check" % vgrid)
             continue
-        if vgrid_allowed(client_id, vgrid_dict[OWNERS]) or \
-                vgrid_allowed(client_id, vgrid_dict[MEMBERS]):
+        direct_access[vgrid] = vgrid_allowed(client_id, vgrid_dict[OWNERS]) \
+            or vgrid_allowed(client_id, vgrid_dict[MEMBERS])
+    for vgrid in direct_access:
+        parents = vgrid_list_parents(vgrid, configuration)
+        allowed = direct_access[vgrid]
+        if recursive and not allowed:
+            allowed = [i for i in parents if direct_access.get(i, False)]
+        if allowed:
             if inherited:
-                vgrid_access += vgrid_list_parents(vgrid, configuration)
+                vgrid_access += parents
             vgrid_access.append(vgrid)
     return vgrid_access
 
@@ -853,12 +1049,19 @@ def check_vgrid_access(configuration, client_id, vgrid_name, recursive=True,
     the vgrid module and should replace that one everywhere that only vgrid map
     (cached) lookups are needed.
     """
-    vgrid_access = [default_vgrid]
-    vgrid_map = get_vgrid_map(configuration, recursive, caching)
-    vgrid_entry = vgrid_map.get(VGRIDS, {}).get(
-        vgrid_name, {OWNERS: [], MEMBERS: []})
-    return vgrid_allowed(client_id, vgrid_entry[OWNERS]) or \
-        vgrid_allowed(client_id, vgrid_entry[MEMBERS])
+    lookup_vgrids = [vgrid_name]
+    if recursive:
+        lookup_vgrids += vgrid_list_parents(vgrid_name, configuration)
+    vgrid_entries = _lookup_vgrid_entries(configuration, lookup_vgrids,
+                                          caching)
+    # NOTE: like in vgrid_inherit_map missing vgrids have no participants
+    if not vgrid_name in vgrid_entries:
+        return False
+    for vgrid_entry in vgrid_entries.values():
+        if vgrid_allowed(client_id, vgrid_entry.get(OWNERS, [])) or \
+                vgrid_allowed(client_id, vgrid_entry.get(MEMBERS, [])):
+            return True
+    return False
 
 
 def res_vgrid_access(configuration, client_id, recursive=True, caching=False):
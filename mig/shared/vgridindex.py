@@ -0,0 +1,438 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# vgridindex - in-memory index of effective vgrid participation
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Index of effective vgrid owners, members, resources and triggers.
+
+Every vgrid_is_owner, vgrid_is_member and similar check used to go through
+vgrid_list, which takes a shared lock and unpickles the entity file for each
+level of a nested vgrid name. Pages and daemons doing such checks in loops over
+many vgrids and users thus repeated a lot of file I/O. This index keeps the
+validated direct entries of each vgrid level in memory with the stat stamps of
+the entity files and derives the effective inherited participation from them.
+Membership checks are then set lookups and the reverse lookup of the vgrids
+where a user or resource participates only needs one pass over all vgrids per
+process.
+
+All entity writes in the vgrid module invalidate the affected vgrids in the
+local index and replace a shared generation marker in vgrid_home. Other
+processes check the marker on each lookup and when it changed they stat the
+known entity files to load only the changed vgrid levels again.
+Unlike the vgrid map in vgridaccess the index is never stale so it is suitable
+for the access checks.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import copy
+import fnmatch
+import os
+import tempfile
+import threading
+import time
+
+from mig.shared.fileio import acquire_file_lock, release_file_lock
+from mig.shared.serial import load
+
+# Entity kinds kept in the index
+INDEX_KINDS = ('owners', 'members', 'resources', 'triggers')
+# Entity kinds used in the reverse lookup
+REVERSE_KINDS = ('owners', 'members', 'resources')
+# Field with the ID of dictionary entries
+ID_FIELDS = {'triggers': 'rule_id'}
+
+# Shared marker replaced on every entity write to signal other processes
+GENERATION_MARKER = '.vgridindex'
+# Stat all known entity files at least this often to catch any direct edits
+REVALIDATE_SECONDS = 60
+
+# Load states of entity files
+(LOADED, MISSING, FAILED) = ('loaded', 'missing', 'failed')
+
+_wildcard_chars = ('*', '?', '[')
+
+
+def _entity_filename(configuration, kind):
+    """Name of the entity file for kind in each vgrid dir"""
+    return {'owners': configuration.vgrid_owners,
+            'members': configuration.vgrid_members,
+            'resources': configuration.vgrid_resources,
+            'triggers': configuration.vgrid_triggers}[kind]
+
+
+def _stat_stamp(path):
+    """Stamp which changes when the file in path is changed or removed"""
+    try:
+        path_stat = os.stat(path)
+    except OSError:
+        return None
+    return (path_stat.st_mtime, path_stat.st_ctime, path_stat.st_size,
+            path_stat.st_ino)
+
+
+def _is_below(vgrid_name, parent_name):
+    """Check if vgrid_name is parent_name or nested below it"""
+    return vgrid_name == parent_name or \
+        vgrid_name.startswith(parent_name + '/')
+
+
+def split_patterns(ids):
+    """Split ids into a set of plain IDs and a tuple of wild card patterns
+    for use with fnmatch like in vgrid_allowed.
+    """
+    exact, patterns = set(), []
+    for entity_id in ids:
+        if [i for i in _wildcard_chars if i in entity_id]:
+            patterns.append(entity_id)
+        else:
+            exact.add(entity_id)
+    return (frozenset(exact), tuple(patterns))
+
+
+class VGridIndex(object):
+
+    """Index of vgrid participation for the vgrids in one vgrid_home"""
+
+    def __init__(self, vgrid_home):
+        """Init empty index"""
+
+        self.vgrid_home = vgrid_home
+        self.marker_path = os.path.join(vgrid_home, GENERATION_MARKER)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        """Clear all index contents. Caller must hold lock or be init."""
+
+        # Direct entries per vgrid level and kind: (stamp, state, entries)
+        self._levels = {}
+        # Effective entries per (vgrid, kind, recursive, allow_missing) key:
+        # (status, entries_or_msg, exact_ids, patterns)
+        self._effective = {}
+        # Reverse lookup of vgrids with effective participation per kind
+        self._vgrids = None
+        self._indexed = {}
+        self._reverse = dict([(kind, {}) for kind in REVERSE_KINDS])
+        self._wildcards = dict([(kind, {}) for kind in REVERSE_KINDS])
+        self._generation = None
+        self._validated = 0
+        self.loads = self.hits = 0
+
+    def _drop_vgrids(self, changed):
+        """Drop the effective entries and reverse lookups for all vgrids
+        equal to or nested below one of the vgrids in changed. Caller must
+        hold lock.
+        """
+        for key in list(self._effective):
+            if [i for i in changed if _is_below(key[0], i)]:
+                del self._effective[key]
+        for vgrid_name in list(self._indexed):
+            if not [i for i in changed if _is_below(vgrid_name, i)]:
+                continue
+            for (kind, exact) in self._indexed.pop(vgrid_name).items():
+                for entity_id in exact:
+                    owned = self._reverse[kind].get(entity_id, set())
+                    owned.discard(vgrid_name)
+                    if not owned:
+                        self._reverse[kind].pop(entity_id, None)
+                self._wildcards[kind].pop(vgrid_name, None)
+
+    def _revalidate(self, configuration):
+        """Check the generation marker and drop all vgrid levels where the
+        entity files changed since they were loaded. Caller must hold lock.
+        """
+        now = time.time()
+        generation = _stat_stamp(self.marker_path)
+        if generation == self._generation and \
+                now < self._validated + REVALIDATE_SECONDS:
+            return
+        changed = []
+        for (vgrid_dir, kinds) in list(self._levels.items()):
+            for (kind, level) in list(kinds.items()):
+                path = os.path.join(self.vgrid_home, vgrid_dir,
+                                    _entity_filename(configuration, kind))
+                if _stat_stamp(path) != level[0]:
+                    del kinds[kind]
+                    changed.append(vgrid_dir)
+            if not kinds:
+                del self._levels[vgrid_dir]
+        if changed:
+            configuration.logger.debug("vgrid index dropping changed %s" %
+                                       sorted(set(changed)))
+            self._drop_vgrids(set(changed))
+        if generation != self._generation:
+            # NOTE: vgrids may have been created or removed
+            self._vgrids = None
+        self._generation = generation
+        self._validated = now
+
+    def _load_level(self, configuration, vgrid_dir, kind):
+        """Load and validate the direct entries of kind for the single vgrid
+        level in vgrid_dir. Caller must hold lock.
+        """
+        # NOTE: avoid circular import
+        from mig.shared.vgrid import LOCK_PATTERN, vgrid_valid_entities
+        level = self._levels.get(vgrid_dir, {}).get(kind, None)
+        if level is not None:
+            return level
+        path = os.path.join(self.vgrid_home, vgrid_dir,
+                            _entity_filename(configuration, kind))
+        lock_handle = None
+        try:
+            # NOTE: stat under the lock so that the stamp matches the contents
+            lock_handle = acquire_file_lock(LOCK_PATTERN % path,
+                                            exclusive=False)
+            stamp = _stat_stamp(path)
+            entries = load(path)
+            state = LOADED
+        except Exception as exc:
+            stamp = _stat_stamp(path)
+            entries = "%s" % exc
+            if stamp is None:
+                state = MISSING
+            else:
+                state = FAILED
+        finally:
+            if lock_handle:
+                release_file_lock(lock_handle)
+        self.loads += 1
+        if state == LOADED:
+            # NOTE: see the empty string note in vgrid_list
+            if entries == ['']:
+                entries = []
+            entries = vgrid_valid_entities(configuration, vgrid_dir, kind,
+                                           entries)
+        level = (stamp, state, entries)
+        self._levels[vgrid_dir] = self._levels.get(vgrid_dir, {})
+        self._levels[vgrid_dir][kind] = level
+        return level
+
+    def _lookup(self, configuration, vgrid_name, kind, recursive,
+                allow_missing):
+        """Find the effective entries of kind for vgrid_name like vgrid_list.
+        Caller must hold lock.
+        """
+        key = (vgrid_name, kind, recursive, allow_missing)
+        self._revalidate(configuration)
+        effective = self._effective.get(key, None)
+        if effective is not None:
+            self.hits += 1
+            return effective
+        if recursive:
+            vgrid_parts = vgrid_name.split('/')
+        else:
+            vgrid_parts = [vgrid_name]
+        vgrid_dir = ''
+        output = []
+        effective = None
+        for sub_vgrid in vgrid_parts:
+            vgrid_dir = os.path.join(vgrid_dir, sub_vgrid)
+            (_, state, entries) = self._load_level(configuration, vgrid_dir,
+                                                   kind)
+            if state == LOADED:
+                output.extend(entries)
+            elif state == FAILED or not allow_missing:
+                effective = (False, "Failed to load %s for %s: %s" %
+                             (kind, vgrid_name, entries), frozenset(), ())
+                break
+        if effective is None:
+            id_field = ID_FIELDS.get(kind, None)
+            if id_field:
+                ids = [i[id_field] for i in output]
+            else:
+                ids = output
+            (exact, patterns) = split_patterns(ids)
+            effective = (True, output, exact, patterns)
+        self._effective[key] = effective
+        return effective
+
+    def list_entities(self, configuration, vgrid_name, kind, recursive=True,
+                      allow_missing=False):
+        """Return a tuple with status and a private copy of the effective
+        entries of kind for vgrid_name or an error message.
+        """
+        with self._lock:
+            (status, output, _, _) = self._lookup(
+                configuration, vgrid_name, kind, recursive, allow_missing)
+        if not status:
+            return (False, output)
+        if kind in ID_FIELDS:
+            return (True, copy.deepcopy(output))
+        return (True, list(output))
+
+    def has_entity(self, configuration, vgrid_name, kind, entity_id,
+                   recursive=True, allow_missing=False):
+        """Check if entity_id participates in vgrid_name as kind. Matches
+        wild card entries like vgrid_allowed. Returns a tuple with status and
+        the boolean result or an error message.
+        """
+        with self._lock:
+            (status, output, exact, patterns) = self._lookup(
+                configuration, vgrid_name, kind, recursive, allow_missing)
+        if not status:
+            return (False, output)
+        if entity_id in exact:
+            return (True, True)
+        for pattern in patterns:
+            if fnmatch.fnmatch(entity_id, pattern):
+                return (True, True)
+        return (True, False)
+
+    def _update_reverse(self, configuration):
+        """Make sure all current vgrids are in the reverse lookup. Caller must
+        hold lock.
+        """
+        # NOTE: avoid circular import
+        from mig.shared.vgrid import vgrid_list_vgrids
+        self._revalidate(configuration)
+        if self._vgrids is None:
+            (_, all_vgrids) = vgrid_list_vgrids(configuration,
+                                                include_default=False)
+            # NOTE: names may have a leading slash depending on vgrid_home
+            self._vgrids = set([i.strip('/') for i in all_vgrids])
+            self._drop_vgrids([i for i in self._indexed if not i in
+                               self._vgrids])
+        for vgrid_name in self._vgrids:
+            if vgrid_name in self._indexed:
+                continue
+            indexed = {}
+            for kind in REVERSE_KINDS:
+                (_, _, exact, patterns) = self._lookup(
+                    configuration, vgrid_name, kind, True, False)
+                indexed[kind] = exact
+                for entity_id in exact:
+                    self._reverse[kind][entity_id] = self._reverse[kind].get(
+                        entity_id, set())
+                    self._reverse[kind][entity_id].add(vgrid_name)
+                if patterns:
+                    self._wildcards[kind][vgrid_name] = patterns
+            self._indexed[vgrid_name] = indexed
+
+    def entity_vgrids(self, configuration, entity_id, kinds):
+        """Return a sorted list of the vgrids where entity_id participates
+        as any of kinds including inherited participation.
+        """
+        found = set()
+        with self._lock:
+            self._update_reverse(configuration)
+            for kind in kinds:
+                found.update(self._reverse[kind].get(entity_id, []))
+                for (vgrid_name, patterns) in self._wildcards[kind].items():
+                    if vgrid_name in found:
+                        continue
+                    for pattern in patterns:
+                        if fnmatch.fnmatch(entity_id, pattern):
+                            found.add(vgrid_name)
+                            break
+        return sorted(found)
+
+    def invalidate(self, vgrid_name=None):
+        """Drop everything about vgrid_name and any nested vgrids or all
+        vgrids if no vgrid_name is given.
+        """
+        with self._lock:
+            if vgrid_name is None:
+                self._reset()
+                return
+            vgrid_name = vgrid_name.strip('/')
+            for vgrid_dir in list(self._levels):
+                if _is_below(vgrid_dir, vgrid_name):
+                    del self._levels[vgrid_dir]
+            self._drop_vgrids([vgrid_name])
+            self._vgrids = None
+
+    def get_stats(self):
+        """Return a dictionary with index counters and size"""
+        with self._lock:
+            return {'loads': self.loads, 'hits': self.hits,
+                    'levels': len(self._levels),
+                    'effective': len(self._effective),
+                    'indexed': len(self._indexed)}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vgrid_index(configuration):
+    """Get the shared index for the vgrid_home of configuration"""
+    with _indexes_lock:
+        index = _indexes.get(configuration.vgrid_home, None)
+        if index is None:
+            index = _indexes[configuration.vgrid_home] = \
+                VGridIndex(configuration.vgrid_home)
+    return index
+
+
+def index_list_entities(configuration, vgrid_name, kind, recursive=True,
+                        allow_missing=False):
+    """Indexed version of vgrid_list for the kinds in INDEX_KINDS"""
+    return get_vgrid_index(configuration).list_entities(
+        configuration, vgrid_name, kind, recursive, allow_missing)
+
+
+def index_has_entity(configuration, vgrid_name, kind, entity_id,
+                     recursive=True, allow_missing=False):
+    """Check if entity_id is in the effective kind list of vgrid_name.
+    Returns a tuple with status and result or error message.
+    """
+    return get_vgrid_index(configuration).has_entity(
+        configuration, vgrid_name, kind, entity_id, recursive, allow_missing)
+
+
+def index_entity_vgrids(configuration, entity_id, kinds=('owners',
+                                                         'members')):
+    """Reverse lookup of all vgrids where entity_id is any of kinds directly
+    or through inheritance from a parent vgrid. The default vgrid is not
+    included.
+    """
+    return get_vgrid_index(configuration).entity_vgrids(configuration,
+                                                        entity_id, kinds)
+
+
+def invalidate_vgrid_index(configuration, vgrid_name=None):
+    """Invalidate the index for vgrid_name and nested vgrids after entity
+    changes and signal other processes to revalidate by replacing the shared
+    generation marker. Returns a boolean indicating success of the latter.
+    """
+    _logger = configuration.logger
+    get_vgrid_index(configuration).invalidate(vgrid_name)
+    marker_path = os.path.join(configuration.vgrid_home, GENERATION_MARKER)
+    tmp_path = None
+    try:
+        # NOTE: atomic replace guarantees a new inode and thus a new stamp
+        (tmp_fd, tmp_path) = tempfile.mkstemp(dir=configuration.vgrid_home,
+                                              prefix=GENERATION_MARKER)
+        os.write(tmp_fd, ("%s %f\n" % (vgrid_name, time.time())).encode())
+        os.close(tmp_fd)
+        os.rename(tmp_path, marker_path)
+        return True
+    except Exception as exc:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _logger.warning("could not update vgrid index marker: %s" % exc)
+        return False
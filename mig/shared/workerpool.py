@@ -0,0 +1,295 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# workerpool - bounded thread worker pool for the daemons
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+"""Bounded pool of worker threads fed from a bounded task queue.
+
+Used by the daemons to run handlers concurrently without spawning a thread
+per request. The task queue provides backpressure: submit blocks or fails
+once max_queue tasks are pending. Tasks may be submitted with a coalesce key
+to drop duplicates of a task that is still waiting in the queue. Tasks may
+also be submitted with a delay, in which case a single timer thread holds them
+until due instead of a worker sleeping on them. Delayed tasks are coalesced by
+key as they arrive and may be bounded as well, in which case any overflow is
+dropped and counted. Simple counters for queue depth, wait and run times are
+kept for monitoring.
+"""
+
+from __future__ import absolute_import
+
+from builtins import object
+import heapq
+import itertools
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Sentinel task telling a worker to exit
+_STOP = None
+
+
+class WorkerPool(object):
+
+    """Fixed size pool of worker threads with a bounded task queue"""
+
+    def __init__(self, name, workers, logger, max_queue=0, max_delayed=0):
+        """Init pool called name with given number of workers. A max_queue
+        of 0 means that the task queue is unbounded and likewise a
+        max_delayed of 0 means that there is no limit on delayed tasks.
+        """
+
+        self.name = name
+        self.workers = max(1, workers)
+        self.logger = logger
+        self.max_queue = max_queue
+        self.max_delayed = max_delayed
+        self._tasks = queue.Queue(max_queue)
+        self._threads = []
+        self._pending_keys = set()
+        self._delayed = []
+        self._delayed_keys = set()
+        self._delayed_seq = itertools.count()
+        self._delay_cond = threading.Condition()
+        self._timer_thread = None
+        self._timer_stop = False
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0,
+                       'rejected': 0, 'coalesced': 0, 'active': 0,
+                       'delayed': 0, 'dropped': 0,
+                       'wait_secs': 0.0, 'run_secs': 0.0,
+                       'max_wait_secs': 0.0}
+
+    def _update_stats(self, **changes):
+        """Thread-safe increment of stats counters"""
+
+        with self._stats_lock:
+            for (key, val) in changes.items():
+                self._stats[key] += val
+
+    def _worker(self):
+        """Worker thread main loop"""
+
+        while True:
+            task = self._tasks.get()
+            if task is _STOP:
+                self._tasks.task_done()
+                break
+            (func, args, kwargs, queued, coalesce_key) = task
+            started = time.time()
+            wait_secs = started - queued
+            self._update_stats(active=1, wait_secs=wait_secs)
+            with self._stats_lock:
+                self._stats['max_wait_secs'] = max(
+                    self._stats['max_wait_secs'], wait_secs)
+                # NOTE: once started new duplicates must run again
+                self._pending_keys.discard(coalesce_key)
+            failed = 0
+            try:
+                func(*args, **kwargs)
+            except Exception as exc:
+                failed = 1
+                self.logger.error('%s worker failed in %s: %s' %
+                                  (self.name, getattr(func, '__name__', func),
+                                   exc))
+            self._update_stats(active=-1, completed=1, failed=failed,
+                               run_secs=time.time() - started)
+            self._tasks.task_done()
+
+    def _timer(self):
+        """Timer thread main loop handing delayed tasks to submit when due"""
+
+        with self._delay_cond:
+            while not self._timer_stop:
+                if not self._delayed:
+                    self._delay_cond.wait()
+                    continue
+                remain = self._delayed[0][0] - time.time()
+                if remain > 0:
+                    self._delay_cond.wait(remain)
+                    continue
+                (_, _, func, args, kwargs) = heapq.heappop(self._delayed)
+                self._delayed_keys.discard(kwargs.get('coalesce_key', None))
+                # NOTE: submit may block on a full queue so release the lock
+                self._delay_cond.release()
+                try:
+                    self.submit(func, *args, **kwargs)
+                finally:
+                    self._delay_cond.acquire()
+
+    def start(self):
+        """Start the worker threads and the timer thread for delayed tasks"""
+
+        for i in range(self.workers):
+            worker = threading.Thread(target=self._worker,
+                                      name='%s-%d' % (self.name, i))
+            worker.daemon = True
+            worker.start()
+            self._threads.append(worker)
+        self._timer_stop = False
+        self._timer_thread = threading.Thread(target=self._timer,
+                                              name='%s-timer' % self.name)
+        self._timer_thread.daemon = True
+        self._timer_thread.start()
+        self.logger.info('started %s pool with %d workers' %
+                         (self.name, self.workers))
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) for execution by a worker. Blocks
+        while the task queue is full unless the special block keyword is
+        False or the optional timeout keyword expires. Returns a boolean
+        indicating if the task was queued.
+        If the special coalesce_key keyword is given and another task with
+        the same key is still waiting in the queue the task is dropped as a
+        duplicate. That also counts as queued.
+        """
+
+        block = kwargs.pop('block', True)
+        timeout = kwargs.pop('timeout', None)
+        coalesce_key = kwargs.pop('coalesce_key', None)
+        if coalesce_key is not None:
+            with self._stats_lock:
+                if coalesce_key in self._pending_keys:
+                    self._stats['coalesced'] += 1
+                    return True
+                self._pending_keys.add(coalesce_key)
+        try:
+            self._tasks.put((func, args, kwargs, time.time(), coalesce_key),
+                            block, timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._pending_keys.discard(coalesce_key)
+                self._stats['rejected'] += 1
+            return False
+        self._update_stats(submitted=1)
+        return True
+
+    def submit_later(self, delay, func, *args, **kwargs):
+        """Submit func(*args, **kwargs) like submit once delay seconds have
+        passed. The task is held by the timer thread until then so that no
+        worker is occupied while waiting. Any special submit keywords are
+        applied when the task is due. If the special coalesce_key keyword is
+        given and another task with the same key is still delayed or waiting
+        in the queue the task is dropped right away as a duplicate. Returns a
+        boolean indicating if the task was accepted, which is only False if
+        max_delayed tasks are already waiting.
+        """
+
+        coalesce_key = kwargs.get('coalesce_key', None)
+        due = time.time() + max(0.0, delay)
+        with self._delay_cond:
+            if coalesce_key is not None:
+                with self._stats_lock:
+                    duplicate = coalesce_key in self._pending_keys
+                if duplicate or coalesce_key in self._delayed_keys:
+                    self._update_stats(coalesced=1)
+                    return True
+            if self.max_delayed > 0 and \
+                    len(self._delayed) >= self.max_delayed:
+                self._update_stats(dropped=1)
+                return False
+            if coalesce_key is not None:
+                self._delayed_keys.add(coalesce_key)
+            heapq.heappush(self._delayed, (due, next(self._delayed_seq),
+                                           func, args, kwargs))
+            self._delay_cond.notify()
+        self._update_stats(delayed=1)
+        return True
+
+    def queue_depth(self):
+        """Number of tasks waiting for a worker"""
+
+        return self._tasks.qsize()
+
+    def get_stats(self):
+        """Return a copy of the stats counters with current queue depth and
+        average wait and run times added.
+        """
+
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self.queue_depth()
+        with self._delay_cond:
+            stats['waiting'] = len(self._delayed)
+        done = max(1, stats['completed'])
+        stats['avg_wait_secs'] = stats['wait_secs'] / done
+        stats['avg_run_secs'] = stats['run_secs'] / done
+        return stats
+
+    def format_stats(self):
+        """Format stats as a single line for logging"""
+
+        stats = self.get_stats()
+        stats['name'] = self.name
+        return '%(name)s pool: %(queued)d queued, %(active)d active, ' \
+            '%(completed)d done, %(failed)d failed, %(rejected)d rejected, ' \
+            '%(coalesced)d coalesced, %(waiting)d delayed, ' \
+            '%(dropped)d dropped, ' \
+            'avg wait %(avg_wait_secs).3fs (max %(max_wait_secs).3fs), ' \
+            'avg run %(avg_run_secs).3fs' % stats
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop all workers after they finish the already queued tasks. With
+        wait set the stop markers are queued and the workers joined within
+        the optional timeout. Otherwise the markers are only queued if there
+        is room. The workers are daemon threads so any left behind die with
+        the process.
+        """
+
+        with self._delay_cond:
+            self._timer_stop = True
+            if self._delayed:
+                self.logger.warning('%s pool dropping %d delayed tasks' %
+                                    (self.name, len(self._delayed)))
+            self._delayed = []
+            self._delayed_keys.clear()
+            self._delay_cond.notify()
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        for _ in self._threads:
+            put_timeout = None
+            if deadline is not None:
+                put_timeout = max(0.0, deadline - time.time())
+            try:
+                # NOTE: never block forever on a full queue where workers
+                #       may be waiting for a lock held by the caller
+                self._tasks.put(_STOP, wait, put_timeout)
+            except queue.Full:
+                self.logger.warning('%s pool queue full - not all workers '
+                                    'stopped' % self.name)
+                break
+        if wait:
+            for worker in self._threads:
+                join_timeout = None
+                if deadline is not None:
+                    join_timeout = max(0.0, deadline - time.time())
+                worker.join(join_timeout)
+        self._threads = []
+        self.logger.info('stopped %s pool' % self.name)
@@ -40,12 +40,14 @@ from mig.shared import returnvalues
 from mig.shared.bailout import bailout_helper, crash_helper, compact_string
 from mig.shared.base import requested_backend, allow_script, \
     is_default_str_coding, force_native_str_rec, force_utf8, force_utf8_rec
-from mig.shared.defaults import download_block_size, default_fs_coding
+from mig.shared.defaults import download_block_size, \
+    download_stream_block_size, default_fs_coding
 from mig.shared.conf import get_configuration_object
 from mig.shared.objecttypes import get_object_type_info
 from mig.shared.output import validate, format_output, dummy_main, reject_main
 from mig.shared.safeinput import valid_backend_name, html_escape, InputException
 from mig.shared.scriptinput import fieldstorage_to_dict
+from mig.shared.streaming import StreamOutput, parse_byte_range
 
 
 def object_type_info(object_type):
@@ -189,6 +191,122 @@ def wrap_wsgi_errors(environ, configuration, max_line_len=100):
         environ['wsgi.errors'].close()
 
 
+def chunked_response(start_response, configuration, backend, client_id,
+                     status, response_headers, output):
+    """Generator delivering the fully formatted output to the client in
+    chunks of at most download_block_size bytes.
+    """
+
+    _logger = configuration.logger
+    content_length = len(output)
+    if not 'Content-Length' in dict(response_headers):
+        # _logger.debug("WSGI adding explicit content length %s" % content_length)
+        response_headers.append(('Content-Length', "%d" % content_length))
+
+    # NOTE: send response to client but don't crash e.g. on closed connection
+    try:
+        # IMPORTANT: headers must be on native string format here
+        native_headers = force_native_str_rec(response_headers)
+        #_logger.debug("native headers: %s" % native_headers)
+        start_response(status, native_headers)
+        #_logger.debug("started response to client")
+
+        # NOTE: we consistently hit download error for archive files reaching ~2GB
+        #       with showfreezefile.py on wsgi but the same on cgi does NOT suffer
+        #       the problem for the exact same files. It seems wsgi has a limited
+        #       output buffer, so we explicitly force significantly smaller chunks
+        #       here as a workaround. Backends delivering big files should use
+        #       a file_stream entry to avoid the formatted output altogether.
+        chunk_parts = 1
+        if content_length > download_block_size:
+            chunk_parts = content_length // download_block_size
+            if content_length % download_block_size != 0:
+                chunk_parts += 1
+            _logger.info("WSGI %s yielding %d output parts (%db)" %
+                         (backend, chunk_parts, content_length))
+        # _logger.debug("send chunked %r response to client" % backend)
+        for i in range(chunk_parts):
+            # _logger.debug("WSGI %s yielding part %d / %d output parts" %
+            #              (backend, i+1, chunk_parts))
+            # end index may be after end of content - but no problem
+            part = output[i*download_block_size:(i+1)*download_block_size]
+            #_logger.debug("yield %r chunk to client" % backend)
+            # IMPORTANT: bytes are required here for all python versions
+            yield force_utf8(part)
+        if chunk_parts > 1:
+            _logger.info("WSGI %s finished yielding all %d output parts" %
+                         (backend, chunk_parts))
+        _logger.debug("done sending %d chunk(s) of %r response to client" %
+                      (chunk_parts, backend))
+    except IOError as ioe:
+        _logger.warning("WSGI %s for %s could not deliver output: %s" %
+                        (backend, client_id, ioe))
+    except Exception as exc:
+        _logger.error("WSGI %s for %s crashed during response: %s" %
+                      (backend, client_id, exc))
+
+
+def stream_response(environ, start_response, configuration, backend,
+                    client_id, status, response_headers, output):
+    """Deliver streamed output with constant memory use. Open files are
+    handed to the wsgi.file_wrapper helper if the server provides it, so that
+    it can use sendfile. Seekable streams with known size additionally serve
+    a single byte range if requested with a HTTP Range header. Such partial
+    content is always chunked here as file wrappers send until end of file.
+    Returns the response iterable.
+    """
+
+    _logger = configuration.logger
+    skip_headers = ('Content-Length', 'Content-Range', 'Accept-Ranges')
+    headers = [(key, val) for (key, val) in response_headers
+               if key not in skip_headers]
+    (start, length) = (0, output.size)
+    if output.seekable():
+        headers.append(('Accept-Ranges', 'bytes'))
+        range_value = environ.get('HTTP_RANGE', '')
+        if range_value and status.startswith('200') and \
+                environ.get('REQUEST_METHOD', 'GET') == 'GET':
+            try:
+                byte_range = parse_byte_range(range_value, output.size)
+            except ValueError as err:
+                _logger.info("WSGI %s for %s refused range: %s" %
+                             (backend, client_id, err))
+                output.close()
+                headers.append(('Content-Range', 'bytes */%d' % output.size))
+                headers.append(('Content-Length', '0'))
+                start_response('416 Range Not Satisfiable',
+                               force_native_str_rec(headers))
+                return []
+            if byte_range is not None:
+                (start, end) = byte_range
+                length = end - start + 1
+                status = '206 Partial Content'
+                headers.append(('Content-Range', 'bytes %d-%d/%d' %
+                                (start, end, output.size)))
+    if length is not None:
+        headers.append(('Content-Length', "%d" % length))
+
+    try:
+        # IMPORTANT: headers must be on native string format here
+        start_response(status, force_native_str_rec(headers))
+    except Exception as exc:
+        _logger.warning("WSGI %s for %s could not start stream: %s" %
+                        (backend, client_id, exc))
+        output.close()
+        return []
+
+    _logger.info("WSGI %s streaming %s bytes from offset %d to %s" %
+                 (backend, length, start, client_id))
+    file_wrapper = environ.get('wsgi.file_wrapper', None)
+    if file_wrapper is not None and output.is_file() and start == 0 and \
+            length == output.size:
+        # NOTE: PEP 3333 file wrappers send from the current position until
+        #       end of file so only use them for the full content
+        output.stream.seek(start)
+        return file_wrapper(output.stream, download_stream_block_size)
+    return output.iter_chunks(start, length, download_stream_block_size)
+
+
 def application(environ, start_response, configuration=None,
         _import_module=importlib.import_module, _set_os_environ=True):
     """MiG app called automatically by WSGI.
@@ -255,7 +373,7 @@ def application(environ, start_response, configuration=None,
         sys.stdout = sys.stderr
 
     if configuration is None:
-        configuration = get_configuration_object()
+        configuration = get_configuration_object(cached=True)
 
     _logger = configuration.logger
 
@@ -382,53 +500,16 @@ def application(environ, start_response, configuration=None,
         _logger.error("WSGI %s output formatting failed" % output_format)
         output = 'Error: output could not be correctly delivered!'
 
-    content_length = len(output)
-    if not 'Content-Length' in dict(response_headers):
-        # _logger.debug("WSGI adding explicit content length %s" % content_length)
-        response_headers.append(('Content-Length', "%d" % content_length))
-
     _logger.debug("send %r response as %s to %s" %
                   (backend, output_format, client_id))
-    # NOTE: send response to client but don't crash e.g. on closed connection
-    try:
-        # IMPORTANT: headers must be on native string format here
-        native_headers = force_native_str_rec(response_headers)
-        #_logger.debug("native headers: %s" % native_headers)
-        start_response(status, native_headers)
-        #_logger.debug("started response to client")
-
-        # NOTE: we consistently hit download error for archive files reaching ~2GB
-        #       with showfreezefile.py on wsgi but the same on cgi does NOT suffer
-        #       the problem for the exact same files. It seems wsgi has a limited
-        #       output buffer, so we explicitly force significantly smaller chunks
-        #       here as a workaround.
-        chunk_parts = 1
-        if content_length > download_block_size:
-            chunk_parts = content_length // download_block_size
-            if content_length % download_block_size != 0:
-                chunk_parts += 1
-            _logger.info("WSGI %s yielding %d output parts (%db)" %
-                         (backend, chunk_parts, content_length))
-        # _logger.debug("send chunked %r response to client" % backend)
-        for i in range(chunk_parts):
-            # _logger.debug("WSGI %s yielding part %d / %d output parts" %
-            #              (backend, i+1, chunk_parts))
-            # end index may be after end of content - but no problem
-            part = output[i*download_block_size:(i+1)*download_block_size]
-            #_logger.debug("yield %r chunk to client" % backend)
-            # IMPORTANT: bytes are required here for all python versions
-            yield force_utf8(part)
-        if chunk_parts > 1:
-            _logger.info("WSGI %s finished yielding all %d output parts" %
-                         (backend, chunk_parts))
-        _logger.debug("done sending %d chunk(s) of %r response to client" %
-                      (chunk_parts, backend))
-    except IOError as ioe:
-        _logger.warning("WSGI %s for %s could not deliver output: %s" %
-                        (backend, client_id, ioe))
-    except Exception as exc:
-        _logger.error("WSGI %s for %s crashed during response: %s" %
-                      (backend, client_id, exc))
+    if isinstance(output, StreamOutput):
+        response = stream_response(environ, start_response, configuration,
+                                   backend, client_id, status,
+                                   response_headers, output)
+    else:
+        response = chunked_response(start_response, configuration, backend,
+                                    client_id, status, response_headers,
+                                    output)
 
     # NOTE: we're done, but add explicit clean up to address late log blow-up
     #       https://github.com/ucphhpc/migrid-sync/issues/50
@@ -440,3 +521,4 @@ def application(environ, start_response, configuration=None,
     _logger.debug("done cleaning up - detach wsgi error loggers")
     # TMP! uncomment next to test unhandled exception and error log
     # fieldstorage.__del__
+    return response
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# smtpsupp - minimal local smtp server stand-in for unit tests
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#
+# -- END_HEADER ---
+#
+
+
+"""Minimal SMTP server stand-in recording received messages for tests"""
+
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Speak just enough SMTP for smtplib sendmail"""
+
+    def _reply(self, line):
+        self.wfile.write(('%s\r\n' % line).encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply('220 localhost stand-in ready')
+        (sender, recipients) = (None, [])
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode('ascii', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250 localhost')
+            elif verb == 'MAIL':
+                with server.lock:
+                    fail = server.fail_next > 0
+                    if fail:
+                        server.fail_next -= 1
+                if fail:
+                    self._reply('421 try again later')
+                    break
+                (sender, recipients) = (command[10:].strip('<> '), [])
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                address = command[8:].strip('<> ')
+                if address in server.reject_rcpt:
+                    self._reply('550 no such user')
+                else:
+                    recipients.append(address)
+                    self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 end data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append((sender, recipients,
+                                            b''.join(data)))
+                self._reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 bye')
+                break
+            else:
+                self._reply('502 not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Local SMTP server for use with make_wrapped_server. Received messages
+    are saved as (sender, recipients, data) tuples in messages and the
+    number of accepted connections is counted in connections. Set fail_next
+    to reply with a temporary error to the next number of MAIL commands.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), on_start=None,
+                 reject_rcpt=()):
+        socketserver.ThreadingTCPServer.__init__(self, address, _SMTPHandler)
+        self.on_start = on_start
+        self.reject_rcpt = reject_rcpt
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0
+
+    @property
+    def server_spec(self):
+        """The host:port string to use as smtp_server"""
+        return '%s:%d' % self.server_address
+
+    def serve_forever(self, poll_interval=0.1):
+        if self.on_start:
+            self.on_start(self)
+        socketserver.ThreadingTCPServer.serve_forever(self, poll_interval)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_resource_imagepreview - unit test of the image preview script
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the image preview generation resource script"""
+
+import hashlib
+import importlib
+import os
+import sys
+import unittest
+from multiprocessing import Pool
+
+from tests.support import MIG_BASE, MigTestCase, temppath, testmain
+
+
+def _import_forcibly(module_name, relative_module_dir):
+    """Import module_name from a non-module dir below mig. Returns None if
+    the image dependencies like numpy, cv2, libtiff and tables are missing.
+    """
+
+    module_path = os.path.join(MIG_BASE, 'mig', relative_module_dir)
+    sys.path.append(module_path)
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+    finally:
+        sys.path.pop(-1)  # do not leave the forced module path
+
+
+imagepreview = _import_forcibly('imagepreview', 'resource/image-scripts')
+
+TEST_X_DIMENSION = 8
+TEST_Y_DIMENSION = 8
+TEST_OFFSET = 16
+
+
+def _private(name):
+    """Lookup module private helper without class name mangling"""
+
+    return getattr(imagepreview, '__%s' % name)
+
+
+@unittest.skipIf(imagepreview is None, "image dependencies not available")
+class MigResourceImagepreview(MigTestCase):
+    """Coverage of preview generation, error paths and worker fan-out"""
+
+    def before_each(self):
+        self.base_path = temppath('imagepreview', self, ensure_dir=True)
+
+    def _write_raw(self, name, values=None, offset=TEST_OFFSET):
+        """Write raw uint16 image with header of offset bytes"""
+
+        from numpy import arange, uint16
+        if values is None:
+            values = arange(TEST_X_DIMENSION * TEST_Y_DIMENSION,
+                            dtype=uint16)
+        raw_path = os.path.join(self.base_path, name)
+        with open(raw_path, 'wb') as raw_fd:
+            raw_fd.write(b'H' * offset)
+            raw_fd.write(values.tobytes())
+        return raw_path
+
+    def _raw_meta(self, name, **overrides):
+        """Build preview meta for raw image name with settings overrides"""
+
+        meta = _private('init_meta')(self.logger, self.base_path, '', name)
+        settings = {'image_type': 'raw', 'data_type': 'uint16',
+                    'offset': TEST_OFFSET, 'x_dimension': TEST_X_DIMENSION,
+                    'y_dimension': TEST_Y_DIMENSION,
+                    'preview_x_dimension': 4, 'preview_y_dimension': 4,
+                    'preview_cutoff_min': 0.0, 'preview_cutoff_max': 0.0}
+        settings.update(overrides)
+        meta['2D']['settings'] = settings
+        return meta
+
+    def test_find_image_files(self):
+        for rel_path in ('a.raw', '.hidden.raw', 'b.txt', 'sub/c.raw'):
+            abs_path = os.path.join(self.base_path, rel_path)
+            if not os.path.isdir(os.path.dirname(abs_path)):
+                os.makedirs(os.path.dirname(abs_path))
+            with open(abs_path, 'w') as image_fd:
+                image_fd.write('dummy')
+        find_image_files = _private('find_image_files')
+
+        self.assertEqual(find_image_files(self.base_path, 'raw', False),
+                         [('', 'a.raw')])
+        self.assertEqual(sorted(find_image_files(self.base_path, 'raw',
+                                                 True)),
+                         [('', 'a.raw'), ('sub', 'c.raw')])
+
+    def test_progress_updates_are_batched(self):
+        progress = _private('init_progress')(100)
+        progress_due = _private('progress_due')
+
+        due = [i for i in range(1, 101) if progress_due(progress, i)]
+        self.assertTrue(len(due) <= 100 // imagepreview.progress_update_percent)
+        self.assertEqual(due[-1], 100)
+
+    def test_raw_preview_generation(self):
+        raw_path = self._write_raw('image.raw')
+        meta = self._raw_meta('image.raw')
+
+        self.assertTrue(imagepreview.fill_image_data(self.logger, meta))
+        self.assertTrue(imagepreview.fill_image_stats(self.logger, meta))
+        self.assertTrue(imagepreview.fill_image_preview(self.logger, meta))
+        self.assertTrue(imagepreview.fill_image_preview_histogram(
+            self.logger, meta))
+
+        image = meta['2D']
+        with open(raw_path, 'rb') as raw_fd:
+            self.assertEqual(image['md5sum'],
+                             hashlib.md5(raw_fd.read()).hexdigest())
+        pixels = TEST_X_DIMENSION * TEST_Y_DIMENSION
+        self.assertEqual(image['stats']['min_value'], 0)
+        self.assertEqual(image['stats']['max_value'], pixels - 1)
+        self.assertEqual(image['stats']['mean'], (pixels - 1) / 2.0)
+        preview = image['preview']
+        self.assertEqual((preview['y_dimension'], preview['x_dimension']),
+                         (4, 4))
+        self.assertEqual(preview['rescaled_data'].shape, (4, 4))
+        self.assertEqual(str(preview['rescaled_data'].dtype), 'uint8')
+        self.assertEqual(int(preview['histogram'].sum()), 16)
+
+    def test_unsupported_image_type(self):
+        self.logger.forgive_errors()
+        self._write_raw('image.raw')
+        meta = self._raw_meta('image.raw', image_type='bogus')
+
+        self.assertFalse(imagepreview.fill_image_data(self.logger, meta))
+        self.assertIsNone(meta['2D']['data'])
+
+    def test_truncated_raw_image(self):
+        from numpy import arange, uint16
+        self.logger.forgive_errors()
+        self._write_raw('short.raw', values=arange(4, dtype=uint16))
+        meta = self._raw_meta('short.raw')
+
+        self.assertFalse(imagepreview.fill_image_data(self.logger, meta))
+
+    def test_missing_settings_skips_file(self):
+        self.logger.forgive_errors()
+        self._write_raw('image.raw')
+
+        self.assertFalse(imagepreview.update_file_preview(
+            self.logger, self.base_path, '', 'image.raw'))
+
+    def test_worker_reports_failures(self):
+        self.logger.forgive_errors()
+        _private('init_preview_worker')(self.logger)
+        file_worker = _private('file_preview_worker')
+        volume_worker = _private('volume_preview_worker')
+
+        self.assertEqual(file_worker((None, 'sub', 'image.raw')),
+                         ('sub', 'image.raw', False))
+        self.assertEqual(volume_worker((None, 'sub', 1, 1)), ('sub', False))
+
+    def test_map_tasks_inline(self):
+        map_tasks = _private('map_tasks')
+
+        results = list(map_tasks(self.logger, None, abs, [-1, 2, -3]))
+        self.assertEqual(results, [1, 2, 3])
+        self.assertIs(imagepreview._worker_logger, self.logger)
+
+    def test_map_tasks_pool(self):
+        map_tasks = _private('map_tasks')
+        pool = Pool(processes=2)
+        try:
+            results = list(map_tasks(self.logger, pool, abs,
+                                     list(range(-10, 0))))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(sorted(results), list(range(1, 11)))
+
+    def test_update_previews_without_settings(self):
+        self.logger.forgive_errors()
+        self._write_raw('image.raw')
+
+        self.assertTrue(imagepreview.update_previews(
+            self.logger, self.base_path, 'raw', workers=2))
+
+
+if __name__ == '__main__':
+    testmain()
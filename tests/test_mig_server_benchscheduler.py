@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_benchscheduler - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the scheduler benchmark harness"""
+
+import os
+import random
+
+from tests.support import MigTestCase, temppath, testmain
+
+from mig.server.benchscheduler import bench_algorithm, load_trace, \
+    make_trace, percentile, save_json
+
+
+class MigServerBenchscheduler(MigTestCase):
+    """Coverage of trace generation and replay"""
+
+    def before_each(self):
+        random.seed(42)
+        self.trace = make_trace(20, 10, 5)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 90), 0.0)
+
+    def test_reproducible_trace(self):
+        random.seed(42)
+        self.assertEqual(make_trace(20, 10, 5), self.trace)
+        requests = [i for i in self.trace['events'] if i[0] == 'request']
+        self.assertEqual(len(requests), 10)
+
+    def test_trace_roundtrip(self):
+        trace_path = os.path.join(temppath('bench', self, ensure_dir=True),
+                                  'trace.json')
+        save_json(self.trace, trace_path)
+        loaded = load_trace(trace_path)
+        self.assertEqual(loaded['events'], self.trace['events'])
+        self.assertEqual(loaded['resources'], self.trace['resources'])
+
+    def test_bench_first_fit(self):
+        result = bench_algorithm('FirstFit', self.trace, self.logger,
+                                 with_memory=False)
+        self.assertEqual(result['requests'], 10)
+        self.assertTrue(0 < result['scheduled'] <= 10)
+        self.assertTrue(result['p50_latency_secs'] <=
+                        result['p99_latency_secs'])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_chkuserroot - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the cached user chroot checks of the RewriteMap helper"""
+
+import os
+
+from tests.support import MigTestCase, testmain, temppath
+from tests.support.configsupp import FakeConfiguration
+
+import mig.server.chkuserroot as chkuserroot
+from mig.shared.base import client_id_dir
+
+TEST_USER = '/C=DK/CN=Alice'
+
+
+class MigServerChkuserroot(MigTestCase):
+    """Coverage of the user chroot verdicts and their caching"""
+
+    def before_each(self):
+        base = temppath('chkuserroot', self, ensure_dir=True)
+        state = os.path.join(base, 'state')
+        self.chroot_conf = FakeConfiguration(
+            logger=self.logger, user_home=os.path.join(state, 'user_home'),
+            user_db_home=os.path.join(state, 'user_db_home'),
+            mig_server_home=os.path.join(base, 'server'),
+            resource_home=os.path.join(state, 'resource_home'),
+            vgrid_private_base=os.path.join(state, 'vgrid_private_base'),
+            vgrid_public_base=os.path.join(state, 'vgrid_public_base'),
+            vgrid_files_home=os.path.join(state, 'vgrid_files_home'),
+            vgrid_files_readonly=os.path.join(state, 'vgrid_files_readonly'),
+            vgrid_files_writable=os.path.join(state, 'vgrid_files_writable'),
+            mig_system_storage=os.path.join(state, 'mig_system_storage'),
+            site_enable_seafile=False)
+        self.home = os.path.join(self.chroot_conf.user_home,
+                                 client_id_dir(TEST_USER))
+        os.makedirs(self.home)
+        self.file_path = os.path.join(self.home, 'data.txt')
+        with open(self.file_path, 'w') as data_fd:
+            data_fd.write('data')
+        chkuserroot.path_cache.clear()
+        chkuserroot.account_cache.clear()
+        chkuserroot._user_db_stamp['mtime'] = None
+        self.checked_accounts = []
+        self.orig_check = chkuserroot.check_account_accessible
+        chkuserroot.check_account_accessible = self._fake_check_account
+
+    def after_each(self):
+        chkuserroot.check_account_accessible = self.orig_check
+
+    def _fake_check_account(self, configuration, user_id, proto):
+        self.checked_accounts.append(user_id)
+        return user_id == TEST_USER
+
+    def test_valid_path_cached(self):
+        hits = chkuserroot.path_cache.get_stats()['hits']
+        for _ in range(3):
+            self.assertEqual(chkuserroot.check_user_root(
+                self.chroot_conf, 'UNKNOWN', self.file_path),
+                os.path.realpath(self.file_path))
+        self.assertEqual(self.checked_accounts, [TEST_USER])
+        self.assertEqual(chkuserroot.path_cache.get_stats()['hits'],
+                         hits + 2)
+
+    def test_invalid_paths(self):
+        self.logger.forgive_errors()
+        other_home = os.path.join(self.chroot_conf.user_home, 'other')
+        os.makedirs(other_home)
+        escape_link = os.path.join(self.home, 'escape')
+        os.symlink(other_home, escape_link)
+        for path in ['relative/path', '/etc/passwd',
+                     os.path.join(self.home, '..', 'other', 'x'),
+                     os.path.join(escape_link, 'x'), self.home]:
+            self.assertEqual(chkuserroot.check_user_root(
+                self.chroot_conf, 'UNKNOWN', path),
+                chkuserroot.INVALID_MARKER)
+
+    def test_account_cache_reset_on_user_db_change(self):
+        chkuserroot.check_user_root(self.chroot_conf, 'UNKNOWN',
+                                    self.file_path)
+        os.makedirs(self.chroot_conf.user_db_home)
+        with open(os.path.join(self.chroot_conf.user_db_home,
+                               'MiG-users.db'), 'w') as db_fd:
+            db_fd.write('changed')
+        chkuserroot.check_user_root(self.chroot_conf, 'UNKNOWN',
+                                    self.file_path)
+        self.assertEqual(self.checked_accounts, [TEST_USER, TEST_USER])
+
+
+if __name__ == '__main__':
+    testmain()
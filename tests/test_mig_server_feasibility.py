@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_feasibility - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the scheduler feasibility index"""
+
+import itertools
+
+from tests.support import MigTestCase, testmain
+
+from mig.server.feasibility import FeasibilityIndex, numpy
+from mig.server.jobqueue import JobQueue
+from mig.server.scheduler import Scheduler
+
+
+def _make_job(job_id, cpucount, arch='', jobtype='batch', envs=None,
+              resource=None):
+    """Minimal job dict helper"""
+    job = {'JOB_ID': job_id, 'CPUCOUNT': '%s' % cpucount, 'NODECOUNT': '1',
+           'CPUTIME': '60', 'DISK': '1', 'MEMORY': '128',
+           'ARCHITECTURE': arch, 'JOBTYPE': jobtype, 'SANDBOX': False,
+           'PLATFORM': '', 'RUNTIMEENVIRONMENT': envs or []}
+    if resource is not None:
+        job['RESOURCE'] = resource
+    return job
+
+
+def _make_res(res_id, cpucount, arch='X86', jobtype='batch', envs=None,
+              sandbox=False):
+    """Minimal resource dict helper"""
+    return {'RESOURCE_ID': res_id, 'ANONYMOUS': False,
+            'CPUCOUNT': '%s' % cpucount, 'NODECOUNT': '4', 'CPUTIME': '3600',
+            'DISK': '10', 'MEMORY': '1024', 'ARCHITECTURE': arch,
+            'JOBTYPE': jobtype, 'SANDBOX': sandbox, 'PLATFORM': '',
+            'RUNTIMEENVIRONMENT': [(i, []) for i in envs or []]}
+
+
+class _StaticChecker(object):
+    """Just enough scheduler state for the classic static fit check"""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+
+class MigServerFeasibility(MigTestCase):
+    """Coverage of the feasibility index against the classic check"""
+
+    def _jobs(self):
+        jobs = []
+        variants = itertools.product([1, 2, 8], ['', 'X86', 'ARM'],
+                                     ['batch', 'bulk'], [[], ['PYTHON']],
+                                     [None, ['res1_*']])
+        for (i, (cpus, arch, jobtype, envs, resource)) in \
+                enumerate(variants):
+            jobs.append(_make_job('job%d' % i, cpus, arch, jobtype, envs,
+                                  resource))
+        return jobs
+
+    def _resources(self):
+        return [_make_res('res1_1', 2), _make_res('res2_1', 8, 'ARM'),
+                _make_res('res3_1', 16, jobtype='bulk', envs=['PYTHON']),
+                _make_res('res4_1', 4, jobtype='all', sandbox=True)]
+
+    def _check_index(self, index, jobs, resources):
+        checker = _StaticChecker(self.logger)
+        for res in resources:
+            mask = index.fit_mask(res)
+            for job in jobs:
+                expected = Scheduler.job_static_fits_resource(checker, job,
+                                                              res)
+                self.assertEqual(bool(mask[index.job_row(job['JOB_ID'])]),
+                                 expected, '%s on %s' % (job, res))
+
+    def _test_matches_classic_check(self, use_numpy):
+        index = FeasibilityIndex(self.logger, use_numpy=use_numpy)
+        jobs = self._jobs()
+        resources = self._resources()
+        index.sync_jobs(jobs)
+        self.assertEqual(len(index), len(jobs))
+        self._check_index(index, jobs, resources)
+
+    def test_matches_classic_check(self):
+        self._test_matches_classic_check(False)
+
+    def test_matches_classic_check_numpy(self):
+        if numpy is None:
+            self.skipTest('numpy not available')
+        self._test_matches_classic_check(True)
+
+    def test_incremental_updates(self):
+        self._test_incremental_updates(False)
+
+    def test_incremental_updates_numpy(self):
+        if numpy is None:
+            self.skipTest('numpy not available')
+        self._test_incremental_updates(True)
+
+    def _test_incremental_updates(self, use_numpy):
+        index = FeasibilityIndex(self.logger, use_numpy=use_numpy)
+        jobs = self._jobs()
+        resources = self._resources()
+        index.sync_jobs(jobs[:10])
+        for res in resources:
+            index.fit_mask(res)
+        # Rows of added jobs must be filled in the cached masks and removed
+        # ones must no longer fit.
+        index.sync_jobs(jobs[5:])
+        self.assertEqual(index.job_row('job0'), None)
+        self._check_index(index, jobs[5:], resources)
+        # Changed resources must be recalculated
+        resources[0]['CPUCOUNT'] = '8'
+        self._check_index(index, jobs[5:], resources)
+
+    def test_huge_values_clamped(self):
+        self._test_huge_values_clamped(False)
+
+    def test_huge_values_clamped_numpy(self):
+        if numpy is None:
+            self.skipTest('numpy not available')
+        self._test_huge_values_clamped(True)
+
+    def _test_huge_values_clamped(self, use_numpy):
+        index = FeasibilityIndex(self.logger, use_numpy=use_numpy)
+        greedy = _make_job('greedy', 1)
+        greedy['MEMORY'] = '%d' % 10**20
+        modest = _make_job('modest', 1)
+        modest['DISK'] = '%d' % -10**20
+        index.sync_jobs([greedy, modest])
+        small = _make_res('small', 4)
+        huge = _make_res('huge', 4)
+        huge['MEMORY'] = 10**30
+        self.assertFalse(index.fits(greedy, small))
+        self.assertFalse(index.fits(greedy, huge))
+        self.assertTrue(index.fits(modest, small))
+        self.assertTrue(index.fits(modest, huge))
+
+    def test_queue_updates_index(self):
+        job_queue = JobQueue(self.logger)
+        jobs = self._jobs()
+        for job in jobs[:10]:
+            job_queue.enqueue_job(job, job_queue.queue_length())
+        index = FeasibilityIndex(self.logger)
+        job_queue.attach_feasibility(index)
+        self.assertEqual(len(index), 10)
+        resources = self._resources()
+        for res in resources:
+            index.fit_mask(res)
+        for job in jobs[10:]:
+            job_queue.enqueue_job(job, job_queue.queue_length())
+        job_queue.dequeue_job(0)
+        job_queue.dequeue_job_by_id('job5')
+        self.assertEqual(len(index), len(jobs) - 2)
+        self.assertEqual(index.job_row('job0'), None)
+        self.assertEqual(index.job_row('job5'), None)
+        self._check_index(index, job_queue.queue, resources)
+
+
+if __name__ == '__main__':
+    testmain()
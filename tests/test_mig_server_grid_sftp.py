@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_grid_sftp - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the grid_sftp connection admission helpers"""
+
+import threading
+
+from tests.support import MigTestCase, testmain
+
+from mig.server.grid_sftp import admit_connection, release_connection
+
+
+class MigServerGridSftpAdmission(MigTestCase):
+    """Coverage of per-address connection admission"""
+
+    def _daemon_conf(self, max_address_connections):
+        return {'max_address_connections': max_address_connections,
+                'conn_lock': threading.Lock(), 'conn_counts': {}}
+
+    def test_address_limit(self):
+        conf = self._daemon_conf(2)
+        self.assertTrue(admit_connection(conf, '10.0.0.1'))
+        self.assertTrue(admit_connection(conf, '10.0.0.1'))
+        self.assertFalse(admit_connection(conf, '10.0.0.1'))
+        self.assertTrue(admit_connection(conf, '10.0.0.2'))
+        release_connection(conf, '10.0.0.1')
+        self.assertTrue(admit_connection(conf, '10.0.0.1'))
+
+    def test_release_drops_idle_addresses(self):
+        conf = self._daemon_conf(-1)
+        for _ in range(5):
+            self.assertTrue(admit_connection(conf, '10.0.0.1'))
+        for _ in range(5):
+            release_connection(conf, '10.0.0.1')
+        self.assertEqual(conf['conn_counts'], {})
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_grid_transfers - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the grid_transfers queueing and change feed helpers"""
+
+from tests.support import MigTestCase, testmain
+from tests.support.configsupp import FakeConfiguration
+
+import mig.server.grid_transfers as grid_transfers
+from mig.shared.base import client_id_dir
+from mig.shared.defaults import datatransfers_filename
+from mig.shared.transferfunctions import add_worker_transfer
+
+TEST_USERS = ['/C=DK/CN=Alice', '/C=DK/CN=Bob']
+
+
+class FakeEvent(object):
+    """Just the watchdog file event attributes used by the handler"""
+
+    def __init__(self, src_path, dest_path='', is_directory=False):
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.is_directory = is_directory
+
+
+class MigServerGridTransfersQueue(MigTestCase):
+    """Coverage of the capped and fair transfer start"""
+
+    def before_each(self):
+        self.transfers_conf = FakeConfiguration(
+            logger=self.logger, user_settings='/settings',
+            site_transfers_max_workers=3,
+            site_transfers_max_user_workers=2)
+        self.started = []
+        self.orig_handle_transfer = grid_transfers.handle_transfer
+        grid_transfers.logger = self.logger
+        grid_transfers.handle_transfer = self._fake_handle_transfer
+        grid_transfers.all_transfers.clear()
+        grid_transfers.all_workers.clear()
+        grid_transfers.pending_transfers.clear()
+        grid_transfers.pop_changed_clients()
+        for client_id in TEST_USERS:
+            grid_transfers.all_transfers[client_id] = dict(
+                [('%s-%d' % (client_id[-3:], i),
+                  {'transfer_id': '%s-%d' % (client_id[-3:], i),
+                   'status': 'NEW'}) for i in range(4)])
+
+    def after_each(self):
+        grid_transfers.handle_transfer = self.orig_handle_transfer
+        grid_transfers.all_transfers.clear()
+        grid_transfers.all_workers.clear()
+        grid_transfers.pending_transfers.clear()
+
+    def _fake_handle_transfer(self, configuration, client_id, transfer_dict):
+        transfer_id = transfer_dict['transfer_id']
+        self.started.append(transfer_id)
+        add_worker_transfer(configuration, grid_transfers.all_workers,
+                            client_id, transfer_id, transfer_id)
+
+    def test_caps_and_fairness(self):
+        grid_transfers.manage_transfers(self.transfers_conf, full_scan=False)
+        started = grid_transfers.start_pending_transfers(self.transfers_conf)
+        self.assertEqual(started, 3)
+        self.assertEqual(self.started, ['ice-0', 'Bob-0', 'ice-1'])
+        # Nothing more until a worker finishes
+        self.assertEqual(
+            grid_transfers.start_pending_transfers(self.transfers_conf), 0)
+        del grid_transfers.all_workers[list(grid_transfers.all_workers)[0]]
+        self.assertEqual(
+            grid_transfers.start_pending_transfers(self.transfers_conf), 1)
+        self.assertEqual(self.started[-1], 'Bob-1')
+
+    def test_skip_stopped_transfers(self):
+        grid_transfers.manage_transfers(self.transfers_conf, full_scan=False)
+        for transfer_dict in grid_transfers.all_transfers[
+                TEST_USERS[0]].values():
+            transfer_dict['status'] = 'PAUSED'
+        grid_transfers.start_pending_transfers(self.transfers_conf)
+        self.assertEqual(self.started, ['Bob-0', 'Bob-1'])
+
+    def test_change_handler(self):
+        handler = grid_transfers.TransfersChangeHandler()
+        user_dir = '/settings/%s' % client_id_dir(TEST_USERS[0])
+        handler.dispatch(FakeEvent('%s/%s' % (user_dir,
+                                              datatransfers_filename)))
+        handler.dispatch(FakeEvent('%s/%s.lock' % (user_dir,
+                                                   datatransfers_filename)))
+        handler.dispatch(FakeEvent(user_dir, is_directory=True))
+        self.assertEqual(grid_transfers.pop_changed_clients(),
+                         [TEST_USERS[0]])
+        self.assertEqual(grid_transfers.pop_changed_clients(), [])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_jobqueue - unit test of the corresponding mig server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the grid_script job queue"""
+
+from tests.support import MigTestCase, temppath, testmain
+
+from mig.server.jobqueue import JobQueue
+from mig.shared.gridscript import load_queue, save_queue
+
+
+def _make_job(job_id, owner='/C=DK/CN=Test User', resource=None):
+    """Minimal job dict helper"""
+    job = {'JOB_ID': job_id, 'USER_CERT': owner, 'STATUS': 'QUEUED'}
+    if resource is not None:
+        job['UNIQUE_RESOURCE_NAME'] = resource
+    return job
+
+
+class MigServerJobQueue(MigTestCase):
+    """Coverage of the JobQueue positional and indexed API"""
+
+    def before_each(self):
+        self.job_queue = JobQueue(self.logger)
+        for i in range(5):
+            self.job_queue.enqueue_job(_make_job('job%d' % i),
+                                       self.job_queue.queue_length())
+
+    def _queued_ids(self):
+        return [self.job_queue.get_job(i)['JOB_ID'] for i in
+                range(self.job_queue.queue_length())]
+
+    def test_enqueue_keeps_order(self):
+        self.assertEqual(self._queued_ids(),
+                         ['job0', 'job1', 'job2', 'job3', 'job4'])
+
+    def test_enqueue_rejects_duplicate(self):
+        self.logger.forgive_errors()
+        result = self.job_queue.enqueue_job(_make_job('job2'), 0)
+        self.assertFalse(result)
+        self.assertEqual(self.job_queue.queue_length(), 5)
+
+    def test_enqueue_inside_queue(self):
+        self.job_queue.enqueue_job(_make_job('first'), 0)
+        self.job_queue.enqueue_job(_make_job('middle'), 3)
+        self.assertEqual(self._queued_ids(), ['first', 'job0', 'job1',
+                                              'middle', 'job2', 'job3',
+                                              'job4'])
+        job = self.job_queue.dequeue_job_by_id('middle')
+        self.assertEqual(job['JOB_ID'], 'middle')
+        self.assertEqual(self._queued_ids(), ['first', 'job0', 'job1',
+                                              'job2', 'job3', 'job4'])
+
+    def test_get_job_by_id(self):
+        job = self.job_queue.get_job_by_id('job3')
+        self.assertEqual(job['JOB_ID'], 'job3')
+        self.assertIs(job, self.job_queue.get_job(3))
+
+    def test_get_job_by_id_missing(self):
+        self.logger.forgive_errors()
+        self.assertIsNone(self.job_queue.get_job_by_id('missing'))
+
+    def test_dequeue_job(self):
+        job = self.job_queue.dequeue_job(1)
+        self.assertEqual(job['JOB_ID'], 'job1')
+        self.assertEqual(self._queued_ids(), ['job0', 'job2', 'job3', 'job4'])
+        self.assertIsNone(self.job_queue.get_job_by_id('job1',
+                                                       log_errors=False))
+
+    def test_dequeue_job_by_id(self):
+        job = self.job_queue.dequeue_job_by_id('job3')
+        self.assertEqual(job['JOB_ID'], 'job3')
+        self.assertEqual(self._queued_ids(), ['job0', 'job1', 'job2', 'job4'])
+        self.assertIsNone(self.job_queue.dequeue_job_by_id('job3',
+                                                           log_errors=False))
+        # NOTE: a dequeued job may be enqueued again
+        self.assertTrue(self.job_queue.enqueue_job(
+            job, self.job_queue.queue_length()))
+        self.assertEqual(self._queued_ids(), ['job0', 'job1', 'job2', 'job4',
+                                              'job3'])
+
+    def test_dequeue_front_repeatedly(self):
+        for i in range(5, 20):
+            self.job_queue.enqueue_job(_make_job('job%d' % i),
+                                       self.job_queue.queue_length())
+        for i in range(12):
+            self.assertEqual(self.job_queue.dequeue_job(0)['JOB_ID'],
+                             'job%d' % i)
+            self.assertEqual(self.job_queue.get_job(0)['JOB_ID'],
+                             'job%d' % (i + 1))
+        self.assertEqual(self.job_queue.queue_length(), 8)
+        self.assertEqual(self.job_queue.dequeue_job_by_id('job15')['JOB_ID'],
+                         'job15')
+        self.job_queue.enqueue_job(_make_job('first'), 0)
+        self.assertEqual(self._queued_ids(),
+                         ['first', 'job12', 'job13', 'job14', 'job16',
+                          'job17', 'job18', 'job19'])
+        self.assertEqual([job['JOB_ID'] for job in self.job_queue.queue],
+                         self._queued_ids())
+
+    def test_dequeue_job_by_id_after_rebuild(self):
+        self.logger.forgive_errors()
+        (_, owner, resource) = self.job_queue._index_keys['job2']
+        self.job_queue._index_keys['job2'] = (-1, owner, resource)
+        job = self.job_queue.dequeue_job_by_id('job2')
+        self.assertEqual(job['JOB_ID'], 'job2')
+        self.assertEqual(self._queued_ids(), ['job0', 'job1', 'job3', 'job4'])
+
+    def test_owner_and_resource_indexes(self):
+        self.job_queue.enqueue_job(_make_job('other', owner='/CN=Other',
+                                             resource='res.0'),
+                                   self.job_queue.queue_length())
+        owner_jobs = self.job_queue.get_jobs_by_owner('/CN=Other')
+        self.assertEqual([job['JOB_ID'] for job in owner_jobs], ['other'])
+        resource_jobs = self.job_queue.get_jobs_by_resource('res.0')
+        self.assertEqual([job['JOB_ID'] for job in resource_jobs], ['other'])
+        self.job_queue.dequeue_job_by_id('other')
+        self.assertEqual(self.job_queue.get_jobs_by_owner('/CN=Other'), [])
+        self.assertEqual(self.job_queue.get_jobs_by_resource('res.0'), [])
+
+    def test_save_and_load_queue(self):
+        tmp_path = temppath('job_queue.pickle', self)
+        self.assertTrue(save_queue(self.job_queue, tmp_path, self.logger))
+        loaded = load_queue(tmp_path, self.logger)
+        self.assertEqual([loaded.get_job(i)['JOB_ID'] for i in
+                          range(loaded.queue_length())], self._queued_ids())
+        self.assertEqual(loaded.get_job_by_id('job2')['JOB_ID'], 'job2')
+        self.assertEqual(loaded.dequeue_job_by_id('job2')['JOB_ID'], 'job2')
+
+    def test_load_state_without_indexes(self):
+        # NOTE: queue pickles from before the indexes only hold these fields
+        legacy = JobQueue.__new__(JobQueue)
+        legacy.__setstate__({'queue': [_make_job('old0'), _make_job('old1')],
+                             'logger': None})
+        legacy.logger = self.logger
+        self.assertEqual(legacy.get_job_by_id('old1')['JOB_ID'], 'old1')
+        self.assertEqual(legacy.dequeue_job(0)['JOB_ID'], 'old0')
+        self.assertEqual(legacy.queue_length(), 1)
+
+
+if __name__ == '__main__':
+    testmain()
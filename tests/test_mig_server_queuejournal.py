@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_queuejournal - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the grid_script queue journal"""
+
+from tests.support import MigTestCase, temppath, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.server.jobqueue import JobQueue
+from mig.server.queuejournal import QueueJournal
+from mig.server.scheduler import Scheduler
+
+
+def _queue_ids(queue):
+    return [queue.get_job(i)['JOB_ID'] for i in range(queue.queue_length())]
+
+
+class MigServerQueueJournal(MigTestCase):
+    """Coverage of journal recording, recovery and compaction"""
+
+    def before_each(self):
+        self.journal_path = temppath('queue_journal.log', self)
+        self.snapshot_path = temppath('queue_snapshot.pickle', self)
+        self.journal = self._make_journal()
+        self.queues = self._make_queues()
+        for (name, queue) in self.queues.items():
+            self.journal.attach(queue, name)
+
+    def after_each(self):
+        self.journal.close()
+
+    def _make_journal(self):
+        return QueueJournal(self.journal_path, self.snapshot_path,
+                            self.logger, compact_after=5)
+
+    def _make_queues(self):
+        return {'job_queue': JobQueue(self.logger),
+                'executing_queue': JobQueue(self.logger)}
+
+    def _recover(self):
+        journal = self._make_journal()
+        queues = self._make_queues()
+        (recovered, extras) = journal.recover(queues)
+        journal.close()
+        return (recovered, queues, extras)
+
+    def _populate(self):
+        job_queue = self.queues['job_queue']
+        for i in range(3):
+            job_queue.enqueue_job({'JOB_ID': 'job%d' % i, 'STATUS': 'QUEUED'},
+                                  job_queue.queue_length())
+        job = job_queue.dequeue_job_by_id('job1')
+        job['STATUS'] = 'EXECUTING'
+        self.queues['executing_queue'].enqueue_job(job, 0)
+        job_queue.update_job('job2', {'STATUS': 'FROZEN'})
+
+    def test_recover_nothing(self):
+        (recovered, queues, _) = self._recover()
+        self.assertFalse(recovered)
+        self.assertEqual(queues['job_queue'].queue_length(), 0)
+
+    def test_recover_from_journal(self):
+        self._populate()
+        (recovered, queues, _) = self._recover()
+        self.assertTrue(recovered)
+        self.assertEqual(_queue_ids(queues['job_queue']), ['job0', 'job2'])
+        self.assertEqual(_queue_ids(queues['executing_queue']), ['job1'])
+        self.assertEqual(queues['executing_queue'].get_job(0)['STATUS'],
+                         'EXECUTING')
+        self.assertEqual(queues['job_queue'].get_job(1)['STATUS'], 'FROZEN')
+
+    def test_recover_from_snapshot_and_journal(self):
+        self._populate()
+        self.assertTrue(self.journal.needs_compaction())
+        self.assertTrue(self.journal.compact(self.queues,
+                                             {'schedule_cache': {'a': 1}}))
+        self.assertFalse(self.journal.needs_compaction())
+        self.queues['job_queue'].dequeue_job_by_id('job0')
+        (recovered, queues, extras) = self._recover()
+        self.assertTrue(recovered)
+        self.assertEqual(_queue_ids(queues['job_queue']), ['job2'])
+        self.assertEqual(_queue_ids(queues['executing_queue']), ['job1'])
+        self.assertEqual(extras, {'schedule_cache': {'a': 1}})
+
+    def test_recover_schedule_fields(self):
+        self._populate()
+        sched_conf = FakeConfiguration(
+            logger=self.logger, expire_after=86400, peers={},
+            mig_server_id='localhost.0', server_fqdn='localhost')
+        scheduler = Scheduler(self.logger, sched_conf)
+        scheduler.attach_job_queue(self.queues['job_queue'])
+        job = self.queues['job_queue'].get_job_by_id('job0')
+        scheduler.fill_schedule(job)
+        job['SCHEDULE_HINT'] = 'GO'
+        job['EXEC_PRICE'] = 42.0
+        scheduler.journal_schedule(job)
+        other = self.queues['job_queue'].get_job_by_id('job2')
+        scheduler.fill_schedule(other)
+        other['SCHEDULE_HINT'] = 'STAY'
+        scheduler.journal_schedule(other)
+        records = self.journal.records
+        scheduler.flush_schedule_journal()
+        self.assertEqual(self.journal.records, records + 1)
+        (recovered, queues, _) = self._recover()
+        self.assertTrue(recovered)
+        recovered_job = queues['job_queue'].get_job_by_id('job0')
+        self.assertEqual(recovered_job['SCHEDULE_HINT'], 'GO')
+        self.assertEqual(recovered_job['EXEC_PRICE'], 42.0)
+        recovered_job = queues['job_queue'].get_job_by_id('job2')
+        self.assertEqual(recovered_job['SCHEDULE_HINT'], 'STAY')
+
+    def test_recover_ignores_truncated_record(self):
+        self._populate()
+        self.journal.close()
+        with open(self.journal_path, 'ab') as journal_fd:
+            journal_fd.write(b'\x00\x00\x01\x00partial')
+        (recovered, queues, _) = self._recover()
+        self.assertTrue(recovered)
+        self.assertEqual(_queue_ids(queues['job_queue']), ['job0', 'job2'])
+
+    def test_recover_skips_stale_journal(self):
+        self._populate()
+        self.journal.close()
+        with open(self.journal_path, 'rb') as journal_fd:
+            stale_journal = journal_fd.read()
+        self.journal.compact(self.queues)
+        self.journal.close()
+        # NOTE: emulate crash between snapshot rename and journal truncation
+        with open(self.journal_path, 'wb') as journal_fd:
+            journal_fd.write(stale_journal)
+        (recovered, queues, _) = self._recover()
+        self.assertTrue(recovered)
+        self.assertEqual(_queue_ids(queues['job_queue']), ['job0', 'job2'])
+        self.assertEqual(_queue_ids(queues['executing_queue']), ['job1'])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_server_scheduler - unit test of the corresponding server module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the scheduler price evaluation"""
+
+from tests.support import MigTestCase, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.server.scheduler import Scheduler
+
+
+class MigServerSchedulerPrices(MigTestCase):
+    """Coverage of the compiled and cached price evaluation"""
+
+    def before_each(self):
+        self.sched_conf = FakeConfiguration(
+            logger=self.logger, expire_after=86400, peers={},
+            mig_server_id='localhost.0', server_fqdn='localhost')
+        self.scheduler = Scheduler(self.logger, self.sched_conf)
+
+    def test_plain_price(self):
+        self.assertEqual(self.scheduler.eval_price('42.5', {}), 42.5)
+
+    def test_expression_with_replacements(self):
+        replace_map = {'hour': '10', 'PYTHON-3': '1'}
+        self.assertEqual(self.scheduler.eval_price('hour*2+PYTHON-3*5',
+                                                   replace_map), 25.0)
+        replace_map['hour'] = '3'
+        self.assertEqual(self.scheduler.eval_price('hour*2+PYTHON-3*5',
+                                                   replace_map), 11.0)
+        self.assertEqual(self.scheduler.price_cache_stats,
+                         {'hits': 1, 'misses': 1})
+
+    def test_negative_price_is_zero(self):
+        self.assertEqual(self.scheduler.eval_price('1-exec_delay',
+                                                   {'exec_delay': '7.5'}),
+                         0.0)
+
+    def test_illegal_price(self):
+        self.logger.forgive_errors()
+        for _ in range(2):
+            self.assertEqual(self.scheduler.eval_price("open('x')", {}),
+                             self.scheduler.illegal_price)
+        self.assertEqual(self.scheduler.price_cache_stats,
+                         {'hits': 1, 'misses': 1})
+
+    def test_bounded_cache(self):
+        self.scheduler.price_cache_size = 2
+        for i in range(3):
+            self.scheduler.eval_price('%d+hour' % i, {'hour': '1'})
+        self.scheduler.eval_price('0+hour', {'hour': '1'})
+        self.assertEqual(self.scheduler.price_cache_stats,
+                         {'hits': 0, 'misses': 4})
+
+
+if __name__ == '__main__':
+    testmain()
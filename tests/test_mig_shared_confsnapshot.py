@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_confsnapshot - unit test of the corresponding shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the configuration snapshot helpers"""
+
+import os
+import pwd
+import signal
+import stat
+
+from tests.support import MigTestCase, testmain, temppath
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared import confsnapshot
+from mig.shared.confsnapshot import find_config_sources, get_env_stamps, \
+    get_snapshot_path, get_source_stamps, is_snapshot_current, \
+    load_configuration, load_snapshot, request_reload
+
+
+class MigSharedConfSnapshot(MigTestCase):
+    """Coverage of configuration snapshot save, load and invalidation"""
+
+    def before_each(self):
+        self.snapshot_dir = temppath('conf_snapshots', self)
+        self.saved_snapshot_dir = os.environ.get('MIG_CONF_SNAPSHOT_DIR',
+                                                 None)
+        os.environ['MIG_CONF_SNAPSHOT_DIR'] = self.snapshot_dir
+        self.config_file = os.environ['MIG_CONF']
+        request_reload()
+
+    def after_each(self):
+        request_reload()
+        if self.saved_snapshot_dir is None:
+            del os.environ['MIG_CONF_SNAPSHOT_DIR']
+        else:
+            os.environ['MIG_CONF_SNAPSHOT_DIR'] = self.saved_snapshot_dir
+
+    def test_load_saves_private_snapshot(self):
+        configuration = load_configuration(self.config_file, True, True)
+        snapshot_path = get_snapshot_path(self.config_file, True, True)
+        self.assertTrue(os.path.isfile(snapshot_path))
+        self.assertEqual(stat.S_IMODE(os.stat(snapshot_path).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.snapshot_dir).st_mode),
+                         0o700)
+        self.assertTrue(configuration.mig_server_id)
+
+    def test_snapshot_restores_configuration(self):
+        parsed = load_configuration(self.config_file, True, True)
+        restored = load_snapshot(self.config_file, True, True)
+        self.assertIsNotNone(restored)
+        configuration = restored[0]
+        for name in ('mig_server_id', 'user_home', 'site_title',
+                     'site_twofactor_auth_apps', 'include_sections'):
+            self.assertEqual(getattr(configuration, name),
+                             getattr(parsed, name))
+        self.assertIsNotNone(configuration.logger)
+        self.assertIsNotNone(configuration.auth_logger)
+        # NOTE: other log flags must not reuse the snapshot
+        self.assertIsNone(load_snapshot(self.config_file, False, True))
+
+    def test_snapshot_restores_home(self):
+        load_configuration(self.config_file, True, True)
+        saved_home = os.environ['HOME']
+        os.environ['HOME'] = '/nonexistent'
+        try:
+            self.assertIsNotNone(load_snapshot(self.config_file, True, True))
+            self.assertEqual(os.environ['HOME'],
+                             pwd.getpwuid(os.geteuid())[5])
+        finally:
+            os.environ['HOME'] = saved_home
+
+    def test_ca_path_is_a_source(self):
+        conf_path = temppath('ca_path.conf', self)
+        ca_path = temppath('ca_path', self)
+        with open(conf_path, 'w') as conf_fd:
+            conf_fd.write('[GLOBAL]\nca_path = %s\n' % ca_path)
+        configuration = FakeConfiguration(config_file=conf_path,
+                                          include_sections=None)
+        (paths, _) = find_config_sources(configuration)
+        self.assertIn(ca_path, paths)
+
+    def test_hangup_default_left_alone(self):
+        saved_handler = signal.getsignal(signal.SIGHUP)
+        saved_registered = confsnapshot._hangup_state['registered']
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        confsnapshot._hangup_state['registered'] = False
+        try:
+            load_configuration(self.config_file, True, True)
+            self.assertEqual(signal.getsignal(signal.SIGHUP), signal.SIG_DFL)
+        finally:
+            confsnapshot._hangup_state['registered'] = saved_registered
+            signal.signal(signal.SIGHUP, saved_handler)
+
+    def test_cached_copies_are_independent(self):
+        first = load_configuration(self.config_file, True, True)
+        first.site_title = 'changed by caller'
+        second = load_configuration(self.config_file, True, True)
+        self.assertIsNot(first, second)
+        self.assertNotEqual(second.site_title, 'changed by caller')
+
+    def test_source_and_env_changes_detected(self):
+        source_path = temppath('conf_source.conf', self)
+        with open(source_path, 'w') as source_fd:
+            source_fd.write('[GLOBAL]\n')
+        source_stamps = get_source_stamps([source_path])
+        os.environ['MIG_TEST_SNAPSHOT_ENV'] = 'before'
+        env_stamps = get_env_stamps(['MIG_TEST_SNAPSHOT_ENV'])
+        self.assertTrue(is_snapshot_current(source_stamps, env_stamps))
+        os.environ['MIG_TEST_SNAPSHOT_ENV'] = 'after'
+        self.assertFalse(is_snapshot_current(source_stamps, env_stamps))
+        del os.environ['MIG_TEST_SNAPSHOT_ENV']
+        with open(source_path, 'a') as source_fd:
+            source_fd.write('# changed\n')
+        self.assertFalse(is_snapshot_current(source_stamps, {}))
+
+
+if __name__ == '__main__':
+    testmain()
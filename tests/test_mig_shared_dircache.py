@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_dircache - unit tests for the persistent directory cache
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the persistent directory cache"""
+
+import os
+
+from tests.support import MigTestCase, temppath, testmain
+
+import mig.shared.dircache
+from mig.shared.dircache import DirCache
+from mig.shared.serial import dump
+
+
+class MigSharedDirCache(MigTestCase):
+    """Coverage of dir cache snapshot, delta log and legacy migration"""
+
+    def before_each(self):
+        self.cache_dir = temppath('dir_cache', self, ensure_dir=True)
+        self.cache_path = os.path.join(self.cache_dir, '.triggers.dir_cache')
+        self.legacy_path = os.path.join(self.cache_dir, 'legacy.dir_cache')
+
+    def _make_cache(self):
+        return DirCache(self.cache_path, self.logger,
+                        legacy_path=self.legacy_path)
+
+    def test_load_missing(self):
+        cache = self._make_cache()
+        self.assertFalse(cache.load())
+        self.assertEqual(len(cache), 0)
+
+    def test_save_and_load_changes(self):
+        cache = self._make_cache()
+        cache.set_mtime('A', 1.0)
+        cache.set_mtime('A/b', 2.0)
+        self.assertTrue(cache.save())
+        # NOTE: first save writes snapshot and later ones append to log
+        cache.set_mtime('A/b', 3.0)
+        cache.set_mtime('A/c', 4.0)
+        cache.remove('A/missing')
+        self.assertTrue(cache.save())
+        cache.remove('A/c')
+        self.assertTrue(cache.save())
+        self.assertTrue(os.path.getsize(cache.log_path) > 0)
+
+        loaded = self._make_cache()
+        self.assertTrue(loaded.load())
+        self.assertEqual(sorted(loaded.paths()), ['A', 'A/b'])
+        self.assertEqual(loaded.get_mtime('A/b'), 3.0)
+        self.assertEqual(loaded.get_mtime('A/c', -1), -1)
+
+    def test_compacts_large_log(self):
+        old_min = mig.shared.dircache.compact_min_records
+        mig.shared.dircache.compact_min_records = 2
+        try:
+            cache = self._make_cache()
+            cache.set_mtime('A', 1.0)
+            cache.save()
+            for i in range(3):
+                cache.set_mtime('A/%d' % i, float(i))
+            cache.save()
+        finally:
+            mig.shared.dircache.compact_min_records = old_min
+        self.assertEqual(os.path.getsize(cache.log_path), 0)
+        loaded = self._make_cache()
+        loaded.load()
+        self.assertEqual(len(loaded), 4)
+
+    def test_migrate_legacy(self):
+        dump({'A': {'mtime': 1.0}, 'A/b': {'mtime': 2.0}}, self.legacy_path)
+        cache = self._make_cache()
+        self.assertTrue(cache.load())
+        self.assertEqual(cache.get_mtime('A/b'), 2.0)
+        cache.save()
+        self.assertTrue(os.path.exists(cache.snapshot_path))
+
+    def test_migrate_legacy_forces_keys(self):
+        dump({'A': {'mtime': 1.0}, 'A/b': {'mtime': 2.0}}, self.legacy_path)
+        cache = DirCache(self.cache_path, self.logger,
+                         legacy_path=self.legacy_path,
+                         legacy_key=lambda path: path.upper())
+        self.assertTrue(cache.load())
+        self.assertEqual(sorted(cache.paths()), ['A', 'A/B'])
+
+    def test_subtrees_of_nested_root(self):
+        cache = self._make_cache()
+        for path in ['A', 'A/B', 'A/B/x', 'A/B/x/1', 'A/B/y', 'A/B/y/2',
+                     'A/c', 'A/BB/z']:
+            cache.set_mtime(path, 1.0)
+        self.assertEqual(cache.subtrees('A/B'),
+                         {'A/B/x': ['A/B/x', 'A/B/x/1'],
+                          'A/B/y': ['A/B/y', 'A/B/y/2']})
+        self.assertEqual(sorted(cache.subtrees('A')),
+                         ['A/B', 'A/BB', 'A/c'])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_entitystore - unit tests for the sqlite entity map store
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the sqlite entity map store"""
+
+from tests.support import MigTestCase, temppath, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.entitystore import close_entity_store, load_store_map, \
+    load_store_entities, load_store_stamp, save_store_map
+from mig.shared.vgridaccess import OWNERS, MEMBERS, RESOURCES, USERS, \
+    VGRIDS, check_vgrid_access, load_user_map, load_vgrid_map, map_cache
+
+
+class MigSharedEntityStore(MigTestCase):
+    """Coverage of entity store save and load"""
+
+    def before_each(self):
+        system_files = temppath('entity_store', self, ensure_dir=True)
+        self.store_conf = FakeConfiguration(
+            logger=self.logger, mig_system_files=system_files,
+            site_entity_map_backend='sqlite')
+        map_cache.clear()
+
+    def after_each(self):
+        close_entity_store(self.store_conf)
+
+    def _vgrid_map(self):
+        return {VGRIDS: {'Generic': {OWNERS: [], MEMBERS: ['*']},
+                         'A': {OWNERS: ['alice'], MEMBERS: []},
+                         'A/B': {OWNERS: [], MEMBERS: ['bob']}},
+                RESOURCES: {},
+                USERS: {'alice': {}, 'bob': {}}}
+
+    def test_load_missing_map(self):
+        (entity_map, map_stamp) = load_store_map(self.store_conf, 'user')
+        self.assertEqual(entity_map, {})
+        self.assertEqual(map_stamp, -1)
+
+    def test_save_and_load_flat_map(self):
+        user_map = {'alice': {'CONF': {'EMAIL': 'a@b.c'}}, 'bob': {}}
+        save_store_map(self.store_conf, 'user', user_map, 42.0)
+        (entity_map, map_stamp) = load_store_map(self.store_conf, 'user')
+        self.assertEqual(entity_map, user_map)
+        self.assertEqual(map_stamp, 42.0)
+
+    def test_save_dirty_only(self):
+        user_map = {'alice': {'name': 'Alice'}, 'bob': {'name': 'Bob'}}
+        save_store_map(self.store_conf, 'user', user_map, 1.0)
+        # NOTE: only dirty entries are written so the clean bob change is lost
+        user_map['alice']['name'] = 'Alice Doe'
+        user_map['bob']['name'] = 'Bob Doe'
+        user_map['carol'] = {'name': 'Carol'}
+        save_store_map(self.store_conf, 'user', user_map, 2.0,
+                       [(None, 'alice'), (None, 'carol')])
+        (entity_map, map_stamp) = load_store_map(self.store_conf, 'user')
+        self.assertEqual(entity_map, {'alice': {'name': 'Alice Doe'},
+                                      'bob': {'name': 'Bob'},
+                                      'carol': {'name': 'Carol'}})
+        self.assertEqual(map_stamp, 2.0)
+        del user_map['alice']
+        save_store_map(self.store_conf, 'user', user_map, 3.0,
+                       [(None, 'alice')])
+        (entity_map, _) = load_store_map(self.store_conf, 'user')
+        self.assertEqual(sorted(entity_map), ['bob', 'carol'])
+
+    def test_nested_map_entities(self):
+        vgrid_map = self._vgrid_map()
+        save_store_map(self.store_conf, 'vgrid', vgrid_map, 1.0)
+        (entity_map, _) = load_store_map(self.store_conf, 'vgrid')
+        # NOTE: empty sections are not stored
+        self.assertEqual(entity_map[VGRIDS], vgrid_map[VGRIDS])
+        self.assertEqual(entity_map[USERS], vgrid_map[USERS])
+        entries = load_store_entities(self.store_conf, 'vgrid', VGRIDS,
+                                      ['A/B', 'missing'])
+        self.assertEqual(entries, {'A/B': {OWNERS: [], MEMBERS: ['bob']}})
+
+    def test_vgrid_access_from_store(self):
+        save_store_map(self.store_conf, 'vgrid', self._vgrid_map(), 1.0)
+        (entity_map, _) = load_vgrid_map(self.store_conf)
+        self.assertEqual(entity_map[RESOURCES], {})
+        self.assertTrue(check_vgrid_access(self.store_conf, 'alice', 'A/B',
+                                           caching=True))
+        self.assertFalse(check_vgrid_access(self.store_conf, 'bob', 'A',
+                                            caching=True))
+        self.assertFalse(check_vgrid_access(self.store_conf, 'alice',
+                                            'A/B', recursive=False,
+                                            caching=True))
+
+    def test_reuse_unchanged_store_map(self):
+        self.assertEqual(load_store_stamp(self.store_conf, 'user'), -1)
+        user_map = {'alice': {'name': 'Alice'}}
+        save_store_map(self.store_conf, 'user', user_map, 1.0)
+        (first_map, map_stamp) = load_user_map(self.store_conf)
+        self.assertEqual(map_stamp, 1.0)
+        (second_map, map_stamp) = load_user_map(self.store_conf)
+        self.assertTrue(second_map is first_map)
+        self.assertEqual(map_cache.get_stats()['hits'], 1)
+        user_map['bob'] = {'name': 'Bob'}
+        save_store_map(self.store_conf, 'user', user_map, 2.0,
+                       [(None, 'bob')])
+        (third_map, map_stamp) = load_user_map(self.store_conf)
+        self.assertEqual(map_stamp, 2.0)
+        self.assertEqual(sorted(third_map), ['alice', 'bob'])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_events - unit tests for the event trigger helpers
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the event trigger helpers"""
+
+import datetime
+import fnmatch
+import re
+
+from tests.support import MigTestCase, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.events import TriggerRuleMatcher, trigger_pattern_prefix, \
+    CronSchedule, cron_match, next_cron_time
+
+BASE = '/vgrid_files_home/Project'
+RULE_PATTERNS = ['*.txt', 'in/*.dat', 'in/sub*/data?.csv', 'in/[ab]*.h5',
+                 'out/result.txt', '*']
+EVENT_PATHS = ['note.txt', 'in/x.dat', 'in/deep/x.dat', 'in/sub1/data2.csv',
+               'in/sub1/more/data2.csv', 'in/b1.h5', 'in/c1.h5',
+               'out/result.txt', 'out/other.txt', 'in']
+
+
+def _naive_match(all_rules, src_path):
+    """Reference implementation from the original grid_events loop"""
+    matches = []
+    for (target_path, rule_list) in all_rules.items():
+        recursive_regexp = fnmatch.translate(target_path)
+        direct_regexp = recursive_regexp.replace('.*', '[^/]*')
+        recursive_hit = re.match(recursive_regexp, src_path)
+        direct_hit = re.match(direct_regexp, src_path)
+        if direct_hit or recursive_hit:
+            matches.append((target_path, rule_list, bool(direct_hit)))
+    return sorted(matches)
+
+
+class MigSharedEventsTriggerRuleMatcher(MigTestCase):
+    """Coverage of the precompiled trigger rule matcher"""
+
+    def _all_rules(self, patterns):
+        return dict([('%s/%s' % (BASE, path), [{'rule_id': path}])
+                     for path in patterns])
+
+    def test_pattern_prefix(self):
+        self.assertEqual(trigger_pattern_prefix('/a/b/*.txt'), '/a/b/')
+        self.assertEqual(trigger_pattern_prefix('/a/b/c?.txt'), '/a/b/')
+        self.assertEqual(trigger_pattern_prefix('/a/[bc]/x'), '/a/')
+        self.assertEqual(trigger_pattern_prefix('/a/b/c.txt'), '/a/b/')
+        self.assertEqual(trigger_pattern_prefix('*.txt'), '')
+
+    def test_match_like_naive(self):
+        all_rules = self._all_rules(RULE_PATTERNS)
+        matcher = TriggerRuleMatcher()
+        matcher.update(all_rules)
+        self.assertEqual(len(matcher), len(RULE_PATTERNS))
+        for path in EVENT_PATHS:
+            src_path = '%s/%s' % (BASE, path)
+            self.assertEqual(sorted(matcher.match(src_path)),
+                             _naive_match(all_rules, src_path))
+
+    def test_update_rules(self):
+        matcher = TriggerRuleMatcher()
+        matcher.update(self._all_rules(['*.txt']))
+        src_path = '%s/in/x.dat' % BASE
+        self.assertEqual(matcher.match(src_path), [])
+        matcher.update(self._all_rules(['*.txt', 'in/*.dat']))
+        self.assertEqual([i[0] for i in matcher.match(src_path)],
+                         ['%s/in/*.dat' % BASE])
+        matcher.update({})
+        self.assertEqual(matcher.match(src_path), [])
+        self.assertEqual(len(matcher), 0)
+
+
+def _cron_entry(minute='*', hour='*', dayofmonth='*', month='*',
+                dayofweek='*'):
+    """Minimal crontab entry with the given time fields"""
+    return {'minute': minute, 'hour': hour, 'dayofmonth': dayofmonth,
+            'month': month, 'dayofweek': dayofweek, 'command': ['ls']}
+
+
+class MigSharedEventsCronSchedule(MigTestCase):
+    """Coverage of the next cron time search and the cron schedule heap"""
+
+    def before_each(self):
+        self.cron_conf = FakeConfiguration(logger=self.logger)
+        self.now = datetime.datetime(2024, 2, 27, 23, 58, 30)
+
+    def _naive_next(self, entry, limit=3 * 24 * 60):
+        """Reference search stepping through every minute with cron_match"""
+        when = self.now.replace(second=0)
+        for _ in range(limit):
+            when += datetime.timedelta(minutes=1)
+            if cron_match(self.cron_conf, when, entry):
+                return when
+        return None
+
+    def test_next_cron_time_like_cron_match(self):
+        for entry in [_cron_entry(), _cron_entry(minute='05'),
+                      _cron_entry(minute='0', hour='0'),
+                      _cron_entry(minute='3?', hour='1'),
+                      _cron_entry(minute='15', dayofmonth='29'),
+                      _cron_entry(minute='1', hour='2', dayofweek='3')]:
+            self.assertEqual(next_cron_time(self.cron_conf, self.now, entry),
+                             self._naive_next(entry))
+
+    def test_next_cron_time_impossible(self):
+        entry = _cron_entry(minute='61')
+        self.assertIsNone(next_cron_time(self.cron_conf, self.now, entry))
+
+    def test_schedule_pop_and_reschedule(self):
+        schedule = CronSchedule(self.cron_conf)
+        at_entry = {'time_stamp': datetime.datetime(2024, 2, 28, 0, 1),
+                    'command': ['ls']}
+        schedule.update('alice/crontab', 'crontab', [_cron_entry()],
+                        now=self.now)
+        schedule.update('bob/atjobs', 'atjobs', [at_entry], now=self.now)
+        self.assertEqual(len(schedule), 2)
+        self.assertEqual(schedule.next_time(),
+                         datetime.datetime(2024, 2, 27, 23, 59))
+        self.assertEqual(schedule.pop_due(self.now), [])
+        first = datetime.datetime(2024, 2, 28, 0, 1)
+        due = schedule.pop_due(first)
+        self.assertEqual(sorted([(i[1], i[2]) for i in due]),
+                         [('alice/crontab', 'crontab'),
+                          ('bob/atjobs', 'atjobs')])
+        # NOTE: the late crontab entry is popped once and then rescheduled
+        self.assertEqual(len(schedule), 1)
+        self.assertEqual(schedule.next_time(),
+                         datetime.datetime(2024, 2, 28, 0, 2))
+
+    def test_schedule_update_replaces(self):
+        schedule = CronSchedule(self.cron_conf)
+        schedule.update('alice/crontab', 'crontab', [_cron_entry()],
+                        now=self.now)
+        schedule.update('alice/crontab', 'crontab',
+                        [_cron_entry(minute='30')], now=self.now)
+        self.assertEqual(len(schedule), 1)
+        self.assertEqual(schedule.next_time(),
+                         datetime.datetime(2024, 2, 28, 0, 30))
+        schedule.remove('alice/crontab')
+        self.assertEqual(len(schedule), 0)
+        self.assertIsNone(schedule.next_time())
+
+
+if __name__ == '__main__':
+    testmain()
@@ -222,5 +222,37 @@ class MigSharedFileio__write_file(MigTestCase):
             self.assertEqual(content[:], DUMMY_UNICODE)
 
 
+class MigSharedFileio__dir_entries(MigTestCase):
+    def before_each(self):
+        self.tmp_dir = temppath('fileio_dir_entries', self, ensure_dir=True)
+        with open(os.path.join(self.tmp_dir, 'data.txt'), 'wb') as data_fd:
+            data_fd.write(DUMMY_BYTES)
+        os.mkdir(os.path.join(self.tmp_dir, 'sub'))
+        os.symlink('missing', os.path.join(self.tmp_dir, 'broken'))
+
+    def test_list_dir_entries(self):
+        entries = dict([(i.name, i) for i in
+                        fileio.list_dir_entries(self.tmp_dir)])
+        self.assertEqual(sorted(entries), ['broken', 'data.txt', 'sub'])
+        self.assertTrue(entries['data.txt'].is_file())
+        self.assertTrue(entries['sub'].is_dir())
+        self.assertTrue(entries['broken'].is_symlink())
+        self.assertFalse(entries['broken'].is_file())
+
+    def test_fileinfo_stat(self):
+        data_path = os.path.join(self.tmp_dir, 'data.txt')
+        file_info = fileio.fileinfo_stat(data_path)
+        self.assertEqual(file_info['ext'], 'txt')
+        self.assertEqual(file_info['size'], DUMMY_BYTES_LENGTH)
+        self.assertEqual(file_info['modified'], os.path.getmtime(data_path))
+        self.assertEqual(fileio.fileinfo_stat(os.path.join(self.tmp_dir,
+                                                           'sub'))['ext'],
+                         'dir')
+        self.assertEqual(fileio.fileinfo_stat(os.path.join(self.tmp_dir,
+                                                           'broken')),
+                         {'size': 0, 'created': 0, 'modified': 0,
+                          'accessed': 0, 'ext': ''})
+
+
 if __name__ == '__main__':
     testmain()
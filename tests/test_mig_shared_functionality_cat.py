@@ -134,11 +134,13 @@ class MigSharedFunctionalityCat(MigTestCase):
                                            user_arguments_dict=payload,
                                            environ=self.test_environ)
 
+        # NOTE: file downloads are streamed from the open file
         self.assertEqual(len(output_objects), 2)
         relevant_obj = self.assertSingleOutputObject(output_objects,
-                                                     with_object_type='file_output')
-        self.assertEqual(len(relevant_obj['lines']), 1)
-        self.assertEqual(relevant_obj['lines'][0], test_binary_file_data)
+                                                     with_object_type='file_stream')
+        self.assertEqual(relevant_obj['size'], test_binary_file_size)
+        with relevant_obj['stream'] as stream:
+            self.assertEqual(stream.read(), test_binary_file_data)
 
     def test_file_serving_over_limit_without_storage_protocols(self):
         test_binary_file = os.path.realpath(os.path.join(TEST_DATA_DIR,
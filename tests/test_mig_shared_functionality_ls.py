@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_functionality_ls - unit test of the corresponding functionality module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the directory listing helpers of the ls backend"""
+
+import os
+
+from tests.support import MigTestCase, testmain, temppath
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.functionality.ls import handle_ls
+
+TEST_FILES = {'b.txt': 300, 'a.dat': 100, 'c.py': 200, '.hidden': 1}
+
+
+class MigSharedFunctionalityLsListing(MigTestCase):
+    """Coverage of sorting, paging and recursion in handle_ls"""
+
+    def before_each(self):
+        self.ls_conf = FakeConfiguration(logger=self.logger)
+        self.base_dir = temppath('ls_home', self, ensure_dir=True) + os.sep
+        for (name, size) in TEST_FILES.items():
+            with open(os.path.join(self.base_dir, name), 'w') as data_fd:
+                data_fd.write('x' * size)
+        os.makedirs(os.path.join(self.base_dir, 'sub', 'deep'))
+        with open(os.path.join(self.base_dir, 'sub', 'inner.txt'), 'w') as \
+                data_fd:
+            data_fd.write('inner')
+
+    def _ls(self, flags='', **kwargs):
+        listing, output_objects = [], []
+        handle_ls(self.ls_conf, output_objects, listing, self.base_dir,
+                  self.base_dir.rstrip(os.sep), flags, **kwargs)
+        self.assertEqual(output_objects, [])
+        return listing
+
+    def test_sorted_listing(self):
+        listing = self._ls('f')
+        self.assertEqual([i['name'] for i in listing],
+                         ['a.dat', 'b.txt', 'c.py', 'sub'])
+        self.assertEqual([i['type'] for i in listing],
+                         ['file', 'file', 'file', 'directory'])
+        self.assertEqual(listing[1]['file_info']['size'], 300)
+        self.assertEqual(listing[1]['file_info']['ext'], 'txt')
+        self.assertEqual(listing[3]['file_info']['ext'], 'dir')
+        self.assertEqual(listing[3]['special'], '')
+
+    def test_sort_by_size(self):
+        listing = self._ls('', sort_by='size', reverse=True)
+        self.assertEqual([i['name'] for i in listing if i['type'] == 'file'],
+                         ['b.txt', 'c.py', 'a.dat'])
+
+    def test_paging(self):
+        page_info = {}
+        listing = self._ls('a', offset=0, limit=2, page_info=page_info)
+        self.assertEqual([i['name'] for i in listing],
+                         ['.', '..', '.hidden', 'a.dat'])
+        self.assertEqual(page_info['total'], 5)
+        listing = self._ls('a', offset=4, limit=2, page_info=page_info)
+        self.assertEqual([i['name'] for i in listing], ['sub'])
+
+    def test_recursive(self):
+        listing = self._ls('r')
+        self.assertEqual([i['rel_path'] for i in listing],
+                         ['a.dat', 'b.txt', 'c.py', 'sub', 'sub/deep',
+                          'sub/inner.txt'])
+
+
+if __name__ == '__main__':
+    testmain()
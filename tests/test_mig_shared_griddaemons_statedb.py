@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_griddaemons_statedb - unit tests for daemon state tables
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the sqlite backed grid daemon rate limits and sessions"""
+
+import time
+
+from tests.support import MigTestCase, temppath, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.griddaemons.ratelimits import expire_rate_limit, \
+    hit_rate_limit, update_rate_limit
+from mig.shared.griddaemons.sessions import active_sessions, \
+    clear_sessions, get_open_sessions, track_close_expired_sessions, \
+    track_close_session, track_open_session
+from mig.shared.griddaemons.statedb import close_state_db
+
+
+class MigSharedGriddaemonsStateDB(MigTestCase):
+    """Coverage of rate limits and sessions with both state backends"""
+
+    def before_each(self):
+        self.state_confs = {}
+        for backend in ('pickle', 'sqlite'):
+            system_run = temppath('state_%s' % backend, self,
+                                  ensure_dir=True)
+            self.state_confs[backend] = FakeConfiguration(
+                logger=self.logger, mig_system_run=system_run,
+                site_daemon_state_backend=backend)
+
+    def after_each(self):
+        close_state_db(self.state_confs['sqlite'])
+
+    def test_rate_limit_backends_agree(self):
+        results = {}
+        for (backend, conf) in self.state_confs.items():
+            hits = []
+            for secret in ('a', 'a', 'b', 'c'):
+                hits.append(update_rate_limit(conf, 'sftp', '10.0.0.1',
+                                              'alice', False, secret=secret))
+            hits.append(update_rate_limit(conf, 'sftp', '10.0.0.1', 'bob',
+                                          False, secret='x'))
+            hits.append(hit_rate_limit(conf, 'sftp', '10.0.0.1', 'alice',
+                                       max_user_hits=3))
+            hits.append(update_rate_limit(conf, 'sftp', '10.0.0.1', 'alice',
+                                          True))
+            hits.append(hit_rate_limit(conf, 'sftp', '10.0.0.1', 'alice',
+                                       max_user_hits=3))
+            results[backend] = hits
+        self.assertEqual(results['sqlite'], results['pickle'])
+        self.assertEqual(results['sqlite'][3], (3, 3, 3, 1))
+        self.assertTrue(results['sqlite'][5])
+        self.assertEqual(results['sqlite'][6], (1, 1, 0, 0))
+        self.assertFalse(results['sqlite'][7])
+
+    def test_expire_rate_limit(self):
+        conf = self.state_confs['sqlite']
+        update_rate_limit(conf, 'sftp', '10.0.0.1', 'alice', False,
+                          secret='a')
+        time.sleep(0.01)
+        self.assertEqual(expire_rate_limit(conf, 'sftp', fail_cache=0,
+                                           expire_delay=0), 1)
+        self.assertFalse(hit_rate_limit(conf, 'sftp', '10.0.0.1', 'alice',
+                                        max_user_hits=1))
+
+    def test_track_sessions(self):
+        conf = self.state_confs['sqlite']
+        opened = track_open_session(conf, 'sftp', 'alice', '10.0.0.1', 22,
+                                    authorized=True)
+        self.assertEqual(opened['session_id'], '10.0.0.1:22')
+        self.assertTrue(opened['authorized'])
+        track_open_session(conf, 'sftp', 'alice', '10.0.0.1', 23)
+        track_open_session(conf, 'sftp', 'bob', '10.0.0.2', 22)
+        self.assertEqual(active_sessions(conf, 'sftp', 'alice'), 2)
+        self.assertEqual(len(get_open_sessions(conf, 'sftp')), 3)
+        closed = track_close_session(conf, 'sftp', 'alice', '10.0.0.1', 22)
+        self.assertEqual(closed['session_id'], '10.0.0.1:22')
+        self.assertEqual(active_sessions(conf, 'sftp', 'alice'), 1)
+        clear_sessions(conf, 'sftp')
+        self.assertEqual(get_open_sessions(conf, 'sftp'), {})
+
+    def test_close_expired_sessions(self):
+        conf = self.state_confs['sqlite']
+        track_open_session(conf, 'dummy', 'alice', '10.0.0.1', 22)
+        time.sleep(0.01)
+        expired = track_close_expired_sessions(conf, 'dummy')
+        self.assertEqual(list(expired), ['10.0.0.1:22'])
+        self.assertEqual(active_sessions(conf, 'dummy', 'alice'), 0)
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_imagemetaio - unit test of the corresponding mig shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the image meta data table lookups"""
+
+import os
+import unittest
+
+from tests.support import MigTestCase, temppath, testmain
+
+try:
+    from tables import open_file
+    from mig.shared import imagemetaio
+except ImportError:
+    imagemetaio = None
+
+TEST_TABLES = {
+    'file_settings': '/settings/image_file_types',
+    'files': '/image/files/meta',
+    'volume_settings': '/settings/image_volume_types',
+    'volumes': '/image/volumes/meta',
+}
+
+
+@unittest.skipIf(imagemetaio is None, "numpy or tables not available")
+class MigSharedImagemetaio(MigTestCase):
+    """Bulk lookups must return the same rows as the per-row lookups they
+    replaced.
+    """
+
+    def before_each(self):
+        self.base_path = temppath('imagemetaio', self, ensure_dir=True)
+        for (extension, status) in [('raw', 'Pending'), ('tif', 'Ready')]:
+            self.assertTrue(imagemetaio.add_image_file_setting(
+                self.logger, self.base_path,
+                {'extension': extension, 'settings_status': status,
+                 'image_type': extension, 'x_dimension': 8,
+                 'preview_cutoff_max': 1.5}))
+            self.assertTrue(imagemetaio.add_image_volume_setting(
+                self.logger, self.base_path,
+                {'extension': extension, 'settings_status': status,
+                 'volume_type': 'Slice', 'z_dimension': 4}))
+        for index in range(6):
+            path = 'dir%d' % (index % 2)
+            self.assertTrue(imagemetaio.add_image_file(
+                self.logger, self.base_path,
+                {'extension': 'raw', 'path': path,
+                 'name': 'image%d.raw' % index, 'x_dimension': index,
+                 'mean_value': index * 0.5,
+                 'file_md5sum': 'md5-%d' % index}))
+            self.assertTrue(imagemetaio.add_image_volume(
+                self.logger, self.base_path,
+                {'extension': 'raw', 'path': path,
+                 'name': 'volume%d.raw' % index, 'z_dimension': index,
+                 'median_value': index * 0.25}))
+
+    def _legacy_rows(self, table_name, **values):
+        """Look up rows matching the column values one field at a time like
+        the replaced code did.
+        """
+
+        settings_path = os.path.join(self.base_path, '.meta',
+                                     'imagepreviews.h5')
+        h5_file = open_file(settings_path, mode='r')
+        try:
+            table = h5_file.get_node(TEST_TABLES[table_name])
+            if values:
+                condition = ' & '.join(['(%s == %s_value)' % (name, name)
+                                        for name in values])
+                condvars = dict([('%s_value' % name, value.encode('utf8'))
+                                 for (name, value) in values.items()])
+                row_list = table.get_where_list(condition, condvars)
+            else:
+                row_list = range(table.nrows)
+            result = []
+            for row_idx in row_list:
+                entry = {}
+                for name in table.colnames:
+                    entry[name] = table[row_idx][name]
+                result.append(entry)
+            return result
+        finally:
+            h5_file.close()
+
+    def _strip_preview(self, entries):
+        """Remove the preview data fields added on top of the table rows"""
+
+        for entry in entries:
+            for name in ('preview_data', 'preview_image',
+                         'preview_histogram'):
+                entry.pop(name, None)
+        return entries
+
+    def test_file_settings_match_legacy(self):
+        self.assertEqual(
+            imagemetaio.get_image_file_settings(self.logger, self.base_path),
+            self._legacy_rows('file_settings'))
+        self.assertEqual(
+            imagemetaio.get_image_file_settings(self.logger, self.base_path,
+                                                'tif'),
+            self._legacy_rows('file_settings', extension='tif'))
+
+    def test_volume_settings_match_legacy(self):
+        self.assertEqual(
+            imagemetaio.get_image_volume_settings(self.logger,
+                                                  self.base_path),
+            self._legacy_rows('volume_settings'))
+        self.assertEqual(
+            imagemetaio.get_image_volume_settings(self.logger,
+                                                  self.base_path, 'raw'),
+            self._legacy_rows('volume_settings', extension='raw'))
+
+    def test_files_match_legacy(self):
+        files = imagemetaio.get_image_files(self.logger, self.base_path)
+        self.assertEqual(len(files), 6)
+        self.assertEqual(self._strip_preview(files),
+                         self._legacy_rows('files'))
+        files = imagemetaio.get_image_files(self.logger, self.base_path,
+                                            path='dir1', extension='raw')
+        self.assertEqual(len(files), 3)
+        self.assertEqual(
+            self._strip_preview(files),
+            self._legacy_rows('files', path='dir1', extension='raw'))
+
+    def test_volumes_match_legacy(self):
+        volumes = imagemetaio.get_image_volumes(self.logger, self.base_path,
+                                                name='volume4.raw')
+        self.assertEqual(len(volumes), 1)
+        self.assertEqual(self._strip_preview(volumes),
+                         self._legacy_rows('volumes', name='volume4.raw'))
+        self.assertEqual(
+            self._strip_preview(imagemetaio.get_image_volumes(
+                self.logger, self.base_path)),
+            self._legacy_rows('volumes'))
+
+    def test_paging_and_columns(self):
+        legacy = self._legacy_rows('files', path='dir0')
+        page = imagemetaio.get_image_files(self.logger, self.base_path,
+                                           path='dir0', offset=1, limit=1)
+        self.assertEqual(self._strip_preview(page), legacy[1:2])
+        page = imagemetaio.get_image_files(self.logger, self.base_path,
+                                           offset=4, limit=10)
+        self.assertEqual(self._strip_preview(page),
+                         self._legacy_rows('files')[4:])
+        columns = ['name', 'mean_value']
+        subset = imagemetaio.get_image_files(self.logger, self.base_path,
+                                             path='dir0', columns=columns)
+        self.assertEqual(
+            self._strip_preview(subset),
+            [dict([(name, entry[name]) for name in columns])
+             for entry in legacy])
+
+    def test_quotes_in_names(self):
+        name = 'it\'s "quoted".raw'
+        self.assertTrue(imagemetaio.add_image_file(
+            self.logger, self.base_path,
+            {'extension': 'raw', 'path': 'dir0', 'name': name,
+             'x_dimension': 1}))
+        files = imagemetaio.get_image_files(self.logger, self.base_path,
+                                            path='dir0', name=name)
+        self.assertEqual(len(files), 1)
+        self.assertEqual(self._strip_preview(files),
+                         self._legacy_rows('files', path='dir0', name=name))
+        self.assertEqual(imagemetaio.get_image_file_count(
+            self.logger, self.base_path, name=name), 1)
+
+    def test_no_matches(self):
+        self.assertEqual(
+            imagemetaio.get_image_files(self.logger, self.base_path,
+                                        path='missing'), [])
+        self.assertEqual(
+            imagemetaio.get_image_file_settings(self.logger, self.base_path,
+                                                'png'), [])
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_jobindex - unit test of the corresponding shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the job index helpers"""
+
+import os
+import time
+
+from tests.support import MigTestCase, testmain, temppath
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.base import client_id_dir
+from mig.shared.fileio import pickle
+from mig.shared.jobindex import close_job_index, is_user_indexed, \
+    match_job_ids, query_job_index, rebuild_job_index, update_job_index
+
+TEST_CLIENT_ID = '/C=DK/ST=NA/L=NA/O=Test Org/OU=NA/CN=Test User/emailAddress=test@example.com'
+TEST_JOBS = [('100_1_1_2026__1_1_1', 'FINISHED'),
+             ('101_1_1_2026__1_1_1', 'QUEUED'),
+             ('102_1_1_2026__1_1_1', 'FAILED'),
+             ('103_1_1_2026__1_1_1', 'QUEUED')]
+
+
+class MigSharedJobIndex(MigTestCase):
+    """Coverage of job index build, lookup and update"""
+
+    def before_each(self):
+        run_dir = temppath('jobindex_run', self, ensure_dir=True)
+        mrsl_dir = temppath('jobindex_mrsl', self, ensure_dir=True)
+        self.index_conf = FakeConfiguration(logger=self.logger,
+                                            mig_system_run=run_dir,
+                                            mrsl_files_dir=mrsl_dir)
+        self.user_dir = os.path.join(mrsl_dir, client_id_dir(TEST_CLIENT_ID))
+        os.makedirs(self.user_dir)
+        for (job_id, status) in TEST_JOBS:
+            self._save_job(job_id, status)
+
+    def after_each(self):
+        close_job_index(self.index_conf)
+
+    def _save_job(self, job_id, status):
+        job_dict = {'JOB_ID': job_id, 'USER_CERT': TEST_CLIENT_ID,
+                    'STATUS': status, 'JOBNAME': 'demo',
+                    'RECEIVED_TIMESTAMP': time.gmtime(),
+                    'OUTPUTFILES': ['+JOBID+.out', '+JOBNAME+.log'],
+                    'SCHEDULE_TARGETS': ['a', 'b']}
+        pickle(job_dict, os.path.join(self.user_dir, job_id + '.mRSL'),
+               self.logger)
+        return job_dict
+
+    def test_query_builds_index_on_first_use(self):
+        self.assertFalse(is_user_indexed(self.index_conf, TEST_CLIENT_ID))
+        (total, jobs, unmatched) = query_job_index(self.index_conf,
+                                                   TEST_CLIENT_ID)
+        self.assertTrue(is_user_indexed(self.index_conf, TEST_CLIENT_ID))
+        self.assertEqual(total, 4)
+        self.assertEqual(unmatched, [])
+        self.assertEqual([i[0] for i in jobs], [i[0] for i in TEST_JOBS])
+        summary = jobs[0][1]
+        self.assertEqual(summary['STATUS'], 'FINISHED')
+        self.assertEqual(summary['SCHEDULE_HITS'], 2)
+        self.assertEqual(summary['OUTPUTFILES'],
+                         ['100_1_1_2026__1_1_1.out', 'demo.log'])
+        self.assertTrue(time.asctime(summary['RECEIVED_TIMESTAMP']))
+
+    def test_query_patterns_states_and_paging(self):
+        (total, jobs, unmatched) = query_job_index(
+            self.index_conf, TEST_CLIENT_ID, ['10[0-2]_*', 'missing'],
+            states=['QUEUED', 'FAILED'], reverse=True, offset=1, limit=1)
+        self.assertEqual(total, 2)
+        self.assertEqual([i[0] for i in jobs], ['101_1_1_2026__1_1_1'])
+        self.assertEqual(unmatched, ['missing'])
+        (job_ids, unmatched) = match_job_ids(self.index_conf,
+                                             TEST_CLIENT_ID, ['*'],
+                                             states=['QUEUED'])
+        self.assertEqual(job_ids, ['101_1_1_2026__1_1_1',
+                                   '103_1_1_2026__1_1_1'])
+
+    def test_update_changes_status(self):
+        query_job_index(self.index_conf, TEST_CLIENT_ID)
+        job_dict = self._save_job('101_1_1_2026__1_1_1', 'CANCELED')
+        self.assertTrue(update_job_index(self.index_conf, job_dict))
+        (total, jobs, _) = query_job_index(self.index_conf, TEST_CLIENT_ID,
+                                           states=['CANCELED'])
+        self.assertEqual(total, 1)
+        self.assertEqual(jobs[0][0], '101_1_1_2026__1_1_1')
+
+    def test_changed_mrsl_refreshed_without_update(self):
+        query_job_index(self.index_conf, TEST_CLIENT_ID)
+        mrsl_path = os.path.join(self.user_dir, '103_1_1_2026__1_1_1.mRSL')
+        self._save_job('103_1_1_2026__1_1_1', 'EXECUTING')
+        os.utime(mrsl_path, (time.time() + 10, time.time() + 10))
+        (_, jobs, _) = query_job_index(self.index_conf, TEST_CLIENT_ID,
+                                       ['103_1_1_2026__1_1_1'])
+        self.assertEqual(jobs[0][1]['STATUS'], 'EXECUTING')
+
+    def test_status_filter_after_refresh(self):
+        query_job_index(self.index_conf, TEST_CLIENT_ID)
+        mrsl_path = os.path.join(self.user_dir, '103_1_1_2026__1_1_1.mRSL')
+        self._save_job('103_1_1_2026__1_1_1', 'EXECUTING')
+        os.utime(mrsl_path, (time.time() + 10, time.time() + 10))
+        (job_ids, _) = match_job_ids(self.index_conf, TEST_CLIENT_ID,
+                                     states=['QUEUED'])
+        self.assertEqual(job_ids, ['101_1_1_2026__1_1_1'])
+        (total, jobs, _) = query_job_index(self.index_conf, TEST_CLIENT_ID,
+                                           states=['EXECUTING'])
+        self.assertEqual(total, 1)
+        self.assertEqual(jobs[0][0], '103_1_1_2026__1_1_1')
+
+    def test_rebuild_keeps_newer_rows(self):
+        query_job_index(self.index_conf, TEST_CLIENT_ID)
+        # NOTE: rows with a modified stamp after the rebuild scan started
+        #       look just like jobs indexed concurrently with the rebuild
+        mrsl_path = os.path.join(self.user_dir, '104_1_1_2026__1_1_1.mRSL')
+        job_dict = self._save_job('104_1_1_2026__1_1_1', 'QUEUED')
+        os.utime(mrsl_path, (time.time() + 10, time.time() + 10))
+        self.assertTrue(update_job_index(self.index_conf, job_dict))
+        os.remove(mrsl_path)
+        # NOTE: an older mRSL version must not replace the indexed one
+        mrsl_path = os.path.join(self.user_dir, '101_1_1_2026__1_1_1.mRSL')
+        self._save_job('101_1_1_2026__1_1_1', 'CANCELED')
+        os.utime(mrsl_path, (time.time() - 10, time.time() - 10))
+        os.remove(os.path.join(self.user_dir, '102_1_1_2026__1_1_1.mRSL'))
+        self.assertEqual(rebuild_job_index(self.index_conf, TEST_CLIENT_ID),
+                         3)
+        (job_ids, _) = match_job_ids(self.index_conf, TEST_CLIENT_ID,
+                                     states=['QUEUED'])
+        self.assertEqual(job_ids, ['101_1_1_2026__1_1_1',
+                                   '103_1_1_2026__1_1_1',
+                                   '104_1_1_2026__1_1_1'])
+        (job_ids, _) = match_job_ids(self.index_conf, TEST_CLIENT_ID)
+        self.assertNotIn('102_1_1_2026__1_1_1', job_ids)
+
+if __name__ == '__main__':
+    testmain()
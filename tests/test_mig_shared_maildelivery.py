@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_maildelivery - unit tests for daemon state tables
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the pooled and spooled mail delivery"""
+
+import time
+
+from tests.support import MigTestCase, make_wrapped_server, temppath, \
+    testmain
+from tests.support.configsupp import FakeConfiguration
+from tests.support.smtpsupp import SMTPStandIn
+
+from mig.shared import maildelivery
+from mig.shared.maildelivery import RateLimiter, close_smtp_pools, \
+    deliver_mails, flush_mail_spool, get_smtp_pool
+
+TEST_SENDER = 'sender@example.com'
+TEST_MESSAGE = 'Subject: test\r\n\r\nJust a test.\r\n'
+
+
+class MigSharedMaildelivery(MigTestCase):
+    """Coverage of delivery through a local SMTP stand-in"""
+
+    def before_each(self):
+        self.smtp_wrapper = make_wrapped_server(
+            SMTPStandIn, reject_rcpt=('nobody@example.com', ))
+        self.smtp_wrapper.start_wait_until_ready()
+        self.smtp = self.smtp_wrapper._wrapped
+        self.mail_conf = FakeConfiguration(
+            logger=self.logger, smtp_server=self.smtp.server_spec,
+            smtp_pool_size=2, smtp_rate_limit=0, smtp_max_retries=2,
+            site_enable_notify=True,
+            mig_system_run=temppath('mail_run', self, ensure_dir=True))
+
+    def after_each(self):
+        close_smtp_pools()
+        self.smtp_wrapper.stop()
+
+    def _mails(self, count, recipient='user@example.com'):
+        return [(TEST_SENDER, [recipient], TEST_MESSAGE)
+                for _ in range(count)]
+
+    def test_batch_on_single_connection(self):
+        self.assertEqual(deliver_mails(self.mail_conf, self._mails(5)),
+                         ['sent'] * 5)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(self.smtp.connections, 1)
+
+    def test_pooled_connection_reuse(self):
+        for _ in range(3):
+            deliver_mails(self.mail_conf, self._mails(1))
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(get_smtp_pool(self.mail_conf).stats,
+                         {'connects': 1, 'reuses': 2})
+
+    def test_refused_recipient_is_permanent(self):
+        self.logger.forgive_errors()
+        results = deliver_mails(self.mail_conf,
+                                self._mails(1, 'nobody@example.com') +
+                                self._mails(1))
+        self.assertEqual(results, ['failed', 'sent'])
+        self.assertEqual(flush_mail_spool(self.mail_conf), (0, 0))
+
+    def test_spool_and_retry(self):
+        self.smtp.fail_next = 1
+        self.assertEqual(deliver_mails(self.mail_conf, self._mails(1)),
+                         ['spooled'])
+        self.assertEqual(len(self.smtp.messages), 0)
+        # Not due for retry yet
+        self.assertEqual(flush_mail_spool(self.mail_conf), (0, 1))
+        orig_retry_secs = maildelivery.spool_retry_secs
+        maildelivery.spool_retry_secs = 0
+        try:
+            self.smtp.fail_next = 1
+            self.smtp.messages = []
+            deliver_mails(self.mail_conf, self._mails(1))
+        finally:
+            maildelivery.spool_retry_secs = orig_retry_secs
+        self.assertEqual(flush_mail_spool(self.mail_conf), (1, 1))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_partial_delivery(self):
+        mails = [(TEST_SENDER, ['nobody@example.com', 'user@example.com'],
+                  TEST_MESSAGE)]
+        self.assertEqual(deliver_mails(self.mail_conf, mails), ['partial'])
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_flush_skips_entries_not_due_unread(self):
+        self.smtp.fail_next = 1
+        deliver_mails(self.mail_conf, self._mails(1))
+        reads = []
+        orig_unpickle = maildelivery.unpickle
+
+        def counting_unpickle(path, logger):
+            reads.append(path)
+            return orig_unpickle(path, logger)
+        maildelivery.unpickle = counting_unpickle
+        try:
+            self.assertEqual(flush_mail_spool(self.mail_conf), (0, 1))
+        finally:
+            maildelivery.unpickle = orig_unpickle
+        self.assertEqual(reads, [])
+
+    def test_no_spool_without_notify(self):
+        self.logger.forgive_errors()
+        self.mail_conf.site_enable_notify = False
+        self.smtp.fail_next = 1
+        self.assertEqual(deliver_mails(self.mail_conf, self._mails(1)),
+                         ['failed'])
+        self.assertEqual(flush_mail_spool(self.mail_conf), (0, 0))
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(50)
+        start = time.time()
+        for _ in range(60):
+            limiter.wait()
+        self.assertTrue(time.time() - start >= 0.15)
+
+
+if __name__ == '__main__':
+    testmain()
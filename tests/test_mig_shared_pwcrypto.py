@@ -33,6 +33,7 @@ import sys
 sys.path.append(os.path.realpath(os.path.join(os.path.dirname(__file__), ".")))
 
 from support import MigTestCase, temppath, testmain
+from support.configsupp import FakeConfiguration
 
 from mig.shared.pwcrypto import *
 
@@ -45,5 +46,46 @@ class MigSharedPwcrypto_make_hash(MigTestCase):
         self.assertEqual(actual, expected, "mismatch pickling string")
 
 
+class MigSharedPwcrypto_creds_cache(MigTestCase):
+    def before_each(self):
+        self.pw_conf = FakeConfiguration(logger=self.logger)
+        self.password = 'Some-Pass-Phrase-42'
+
+    def test_check_hash_cached(self):
+        hash_cache = make_creds_cache()
+        hashed = make_hash(self.password)
+        for _ in range(3):
+            self.assertTrue(check_hash(self.pw_conf, 'test', 'alice',
+                                       self.password, hashed, hash_cache,
+                                       strict_policy=False))
+        stats = hash_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['entries']), (2, 1))
+
+    def test_check_hash_changed_password(self):
+        hash_cache = make_creds_cache()
+        old_hashed = make_hash(self.password)
+        self.assertTrue(check_hash(self.pw_conf, 'test', 'alice',
+                                   self.password, old_hashed, hash_cache,
+                                   strict_policy=False))
+        new_hashed = make_hash('Another-Pass-Phrase-42')
+        self.assertFalse(check_hash(self.pw_conf, 'test', 'alice',
+                                    self.password, new_hashed, hash_cache,
+                                    strict_policy=False))
+
+    def test_check_scramble_cached(self):
+        scramble_cache = make_creds_cache()
+        scrambled = make_scramble(self.password, None)
+        for _ in range(2):
+            self.assertTrue(check_scramble(self.pw_conf, 'test', 'alice',
+                                           self.password, scrambled,
+                                           scramble_cache=scramble_cache,
+                                           strict_policy=False))
+        self.assertFalse(check_scramble(self.pw_conf, 'test', 'alice',
+                                        'wrong', scrambled,
+                                        scramble_cache=scramble_cache,
+                                        strict_policy=False))
+        self.assertEqual(scramble_cache.get_stats()['hits'], 1)
+
+
 if __name__ == '__main__':
     testmain()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_safeeval - unit test of the corresponding shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the safe expression evaluation helpers"""
+
+from tests.support import MigTestCase, testmain
+
+from mig.shared.safeeval import compile_math_expr
+
+
+class MigSharedSafeevalCompile(MigTestCase):
+    """Coverage of compiled math expressions"""
+
+    def test_constant_expression(self):
+        self.assertEqual(compile_math_expr('(1+2)*3')(), 9)
+
+    def test_variables_and_math(self):
+        price_func = compile_math_expr('max(hour, 2) * sqrt(load)',
+                                       ['hour', 'load'])
+        self.assertEqual(price_func(1, 16), 8.0)
+        self.assertEqual(price_func(3, 4), 6.0)
+
+    def test_reject_unsafe(self):
+        for expr in ["__import__('os')", "(1).real", "'a' * 3", "x[0]",
+                     "lambda: 1", "open('/etc/passwd')", "1 +"]:
+            self.assertRaises(ValueError, compile_math_expr, expr, ['x'])
+
+    def test_reject_unbounded(self):
+        for expr in ["9**9**9**9", "pow(10, 10**10)", "[1]*10**10",
+                     "(1, )*10", "x**2"]:
+            self.assertRaises(ValueError, compile_math_expr, expr, ['x'])
+
+
+if __name__ == '__main__':
+    testmain()
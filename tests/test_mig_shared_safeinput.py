@@ -36,7 +36,7 @@ from past.builtins import basestring, unicode
 from tests.support import MigTestCase, testmain
 
 from mig.shared.safeinput import main as safeinput_main, InputException, \
-    filter_commonname, valid_commonname
+    filter_commonname, valid_commonname, validated_input
 
 PY2 = sys.version_info[0] == 2
 
@@ -112,6 +112,22 @@ class MigSharedSafeinput(MigTestCase):
             filtered_cn = filter_commonname(test_cn)
             self.assertNotEqual(filtered_cn, test_cn_unicode)
 
+    def test_listing_args_validated(self):
+        defaults = {'sort': ['name'], 'order': ['asc'], 'offset': ['0'],
+                    'limit': ['0']}
+        (accepted, rejected) = validated_input(
+            {'sort': ['job_id'], 'order': ['desc'], 'offset': ['10'],
+             'limit': ['50']}, defaults)
+        self.assertEqual(rejected, {})
+        self.assertEqual(accepted['sort'], ['job_id'])
+        self.assertEqual(accepted['limit'], ['50'])
+
+        for (name, value) in (('sort', 'name;rm'), ('order', 'sideways'),
+                              ('offset', '-1'), ('limit', 'all'),
+                              ('limit', '99999999')):
+            (accepted, rejected) = validated_input({name: [value]}, defaults)
+            self.assertIn(name, rejected)
+
 
 if __name__ == '__main__':
     testmain()
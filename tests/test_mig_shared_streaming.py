@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_streaming - unit test of the corresponding mig shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the streamed output helpers"""
+
+from io import BytesIO
+
+from tests.support import MigTestCase, testmain, temppath
+
+from mig.shared.streaming import StreamOutput, make_file_stream, \
+    parse_byte_range
+
+
+class MigSharedStreaming(MigTestCase):
+    """Coverage of byte range parsing and chunked stream delivery"""
+
+    def test_parse_byte_range(self):
+        self.assertEqual(parse_byte_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_byte_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_byte_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_byte_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_byte_range('bytes=-200', 100), (0, 99))
+        # NOTE: malformed and multiple ranges fall back to full content
+        for value in ('bytes=', 'bytes=a-b', 'bytes=9-0', 'lines=0-9',
+                      'bytes=0-1,5-6'):
+            self.assertIsNone(parse_byte_range(value, 100))
+        for value in ('bytes=100-', 'bytes=200-300', 'bytes=-0'):
+            self.assertRaises(ValueError, parse_byte_range, value, 100)
+
+    def test_iter_chunks(self):
+        data = b'x' * 10 + b'y' * 10
+        output = StreamOutput(BytesIO(data), len(data))
+        self.assertTrue(output.seekable())
+        self.assertFalse(output.is_file())
+        chunks = list(output.iter_chunks(5, 12, block_size=4))
+        self.assertEqual([len(i) for i in chunks], [4, 4, 4])
+        self.assertEqual(b''.join(chunks), data[5:17])
+        self.assertTrue(output.stream.closed)
+
+        output = StreamOutput(iter([b'ab', b'cd']))
+        self.assertFalse(output.seekable())
+        self.assertEqual(b''.join(output.iter_chunks()), b'abcd')
+
+    def test_make_file_stream(self):
+        tmp_path = temppath('streaming_file', self)
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(b'0123456789')
+        entry = make_file_stream(tmp_path)
+        output = StreamOutput(entry['stream'], entry['size'])
+        self.assertEqual(entry['size'], 10)
+        self.assertTrue(output.is_file())
+        self.assertEqual(b''.join(output.iter_chunks(8)), b'89')
+
+
+if __name__ == '__main__':
+    testmain()
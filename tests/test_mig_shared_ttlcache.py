@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_ttlcache - unit test of the corresponding mig shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the bounded expiring cache"""
+
+import time
+
+from tests.support import MigTestCase, testmain
+
+from mig.shared.ttlcache import TTLCache
+
+
+class MigSharedTTLCache(MigTestCase):
+    """Coverage of lookups, expiry and eviction"""
+
+    def test_get_and_put(self):
+        cache = TTLCache(10, 60)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        cache['b'] = False
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIs(cache['b'], False)
+        self.assertIn('a', cache)
+        with self.assertRaises(KeyError):
+            cache['c']
+        del cache['a']
+        self.assertNotIn('a', cache)
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_expire(self):
+        cache = TTLCache(10, 0.05)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()['expired'], 2)
+
+    def test_evict_least_recently_used(self):
+        cache = TTLCache(2, 60)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+
+if __name__ == '__main__':
+    testmain()
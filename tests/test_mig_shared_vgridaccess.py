@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_vgridaccess - unit tests for the vgrid access helpers
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+
+"""Unit tests for the vgrid access helpers"""
+
+import os
+
+from tests.support import MigTestCase, temppath, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.serial import dump
+from mig.shared.vgridaccess import EntityMapCache, load_entity_map, map_cache
+
+
+class MigSharedVgridAccessMapCache(MigTestCase):
+    """Coverage of the in-process entity map cache"""
+
+    def before_each(self):
+        system_files = temppath('map_files', self, ensure_dir=True)
+        system_run = temppath('map_run', self, ensure_dir=True)
+        self.map_conf = FakeConfiguration(
+            logger=self.logger, mig_system_files=system_files,
+            mig_system_run=system_run, site_entity_map_backend='pickle')
+        self.map_path = os.path.join(system_files, 'user.map')
+        map_cache.clear()
+
+    def _write_map(self, user_map, stamp):
+        dump(user_map, self.map_path)
+        os.utime(self.map_path, (stamp, stamp))
+
+    def test_reuse_unchanged_map(self):
+        self._write_map({'alice': {}}, 100.0)
+        (first, stamp) = load_entity_map(self.map_conf, 'user', True, False)
+        (second, _) = load_entity_map(self.map_conf, 'user', True, False)
+        self.assertEqual(first, {'alice': {}})
+        self.assertEqual(stamp, 100.0)
+        self.assertIs(first, second)
+        stats = map_cache.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_reload_changed_map(self):
+        self._write_map({'alice': {}}, 100.0)
+        (first, _) = load_entity_map(self.map_conf, 'user', True, False)
+        self._write_map({'alice': {}, 'bob': {}}, 200.0)
+        (second, stamp) = load_entity_map(self.map_conf, 'user', True, False)
+        self.assertEqual(sorted(second), ['alice', 'bob'])
+        self.assertEqual(stamp, 200.0)
+
+    def test_no_reuse_returns_private_copy(self):
+        self._write_map({'alice': {}}, 100.0)
+        (shared, _) = load_entity_map(self.map_conf, 'user', True, False)
+        (private, _) = load_entity_map(self.map_conf, 'user', True, False,
+                                       reuse=False)
+        self.assertIsNot(shared, private)
+        private['bob'] = {}
+        (shared, _) = load_entity_map(self.map_conf, 'user', True, False)
+        self.assertEqual(shared, {'alice': {}})
+
+    def test_missing_map(self):
+        (entity_map, stamp) = load_entity_map(self.map_conf, 'user', True,
+                                              False)
+        self.assertEqual(entity_map, {})
+        self.assertEqual(stamp, -1)
+
+    def test_evict_least_recently_used(self):
+        self._write_map({'alice': {}}, 100.0)
+        map_stat = os.stat(self.map_path)
+        # NOTE: room for just two maps of this size
+        cache = EntityMapCache(map_stat.st_size * 5 // 2)
+        cache.put('a', map_stat, 'A')
+        cache.put('b', map_stat, 'B')
+        self.assertEqual(cache.get('a', map_stat), 'A')
+        cache.put('c', map_stat, 'C')
+        self.assertIsNone(cache.get('b', map_stat))
+        self.assertEqual(cache.get('a', map_stat), 'A')
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_stamped_entries(self):
+        cache = EntityMapCache(100)
+        cache.put_stamped(('store', 'user'), 1.0, 'A', 60)
+        self.assertEqual(cache.get_stamped(('store', 'user'), 1.0), 'A')
+        self.assertIsNone(cache.get_stamped(('store', 'user'), 2.0))
+        cache.put_stamped(('store', 'vgrid'), 1.0, 'B', 60)
+        self.assertIsNone(cache.get_stamped(('store', 'user'), 1.0))
+        self.assertEqual(cache.get_stats()['used_bytes'], 60)
+
+
+if __name__ == '__main__':
+    testmain()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_vgridindex - unit tests for the vgrid participation index
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the vgrid participation index"""
+
+import os
+
+from tests.support import MigTestCase, temppath, testmain
+from tests.support.configsupp import FakeConfiguration
+
+from mig.shared.serial import dump
+from mig.shared.vgrid import vgrid_is_owner, vgrid_is_member, \
+    vgrid_is_resource, vgrid_list, vgrid_add_members, user_allowed_vgrids, \
+    res_allowed_vgrids
+from mig.shared.vgridindex import get_vgrid_index, index_entity_vgrids, \
+    invalidate_vgrid_index
+
+TEST_OWNER = '/C=DK/CN=Owner'
+TEST_MEMBER = '/C=DK/CN=Member'
+TEST_OTHER = '/C=DK/CN=Other'
+TEST_RESOURCE = 'resource.example.org.0'
+
+
+class MigSharedVgridIndex(MigTestCase):
+    """Coverage of the vgrid participation index"""
+
+    def before_each(self):
+        self.vgrid_home = temppath('vgrid_home', self, ensure_dir=True)
+        system_files = temppath('system_files', self, ensure_dir=True)
+        self.vgrid_conf = FakeConfiguration(
+            logger=self.logger, vgrid_home=self.vgrid_home,
+            mig_system_files=system_files, vgrid_owners='owners',
+            vgrid_members='members', vgrid_resources='resources',
+            vgrid_triggers='triggers')
+        invalidate_vgrid_index(self.vgrid_conf)
+        self._write('Top', 'owners', [TEST_OWNER])
+        self._write('Top', 'members', [TEST_MEMBER])
+        self._write('Top', 'resources', [TEST_RESOURCE])
+        self._write('Top/Sub', 'owners', [])
+        self._write('Top/Sub', 'members', ['/C=SE/*'])
+        self._write('Top/Sub', 'resources', [])
+
+    def _write(self, vgrid_name, kind, entries):
+        vgrid_dir = os.path.join(self.vgrid_home, vgrid_name)
+        if not os.path.isdir(vgrid_dir):
+            os.makedirs(vgrid_dir)
+        dump(entries, os.path.join(vgrid_dir, kind))
+
+    def test_inherited_participation(self):
+        self.assertTrue(vgrid_is_owner('Top/Sub', TEST_OWNER,
+                                       self.vgrid_conf))
+        self.assertFalse(vgrid_is_owner('Top/Sub', TEST_OWNER,
+                                        self.vgrid_conf, recursive=False))
+        self.assertTrue(vgrid_is_member('Top/Sub', TEST_MEMBER,
+                                        self.vgrid_conf))
+        self.assertTrue(vgrid_is_member('Top/Sub', '/C=SE/CN=Wild',
+                                        self.vgrid_conf))
+        self.assertFalse(vgrid_is_member('Top', '/C=SE/CN=Wild',
+                                         self.vgrid_conf))
+        self.assertTrue(vgrid_is_resource('Top/Sub', TEST_RESOURCE,
+                                          self.vgrid_conf))
+        self.assertEqual(vgrid_list('Top/Sub', 'members', self.vgrid_conf),
+                         (True, [TEST_MEMBER, '/C=SE/*']))
+        # NOTE: repeated checks must not load entity files again
+        loads = get_vgrid_index(self.vgrid_conf).get_stats()['loads']
+        for _ in range(3):
+            vgrid_is_owner('Top/Sub', TEST_OTHER, self.vgrid_conf)
+        self.assertEqual(get_vgrid_index(self.vgrid_conf).get_stats()['loads'],
+                         loads)
+
+    def test_missing_entity_file(self):
+        self.logger.forgive_errors()
+        os.makedirs(os.path.join(self.vgrid_home, 'Top', 'Bare'))
+        self.assertFalse(vgrid_is_owner('Top/Bare', TEST_OWNER,
+                                        self.vgrid_conf))
+        (status, owners) = vgrid_list('Top/Bare', 'owners', self.vgrid_conf,
+                                      allow_missing=True)
+        self.assertTrue(status)
+        self.assertEqual(owners, [TEST_OWNER])
+
+    def test_reverse_lookup(self):
+        self.assertEqual(index_entity_vgrids(self.vgrid_conf, TEST_OWNER),
+                         ['Top', 'Top/Sub'])
+        self.assertEqual(index_entity_vgrids(self.vgrid_conf,
+                                             '/C=SE/CN=Wild'), ['Top/Sub'])
+        self.assertEqual(user_allowed_vgrids(self.vgrid_conf, TEST_OTHER),
+                         ['Generic'])
+        self.assertEqual(res_allowed_vgrids(self.vgrid_conf, TEST_RESOURCE),
+                         ['Top', 'Top/Sub', 'Generic'])
+
+    def test_invalidate_on_write(self):
+        self.assertFalse(vgrid_is_member('Top/Sub', TEST_OTHER,
+                                         self.vgrid_conf))
+        self.assertEqual(index_entity_vgrids(self.vgrid_conf, TEST_OTHER), [])
+        vgrid_add_members(self.vgrid_conf, 'Top', [TEST_OTHER])
+        self.assertTrue(vgrid_is_member('Top/Sub', TEST_OTHER,
+                                        self.vgrid_conf))
+        self.assertEqual(index_entity_vgrids(self.vgrid_conf, TEST_OTHER),
+                         ['Top', 'Top/Sub'])
+
+    def test_detect_write_from_other_process(self):
+        self.assertTrue(vgrid_is_member('Top', TEST_MEMBER, self.vgrid_conf))
+        # NOTE: simulate another process writing and bumping the marker
+        self._write('Top', 'members', [])
+        marker_path = os.path.join(self.vgrid_home, '.vgridindex')
+        with open(marker_path, 'w') as marker_fd:
+            marker_fd.write('changed')
+        self.assertFalse(vgrid_is_member('Top', TEST_MEMBER,
+                                         self.vgrid_conf))
+        self.assertFalse(vgrid_is_member('Top/Sub', TEST_MEMBER,
+                                         self.vgrid_conf))
+
+
+if __name__ == '__main__':
+    testmain()
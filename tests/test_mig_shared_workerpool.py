@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# --- BEGIN_HEADER ---
+#
+# test_mig_shared_workerpool - unit test of the corresponding mig shared module
+# Copyright (C) 2003-2026  The MiG Project by the Science HPC Center at UCPH
+#
+# This file is part of MiG.
+#
+# MiG is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# MiG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+# USA.
+#
+# --- END_HEADER ---
+#
+
+"""Unit tests for the bounded worker pool"""
+
+import threading
+import time
+
+from tests.support import MigTestCase, testmain
+
+from mig.shared.workerpool import WorkerPool
+
+
+class MigSharedWorkerPool(MigTestCase):
+    """Coverage of worker pool execution, backpressure and stats"""
+
+    def test_runs_all_tasks(self):
+        results = []
+        pool = WorkerPool('test', 3, self.logger)
+        pool.start()
+        for i in range(20):
+            self.assertTrue(pool.submit(results.append, i))
+        pool.shutdown()
+        self.assertEqual(sorted(results), list(range(20)))
+        stats = pool.get_stats()
+        self.assertEqual(stats['submitted'], 20)
+        self.assertEqual(stats['completed'], 20)
+        self.assertEqual(stats['queued'], 0)
+
+    def test_rejects_when_full(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(10)
+
+        pool = WorkerPool('test', 1, self.logger, max_queue=1)
+        pool.start()
+        self.assertTrue(pool.submit(blocker))
+        started.wait(10)
+        self.assertTrue(pool.submit(blocker, block=False))
+        self.assertFalse(pool.submit(blocker, block=False))
+        release.set()
+        pool.shutdown()
+        self.assertEqual(pool.get_stats()['rejected'], 1)
+
+    def test_coalesces_pending_duplicates(self):
+        release = threading.Event()
+        started = threading.Event()
+        results = []
+
+        def blocker():
+            started.set()
+            release.wait(10)
+
+        pool = WorkerPool('test', 1, self.logger)
+        pool.start()
+        pool.submit(blocker)
+        started.wait(10)
+        for _ in range(5):
+            self.assertTrue(pool.submit(results.append, 'a',
+                                        coalesce_key='a'))
+        self.assertTrue(pool.submit(results.append, 'b', coalesce_key='b'))
+        release.set()
+        pool.shutdown()
+        self.assertEqual(sorted(results), ['a', 'b'])
+        self.assertEqual(pool.get_stats()['coalesced'], 4)
+
+    def test_shutdown_with_full_queue_and_stuck_worker(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(10)
+
+        pool = WorkerPool('test', 1, self.logger, max_queue=1)
+        pool.start()
+        pool.submit(blocker)
+        started.wait(10)
+        pool.submit(blocker)
+        before = time.time()
+        pool.shutdown(timeout=0.5)
+        self.assertTrue(time.time() - before < 5)
+        release.set()
+
+    def test_submit_later_runs_when_due(self):
+        done = threading.Event()
+        pool = WorkerPool('test', 1, self.logger)
+        pool.start()
+        before = time.time()
+        pool.submit_later(0.2, done.set)
+        self.assertEqual(pool.get_stats()['waiting'], 1)
+        self.assertTrue(done.wait(10))
+        self.assertTrue(time.time() - before >= 0.2)
+        pool.shutdown()
+        self.assertEqual(pool.get_stats()['waiting'], 0)
+
+    def test_submit_later_does_not_hold_workers(self):
+        done = threading.Event()
+        pool = WorkerPool('test', 1, self.logger)
+        pool.start()
+        pool.submit_later(60, done.set)
+        pool.submit(done.set)
+        self.assertTrue(done.wait(10))
+        pool.shutdown()
+
+    def test_submit_later_coalesces_on_insert(self):
+        results = []
+        pool = WorkerPool('test', 1, self.logger)
+        pool.start()
+        for _ in range(5):
+            self.assertTrue(pool.submit_later(0.2, results.append, 'a',
+                                              coalesce_key='a'))
+        self.assertTrue(pool.submit_later(0.2, results.append, 'b',
+                                          coalesce_key='b'))
+        stats = pool.get_stats()
+        self.assertEqual(stats['waiting'], 2)
+        self.assertEqual(stats['coalesced'], 4)
+        time.sleep(0.5)
+        pool.shutdown()
+        self.assertEqual(sorted(results), ['a', 'b'])
+
+    def test_submit_later_drops_overflow(self):
+        pool = WorkerPool('test', 1, self.logger, max_delayed=2)
+        pool.start()
+        self.assertTrue(pool.submit_later(60, len, 'a'))
+        self.assertTrue(pool.submit_later(60, len, 'b'))
+        self.assertFalse(pool.submit_later(60, len, 'c'))
+        stats = pool.get_stats()
+        self.assertEqual(stats['waiting'], 2)
+        self.assertEqual(stats['dropped'], 1)
+        pool.shutdown()
+
+    def test_counts_failures(self):
+        def failing():
+            raise ValueError('expected failure')
+
+        self.logger.forgive_errors()
+        pool = WorkerPool('test', 1, self.logger)
+        pool.start()
+        pool.submit(failing)
+        pool.shutdown()
+        self.assertEqual(pool.get_stats()['failed'], 1)
+
+
+if __name__ == '__main__':
+    testmain()
@@ -30,11 +30,14 @@
 import codecs
 from configparser import ConfigParser
 import importlib
+from io import BytesIO
 import os
 import stat
 import sys
+from wsgiref.util import FileWrapper
 
-from tests.support import PY2, MIG_BASE, MigTestCase, testmain, is_path_within
+from tests.support import PY2, MIG_BASE, MigTestCase, testmain, \
+    is_path_within, temppath
 from tests.support.snapshotsupp import SnapshotAssertMixin
 from tests.support.wsgisupp import prepare_wsgi, WsgiAssertMixin
 
@@ -304,5 +307,91 @@ class MigWsgibin_output_objects(MigTestCase, WsgiAssertMixin, SnapshotAssertMixi
         self.assertSnapshotOfHtmlContent(output)
 
 
+class MigWsgibin_file_stream(MigTestCase, WsgiAssertMixin):
+    """WSGI delivery of streamed file output"""
+
+    TEST_DATA = b'0123456789abcdef'
+
+    def _provide_configuration(self):
+        return 'testconfig'
+
+    def _stream_request(self, headers=None, real_file=False):
+        """Request streamed file output and return response iterable. The
+        optional real_file arg streams from an open file and provides a
+        wsgi.file_wrapper to exercise the sendfile path.
+        """
+        if real_file:
+            stream_path = temppath('stream_data', self)
+            with open(stream_path, 'wb') as stream_fd:
+                stream_fd.write(self.TEST_DATA)
+            stream = open(stream_path, 'rb')
+            self.addCleanup(stream.close)
+        else:
+            stream = BytesIO(self.TEST_DATA)
+        self.fake_backend = FakeBackend()
+        self.fake_backend.set_response([
+            {'object_type': 'start', 'headers': [
+                ('Content-Type', 'application/octet-stream'),
+                ('Content-Length', "%d" % len(self.TEST_DATA))]},
+            {'object_type': 'file_stream', 'stream': stream,
+             'size': len(self.TEST_DATA)},
+        ], returnvalues.OK)
+        self.fake_wsgi = prepare_wsgi(self.configuration,
+                                      'http://localhost/?output_format=file',
+                                      headers=headers)
+        if real_file:
+            self.fake_wsgi.environ['wsgi.file_wrapper'] = FileWrapper
+        return migwsgi.application(
+            self.fake_wsgi.environ,
+            self.fake_wsgi.start_response,
+            configuration=self.configuration,
+            _import_module=self.fake_backend.to_import_module(),
+            _set_os_environ=False,
+        )
+
+    def test_stream_delivers_full_content(self):
+        wsgi_result = self._stream_request()
+
+        output, headers = self.assertWsgiResponse(wsgi_result, self.fake_wsgi,
+                                                  200)
+        self.assertEqual(output, self.TEST_DATA.decode('utf8'))
+        self.assertEqual(headers['Content-Length'], '16')
+        self.assertEqual(headers['Accept-Ranges'], 'bytes')
+
+    def test_stream_delivers_requested_range(self):
+        wsgi_result = self._stream_request(headers={'Range': 'bytes=4-9'})
+
+        output, headers = self.assertWsgiResponse(wsgi_result, self.fake_wsgi,
+                                                  206)
+        self.assertEqual(output, '456789')
+        self.assertEqual(headers['Content-Length'], '6')
+        self.assertEqual(headers['Content-Range'], 'bytes 4-9/16')
+
+    def test_stream_file_wrapper_full_content(self):
+        wsgi_result = self._stream_request(real_file=True)
+
+        self.assertIsInstance(wsgi_result, FileWrapper)
+        output, headers = self.assertWsgiResponse(wsgi_result, self.fake_wsgi,
+                                                  200)
+        self.assertEqual(output, self.TEST_DATA.decode('utf8'))
+
+    def test_stream_file_wrapper_range_stops_at_end(self):
+        wsgi_result = self._stream_request(headers={'Range': 'bytes=4-9'},
+                                           real_file=True)
+
+        output, headers = self.assertWsgiResponse(wsgi_result, self.fake_wsgi,
+                                                  206)
+        self.assertEqual(output, '456789')
+        self.assertEqual(headers['Content-Length'], '6')
+
+    def test_stream_refuses_unsatisfiable_range(self):
+        wsgi_result = self._stream_request(headers={'Range': 'bytes=42-'})
+
+        self.assertEqual(list(wsgi_result), [])
+        (status, headers, _) = self.fake_wsgi.start_response.calls[0]
+        self.assertEqual(status[:3], '416')
+        self.assertEqual(dict(headers)['Content-Range'], 'bytes */16')
+
+
 if __name__ == '__main__':
     testmain()